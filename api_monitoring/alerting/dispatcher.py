@@ -0,0 +1,361 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from api_monitoring.config import settings
+from api_monitoring.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Maximum length of a Telegram message text
+MESSAGE_LIMIT = 4096
+
+
+@dataclass(slots=True)
+class TelegramResponse:
+    """Outcome of a single Bot API call."""
+
+    # The "result" object of the response, or None if the call failed
+    result: Optional[Dict[str, Any]] = None
+    # Seconds Telegram asked us to wait before retrying (HTTP 429)
+    retry_after: Optional[float] = None
+
+
+# Performs one Bot API call: (method, payload) -> response
+Sender = Callable[[str, Dict[str, Any]], Awaitable[TelegramResponse]]
+
+# Builds digest message texts out of digest lines, each within MESSAGE_LIMIT
+DigestFormatter = Callable[[List[str]], List[str]]
+
+
+@dataclass(slots=True)
+class DispatchRequest:
+    """A Bot API call waiting in the dispatcher queue."""
+
+    method: str
+    payload: Dict[str, Any]
+    send: Sender
+    future: "asyncio.Future[Optional[Dict[str, Any]]]"
+    # Alerts that may be merged into a digest carry a one-line summary
+    digest_line: Optional[str] = None
+    format_digest: Optional[DigestFormatter] = None
+    # Requests with the same key go to the same chat and may share a digest
+    key: Hashable = None
+    attempts: int = field(default=0)
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the rate of outgoing messages.
+
+    Holds up to burst tokens and refills rate tokens per second. A pause
+    requested by the server (retry_after) empties the bucket until it ends.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the bucket, full.
+
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens
+            clock: Monotonic clock returning seconds
+        """
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accumulated since the last update."""
+        start = max(self.updated, self.paused_until)
+        if now > start:
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self.updated = max(now, self.updated)
+
+    def delay(self) -> float:
+        """
+        Return how long to wait before a token is available.
+
+        Returns:
+            Seconds until the next token, 0 if one is available now
+        """
+        now = self.clock()
+        if now < self.paused_until:
+            return self.paused_until - now + max(0.0, 1 - self.tokens) / self.rate
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> None:
+        """Wait for a token and take it."""
+        while True:
+            delay = self.delay()
+            if delay <= 0:
+                self.tokens -= 1
+                return
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Take no tokens for the given number of seconds."""
+        now = self.clock()
+        self._refill(now)
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, now + seconds)
+
+
+class TelegramDispatcher:
+    """
+    Sends Bot API calls from a single background task.
+
+    Calls are queued and sent one at a time through a token bucket, so a burst
+    of alerts cannot exceed Telegram's per-chat rate limits. A call rejected
+    with HTTP 429 is retried once its retry_after has passed. Alerts for
+    different targets queued within digest_window seconds of each other are
+    merged into one digest message.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 3,
+        digest_window: float = 1.0,
+        max_queue: int = 1000,
+        max_retries: int = 5,
+    ):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            rate: Messages per second sent on average
+            burst: Messages that may be sent back to back
+            digest_window: Seconds to wait for more alerts to merge into a digest
+            max_queue: Maximum number of queued calls; callers wait beyond it
+            max_retries: Attempts per call after HTTP 429 responses
+        """
+        self.bucket = TokenBucket(rate, burst)
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.max_queue = max_queue
+        self._queue: Optional["asyncio.Queue[DispatchRequest]"] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+        # Delivery statistics
+        self.sent = 0
+        self.rate_limited = 0
+        self.digests = 0
+
+    async def submit(
+        self,
+        send: Sender,
+        method: str,
+        payload: Dict[str, Any],
+        digest_line: Optional[str] = None,
+        format_digest: Optional[DigestFormatter] = None,
+        key: Hashable = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Queue a Bot API call and wait for its result.
+
+        Args:
+            send: Performs the call
+            method: The API method, e.g. "sendMessage"
+            payload: The method parameters
+            digest_line: One-line summary if the call is an alert that may be
+                merged into a digest with others
+            format_digest: Builds the digest messages out of summary lines
+            key: Identifies the chat, only alerts with equal keys are merged
+
+        Returns:
+            The "result" object of the response, or None if the call failed.
+            Alerts sent as part of a digest get {"message_id": ..., "digest": True}.
+        """
+        self.start()
+        assert self._queue is not None
+        future: "asyncio.Future[Optional[Dict[str, Any]]]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        await self._queue.put(
+            DispatchRequest(
+                method, payload, send, future, digest_line, format_digest, key
+            )
+        )
+        return await future
+
+    def start(self) -> None:
+        """Start the dispatcher task if it is not running on the current loop."""
+        if (
+            self._task is None
+            or self._task.done()
+            or self._task.get_loop() is not asyncio.get_running_loop()
+        ):
+            self._queue = asyncio.Queue(self.max_queue)
+            self._task = asyncio.create_task(self._run(), name="telegram-dispatcher")
+
+    async def stop(self) -> None:
+        """Stop the dispatcher, failing the calls that are still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                request = self._queue.get_nowait()
+                if not request.future.done():
+                    request.future.set_result(None)
+
+    async def _run(self) -> None:
+        """Send queued calls until stopped."""
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            request = await queue.get()
+            batch = [request]
+            deferred: List[DispatchRequest] = []
+            if request.digest_line is not None and self.digest_window > 0:
+                await self._collect(request, batch, deferred)
+
+            try:
+                if len(batch) > 1:
+                    await self._send_digest(batch)
+                else:
+                    await self._deliver(request)
+                for other in deferred:
+                    await self._deliver(other)
+            except asyncio.CancelledError:
+                for pending in batch + deferred:
+                    if not pending.future.done():
+                        pending.future.set_result(None)
+                raise
+
+    async def _collect(
+        self,
+        first: DispatchRequest,
+        batch: List[DispatchRequest],
+        deferred: List[DispatchRequest],
+    ) -> None:
+        """Gather the alerts queued within the digest window after the first."""
+        assert self._queue is not None
+        deadline = time.monotonic() + self.digest_window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if request.digest_line is not None and request.key == first.key:
+                batch.append(request)
+            else:
+                deferred.append(request)
+
+    async def _call(self, request: DispatchRequest) -> Optional[Dict[str, Any]]:
+        """Make a call within the rate limit, retrying after HTTP 429."""
+        while True:
+            await self.bucket.acquire()
+            request.attempts += 1
+            response = await request.send(request.method, request.payload)
+            if response.retry_after is None:
+                if response.result is not None:
+                    self.sent += 1
+                return response.result
+
+            self.rate_limited += 1
+            self.bucket.pause(response.retry_after)
+            if request.attempts >= self.max_retries:
+                logger.error(
+                    f"Telegram {request.method} still rate limited after "
+                    f"{request.attempts} attempts, giving up"
+                )
+                return None
+            logger.warning(
+                f"Telegram rate limit hit, retrying {request.method} "
+                f"in {response.retry_after:g} seconds"
+            )
+
+    async def _deliver(self, request: DispatchRequest) -> None:
+        """Send a single call and resolve its future."""
+        try:
+            result = await self._call(request)
+        except Exception as e:
+            logger.error(f"Telegram {request.method} failed: {e}", exc_info=True)
+            result = None
+        if not request.future.done():
+            request.future.set_result(result)
+
+    async def _send_digest(self, batch: List[DispatchRequest]) -> None:
+        """Send several alerts as one digest and resolve their futures."""
+        first = batch[0]
+        assert first.format_digest is not None
+        lines = [request.digest_line or "" for request in batch]
+        logger.info(f"Sending digest of {len(batch)} alerts")
+
+        message_id: Optional[int] = None
+        for text in first.format_digest(lines):
+            payload = {**first.payload, "text": text}
+            request = DispatchRequest("sendMessage", payload, first.send, first.future)
+            try:
+                result = await self._call(request)
+            except Exception as e:
+                logger.error(f"Telegram digest failed: {e}", exc_info=True)
+                result = None
+            if result is not None and message_id is None:
+                message_id = int(result.get("message_id", 0))
+        self.digests += 1
+
+        digest_result = (
+            None if message_id is None else {"message_id": message_id, "digest": True}
+        )
+        for request in batch:
+            if not request.future.done():
+                request.future.set_result(digest_result)
+
+
+def split_lines(header: str, lines: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Split a header and lines into as few messages as fit within the limit.
+
+    Every message starts with the header; lines are never broken up, a line
+    longer than the limit is cut.
+
+    Args:
+        header: Text repeated at the top of every message
+        lines: Lines to distribute over the messages
+        limit: Maximum message length
+
+    Returns:
+        The message texts
+    """
+    messages: List[str] = []
+    current = header
+    room = limit - len(header)
+    for line in lines:
+        line = line[: max(room - 1, 0)]
+        if current != header and len(current) + len(line) + 1 > limit:
+            messages.append(current)
+            current = header
+        current = f"{current}\n{line}" if current else line
+    if current != header or not messages:
+        messages.append(current)
+    return messages
+
+
+# Create the dispatcher shared by all alerters of the process
+telegram_dispatcher = TelegramDispatcher(
+    rate=settings.telegram_rate_limit,
+    burst=settings.telegram_burst,
+    digest_window=settings.telegram_digest_window,
+)
@@ -0,0 +1,566 @@
+"""
+Durable outbox of alert notifications.
+
+Notifications are queued here instead of being sent from the monitoring
+cycle, so a probe never waits on an alert sink. Every sink has its own queue
+per target, delivered strictly in order by a background task that retries
+with exponential backoff while the sink is unreachable. Queues of different
+sinks and targets are delivered concurrently: a slow sink delays neither the
+other sinks nor the probes, and alerts raised together can still be merged
+into a Telegram digest.
+
+The outbox is an append-only JSON lines file with three kinds of records:
+
+    {"op": "add", "id": 7, "target": "api", "notification": {...}}
+    {"op": "done", "id": 7, "target": "api", "sink": "telegram",
+     "delivered": true, "message_id": 42}
+    {"op": "state", "target": "api", "open": true, "threads": {...}}
+
+Replaying the file on startup restores the undelivered notifications and the
+open alert of every target, including what follow-ups refer to in every sink.
+Once enough records are obsolete the file is rewritten atomically with state
+records followed by the pending notifications, each limited to the sinks that
+have not delivered it yet. Delivery is at least once: a notification sent
+just before a crash may be sent again.
+
+Records are appended by a single writer task in a worker thread, so the
+event loop never waits on the disk; records queued while a write is in
+progress share the next fsync. A record takes effect once it is on disk, so
+a notification is never delivered before it is persisted. If a write fails,
+e.g. on a full disk, the records take effect in memory instead so alerts are
+still delivered, and the file is rewritten from memory with backoff until
+the disk accepts it again.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    TextIO,
+    Tuple,
+)
+
+from api_monitoring.alerting.sinks import (
+    ALERT_KINDS,
+    AlertSink,
+    AlertThread,
+    Notification,
+)
+from api_monitoring.utils.logging import get_logger
+from api_monitoring.utils.metrics import alert_deliveries_total, alert_outbox_pending
+
+logger = get_logger(__name__)
+
+# Obsolete records tolerated in the file before it is rewritten
+COMPACT_AFTER = 1000
+
+# Queues are kept per sink name and target name
+QueueKey = Tuple[str, str]
+
+
+@dataclass(slots=True)
+class OutboxEntry:
+    """A notification waiting to be delivered."""
+
+    id: int
+    target: str
+    notification: Notification
+    # Wall clock time the entry was queued
+    created: float = 0.0
+
+
+class AlertOutbox:
+    """
+    Queues alert notifications on disk and delivers them to every sink in the
+    background.
+
+    Queuing a notification only appends a line to the outbox file, so the
+    monitoring cycle does not wait for any sink, nor block the event loop on
+    the disk. Diagnostics are queued with
+    the alert, so they are never collected twice for one alert.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        sinks: Sequence[AlertSink] = (),
+        retry_delay: float = 5.0,
+        retry_max_delay: float = 300.0,
+        max_age: float = 86400.0,
+        compact_after: int = COMPACT_AFTER,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Open the outbox, replaying the notifications left in its file.
+
+        Args:
+            path: File keeping the outbox across restarts (None or empty keeps
+                it in memory only)
+            sinks: The destinations every notification is delivered to
+            retry_delay: Seconds before the first retry of a failed delivery
+            retry_max_delay: Upper bound of the retry backoff
+            max_age: Seconds after which an undelivered notification is dropped
+            compact_after: Obsolete records in the file before it is rewritten
+            clock: Wall clock returning seconds, used for the age of entries
+        """
+        self.path = Path(path) if path else None
+        self.sinks: Dict[str, AlertSink] = {}
+        for sink in sinks:
+            if sink.name in self.sinks:
+                raise ValueError(f"Duplicate alert sink name {sink.name!r}")
+            self.sinks[sink.name] = sink
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.max_age = max_age
+        self.compact_after = compact_after
+        self.clock = clock
+
+        self._queues: Dict[QueueKey, Deque[OutboxEntry]] = {}
+        self._threads: Dict[QueueKey, AlertThread] = {}
+        self._open: Set[str] = set()
+        self._tasks: Dict[QueueKey, "asyncio.Task[None]"] = {}
+        self._next_id = 1
+        self._file: Optional[TextIO] = None
+        self._obsolete = 0
+        # Encoded records waiting for the writer, applied once they are synced
+        self._writes: List[Tuple[str, Callable[[], None], "asyncio.Future[None]"]] = []
+        self._writer: Optional["asyncio.Task[None]"] = None
+        # Whether the file misses records applied while the disk failed
+        self._stale = False
+
+        # Delivery statistics
+        self.delivered = 0
+        self.retries = 0
+        self.dropped = 0
+        self.syncs = 0
+
+        if self.path is not None:
+            # Still before the event loop starts, so done synchronously
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._load()
+            self._rewrite(self._live_records())
+
+    def _load(self) -> None:
+        """Replay the outbox file."""
+        assert self.path is not None
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                    op = record.pop("op")
+                    if op == "add":
+                        sinks = record.pop("sinks", None)
+                        notification = Notification(**record.pop("notification"))
+                        entry = OutboxEntry(notification=notification, **record)
+                        self._apply_add(entry, sinks)
+                    elif op == "done":
+                        self._apply_done(**record)
+                    elif op == "state":
+                        self._apply_state(**record)
+                except (ValueError, TypeError, KeyError) as e:
+                    # A crash while appending leaves a torn last line
+                    logger.warning(f"Skipping bad outbox record at line {number}: {e}")
+
+        pending = self.pending()
+        if pending:
+            logger.info(f"Replaying {pending} undelivered notifications from outbox")
+
+    def _apply_add(
+        self, entry: OutboxEntry, sinks: Optional[Sequence[str]] = None
+    ) -> None:
+        """Queue an entry for its sinks and update the alert state of its target."""
+        for name in self.sinks if sinks is None else sinks:
+            if name not in self.sinks:
+                continue
+            queue = self._queues.setdefault((name, entry.target), deque())
+            queue.append(entry)
+            alert_outbox_pending.labels(name, entry.target).set(len(queue))
+        self._next_id = max(self._next_id, entry.id + 1)
+        if entry.notification.kind == "alert":
+            self._open.add(entry.target)
+        elif entry.notification.kind == "resolution":
+            self._open.discard(entry.target)
+
+    def _apply_done(
+        self,
+        id: int,
+        target: str,
+        sink: str,
+        delivered: bool,
+        message_id: Optional[Any] = None,
+        digest: bool = False,
+    ) -> None:
+        """Remove an entry finished by a sink and remember the alert it delivered."""
+        key = (sink, target)
+        queue = self._queues.get(key)
+        if not queue:
+            return
+        entry = next((entry for entry in queue if entry.id == id), None)
+        if entry is None:
+            return
+        queue.remove(entry)
+        alert_outbox_pending.labels(sink, target).set(len(queue))
+        if not queue:
+            del self._queues[key]
+
+        kind = entry.notification.kind
+        if kind == "alert" and delivered:
+            self._threads[key] = AlertThread(message_id, digest)
+        elif kind in ("alert", "resolution"):
+            self._threads.pop(key, None)
+
+    def _apply_state(
+        self,
+        target: str,
+        open: bool,
+        threads: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> None:
+        """Restore the alert state of a target written by a compaction."""
+        if open:
+            self._open.add(target)
+        for sink, thread in (threads or {}).items():
+            if sink in self.sinks:
+                self._threads[(sink, target)] = AlertThread(**thread)
+
+    async def _commit(self, record: Dict[str, Any], apply: Callable[[], None]) -> None:
+        """
+        Persist a record, then apply it to the in-memory state.
+
+        Args:
+            record: The record appended to the outbox file
+            apply: Applies the record once it is on disk, even if the caller
+                stops waiting for it
+        """
+        if self.path is None or self._stale:
+            # A stale file is rewritten from memory by the writer
+            apply()
+            return
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[None]" = loop.create_future()
+        self._writes.append((json.dumps(record, separators=(",", ":")), apply, future))
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write_batches(), name="outbox-writer")
+        await future
+
+    async def _write_batches(self) -> None:
+        """Append the queued records in batches until none are left."""
+        while self._writes:
+            batch, self._writes = self._writes, []
+            try:
+                await asyncio.to_thread(self._append, [line for line, _, _ in batch])
+            except Exception as e:
+                logger.error(
+                    f"Failed to write alert outbox {self.path}, "
+                    f"delivering from memory: {e}"
+                )
+                self._stale = True
+                batch += self._writes
+                self._writes = []
+                self._apply_batch(batch)
+                await self._recover()
+                continue
+            self._apply_batch(batch)
+
+            if self._obsolete >= self.compact_after:
+                # The records are built on the loop, so they match the state
+                records = self._live_records()
+                try:
+                    await asyncio.to_thread(self._rewrite, records)
+                except OSError as e:
+                    logger.error(f"Failed to compact alert outbox {self.path}: {e}")
+
+    def _apply_batch(
+        self, batch: List[Tuple[str, Callable[[], None], "asyncio.Future[None]"]]
+    ) -> None:
+        """Apply written records and release the callers waiting for them."""
+        for _, apply, future in batch:
+            apply()
+            if not future.done():
+                future.set_result(None)
+
+    async def _recover(self) -> None:
+        """Rewrite a stale file from memory, with backoff until it succeeds."""
+        attempts = 0
+        while self._stale:
+            attempts += 1
+            delay = min(
+                self.retry_delay * 2 ** min(attempts - 1, 32), self.retry_max_delay
+            )
+            await asyncio.sleep(delay)
+            # The records are built on the loop, so they match the state
+            records = self._live_records()
+            try:
+                await asyncio.to_thread(self._rewrite, records)
+            except OSError as e:
+                logger.error(f"Failed to rewrite alert outbox {self.path}: {e}")
+                continue
+            self._stale = False
+            logger.info(f"Alert outbox {self.path} is written again")
+
+    def _append(self, lines: List[str]) -> None:
+        """Append lines to the outbox file and sync it to disk, in one fsync."""
+        assert self.path is not None
+        if self._file is None:
+            self._file = self.path.open("a", encoding="utf-8")
+        self._file.write("".join(line + "\n" for line in lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.syncs += 1
+
+    def _live_records(self) -> List[Dict[str, Any]]:
+        """Build the records restoring the live state: states, then pending entries."""
+        records = []
+        threads: Dict[str, Dict[str, Any]] = {}
+        for (sink, target), thread in self._threads.items():
+            threads.setdefault(target, {})[sink] = asdict(thread)
+        for target in sorted(self._open | set(threads)):
+            records.append(
+                {
+                    "op": "state",
+                    "target": target,
+                    "open": target in self._open,
+                    "threads": threads.get(target, {}),
+                }
+            )
+
+        # Every pending entry once, limited to the sinks still delivering it
+        entries: Dict[int, OutboxEntry] = {}
+        entry_sinks: Dict[int, List[str]] = {}
+        for (sink, _), queue in self._queues.items():
+            for entry in queue:
+                entries[entry.id] = entry
+                entry_sinks.setdefault(entry.id, []).append(sink)
+        for entry_id in sorted(entries):
+            records.append(
+                {
+                    "op": "add",
+                    **asdict(entries[entry_id]),
+                    "sinks": sorted(entry_sinks[entry_id]),
+                }
+            )
+        return records
+
+    def _rewrite(self, records: List[Dict[str, Any]]) -> None:
+        """Atomically replace the file with the given records."""
+        if self.path is None:
+            return
+        if self._file is not None:
+            file, self._file = self._file, None
+            try:
+                file.close()
+            except OSError:
+                # A failed append left unwritten lines, replaced by this rewrite
+                pass
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._obsolete = 0
+
+    def is_open(self, target: str) -> bool:
+        """Whether an alert was queued for a target and not resolved since."""
+        return target in self._open
+
+    def pending(self, target: Optional[str] = None) -> int:
+        """
+        Return the number of undelivered notifications, counted once per sink.
+
+        Args:
+            target: Count only the notifications of this target
+
+        Returns:
+            The number of queued deliveries
+        """
+        return sum(
+            len(queue)
+            for (_, queue_target), queue in self._queues.items()
+            if target is None or queue_target == target
+        )
+
+    async def add(self, target: str, notification: Notification) -> OutboxEntry:
+        """
+        Queue a notification for every sink and wake up their delivery.
+
+        Returns once the notification is on disk, or queued in memory while the
+        disk fails, without waiting for any sink.
+
+        Args:
+            target: The target name
+            notification: The notification
+
+        Returns:
+            The queued entry
+        """
+        if notification.kind not in ALERT_KINDS:
+            raise ValueError(f"Unknown notification kind {notification.kind!r}")
+        entry = OutboxEntry(self._next_id, target, notification, self.clock())
+        # Reserved now, as other entries may be added while this one is written
+        self._next_id += 1
+
+        def apply() -> None:
+            self._apply_add(entry)
+            for sink in self.sinks:
+                self._wake((sink, target))
+
+        await self._commit({"op": "add", **asdict(entry)}, apply)
+        return entry
+
+    async def _done(
+        self,
+        sink: str,
+        entry: OutboxEntry,
+        delivered: bool,
+        thread: Optional[AlertThread] = None,
+    ) -> None:
+        """Record that a sink delivered or dropped an entry."""
+        record: Dict[str, Any] = {
+            "op": "done",
+            "id": entry.id,
+            "target": entry.target,
+            "sink": sink,
+            "delivered": delivered,
+        }
+        if thread is not None and thread.message_id is not None:
+            record["message_id"] = thread.message_id
+            record["digest"] = thread.in_digest
+
+        def apply() -> None:
+            self._apply_done(**{k: v for k, v in record.items() if k != "op"})
+            self._obsolete += 1
+
+        await self._commit(record, apply)
+
+    def start(self) -> None:
+        """Start delivering the notifications replayed from the file."""
+        for key in list(self._queues):
+            self._wake(key)
+
+    def _wake(self, key: QueueKey) -> None:
+        """Start the delivery task of a queue unless it is running."""
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not in the event loop yet, start() picks the entry up
+            return
+        sink, target = key
+        self._tasks[key] = loop.create_task(
+            self._drain(key), name=f"outbox-{sink}-{target}"
+        )
+
+    async def _drain(self, key: QueueKey) -> None:
+        """Deliver a queue in order, retrying with backoff."""
+        name, target = key
+        sink = self.sinks[name]
+        attempts = 0
+        while self._queues.get(key):
+            entry = self._queues[key][0]
+            kind = entry.notification.kind
+            age = self.clock() - entry.created
+            if age > self.max_age:
+                logger.error(
+                    f"Dropping {kind} for {target} in {name}, "
+                    f"undelivered for {age:.0f}s"
+                )
+                self.dropped += 1
+                alert_deliveries_total.labels(name, target, "dropped").inc()
+                await self._done(name, entry, delivered=False)
+                attempts = 0
+                continue
+
+            try:
+                thread = await sink.deliver(entry.notification, self._threads.get(key))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"Delivering {kind} for {target} to {name} failed: {e}",
+                    exc_info=True,
+                )
+                thread = None
+
+            if thread is not None:
+                self.delivered += 1
+                alert_deliveries_total.labels(name, target, "delivered").inc()
+                await self._done(name, entry, True, thread)
+                attempts = 0
+                continue
+
+            attempts += 1
+            self.retries += 1
+            alert_deliveries_total.labels(name, target, "retried").inc()
+            delay = min(
+                self.retry_delay * 2 ** min(attempts - 1, 32), self.retry_max_delay
+            )
+            logger.warning(
+                f"Could not deliver {kind} for {target} to {name}, "
+                f"retrying in {delay:g} seconds"
+            )
+            await asyncio.sleep(delay)
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued notification is delivered or dropped.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            True if the outbox is empty, False if the timeout expired first
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            tasks = [task for task in self._tasks.values() if not task.done()]
+            if not tasks:
+                return not self._queues
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            await asyncio.wait(tasks, timeout=remaining)
+
+    async def stop(self) -> None:
+        """Stop delivering, keeping undelivered notifications in the file."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        # Records already queued are still written
+        if self._writer is not None:
+            if self._stale:
+                # Do not wait for the backoff, the file is rewritten below
+                self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        if self._stale:
+            try:
+                await asyncio.to_thread(self._rewrite, self._live_records())
+                self._stale = False
+            except OSError as e:
+                logger.error(f"Failed to rewrite alert outbox {self.path}: {e}")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        pending = self.pending()
+        if pending:
+            logger.info(f"{pending} undelivered notifications left in outbox")
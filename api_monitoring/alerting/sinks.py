@@ -0,0 +1,488 @@
+import asyncio
+import html
+import smtplib
+import ssl
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from email.message import EmailMessage
+from email.utils import make_msgid
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import aiohttp
+
+from api_monitoring.alerting.telegram import TelegramAlerter, fit_trace, shorten
+from api_monitoring.config import Settings
+from api_monitoring.utils.http import http_session_manager
+from api_monitoring.utils.logging import get_logger
+from api_monitoring.utils.network import ExternalIPCache, external_ip_cache
+
+logger = get_logger(__name__)
+
+# Kinds of notifications: the alert itself, its diagnostics and its resolution
+ALERT_KINDS = ("alert", "diagnostics", "resolution")
+
+# Longest trace included in a Slack message
+SLACK_TRACE_LIMIT = 3000
+
+
+@dataclass(slots=True)
+class Notification:
+    """A sink-independent alert notification, formatted by every sink itself."""
+
+    # "alert" (sent at once), "diagnostics" (the alert completed with
+    # diagnostics) or "resolution"
+    kind: str
+    # The target API shown in the notification
+    target: str
+    # Time of the alert, shared by all notifications of one alert
+    timestamp: str
+    error_message: Optional[str] = None
+    comment: Optional[str] = None
+    mtr_output: Optional[str] = None
+    diagnostics: Optional[str] = None
+
+
+@dataclass(slots=True)
+class AlertThread:
+    """The delivered alert of a target in one sink, which follow-ups refer to."""
+
+    # Telegram message id or e-mail Message-ID of the alert
+    message_id: Optional[Union[int, str]] = None
+    # Whether the alert went out as part of a digest of several targets
+    in_digest: bool = False
+
+
+class AlertSink(ABC):
+    """
+    Base class of alert destinations.
+
+    Every sink limits how many notifications it sends at once; the outbox
+    gives it a queue of its own, so a slow sink never delays the others.
+    """
+
+    def __init__(self, name: str, timeout: float = 10.0, concurrency: int = 4):
+        """
+        Initialize the sink.
+
+        Args:
+            name: Name of the sink, unique within the outbox
+            timeout: Timeout of a single delivery in seconds
+            concurrency: Maximum number of deliveries in progress at once
+        """
+        self.name = name
+        self.timeout = timeout
+        self.concurrency = max(concurrency, 1)
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def deliver(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> Optional[AlertThread]:
+        """
+        Deliver a notification within the concurrency limit.
+
+        Args:
+            notification: The notification to deliver
+            thread: The delivered alert the notification follows up on, if any
+
+        Returns:
+            The alert thread (for an alert, the new one), or None if the
+            notification could not be delivered
+        """
+        async with self.semaphore:
+            return await self.send(notification, thread)
+
+    @abstractmethod
+    async def send(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> Optional[AlertThread]:
+        """Send a notification, see deliver()."""
+
+
+class TelegramSink(AlertSink):
+    """
+    Sends notifications to Telegram.
+
+    The alert is posted at once and edited in place with the diagnostics (a
+    reply if it cannot be edited or went out in a digest); resolutions reply
+    to the alert. With a dispatcher, the alerter's calls are queued, rate
+    limited and merged into digests by it, so the concurrency limit only
+    applies to alerters calling the Bot API directly.
+    """
+
+    def __init__(
+        self, alerter: TelegramAlerter, name: str = "telegram", concurrency: int = 4
+    ):
+        """
+        Initialize the sink.
+
+        Args:
+            alerter: Alerter making the Bot API calls, with its own timeout
+            name: Name of the sink
+            concurrency: Maximum number of deliveries in progress at once
+                without a dispatcher
+        """
+        super().__init__(name, alerter.timeout, concurrency)
+        self.alerter = alerter
+
+    async def deliver(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> Optional[AlertThread]:
+        # Holding the semaphore while the dispatcher waits for its digest
+        # window would split simultaneous alerts into digests of concurrency
+        if self.alerter.dispatcher is not None:
+            return await self.send(notification, thread)
+        return await super().deliver(notification, thread)
+
+    async def send(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> Optional[AlertThread]:
+        alerter = self.alerter
+        thread = thread or AlertThread()
+        if notification.kind == "alert":
+            message = await alerter.post_message(
+                alerter.format_alert(
+                    notification.target,
+                    notification.error_message,
+                    notification.comment,
+                    timestamp=notification.timestamp,
+                    pending=True,
+                ),
+                digest_line=alerter.format_digest_line(
+                    notification.target, notification.error_message
+                ),
+            )
+            if message is None:
+                return None
+            return AlertThread(message.message_id or None, message.in_digest)
+
+        if notification.kind == "resolution":
+            text = alerter.format_resolution(notification.target)
+        else:
+            text = alerter.format_alert(
+                notification.target,
+                notification.error_message,
+                notification.comment,
+                notification.mtr_output,
+                notification.diagnostics,
+                timestamp=notification.timestamp,
+            )
+            if isinstance(thread.message_id, int) and not thread.in_digest:
+                if await alerter.edit_message(thread.message_id, text):
+                    return thread
+                logger.warning("Could not edit the alert, replying with diagnostics")
+
+        reply_to = thread.message_id if isinstance(thread.message_id, int) else None
+        message = await alerter.post_message(text, reply_to)
+        return None if message is None else thread
+
+
+class WebhookSink(AlertSink):
+    """Posts every notification as a JSON document to a URL."""
+
+    def __init__(
+        self,
+        url: str,
+        name: str = "webhook",
+        timeout: float = 10.0,
+        concurrency: int = 4,
+        ip_cache: ExternalIPCache = external_ip_cache,
+    ):
+        """
+        Initialize the sink.
+
+        Args:
+            url: URL the notifications are posted to
+            name: Name of the sink
+            timeout: Timeout of a request in seconds
+            concurrency: Maximum number of requests in progress at once
+            ip_cache: Cache providing the source IP included in notifications
+        """
+        super().__init__(name, timeout, concurrency)
+        self.url = url
+        self.ip_cache = ip_cache
+
+    def payload(self, notification: Notification) -> Dict[str, Any]:
+        """
+        Build the JSON document of a notification.
+
+        Args:
+            notification: The notification
+
+        Returns:
+            The document, with the source IP added
+        """
+        return {**asdict(notification), "source_ip": self.ip_cache.get()}
+
+    async def post(self, payload: Dict[str, Any]) -> bool:
+        """
+        Post a JSON document.
+
+        Args:
+            payload: The document
+
+        Returns:
+            True if the server accepted it with a 2xx status, False otherwise
+        """
+        try:
+            session = http_session_manager.get_session()
+            async with session.post(
+                self.url,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            ) as response:
+                if 200 <= response.status < 300:
+                    return True
+                text = await response.text()
+                logger.error(
+                    f"{self.name} sink rejected notification: {response.status} - "
+                    f"{shorten(text, 200)}"
+                )
+                return False
+        except asyncio.TimeoutError:
+            logger.error(f"Timeout posting to {self.name} after {self.timeout:g}s")
+            return False
+        except aiohttp.ClientError as e:
+            logger.error(f"HTTP client error posting to {self.name}: {e}")
+            return False
+
+    async def send(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> Optional[AlertThread]:
+        if not await self.post(self.payload(notification)):
+            return None
+        return thread or AlertThread()
+
+
+class SlackSink(WebhookSink):
+    """Posts notifications to a Slack-compatible incoming webhook."""
+
+    def __init__(
+        self,
+        url: str,
+        name: str = "slack",
+        timeout: float = 10.0,
+        concurrency: int = 4,
+        ip_cache: ExternalIPCache = external_ip_cache,
+    ):
+        """
+        Initialize the sink.
+
+        Args:
+            url: The incoming webhook URL
+            name: Name of the sink
+            timeout: Timeout of a request in seconds
+            concurrency: Maximum number of requests in progress at once
+            ip_cache: Cache providing the source IP included in notifications
+        """
+        super().__init__(url, name, timeout, concurrency, ip_cache)
+
+    def payload(self, notification: Notification) -> Dict[str, Any]:
+        """
+        Build the Slack message of a notification.
+
+        Args:
+            notification: The notification
+
+        Returns:
+            The message, in Slack mrkdwn
+        """
+        # Slack only needs &, < and > escaped
+        target = html.escape(notification.target, quote=False)
+        if notification.kind == "resolution":
+            return {"text": f":large_green_circle: Issue with API {target} resolved!"}
+
+        error = html.escape(
+            shorten(notification.error_message or "Unknown error", 1000), quote=False
+        )
+        lines = [
+            f":rotating_light: *Issue detected with API {target}*",
+            f"*Timestamp:* {notification.timestamp}",
+            f"*Source IP:* {self.ip_cache.get()}",
+            f"*Error:* `{error}`",
+        ]
+        if notification.comment:
+            comment = html.escape(notification.comment, quote=False)
+            lines.append(f"*Comment:* _{comment}_")
+        if notification.diagnostics:
+            diagnostics = html.escape(notification.diagnostics, quote=False)
+            lines.append(f"*Diagnostics:*\n```{diagnostics}```")
+        if notification.mtr_output:
+            trace = fit_trace(
+                html.escape(notification.mtr_output, quote=False), SLACK_TRACE_LIMIT
+            )
+            lines.append(f"*Trace to {target}:*\n```{trace}```")
+        return {"text": "\n".join(lines)}
+
+
+class SmtpSink(AlertSink):
+    """
+    Sends notifications by e-mail.
+
+    The blocking smtplib client runs in a worker thread. Diagnostics and
+    resolutions are threaded to the alert with In-Reply-To headers.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        sender: str,
+        recipients: Sequence[str],
+        port: int = 587,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        name: str = "smtp",
+        timeout: float = 10.0,
+        concurrency: int = 2,
+        ip_cache: ExternalIPCache = external_ip_cache,
+    ):
+        """
+        Initialize the sink.
+
+        Args:
+            host: SMTP server host
+            sender: From address
+            recipients: To addresses
+            port: SMTP server port
+            username: Login user name (no login if None)
+            password: Login password
+            starttls: Upgrade the connection with STARTTLS before logging in
+            name: Name of the sink
+            timeout: Timeout of SMTP socket operations in seconds
+            concurrency: Maximum number of connections at once
+            ip_cache: Cache providing the source IP included in notifications
+        """
+        super().__init__(name, timeout, concurrency)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = list(recipients)
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.ip_cache = ip_cache
+
+    def build_message(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> EmailMessage:
+        """
+        Build the e-mail of a notification.
+
+        Args:
+            notification: The notification
+            thread: The delivered alert the notification follows up on, if any
+
+        Returns:
+            The e-mail, with a new Message-ID
+        """
+        message = EmailMessage()
+        subject = f"API {notification.target} issue detected"
+        if notification.kind == "resolution":
+            body = f"Issue with API {notification.target} resolved."
+            subject = f"Re: {subject}"
+        else:
+            lines = [
+                f"Issue detected with API {notification.target}",
+                f"Timestamp: {notification.timestamp}",
+                f"Source IP: {self.ip_cache.get()}",
+                f"Error: {notification.error_message or 'Unknown error'}",
+            ]
+            if notification.comment:
+                lines.append(f"Comment: {notification.comment}")
+            if notification.kind == "alert":
+                lines.append("Collecting diagnostics...")
+            else:
+                subject = f"Re: {subject}"
+            if notification.diagnostics:
+                lines += ["", "Diagnostics:", notification.diagnostics]
+            if notification.mtr_output:
+                lines += ["", f"Trace to {notification.target}:"]
+                lines.append(notification.mtr_output)
+            body = "\n".join(lines) + "\n"
+
+        message["Subject"] = subject
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.recipients)
+        message["Message-ID"] = make_msgid()
+        if thread is not None and isinstance(thread.message_id, str):
+            message["In-Reply-To"] = thread.message_id
+            message["References"] = thread.message_id
+        message.set_content(body)
+        return message
+
+    def send_sync(self, message: EmailMessage) -> None:
+        """Send an e-mail with the blocking SMTP client."""
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls(context=ssl.create_default_context())
+            if self.username:
+                smtp.login(self.username, self.password or "")
+            smtp.send_message(message)
+
+    async def send(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> Optional[AlertThread]:
+        message = self.build_message(notification, thread)
+        try:
+            await asyncio.to_thread(self.send_sync, message)
+        except (OSError, smtplib.SMTPException) as e:
+            logger.error(f"Sending e-mail through {self.host}:{self.port} failed: {e}")
+            return None
+        if notification.kind == "alert":
+            return AlertThread(message["Message-ID"])
+        return thread or AlertThread()
+
+
+def sinks_from_settings(
+    settings: Settings, telegram_alerter: Optional[TelegramAlerter] = None
+) -> List[AlertSink]:
+    """
+    Create the alert sinks configured in the settings.
+
+    Args:
+        settings: The settings
+        telegram_alerter: Alerter of the Telegram sink, used if the bot token
+            and chat id are set
+
+    Returns:
+        The configured sinks
+    """
+    concurrency = settings.alert_sink_concurrency
+    sinks: List[AlertSink] = []
+    if (
+        telegram_alerter is not None
+        and settings.telegram_bot_token
+        and settings.telegram_chat_id
+    ):
+        sinks.append(TelegramSink(telegram_alerter, concurrency=concurrency))
+    if settings.alert_webhook_url:
+        sinks.append(
+            WebhookSink(
+                settings.alert_webhook_url,
+                timeout=settings.alert_webhook_timeout,
+                concurrency=concurrency,
+            )
+        )
+    if settings.slack_webhook_url:
+        sinks.append(
+            SlackSink(
+                settings.slack_webhook_url,
+                timeout=settings.slack_webhook_timeout,
+                concurrency=concurrency,
+            )
+        )
+    if settings.smtp_host:
+        sinks.append(
+            SmtpSink(
+                settings.smtp_host,
+                settings.smtp_sender,
+                settings.smtp_recipients,
+                port=settings.smtp_port,
+                username=settings.smtp_username,
+                password=settings.smtp_password,
+                starttls=settings.smtp_starttls,
+                timeout=settings.smtp_timeout,
+                concurrency=concurrency,
+            )
+        )
+    return sinks
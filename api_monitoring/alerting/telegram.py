@@ -1,21 +1,105 @@
 import asyncio
 import html
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import aiohttp
 
+from api_monitoring.alerting.dispatcher import (
+    MESSAGE_LIMIT,
+    TelegramDispatcher,
+    TelegramResponse,
+    split_lines,
+    telegram_dispatcher,
+)
 from api_monitoring.config import settings
+from api_monitoring.utils.http import http_session_manager
 from api_monitoring.utils.logging import get_logger
-from api_monitoring.utils.network import get_external_ip
+from api_monitoring.utils.network import ExternalIPCache, external_ip_cache
 
 logger = get_logger(__name__)
 
+# Base URL of the Telegram Bot API
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+# Longest error message shown in an alert and in a digest line
+MAX_ERROR_LENGTH = 1000
+MAX_DIGEST_ERROR_LENGTH = 200
+
+# Trace lines always kept when a trace is shortened (the MTR report header)
+TRACE_HEAD_LINES = 2
+
+
+def shorten(text: str, limit: int) -> str:
+    """Cut text to at most limit characters, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[: max(limit - 1, 0)] + "…"
+
+
+def fit_trace(trace: str, budget: int) -> str:
+    """
+    Shorten an escaped trace to fit a character budget.
+
+    The report header and the hops closest to the target are kept, since they
+    show where the path breaks; the hops in between are replaced by a marker.
+
+    Args:
+        trace: The HTML-escaped trace text
+        budget: Maximum length of the result
+
+    Returns:
+        The trace, shortened if needed
+    """
+    if len(trace) <= budget:
+        return trace
+    lines = trace.splitlines()
+    head = lines[:TRACE_HEAD_LINES]
+    tail: List[str] = []
+    for line in reversed(lines[TRACE_HEAD_LINES:]):
+        omitted = len(lines) - len(head) - len(tail) - 1
+        marker = f"... {omitted} lines omitted ..."
+        if len("\n".join(head + [marker, line] + tail)) > budget:
+            break
+        tail.insert(0, line)
+    omitted = len(lines) - len(head) - len(tail)
+    text = "\n".join(head + [f"... {omitted} lines omitted ..."] + tail)
+    # Cutting escaped text could split an entity, cut before the last "&"
+    if len(text) > budget:
+        text = text[: max(budget - 1, 0)]
+        if "&" in text[-6:]:
+            text = text[: text.rindex("&")]
+        text += "…"
+    return text
+
+
+@dataclass(slots=True)
+class PostedMessage:
+    """A message sent to Telegram."""
+
+    # Message id, 0 if Telegram did not return one
+    message_id: int
+    # Whether the message went out as part of a digest of several targets
+    in_digest: bool = False
+
 
 class TelegramAlerter:
-    """Sends alerts to Telegram."""
+    """
+    Sends alerts to Telegram.
+
+    Alerts can be sent in two steps: send_initial_alert() posts a minimal
+    alert right away and remembers its message id, and enrich_alert() later
+    edits that message to add the diagnostics. send_alert() does both at once.
+    """
 
-    def __init__(self, bot_token: str, chat_id: str, timeout: int = 10):
+    def __init__(
+        self,
+        bot_token: str,
+        chat_id: str,
+        timeout: int = 10,
+        ip_cache: ExternalIPCache = external_ip_cache,
+        api_base_url: str = TELEGRAM_API_URL,
+        dispatcher: Optional[TelegramDispatcher] = None,
+    ):
         """
         Initialize the Telegram alerter.
 
@@ -23,100 +107,229 @@ class TelegramAlerter:
             bot_token: Telegram bot token
             chat_id: Telegram chat ID to send messages to
             timeout: Timeout for Telegram API requests in seconds
+            ip_cache: Cache providing the source IP shown in alerts
+            api_base_url: Base URL of the Telegram Bot API
+            dispatcher: Rate-limited queue all calls go through (calls are made
+                directly if None)
         """
         self.bot_token = bot_token
         self.chat_id = chat_id
-        self.api_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        self.api_base_url = f"{api_base_url.rstrip('/')}/bot{bot_token}"
+        self.api_url = f"{self.api_base_url}/sendMessage"
         self.timeout = timeout
-        self.alert_sent = False
+        self.ip_cache = ip_cache
+        self.dispatcher = dispatcher
 
-    async def send_message(self, text: str) -> bool:
+        # Message id and timestamp of the open alert, used to edit and reply to it
+        self.alert_message_id: Optional[int] = None
+        self.alert_timestamp: Optional[str] = None
+        # Whether the open alert went out as part of a digest of several targets
+        self.alert_in_digest = False
+
+    async def call_api(
+        self,
+        method: str,
+        payload: Dict[str, Any],
+        digest_line: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
         """
-        Send a message to Telegram.
+        Call a Telegram Bot API method, through the dispatcher if there is one.
 
         Args:
-            text: The message text to send
+            method: The API method, e.g. "sendMessage"
+            payload: The method parameters
+            digest_line: One-line summary of an alert that may be merged into a
+                digest with alerts of other targets
 
         Returns:
-            True if the message was sent successfully, False otherwise
+            The "result" object of the response, or None if the call failed
         """
-        logger.info("Sending message to Telegram...")
+        if self.dispatcher is not None:
+            return await self.dispatcher.submit(
+                self.request_api,
+                method,
+                payload,
+                digest_line=digest_line,
+                format_digest=self.format_digest,
+                key=(self.api_base_url, self.chat_id),
+            )
+        response = await self.request_api(method, payload)
+        return response.result
+
+    async def request_api(
+        self, method: str, payload: Dict[str, Any]
+    ) -> TelegramResponse:
+        """
+        Make a single Telegram Bot API request.
 
-        payload = {"chat_id": self.chat_id, "text": text, "parse_mode": "HTML"}
+        Args:
+            method: The API method, e.g. "sendMessage"
+            payload: The method parameters
 
+        Returns:
+            The response, with retry_after set if Telegram rate limited the call
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url,
-                    data=payload,
-                    timeout=aiohttp.ClientTimeout(total=self.timeout),
-                ) as response:
-                    if response.status == 200:
-                        logger.info("Message sent to Telegram successfully")
-                        return True
-                    else:
-                        response_text = await response.text()
-                        logger.error(
-                            f"Failed to send message to Telegram: {response.status} - {response_text}"
-                        )
-                        return False
+            session = http_session_manager.get_session()
+            async with session.post(
+                f"{self.api_base_url}/{method}",
+                data=payload,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            ) as response:
+                if response.status == 200:
+                    data = await response.json(content_type=None)
+                    result = data.get("result") if isinstance(data, dict) else None
+                    return TelegramResponse(result if isinstance(result, dict) else {})
+                elif response.status == 429:
+                    try:
+                        data = await response.json(content_type=None)
+                    except ValueError:
+                        data = None
+                    parameters = (
+                        data.get("parameters") if isinstance(data, dict) else None
+                    )
+                    retry_after = (
+                        parameters.get("retry_after")
+                        if isinstance(parameters, dict)
+                        else None
+                    )
+                    logger.warning(
+                        f"Telegram {method} rate limited, retry after {retry_after}s"
+                    )
+                    return TelegramResponse(retry_after=float(retry_after or 1))
+                else:
+                    response_text = await response.text()
+                    logger.error(
+                        f"Telegram {method} failed: {response.status} - {response_text}"
+                    )
+                    return TelegramResponse()
         except asyncio.TimeoutError:
             logger.error(
-                f"Timeout sending message to Telegram after {self.timeout} seconds"
+                f"Timeout calling Telegram {method} after {self.timeout} seconds"
             )
-            return False
+            return TelegramResponse()
         except aiohttp.ClientConnectorError as e:
-            logger.error(f"Connection error sending message to Telegram: {e}")
-            return False
+            logger.error(f"Connection error calling Telegram {method}: {e}")
+            return TelegramResponse()
         except aiohttp.ClientResponseError as e:
             logger.error(
-                f"Response error sending message to Telegram: {e.status} - {e.message}"
+                f"Response error calling Telegram {method}: {e.status} - {e.message}"
             )
-            return False
+            return TelegramResponse()
         except aiohttp.ClientError as e:
-            logger.error(f"HTTP client error sending message to Telegram: {e}")
-            return False
+            logger.error(f"HTTP client error calling Telegram {method}: {e}")
+            return TelegramResponse()
         except Exception as e:
             logger.error(
-                f"Unexpected error sending message to Telegram: {e}", exc_info=True
+                f"Unexpected error calling Telegram {method}: {e}", exc_info=True
             )
-            return False
+            return TelegramResponse()
 
-    async def send_alert(
+    async def post_message(
+        self,
+        text: str,
+        reply_to_message_id: Optional[int] = None,
+        digest_line: Optional[str] = None,
+    ) -> Optional[PostedMessage]:
+        """
+        Send a message to Telegram.
+
+        Args:
+            text: The message text to send
+            reply_to_message_id: Optional message to reply to
+            digest_line: One-line summary if the message is an alert that may be
+                merged into a digest with alerts of other targets
+
+        Returns:
+            The sent message, or None if the message was not sent
+        """
+        logger.info("Sending message to Telegram...")
+
+        payload: Dict[str, Any] = {
+            "chat_id": self.chat_id,
+            "text": shorten(text, MESSAGE_LIMIT),
+            "parse_mode": "HTML",
+        }
+        if reply_to_message_id:
+            payload["reply_to_message_id"] = reply_to_message_id
+            payload["allow_sending_without_reply"] = "true"
+
+        result = await self.call_api("sendMessage", payload, digest_line)
+        if result is None:
+            return None
+        logger.info("Message sent to Telegram successfully")
+        return PostedMessage(
+            int(result.get("message_id", 0)), bool(result.get("digest"))
+        )
+
+    async def send_message(self, text: str) -> bool:
+        """
+        Send a message to Telegram.
+
+        Args:
+            text: The message text to send
+
+        Returns:
+            True if the message was sent successfully, False otherwise
+        """
+        return await self.post_message(text) is not None
+
+    async def edit_message(self, message_id: int, text: str) -> bool:
+        """
+        Replace the text of a message sent earlier.
+
+        Args:
+            message_id: The id of the message to edit
+            text: The new message text
+
+        Returns:
+            True if the message was edited successfully, False otherwise
+        """
+        result = await self.call_api(
+            "editMessageText",
+            {
+                "chat_id": self.chat_id,
+                "message_id": message_id,
+                "text": text,
+                "parse_mode": "HTML",
+            },
+        )
+        return result is not None
+
+    def format_alert(
         self,
         target: str,
-        mtr_output: str,
         error_message: Optional[str] = None,
         comment: Optional[str] = None,
-    ) -> bool:
+        mtr_output: Optional[str] = None,
+        diagnostics: Optional[str] = None,
+        timestamp: Optional[str] = None,
+        pending: bool = False,
+    ) -> str:
         """
-        Send an alert about an API issue to Telegram.
+        Format an alert message.
 
         Args:
             target: The target API that has an issue
-            mtr_output: The MTR trace output
             error_message: Optional error message describing the issue
             comment: Optional comment to include in the alert
+            mtr_output: The MTR trace output
+            diagnostics: Optional one-line-per-check diagnostics summary
+            timestamp: Time of the alert (defaults to now)
+            pending: Whether diagnostics are still being collected
 
         Returns:
-            True if the alert was sent successfully, False otherwise
+            The alert text in Telegram HTML
         """
-        logger.info("Compiling alert message...")
-
         # Get current timestamp
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        now = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        # Get source IP
-        source_ip = await get_external_ip()
+        # Get source IP from the cache, never from the network on the alert path
+        source_ip = self.ip_cache.get()
 
         # Escape received values for safety
-        safe_mtr_output = (
-            f"<pre>{html.escape(mtr_output)}</pre>"
-            if mtr_output
-            else "<pre>No MTR output available</pre>"
-        )
         safe_error_message = (
-            f"<code>{html.escape(error_message)}</code>"
+            f"<code>{html.escape(shorten(error_message, MAX_ERROR_LENGTH))}</code>"
             if error_message
             else "<code>Unknown error</code>"
         )
@@ -125,44 +338,223 @@ class TelegramAlerter:
         # Prepare comment section if provided
         comment_section = f"<b>Comment:</b> {safe_comment}\n" if comment else ""
 
-        # Format the alert message
-        alert_message = f"""
+        header = f"""
 <b>🚨 Issue detected with API {target} 🚨</b>
 <b>Timestamp:</b> {now}
 <b>Source IP:</b> {source_ip}
 <b>Error:</b> {safe_error_message}
-{comment_section}<b>Trace to {target}:</b>
-{safe_mtr_output}
-"""
+{comment_section}"""
 
-        # Send the message
-        success = await self.send_message(alert_message)
+        if pending:
+            return f"{header}<i>Collecting diagnostics...</i>\n"
+
+        diagnostics_section = (
+            f"<b>Diagnostics:</b>\n<pre>{html.escape(diagnostics)}</pre>\n"
+            if diagnostics
+            else ""
+        )
+        trace_title = f"<b>Trace to {target}:</b>\n"
+        if not mtr_output:
+            return (
+                f"{header}{diagnostics_section}{trace_title}"
+                "<pre>No MTR output available</pre>\n"
+            )
+
+        # Shorten the trace so the whole alert fits in one message
+        budget = MESSAGE_LIMIT - len(
+            f"{header}{diagnostics_section}{trace_title}<pre></pre>\n"
+        )
+        safe_mtr_output = fit_trace(html.escape(mtr_output), max(budget, 0))
+        return (
+            f"{header}{diagnostics_section}{trace_title}<pre>{safe_mtr_output}</pre>\n"
+        )
+
+    def format_digest_line(self, target: str, error_message: Optional[str]) -> str:
+        """
+        Format the one-line summary of an alert shown in a digest.
+
+        Args:
+            target: The target API that has an issue
+            error_message: Optional error message describing the issue
+
+        Returns:
+            The summary line in Telegram HTML
+        """
+        error = shorten(error_message or "Unknown error", MAX_DIGEST_ERROR_LENGTH)
+        return f"• <b>{html.escape(target)}</b>: <code>{html.escape(error)}</code>"
+
+    def format_digest(self, lines: List[str]) -> List[str]:
+        """
+        Format a digest of alerts for several targets.
 
-        if success:
-            self.alert_sent = True
-            logger.info("Alert sent and alert_sent set to True")
+        Args:
+            lines: Summary lines from format_digest_line()
 
-        return success
+        Returns:
+            The digest message texts, split to fit the message size limit
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        header = (
+            f"<b>🚨 Issues detected with {len(lines)} APIs 🚨</b>\n"
+            f"<b>Timestamp:</b> {now}\n"
+            f"<b>Source IP:</b> {self.ip_cache.get()}\n"
+        )
+        return split_lines(header, lines)
+
+    def format_resolution(self, target: str) -> str:
+        """
+        Format the message sent when an API issue is resolved.
+
+        Args:
+            target: The target API that has been resolved
+
+        Returns:
+            The resolution text
+        """
+        return f"🟢 Issue with API {target} resolved!"
+
+    async def send_initial_alert(
+        self,
+        target: str,
+        error_message: Optional[str] = None,
+        comment: Optional[str] = None,
+    ) -> bool:
+        """
+        Send a minimal alert right away, to be completed by enrich_alert().
+
+        Args:
+            target: The target API that has an issue
+            error_message: Optional error message describing the issue
+            comment: Optional comment to include in the alert
+
+        Returns:
+            True if the alert was sent successfully, False otherwise
+        """
+        logger.info("Sending initial alert...")
+        self.alert_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        message = await self.post_message(
+            self.format_alert(
+                target,
+                error_message,
+                comment,
+                timestamp=self.alert_timestamp,
+                pending=True,
+            ),
+            digest_line=self.format_digest_line(target, error_message),
+        )
+        if message is None:
+            return False
+
+        self.alert_message_id = message.message_id or None
+        self.alert_in_digest = message.in_digest
+        logger.info("Alert sent")
+        return True
+
+    async def enrich_alert(
+        self,
+        target: str,
+        mtr_output: str,
+        error_message: Optional[str] = None,
+        comment: Optional[str] = None,
+        diagnostics: Optional[str] = None,
+    ) -> bool:
+        """
+        Complete the alert sent by send_initial_alert() with diagnostics.
+
+        The alert message is edited in place. If it cannot be edited, or went
+        out as part of a digest, the diagnostics are posted as a reply to it
+        instead.
+
+        Args:
+            target: The target API that has an issue
+            mtr_output: The MTR trace output
+            error_message: Optional error message describing the issue
+            comment: Optional comment to include in the alert
+            diagnostics: Optional one-line-per-check diagnostics summary
+
+        Returns:
+            True if the diagnostics were delivered, False otherwise
+        """
+        text = self.format_alert(
+            target,
+            error_message,
+            comment,
+            mtr_output,
+            diagnostics,
+            timestamp=self.alert_timestamp,
+        )
+        # A digest is shared with other targets, never overwrite it
+        if self.alert_message_id is not None and not self.alert_in_digest:
+            if await self.edit_message(self.alert_message_id, text):
+                logger.info("Alert enriched with diagnostics")
+                return True
+            logger.warning("Could not edit the alert, replying with diagnostics")
+        return await self.post_message(text, self.alert_message_id) is not None
+
+    async def send_alert(
+        self,
+        target: str,
+        mtr_output: str,
+        error_message: Optional[str] = None,
+        comment: Optional[str] = None,
+        diagnostics: Optional[str] = None,
+    ) -> bool:
+        """
+        Send an alert about an API issue to Telegram.
+
+        Args:
+            target: The target API that has an issue
+            mtr_output: The MTR trace output
+            error_message: Optional error message describing the issue
+            comment: Optional comment to include in the alert
+            diagnostics: Optional one-line-per-check diagnostics summary
+
+        Returns:
+            True if the alert was sent successfully, False otherwise
+        """
+        logger.info("Compiling alert message...")
+        self.alert_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        alert_message = self.format_alert(
+            target,
+            error_message,
+            comment,
+            mtr_output,
+            diagnostics,
+            timestamp=self.alert_timestamp,
+        )
+
+        # Send the message
+        message = await self.post_message(alert_message)
+        if message is None:
+            return False
+
+        self.alert_message_id = message.message_id or None
+        self.alert_in_digest = False
+        logger.info("Alert sent")
+        return True
 
     async def send_resolution(self, target: str) -> bool:
         """
         Send a resolution message when an API issue is resolved.
 
+        The message is threaded as a reply to the alert when its id is known.
+
         Args:
             target: The target API that has been resolved
 
         Returns:
             True if the message was sent successfully, False otherwise
         """
-        resolution_message = f"🟢 Issue with API {target} resolved!"
-
-        success = await self.send_message(resolution_message)
-
-        if success:
-            self.alert_sent = False
-            logger.info("Resolution message sent and alert_sent set to False")
+        message = await self.post_message(
+            self.format_resolution(target), self.alert_message_id
+        )
+        if message is None:
+            return False
 
-        return success
+        self.alert_message_id = None
+        self.alert_in_digest = False
+        logger.info("Resolution message sent")
+        return True
 
 
 # Create a default Telegram alerter instance
@@ -170,4 +562,5 @@ telegram_alerter = TelegramAlerter(
     bot_token=settings.telegram_bot_token,
     chat_id=settings.telegram_chat_id,
     timeout=settings.api_timeout,  # Use the same timeout as API requests
+    dispatcher=telegram_dispatcher,
 )
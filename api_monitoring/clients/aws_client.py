@@ -1,23 +1,93 @@
 import asyncio
-from typing import Optional, Tuple
+from contextvars import ContextVar
+from typing import Any, Optional
 
 import aiobotocore.session
 from aiobotocore.config import AioConfig
 from botocore.exceptions import (
     ClientError,
+)
+from botocore.exceptions import ConnectionError as BotoConnectionError
+from botocore.exceptions import (
     EndpointConnectionError,
+    HTTPClientError,
     PartialCredentialsError,
     SSLError,
 )
 
 from api_monitoring.config import settings
+from api_monitoring.monitoring.results import ProbeResult
 from api_monitoring.utils.logging import get_logger
+from api_monitoring.utils.timings import PhaseTimings
 
 logger = get_logger(__name__)
 
 
+# Errors after which the pooled connection can no longer be trusted
+CONNECTION_ERRORS = (BotoConnectionError, HTTPClientError, asyncio.TimeoutError)
+
+# Botocore session shared by all clients, see shared_session()
+_session: Optional[Any] = None
+
+# Timings of the probe running in the current task, filled by botocore hooks
+_current_timings: ContextVar[Optional[PhaseTimings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+def shared_session() -> Any:
+    """
+    Return the botocore session all clients are created from.
+
+    A session loads and caches the EC2 service model, which costs a few
+    hundred milliseconds of CPU and tens of MB, so one session per target
+    does not scale. Credentials and endpoints are passed to every client,
+    so sharing the session shares nothing else between targets.
+    """
+    global _session
+    if _session is None:
+        _session = aiobotocore.session.get_session()
+    return _session
+
+
+def _on_before_send(**kwargs: Any) -> None:
+    """Botocore hook: the signed request is about to go on the wire."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.attempts += 1
+        timings.mark()
+
+
+def _on_before_parse(**kwargs: Any) -> None:
+    """Botocore hook: the HTTP response has been received."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.ttfb = timings.since_mark()
+
+
+def register_timing_hooks(client: Any) -> None:
+    """
+    Register the phase timing hooks on an aiobotocore EC2 client.
+
+    Botocore does not expose DNS or connect events, so only time to first
+    byte, attempts and total latency are recorded for EC2 calls.
+
+    Args:
+        client: The aiobotocore client
+    """
+    client.meta.events.register("before-send.ec2", _on_before_send)
+    client.meta.events.register("before-parse.ec2", _on_before_parse)
+
+
 class AWSClient:
-    """Asynchronous AWS API client for interacting with AWS-compatible APIs."""
+    """
+    Asynchronous AWS API client for interacting with AWS-compatible APIs.
+
+    The underlying aiobotocore client is created on first use and kept open
+    across checks, so the service model, connection pool and TLS session are
+    reused. It is rebuilt after connection-level errors or credential changes
+    and must be released with close() on shutdown.
+    """
 
     def __init__(
         self,
@@ -28,6 +98,7 @@ class AWSClient:
         connect_timeout: int = 5,
         read_timeout: int = 10,
         max_retries: int = 3,
+        cold_probe_interval: int = 0,
     ):
         """
         Initialize the AWS client.
@@ -40,6 +111,8 @@ class AWSClient:
             connect_timeout: Connection timeout in seconds
             read_timeout: Read timeout in seconds
             max_retries: Maximum number of retries for failed requests
+            cold_probe_interval: Run every Nth check on a freshly created client to
+                measure cold-start latency (0 disables cold probes)
         """
         self.endpoint_url = endpoint_url
         self.aws_access_key_id = aws_access_key_id
@@ -50,63 +123,210 @@ class AWSClient:
             read_timeout=read_timeout,
             retries={"max_attempts": max_retries},
         )
-        self.session = aiobotocore.session.get_session()
+        self.session = shared_session()
+        self.cold_probe_interval = cold_probe_interval
+
+        self._client: Optional[Any] = None
+        self._client_context: Optional[Any] = None
+        self._client_lock = asyncio.Lock()
+        self._needs_rebuild = False
+        self._probe_count = 0
+
+        # Whether the last check ran on a freshly created client
+        self.last_probe_cold = False
+
+    def _create_client_context(self) -> Any:
+        """Create a client context for the EC2 API of the configured endpoint."""
+        return self.session.create_client(
+            "ec2",
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id=self.aws_access_key_id,
+            aws_secret_access_key=self.aws_secret_access_key,
+            region_name=self.region_name,
+            config=self.config,
+        )
+
+    async def _get_client(self) -> Any:
+        """
+        Return the persistent client, creating it if needed.
+
+        Returns:
+            An open aiobotocore EC2 client
+        """
+        async with self._client_lock:
+            if self._client is None:
+                logger.info(f"Creating persistent EC2 client for {self.endpoint_url}")
+                context = self._create_client_context()
+                self._client = await context.__aenter__()
+                self._client_context = context
+                register_timing_hooks(self._client)
+            return self._client
+
+    async def _reset_client(self) -> None:
+        """Close the persistent client so the next check creates a new one."""
+        async with self._client_lock:
+            context = self._client_context
+            self._client = None
+            self._client_context = None
+        if context is not None:
+            try:
+                await context.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Error closing EC2 client: {e}")
 
-    async def check_api_availability(self) -> Tuple[bool, Optional[str]]:
+    def update_credentials(
+        self, aws_access_key_id: str, aws_secret_access_key: str
+    ) -> None:
+        """
+        Replace the credentials used for API checks.
+
+        The persistent client is closed on the next check and rebuilt with the
+        new credentials.
+
+        Args:
+            aws_access_key_id: AWS access key ID
+            aws_secret_access_key: AWS secret access key
+        """
+        if (
+            aws_access_key_id == self.aws_access_key_id
+            and aws_secret_access_key == self.aws_secret_access_key
+        ):
+            return
+        self.aws_access_key_id = aws_access_key_id
+        self.aws_secret_access_key = aws_secret_access_key
+        self._needs_rebuild = True
+        logger.info(f"Credentials updated for {self.endpoint_url}")
+
+    async def close(self) -> None:
+        """Close the persistent client and its connection pool."""
+        await self._reset_client()
+
+    async def _describe_availability_zones(
+        self, timings: PhaseTimings, fresh: bool = False
+    ) -> None:
+        """
+        Call describe_availability_zones() on a warm or cold client.
+
+        Args:
+            timings: Collects the phase timings of the call
+            fresh: Use a throwaway client instead of the persistent one
+        """
+        if fresh:
+            cold = True
+        else:
+            self._probe_count += 1
+            cold = (
+                self.cold_probe_interval > 0
+                and self._probe_count % self.cold_probe_interval == 0
+            )
+            self.last_probe_cold = cold
+
+        if cold:
+            # Measure the full setup cost on a throwaway client
+            logger.info("Running cold probe on a fresh EC2 client")
+            timings.start()
+            async with self._create_client_context() as client:
+                register_timing_hooks(client)
+                await client.describe_availability_zones()
+            timings.finish()
+            return
+
+        client = await self._get_client()
+        timings.start()
+        await client.describe_availability_zones()
+        timings.finish()
+
+    async def check_api_availability(self, fresh: bool = False) -> ProbeResult:
         """
         Check if the AWS-compatible API is available.
 
+        Args:
+            fresh: Run the check on a throwaway client with its own connection,
+                independent of the persistent client (used for hedged probes)
+
         Returns:
-            A tuple of (success, error_message) where success is a boolean indicating if the
-            API is available, and error_message is an optional error message if not available.
+            A probe result where success indicates if the API is available,
+            error_message describes the failure, and timings holds the time to
+            first byte and total latency of the API call.
         """
         logger.info(f"Checking API availability for {self.endpoint_url}")
 
+        if self._needs_rebuild and not fresh:
+            self._needs_rebuild = False
+            await self._reset_client()
+
+        timings = PhaseTimings()
+        token = _current_timings.set(timings)
+        try:
+            result = await self._check(timings, fresh)
+        finally:
+            _current_timings.reset(token)
+        if timings.total is None:
+            timings.finish()
+        result.timings = timings
+        return result
+
+    async def _check(self, timings: PhaseTimings, fresh: bool = False) -> ProbeResult:
+        """
+        Call the API and translate errors into a probe result.
+
+        Args:
+            timings: Collects the phase timings of the call
+            fresh: Use a throwaway client instead of the persistent one
+
+        Returns:
+            The probe result without timings
+        """
         try:
-            async with self.session.create_client(
-                "ec2",
-                endpoint_url=self.endpoint_url,
-                aws_access_key_id=self.aws_access_key_id,
-                aws_secret_access_key=self.aws_secret_access_key,
-                region_name=self.region_name,
-                config=self.config,
-            ) as client:
+            try:
                 logger.info("Calling describe_availability_zones()...")
-                response = await client.describe_availability_zones()
-                logger.info("describe_availability_zones() call completed successfully")
-                return True, None
+                await self._describe_availability_zones(timings, fresh)
+            except CONNECTION_ERRORS:
+                # Do not reuse a pool that just failed at the connection level.
+                # A cancelled request (a hedge that lost, a maintenance check
+                # that failed first) only drops its own connection, the
+                # client stays usable.
+                if not fresh:
+                    await self._reset_client()
+                raise
+            logger.info(
+                "describe_availability_zones() call completed successfully "
+                f"in {(timings.total or 0) * 1000:.1f} ms"
+                + (" (cold)" if fresh or self.last_probe_cold else "")
+            )
+            return ProbeResult(success=True)
 
         except EndpointConnectionError as e:
             error_msg = f"Cannot connect to the endpoint: {e}"
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, type(e).__name__)
 
         except PartialCredentialsError as e:
             error_msg = f"Incomplete credentials provided: {e}"
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, type(e).__name__)
 
         except SSLError as e:
             error_msg = f"SSL/TLS error occurred: {e}"
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, type(e).__name__)
 
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
             error_message = e.response["Error"]["Message"]
             error_msg = f"ClientError occurred: {error_code} - {error_message}"
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, error_code)
 
         except asyncio.TimeoutError:
             error_msg = "API request timed out"
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, "Timeout")
 
         except Exception as e:
             error_msg = f"Unexpected error: {str(e)}"
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, type(e).__name__)
 
 
 # Create a default AWS client instance
@@ -115,4 +335,5 @@ aws_client = AWSClient(
     aws_access_key_id=settings.aws_access_key_id,
     aws_secret_access_key=settings.aws_secret_access_key,
     region_name=settings.aws_default_region,
+    cold_probe_interval=settings.aws_cold_probe_interval,
 )
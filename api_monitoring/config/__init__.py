@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import json
+from collections import Counter
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -15,6 +17,167 @@ else:
         from typing import Self
 
 
+def hostname_from_url(url: str) -> str:
+    """
+    Extract the hostname from an endpoint URL.
+
+    Args:
+        url: The endpoint URL, with or without a protocol prefix
+
+    Returns:
+        The hostname part of the URL (without path and query parameters)
+    """
+    # Remove protocol prefix if present
+    if "://" in url:
+        url = url.split("://")[1]
+    # Extract hostname (remove path and query parameters)
+    return url.split("/")[0]
+
+
+class TargetConfig(BaseModel):
+    """Configuration of a single monitored endpoint."""
+
+    name: str = Field(
+        default="", description="Unique target name (defaults to the hostname)"
+    )
+    endpoint_url: str = Field(description="The API endpoint to monitor")
+    aws_access_key_id: str = Field(description="AWS Access Key ID")
+    aws_secret_access_key: str = Field(description="AWS Secret Access Key")
+    aws_default_region: str = Field(
+        default="us-east-1", description="AWS Default Region"
+    )
+    check_interval: int = Field(
+        default=60, description="Interval between API checks in seconds"
+    )
+    api_timeout: int = Field(
+        default=15, description="Timeout for API requests in seconds"
+    )
+    maintenance_check_timeout: int = Field(
+        default=10, description="Timeout for maintenance check in seconds"
+    )
+    maintenance_markers: List[str] = Field(
+        default_factory=lambda: ["OnMaintenance"],
+        description="Literal strings in the response body that indicate maintenance",
+    )
+    maintenance_marker_patterns: List[str] = Field(
+        default_factory=list,
+        description="Regular expressions matching a maintenance response body",
+    )
+    maintenance_status_codes: List[int] = Field(
+        default_factory=list,
+        description="HTTP status codes that indicate maintenance",
+    )
+    maintenance_headers: List[str] = Field(
+        default_factory=list,
+        description='Maintenance response headers ("Name" or "Name: value")',
+    )
+    maintenance_max_body_bytes: int = Field(
+        default=1024 * 1024,
+        description="Maximum number of body bytes read by the maintenance check",
+    )
+    maintenance_failure_threshold: int = Field(
+        default=1,
+        description="Number of consecutive maintenance check failures before alerting",
+    )
+    api_failure_threshold: int = Field(
+        default=1,
+        description="Number of consecutive API check failures before alerting",
+    )
+    recover_threshold: int = Field(
+        default=1,
+        description="Number of consecutive successful checks to resolve an alert",
+    )
+    alert_min_hold: float = Field(
+        default=0.0, description="Minimum seconds an alert stays open"
+    )
+    flap_window: int = Field(
+        default=20,
+        description="Number of recent checks flapping is detected over (0 disables)",
+    )
+    flap_threshold: float = Field(
+        default=0.5,
+        description="Share of outcome changes among recent checks at which a target "
+        "is flapping and its alert is held open",
+    )
+    alert_comment: Optional[str] = Field(
+        default=None, description="Optional comment to include in alerts"
+    )
+    concurrent_probes: bool = Field(
+        default=False,
+        description="Run the maintenance check and the API check concurrently",
+    )
+    aws_cold_probe_interval: int = Field(
+        default=0,
+        description="Run every Nth API check on a fresh client (0 disables)",
+    )
+    diagnostics_deadline: float = Field(
+        default=10.0,
+        description="Time budget in seconds for the diagnostics attached to an alert",
+    )
+    hedge_probes: bool = Field(
+        default=False,
+        description="Start a second API check on a fresh connection when the first "
+        "one is slower than usual; the first success wins",
+    )
+    hedge_percentile: float = Field(
+        default=0.95,
+        description="Percentile of recent API check latencies after which to hedge",
+    )
+    hedge_min_samples: int = Field(
+        default=20,
+        description="Successful API checks needed before hedging starts",
+    )
+    schedule_phase: Optional[float] = Field(
+        default=None,
+        description="Offset of the checks within the check interval in seconds "
+        "(defaults to a stable offset derived from the target name)",
+    )
+    schedule_jitter: float = Field(
+        default=0.0, description="Maximum random delay added to every check in seconds"
+    )
+    retry_delay: float = Field(
+        default=1.0,
+        description="Seconds before the first check confirming a failure below "
+        "the threshold; doubles with every further failure",
+    )
+    retry_max_delay: float = Field(
+        default=8.0, description="Upper bound of the failure confirmation backoff"
+    )
+    recovery_interval: float = Field(
+        default=0.0,
+        description="Interval between checks right after a recovery (0 disables)",
+    )
+    recovery_window: float = Field(
+        default=0.0,
+        description="Seconds after a recovery during which recovery_interval applies",
+    )
+    maintenance_interval: float = Field(
+        default=0.0,
+        description="Interval between checks while the service is on maintenance "
+        "(0 uses check_interval)",
+    )
+
+    @field_validator("endpoint_url")
+    @classmethod
+    def validate_endpoint_url(cls, v: str) -> str:
+        """Ensure endpoint_url is properly formatted."""
+        if not v.startswith(("http://", "https://")):
+            return f"https://{v}"
+        return v
+
+    @model_validator(mode="after")
+    def default_name(self) -> Self:
+        """Use the endpoint hostname as the target name if none is given."""
+        if not self.name:
+            self.name = hostname_from_url(self.endpoint_url)
+        return self
+
+    @property
+    def hostname(self) -> str:
+        """The hostname of the monitored endpoint."""
+        return hostname_from_url(self.endpoint_url)
+
+
 class Settings(BaseSettings):
     """Application settings loaded from environment variables with validation."""
 
@@ -42,8 +205,50 @@ class Settings(BaseSettings):
     maintenance_check_timeout: int = Field(
         default=10, description="Timeout for maintenance check in seconds"
     )
+    maintenance_markers: List[str] = Field(
+        default_factory=lambda: ["OnMaintenance"],
+        description="Literal strings in the response body that indicate maintenance",
+    )
+    maintenance_marker_patterns: List[str] = Field(
+        default_factory=list,
+        description="Regular expressions matching a maintenance response body",
+    )
+    maintenance_status_codes: List[int] = Field(
+        default_factory=list,
+        description="HTTP status codes that indicate maintenance",
+    )
+    maintenance_headers: List[str] = Field(
+        default_factory=list,
+        description='Maintenance response headers ("Name" or "Name: value")',
+    )
+    maintenance_max_body_bytes: int = Field(
+        default=1024 * 1024,
+        description="Maximum number of body bytes read by the maintenance check",
+    )
     log_level: str = Field(default="INFO", description="Logging level")
     log_file: Optional[str] = Field(default="logs.log", description="Log file path")
+    log_queue_size: int = Field(
+        default=10000,
+        description="Maximum number of log records waiting to be written; "
+        "records beyond it are dropped and counted",
+    )
+    log_flush_interval: float = Field(
+        default=1.0, description="Maximum seconds between log flushes while busy"
+    )
+    log_max_bytes: int = Field(
+        default=50 * 1024 * 1024,
+        description="Rotate the log file once it reaches this size (0 disables)",
+    )
+    log_rotate_interval: int = Field(
+        default=86400,
+        description="Rotate the log file after this many seconds (0 disables)",
+    )
+    log_backup_count: int = Field(
+        default=7, description="Number of rotated log files to keep (0 keeps all)"
+    )
+    log_compress: bool = Field(
+        default=True, description="Gzip rotated log files in the background"
+    )
     alert_comment: Optional[str] = Field(
         default=None, description="Optional comment to include in alerts"
     )
@@ -57,6 +262,246 @@ class Settings(BaseSettings):
         default=1,
         description="Number of consecutive API check failures before alerting",
     )
+    recover_threshold: int = Field(
+        default=1,
+        description="Number of consecutive successful checks to resolve an alert",
+    )
+    alert_min_hold: float = Field(
+        default=0.0, description="Minimum seconds an alert stays open"
+    )
+    flap_window: int = Field(
+        default=20,
+        description="Number of recent checks flapping is detected over (0 disables)",
+    )
+    flap_threshold: float = Field(
+        default=0.5,
+        description="Share of outcome changes among recent checks at which a target "
+        "is flapping and its alert is held open",
+    )
+
+    # Probe Configuration
+    concurrent_probes: bool = Field(
+        default=False,
+        description="Run the maintenance check and the API check concurrently",
+    )
+
+    # AWS Client Configuration
+    aws_cold_probe_interval: int = Field(
+        default=0,
+        description="Run every Nth API check on a freshly created client to "
+        "measure cold-start latency (0 disables cold probes)",
+    )
+
+    # Hedged Probe Configuration
+    hedge_probes: bool = Field(
+        default=False,
+        description="Start a second API check on a fresh connection when the first "
+        "one is slower than usual; the first success wins",
+    )
+    hedge_percentile: float = Field(
+        default=0.95,
+        description="Percentile of recent API check latencies after which to hedge",
+    )
+    hedge_min_samples: int = Field(
+        default=20,
+        description="Successful API checks needed before hedging starts",
+    )
+
+    # Diagnostics Configuration
+    diagnostics_deadline: float = Field(
+        default=10.0,
+        description="Time budget in seconds for the diagnostics attached to an alert "
+        "(MTR, DNS, TCP connect, TLS handshake and HTTP HEAD)",
+    )
+    mtr_report_cycles: int = Field(
+        default=3, description="Probes MTR sends to every hop of an alert trace"
+    )
+    mtr_baseline_interval: float = Field(
+        default=0.0,
+        description="Seconds between background baseline traces of every healthy "
+        "target (0 disables baselines)",
+    )
+    mtr_baseline_cycles: int = Field(
+        default=10, description="Probes MTR sends to every hop of a baseline trace"
+    )
+    mtr_baseline_concurrency: int = Field(
+        default=2, description="Baseline traces running at the same time"
+    )
+    mtr_baseline_history: int = Field(
+        default=3, description="Baseline traces kept per target"
+    )
+    mtr_loss_jump: float = Field(
+        default=20.0,
+        description="Increase of a hop's packet loss over the baseline, in "
+        "percentage points, reported in alerts",
+    )
+    mtr_latency_jump: float = Field(
+        default=50.0,
+        description="Increase of a hop's average latency over the baseline, in "
+        "ms, reported in alerts",
+    )
+
+    # Scheduling Configuration
+    schedule_phase: Optional[float] = Field(
+        default=None,
+        description="Offset of the checks within the check interval in seconds "
+        "(defaults to a stable offset derived from the target name)",
+    )
+    schedule_jitter: float = Field(
+        default=0.0, description="Maximum random delay added to every check in seconds"
+    )
+    schedule_overrun: str = Field(
+        default="skip",
+        description="What to do when a check is due while the previous one is still "
+        'running: "skip" it or "coalesce" missed checks into one run',
+    )
+
+    # Adaptive Probing Configuration
+    retry_delay: float = Field(
+        default=1.0,
+        description="Seconds before the first check confirming a failure below "
+        "the threshold; doubles with every further failure",
+    )
+    retry_max_delay: float = Field(
+        default=8.0, description="Upper bound of the failure confirmation backoff"
+    )
+    recovery_interval: float = Field(
+        default=0.0,
+        description="Interval between checks right after a recovery (0 disables)",
+    )
+    recovery_window: float = Field(
+        default=0.0,
+        description="Seconds after a recovery during which recovery_interval applies",
+    )
+    maintenance_interval: float = Field(
+        default=0.0,
+        description="Interval between checks while the service is on maintenance "
+        "(0 uses check_interval)",
+    )
+
+    # Telegram Delivery Configuration
+    telegram_rate_limit: float = Field(
+        default=1.0, description="Telegram messages sent per second on average"
+    )
+    telegram_burst: int = Field(
+        default=3, description="Telegram messages that may be sent back to back"
+    )
+    telegram_digest_window: float = Field(
+        default=1.0,
+        description="Seconds to wait for alerts of other targets to merge into one "
+        "digest message (0 disables digests)",
+    )
+
+    # Alert Outbox Configuration
+    alert_outbox_file: str = Field(
+        default="",
+        description="File keeping undelivered alerts across restarts "
+        "(empty keeps them in memory only)",
+    )
+    alert_retry_delay: float = Field(
+        default=5.0, description="Seconds before retrying an undelivered alert"
+    )
+    alert_retry_max_delay: float = Field(
+        default=300.0, description="Upper bound of the alert retry backoff"
+    )
+    alert_max_age: float = Field(
+        default=86400.0,
+        description="Seconds after which an undelivered alert is dropped",
+    )
+
+    # State Snapshot Configuration
+    state_snapshot_file: str = Field(
+        default="",
+        description="File the monitor state is saved to and resumed from after "
+        "a restart (empty disables it)",
+    )
+    state_snapshot_interval: float = Field(
+        default=5.0,
+        description="Maximum seconds between writes of a changed state snapshot",
+    )
+
+    # Alert Sinks Configuration
+    alert_sink_concurrency: int = Field(
+        default=4, description="Notifications every alert sink sends at once"
+    )
+    alert_webhook_url: Optional[str] = Field(
+        default=None, description="URL notifications are posted to as JSON"
+    )
+    alert_webhook_timeout: float = Field(
+        default=10.0, description="Timeout of JSON webhook requests in seconds"
+    )
+    slack_webhook_url: Optional[str] = Field(
+        default=None, description="Slack-compatible incoming webhook URL"
+    )
+    slack_webhook_timeout: float = Field(
+        default=10.0, description="Timeout of Slack webhook requests in seconds"
+    )
+    smtp_host: Optional[str] = Field(
+        default=None, description="SMTP server notifications are e-mailed through"
+    )
+    smtp_port: int = Field(default=587, description="SMTP server port")
+    smtp_username: Optional[str] = Field(default=None, description="SMTP user name")
+    smtp_password: Optional[str] = Field(default=None, description="SMTP password")
+    smtp_starttls: bool = Field(
+        default=True, description="Upgrade SMTP connections with STARTTLS"
+    )
+    smtp_sender: str = Field(default="", description="From address of e-mails")
+    smtp_recipients: List[str] = Field(
+        default_factory=list, description="Addresses e-mails are sent to"
+    )
+    smtp_timeout: float = Field(
+        default=10.0, description="Timeout of SMTP operations in seconds"
+    )
+
+    # Shared HTTP Connection Pool Configuration
+    http_pool_limit: int = Field(
+        default=100, description="Maximum number of simultaneous HTTP connections"
+    )
+    http_pool_limit_per_host: int = Field(
+        default=10, description="Maximum number of simultaneous connections per host"
+    )
+    http_dns_cache_ttl: int = Field(
+        default=300, description="Seconds to cache DNS lookups (0 disables the cache)"
+    )
+    http_keepalive_timeout: float = Field(
+        default=30.0, description="Seconds to keep idle HTTP connections open"
+    )
+
+    # External IP Configuration
+    external_ip_ttl: int = Field(
+        default=3600,
+        description="Seconds between background refreshes of the external IP",
+    )
+
+    # Metrics Endpoint Configuration
+    metrics_host: str = Field(
+        default="0.0.0.0", description="Address the /metrics endpoint listens on"
+    )
+    metrics_port: int = Field(
+        default=0,
+        description="Port of the Prometheus /metrics endpoint (0 disables it)",
+    )
+
+    # Time Series Store Configuration
+    timeseries_dir: Optional[str] = Field(
+        default=None,
+        description="Directory of the on-disk probe result store (unset disables it)",
+    )
+    timeseries_raw_retention_days: int = Field(
+        default=7, description="Days to keep raw probe results"
+    )
+    timeseries_rollup_1m_retention_days: int = Field(
+        default=30, description="Days to keep 1-minute rollups"
+    )
+    timeseries_rollup_1h_retention_days: int = Field(
+        default=365, description="Days to keep 1-hour rollups"
+    )
+
+    # Multi-target Configuration
+    targets_file: Optional[str] = Field(
+        default=None,
+        description="Path to a JSON file with a list of targets to monitor",
+    )
 
     @field_validator("endpoint_url")
     @classmethod
@@ -66,16 +511,29 @@ class Settings(BaseSettings):
             return f"https://{v}"
         return v
 
+    @field_validator("schedule_overrun")
+    @classmethod
+    def validate_schedule_overrun(cls, v: str) -> str:
+        """Ensure schedule_overrun names a known policy."""
+        if v not in ("skip", "coalesce"):
+            raise ValueError('schedule_overrun must be "skip" or "coalesce"')
+        return v
+
     @model_validator(mode="after")
     def validate_required_fields(self) -> Self:
         """Validate that required fields are not empty."""
-        required_fields = [
-            "endpoint_url",
-            "aws_access_key_id",
-            "aws_secret_access_key",
-            "telegram_bot_token",
-            "telegram_chat_id",
-        ]
+        required_fields = (
+            []
+            if self.has_other_alert_sinks
+            else ["telegram_bot_token", "telegram_chat_id"]
+        )
+        # Endpoint and credentials may come from the targets file instead
+        if not self.targets_file:
+            required_fields = [
+                "endpoint_url",
+                "aws_access_key_id",
+                "aws_secret_access_key",
+            ] + required_fields
 
         missing_fields = []
         for field_name in required_fields:
@@ -90,6 +548,49 @@ class Settings(BaseSettings):
 
         return self
 
+    @property
+    def has_other_alert_sinks(self) -> bool:
+        """Whether an alert sink other than Telegram is configured."""
+        return bool(self.alert_webhook_url or self.slack_webhook_url or self.smtp_host)
+
+    def load_targets(self) -> List[TargetConfig]:
+        """
+        Build the list of targets to monitor.
+
+        Each entry of the targets file may override any TargetConfig field;
+        fields that are not set fall back to the global settings. Without a
+        targets file a single target is built from the global settings.
+
+        Returns:
+            The list of target configurations
+
+        Raises:
+            ValueError: If the targets file is malformed or target names collide
+        """
+        defaults: Dict[str, Any] = {
+            field_name: getattr(self, field_name)
+            for field_name in TargetConfig.model_fields
+            if field_name != "name"
+        }
+
+        if not self.targets_file:
+            return [TargetConfig(**defaults)]
+
+        data = json.loads(Path(self.targets_file).read_text(encoding="utf-8"))
+        if isinstance(data, dict):
+            data = data.get("targets", [])
+        if not isinstance(data, list) or not data:
+            raise ValueError(f"No targets defined in {self.targets_file}")
+
+        targets = [TargetConfig(**{**defaults, **entry}) for entry in data]
+
+        name_counts = Counter(target.name for target in targets)
+        duplicates = sorted(name for name, count in name_counts.items() if count > 1)
+        if duplicates:
+            raise ValueError(f"Duplicate target names: {', '.join(duplicates)}")
+
+        return targets
+
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=False
     )
@@ -120,11 +621,81 @@ def _create_settings() -> Settings:
             check_interval=60,
             api_timeout=15,
             maintenance_check_timeout=10,
+            maintenance_markers=["OnMaintenance"],
+            maintenance_marker_patterns=[],
+            maintenance_status_codes=[],
+            maintenance_headers=[],
+            maintenance_max_body_bytes=1024 * 1024,
             log_level="INFO",
             log_file="logs.log",
+            log_queue_size=10000,
+            log_flush_interval=1.0,
+            log_max_bytes=50 * 1024 * 1024,
+            log_rotate_interval=86400,
+            log_backup_count=7,
+            log_compress=True,
             alert_comment=None,
             maintenance_failure_threshold=1,
             api_failure_threshold=1,
+            recover_threshold=1,
+            alert_min_hold=0.0,
+            flap_window=20,
+            flap_threshold=0.5,
+            concurrent_probes=False,
+            aws_cold_probe_interval=0,
+            diagnostics_deadline=10.0,
+            mtr_report_cycles=3,
+            mtr_baseline_interval=0.0,
+            mtr_baseline_cycles=10,
+            mtr_baseline_concurrency=2,
+            mtr_baseline_history=3,
+            mtr_loss_jump=20.0,
+            mtr_latency_jump=50.0,
+            hedge_probes=False,
+            hedge_percentile=0.95,
+            hedge_min_samples=20,
+            schedule_phase=None,
+            schedule_jitter=0.0,
+            schedule_overrun="skip",
+            retry_delay=1.0,
+            retry_max_delay=8.0,
+            recovery_interval=0.0,
+            recovery_window=0.0,
+            maintenance_interval=0.0,
+            telegram_rate_limit=1.0,
+            telegram_burst=3,
+            telegram_digest_window=1.0,
+            alert_outbox_file="",
+            alert_retry_delay=5.0,
+            alert_retry_max_delay=300.0,
+            alert_max_age=86400.0,
+            state_snapshot_file="",
+            state_snapshot_interval=5.0,
+            alert_sink_concurrency=4,
+            alert_webhook_url=None,
+            alert_webhook_timeout=10.0,
+            slack_webhook_url=None,
+            slack_webhook_timeout=10.0,
+            smtp_host=None,
+            smtp_port=587,
+            smtp_username=None,
+            smtp_password=None,
+            smtp_starttls=True,
+            smtp_sender="",
+            smtp_recipients=[],
+            smtp_timeout=10.0,
+            http_pool_limit=100,
+            http_pool_limit_per_host=10,
+            http_dns_cache_ttl=300,
+            http_keepalive_timeout=30.0,
+            external_ip_ttl=3600,
+            metrics_host="0.0.0.0",
+            metrics_port=0,
+            timeseries_dir=None,
+            timeseries_raw_retention_days=7,
+            timeseries_rollup_1m_retention_days=30,
+            timeseries_rollup_1h_retention_days=365,
+            targets_file=None,
         )
 
 
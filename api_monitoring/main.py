@@ -5,29 +5,75 @@ API Monitoring Tool
 This script monitors the availability of an AWS-compatible API and sends alerts
 when issues are detected.
 """
+
 import asyncio
 import signal
 import sys
-from types import FrameType
 from typing import Optional
 
-from api_monitoring.config import settings
-from api_monitoring.monitoring.monitor import api_monitor
+from api_monitoring.alerting.dispatcher import telegram_dispatcher
+from api_monitoring.alerting.outbox import AlertOutbox
+from api_monitoring.alerting.sinks import sinks_from_settings
+from api_monitoring.alerting.telegram import telegram_alerter
+from api_monitoring.config import Settings, settings
+from api_monitoring.monitoring.engine import MonitoringEngine
+from api_monitoring.monitoring.mtr import MtrBaselineCache
+from api_monitoring.storage.snapshot import StateSnapshot
+from api_monitoring.storage.timeseries import TimeSeriesStore
+from api_monitoring.utils.http import http_session_manager
 from api_monitoring.utils.logging import logger
-from api_monitoring.utils.network import is_command_available, is_command_available_sync
+from api_monitoring.utils.metrics import MetricsServer, metrics_registry
+from api_monitoring.utils.network import (
+    external_ip_cache,
+    is_command_available,
+    is_command_available_sync,
+)
 
 
 def setup_signal_handlers() -> None:
-    """Set up signal handlers for graceful shutdown."""
+    """
+    Set up signal handlers for graceful shutdown.
 
-    def handle_exit(sig: int, frame: Optional[FrameType]) -> None:
+    The signals cancel the current task so that the monitoring engine can
+    close its clients and connections before the process exits.
+    """
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+
+    def handle_exit(sig: int) -> None:
         """Handle exit signals."""
         logger.info(f"Received signal {sig}, shutting down...")
-        sys.exit(0)
+        if main_task is not None:
+            main_task.cancel()
 
     # Register signal handlers
-    signal.signal(signal.SIGINT, handle_exit)
-    signal.signal(signal.SIGTERM, handle_exit)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, handle_exit, sig)
+
+
+def setup_reload_handler(engine: MonitoringEngine) -> None:
+    """
+    Reload the AWS credentials of all targets on SIGHUP.
+
+    The settings and the targets file are read again, so rotated keys take
+    effect without a restart; every other setting keeps its startup value.
+
+    Args:
+        engine: The engine whose monitors receive the new credentials
+    """
+    loop = asyncio.get_running_loop()
+
+    def handle_reload() -> None:
+        """Handle the reload signal."""
+        logger.info("Received SIGHUP, reloading credentials...")
+        try:
+            targets = Settings().load_targets()
+        except Exception as e:
+            logger.error(f"Failed to reload credentials: {e}")
+            return
+        engine.update_credentials(targets)
+
+    loop.add_signal_handler(signal.SIGHUP, handle_reload)
 
 
 async def check_prerequisites() -> Optional[str]:
@@ -42,13 +88,18 @@ async def check_prerequisites() -> Optional[str]:
         return "MTR is not installed. Please install it using your package manager."
 
     # Check if required environment variables are set
-    required_vars = [
-        "endpoint_url",
-        "aws_access_key_id",
-        "aws_secret_access_key",
-        "telegram_bot_token",
-        "telegram_chat_id",
-    ]
+    required_vars = (
+        []
+        if settings.has_other_alert_sinks
+        else ["telegram_bot_token", "telegram_chat_id"]
+    )
+    # Endpoint and credentials may come from the targets file instead
+    if not settings.targets_file:
+        required_vars = [
+            "endpoint_url",
+            "aws_access_key_id",
+            "aws_secret_access_key",
+        ] + required_vars
 
     missing_vars = []
     for var in required_vars:
@@ -75,20 +126,105 @@ async def main() -> None:
         logger.error(f"Prerequisite check failed: {error}")
         sys.exit(1)
 
+    try:
+        targets = settings.load_targets()
+    except Exception as e:
+        logger.error(f"Failed to load targets: {e}")
+        sys.exit(1)
+
     # Set up signal handlers
     setup_signal_handlers()
 
     # Log configuration
-    logger.info(f"Monitoring endpoint: {settings.endpoint_url}")
-    logger.info(f"Check interval: {settings.check_interval} seconds")
-    logger.info(f"API timeout: {settings.api_timeout} seconds")
+    for target in targets:
+        logger.info(
+            f"Monitoring endpoint {target.name}: {target.endpoint_url} "
+            f"(interval {target.check_interval}s, API timeout {target.api_timeout}s)"
+        )
+
+    # Open the shared HTTP connection pool before the first checks
+    http_session_manager.get_session()
+
+    # Resolve the source IP shown in alerts now and keep it fresh
+    external_ip_cache.start()
+
+    # Record every probe result on disk if a store is configured
+    store: Optional[TimeSeriesStore] = None
+    if settings.timeseries_dir:
+        store = TimeSeriesStore(
+            settings.timeseries_dir,
+            raw_retention_days=settings.timeseries_raw_retention_days,
+            rollup_1m_retention_days=settings.timeseries_rollup_1m_retention_days,
+            rollup_1h_retention_days=settings.timeseries_rollup_1h_retention_days,
+        )
+        logger.info(f"Recording probe results in {settings.timeseries_dir}")
+
+    # Queue notifications on disk and deliver them to every sink in the background
+    sinks = sinks_from_settings(settings, telegram_alerter)
+    logger.info(f"Alert sinks: {', '.join(sink.name for sink in sinks) or 'none'}")
+    outbox = AlertOutbox(
+        settings.alert_outbox_file,
+        sinks,
+        retry_delay=settings.alert_retry_delay,
+        retry_max_delay=settings.alert_retry_max_delay,
+        max_age=settings.alert_max_age,
+    )
+
+    # Resume the alert state and counters of every target from the last run
+    snapshot = StateSnapshot(
+        settings.state_snapshot_file, interval=settings.state_snapshot_interval
+    )
+
+    # Trace every healthy target in the background to compare alert traces with
+    mtr_baselines: Optional[MtrBaselineCache] = None
+    if settings.mtr_baseline_interval > 0:
+        mtr_baselines = MtrBaselineCache(
+            interval=settings.mtr_baseline_interval,
+            cycles=settings.mtr_baseline_cycles,
+            concurrency=settings.mtr_baseline_concurrency,
+            history=settings.mtr_baseline_history,
+            # Keep the path history next to the probe results
+            on_trace=store.append_path if store is not None else None,
+        )
+
+    engine = MonitoringEngine.from_targets(
+        targets, store, outbox, snapshot, mtr_baselines
+    )
+    setup_reload_handler(engine)
+    outbox.start()
+    snapshot.start()
+    if mtr_baselines is not None:
+        mtr_baselines.start()
+
+    # Serve metrics from the same event loop as the probes
+    metrics_server: Optional[MetricsServer] = None
+    if settings.metrics_port:
+        metrics_server = MetricsServer(
+            metrics_registry, settings.metrics_host, settings.metrics_port
+        )
+        await metrics_server.start()
 
     try:
         # Start the monitoring process
-        await api_monitor.run()
+        await engine.run()
+    except asyncio.CancelledError:
+        logger.info("Monitoring stopped")
     except Exception as e:
         logger.error(f"Unhandled exception in main loop: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.stop()
+        if mtr_baselines is not None:
+            await mtr_baselines.stop()
+        await engine.close()
+        await snapshot.stop()
+        await outbox.stop()
+        await telegram_dispatcher.stop()
+        if store is not None:
+            store.close()
+        await external_ip_cache.stop()
+        await http_session_manager.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+import time
+from typing import Callable, Optional
+
+from api_monitoring.config import TargetConfig, settings
+
+
+class AdaptiveProbePolicy:
+    """
+    Decides when a target is probed next, based on how the last cycle went.
+
+    A failure below the threshold is confirmed with probes that back off
+    exponentially from retry_delay up to retry_max_delay. After an incident is
+    resolved the target is probed every recovery_interval seconds for
+    recovery_window seconds to catch flapping. While the service is on
+    maintenance it is probed every maintenance_interval seconds. Otherwise the
+    regular check interval applies.
+    """
+
+    def __init__(
+        self,
+        check_interval: float,
+        retry_delay: float = 1.0,
+        retry_max_delay: float = 8.0,
+        recovery_interval: float = 0.0,
+        recovery_window: float = 0.0,
+        maintenance_interval: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            check_interval: The regular interval between checks in seconds
+            retry_delay: Delay before the first probe confirming a failure
+            retry_max_delay: Upper bound of the confirmation backoff
+            recovery_interval: Interval between checks after a recovery
+                (0 disables faster probing after a recovery)
+            recovery_window: Seconds after a recovery to use recovery_interval
+            maintenance_interval: Interval between checks while the service is
+                on maintenance (0 uses the check interval)
+            clock: Monotonic clock returning seconds
+        """
+        self.check_interval = check_interval
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.recovery_interval = recovery_interval
+        self.recovery_window = recovery_window
+        self.maintenance_interval = maintenance_interval
+        self.clock = clock
+
+        # Monotonic time until which the target is watched for flapping
+        self.recovery_until = 0.0
+
+    @classmethod
+    def from_target(cls, target: TargetConfig) -> "AdaptiveProbePolicy":
+        """
+        Create the policy configured for a target.
+
+        Args:
+            target: The target configuration
+
+        Returns:
+            The probe policy of the target
+        """
+        return cls(
+            check_interval=target.check_interval,
+            retry_delay=target.retry_delay,
+            retry_max_delay=target.retry_max_delay,
+            recovery_interval=target.recovery_interval,
+            recovery_window=target.recovery_window,
+            maintenance_interval=target.maintenance_interval,
+        )
+
+    @classmethod
+    def from_settings(cls, check_interval: float) -> "AdaptiveProbePolicy":
+        """
+        Create a policy from the global settings.
+
+        Args:
+            check_interval: The regular interval between checks in seconds
+
+        Returns:
+            The probe policy
+        """
+        return cls(
+            check_interval=check_interval,
+            retry_delay=settings.retry_delay,
+            retry_max_delay=settings.retry_max_delay,
+            recovery_interval=settings.recovery_interval,
+            recovery_window=settings.recovery_window,
+            maintenance_interval=settings.maintenance_interval,
+        )
+
+    @property
+    def recovering(self) -> bool:
+        """Whether the target is inside its post-recovery window."""
+        return self.clock() < self.recovery_until
+
+    def next_delay(
+        self,
+        failures: int = 0,
+        on_maintenance: bool = False,
+        recovered: bool = False,
+    ) -> Optional[float]:
+        """
+        Return the delay until the next cycle.
+
+        Args:
+            failures: Consecutive failures not yet confirmed by an alert
+            on_maintenance: Whether the last cycle found the service on maintenance
+            recovered: Whether the last cycle resolved an open alert
+
+        Returns:
+            The delay in seconds, or None to stay on the regular schedule
+        """
+        if recovered and self.recovery_window > 0:
+            self.recovery_until = self.clock() + self.recovery_window
+
+        if failures > 0:
+            backoff = self.retry_delay * 2.0 ** min(failures - 1, 32)
+            return min(backoff, self.retry_max_delay, self.check_interval)
+
+        if on_maintenance:
+            return self.maintenance_interval or None
+
+        if self.recovering and 0 < self.recovery_interval < self.check_interval:
+            return self.recovery_interval
+
+        return None
@@ -0,0 +1,324 @@
+import time
+from typing import Any, Callable, Dict, Optional
+
+from api_monitoring.config import TargetConfig
+
+# Alert states of a target
+OK = 0
+SUSPECT = 1
+ALERTING = 2
+RECOVERING = 3
+STATE_NAMES = ("ok", "suspect", "alerting", "recovering")
+
+# Outcomes of a monitoring cycle fed to the state machine
+SUCCESS = 0
+MAINTENANCE = 1
+MAINTENANCE_FAILURE = 2
+API_FAILURE = 3
+CAUSES = {MAINTENANCE_FAILURE: "maintenance", API_FAILURE: "api"}
+
+# What the caller has to do after an observation
+NO_ACTION = 0
+OPEN_ALERT = 1
+RESOLVE_ALERT = 2
+
+
+class AlertState:
+    """
+    Alert state machine of one target: OK -> SUSPECT -> ALERTING -> RECOVERING.
+
+    Failures of the maintenance check and of the API check are counted
+    separately, each against its own threshold. A target in SUSPECT whose
+    counter reaches its threshold goes to ALERTING. A success moves an
+    alerting target to RECOVERING, and it is resolved once recover_threshold
+    consecutive successes were seen, the alert has been open for at least
+    min_hold seconds and the target is not flapping. Another failure while
+    recovering goes straight back to ALERTING without a new alert.
+
+    Flapping is detected from the share of outcome changes among the last
+    flap_window checks, once that many were seen. It starts at flap_threshold
+    and ends below half of it.
+
+    The state is a handful of integers in slots, so evaluating thousands of
+    targets per tick costs a few attribute updates each.
+    """
+
+    __slots__ = (
+        "maintenance_threshold",
+        "api_threshold",
+        "recover_threshold",
+        "min_hold",
+        "flap_window",
+        "flap_threshold",
+        "clock",
+        "state",
+        "maintenance_failures",
+        "api_failures",
+        "successes",
+        "cause",
+        "since",
+        "history",
+        "checks",
+        "flapping",
+    )
+
+    def __init__(
+        self,
+        maintenance_threshold: int = 1,
+        api_threshold: int = 1,
+        recover_threshold: int = 1,
+        min_hold: float = 0.0,
+        flap_window: int = 0,
+        flap_threshold: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the state machine in OK.
+
+        Args:
+            maintenance_threshold: Consecutive maintenance check failures
+                before alerting
+            api_threshold: Consecutive API check failures before alerting
+            recover_threshold: Consecutive successes before an alert is resolved
+            min_hold: Minimum seconds an alert stays open
+            flap_window: Number of recent checks flapping is detected over
+                (values below 3 disable flap detection)
+            flap_threshold: Share of outcome changes among those checks at
+                which the target is flapping
+            clock: Monotonic clock returning seconds
+        """
+        self.maintenance_threshold = max(maintenance_threshold, 1)
+        self.api_threshold = max(api_threshold, 1)
+        self.recover_threshold = max(recover_threshold, 1)
+        self.min_hold = min_hold
+        self.flap_window = min(flap_window, 62) if flap_window >= 3 else 0
+        self.flap_threshold = flap_threshold
+        self.clock = clock
+
+        self.state = OK
+        self.maintenance_failures = 0
+        self.api_failures = 0
+        self.successes = 0
+        # Failure mode that opened the alert, "maintenance" or "api"
+        self.cause: Optional[str] = None
+        # Monotonic time the alert was opened
+        self.since = 0.0
+        # Outcomes of the last checks as bits, 1 for a failure, newest lowest
+        self.history = 0
+        self.checks = 0
+        self.flapping = False
+
+    @classmethod
+    def from_target(cls, target: TargetConfig) -> "AlertState":
+        """
+        Create the state machine configured for a target.
+
+        Args:
+            target: The target configuration
+
+        Returns:
+            The alert state of the target
+        """
+        return cls(
+            maintenance_threshold=target.maintenance_failure_threshold,
+            api_threshold=target.api_failure_threshold,
+            recover_threshold=target.recover_threshold,
+            min_hold=target.alert_min_hold,
+            flap_window=target.flap_window,
+            flap_threshold=target.flap_threshold,
+        )
+
+    @property
+    def alerting(self) -> bool:
+        """Whether an alert is open, i.e. the state is ALERTING or RECOVERING."""
+        return self.state >= ALERTING
+
+    @property
+    def name(self) -> str:
+        """The name of the current state."""
+        return STATE_NAMES[self.state]
+
+    def _record(self, failed: bool) -> None:
+        """Add a check outcome to the history and update flap detection."""
+        if not self.flap_window:
+            return
+        window = self.flap_window
+        self.history = ((self.history << 1) | failed) & ((1 << window) - 1)
+        if self.checks < window:
+            self.checks += 1
+            if self.checks < window:
+                # Too few checks to tell flapping from an outage starting or ending
+                return
+        # Every pair of adjacent differing bits is one change of outcome
+        changes = (
+            (self.history ^ (self.history >> 1)) & ((1 << (window - 1)) - 1)
+        ).bit_count()
+        ratio = changes / (window - 1)
+        if self.flapping:
+            self.flapping = ratio >= self.flap_threshold / 2
+        else:
+            self.flapping = ratio >= self.flap_threshold
+
+    def observe(self, outcome: int, now: Optional[float] = None) -> int:
+        """
+        Advance the state machine with the outcome of a monitoring cycle.
+
+        Args:
+            outcome: SUCCESS, MAINTENANCE, MAINTENANCE_FAILURE or API_FAILURE
+            now: Current monotonic time (defaults to the clock)
+
+        Returns:
+            OPEN_ALERT if an alert has to be sent, RESOLVE_ALERT if the open
+            alert has to be resolved, NO_ACTION otherwise
+        """
+        state = self.state
+        if outcome == MAINTENANCE:
+            # Expected downtime: failures so far do not count, open alerts stay
+            self.maintenance_failures = 0
+            self.api_failures = 0
+            if state == SUSPECT:
+                self.state = OK
+            return NO_ACTION
+
+        if outcome == SUCCESS:
+            self._record(False)
+            self.maintenance_failures = 0
+            self.api_failures = 0
+            if state == SUSPECT:
+                self.state = OK
+            elif state >= ALERTING:
+                self.successes = self.successes + 1 if state == RECOVERING else 1
+                self.state = RECOVERING
+                return self._try_resolve(now)
+            return NO_ACTION
+
+        self._record(True)
+        if outcome == MAINTENANCE_FAILURE:
+            self.maintenance_failures += 1
+            reached = self.maintenance_failures >= self.maintenance_threshold
+        else:
+            self.api_failures += 1
+            reached = self.api_failures >= self.api_threshold
+
+        if state >= ALERTING:
+            self.state = ALERTING
+            self.successes = 0
+            return NO_ACTION
+        if not reached:
+            self.state = SUSPECT
+            return NO_ACTION
+        self.open(CAUSES.get(outcome), now)
+        return OPEN_ALERT
+
+    def open(self, cause: Optional[str] = None, now: Optional[float] = None) -> bool:
+        """
+        Open an alert regardless of the thresholds.
+
+        Args:
+            cause: The failure mode that opened the alert
+            now: Current monotonic time (defaults to the clock)
+
+        Returns:
+            True if the alert was opened, False if one was already open
+        """
+        if self.state == ALERTING:
+            return False
+        if self.state == RECOVERING:
+            self.state = ALERTING
+            self.successes = 0
+            return False
+        self.state = ALERTING
+        self.cause = cause
+        self.since = self.clock() if now is None else now
+        self.successes = 0
+        return True
+
+    def _try_resolve(self, now: Optional[float]) -> int:
+        """Resolve a recovering alert if the recovery conditions hold."""
+        if self.successes < self.recover_threshold or self.flapping:
+            return NO_ACTION
+        now = self.clock() if now is None else now
+        if now - self.since < self.min_hold:
+            return NO_ACTION
+        self.state = OK
+        self.cause = None
+        self.successes = 0
+        return RESOLVE_ALERT
+
+    def dump(self, now: float) -> Dict[str, Any]:
+        """
+        Return the state for a snapshot.
+
+        Args:
+            now: Current wall clock time; the alert open time is saved as a
+                wall clock time, since monotonic clocks restart with the host
+
+        Returns:
+            The state as a dict of JSON types
+        """
+        return {
+            "state": self.state,
+            "maintenance_failures": self.maintenance_failures,
+            "api_failures": self.api_failures,
+            "successes": self.successes,
+            "cause": self.cause,
+            "opened_at": (
+                round(now - (self.clock() - self.since), 3) if self.alerting else None
+            ),
+            "history": self.history,
+            "checks": self.checks,
+            "flapping": self.flapping,
+        }
+
+    def load(self, data: Dict[str, Any], now: float) -> None:
+        """
+        Restore a state returned by dump().
+
+        Args:
+            data: The saved state
+            now: Current wall clock time
+
+        Raises:
+            KeyError: If the saved state misses a field
+            ValueError: If the saved state is invalid, leaving the state as is
+        """
+        state = int(data["state"])
+        if not OK <= state <= RECOVERING:
+            raise ValueError(f"Invalid alert state {state}")
+        maintenance_failures = int(data["maintenance_failures"])
+        api_failures = int(data["api_failures"])
+        successes = int(data["successes"])
+        opened_at = data.get("opened_at")
+        since = (
+            self.since
+            if opened_at is None
+            else self.clock() - max(0.0, now - float(opened_at))
+        )
+        # The flap window may have changed since the snapshot was taken
+        window = self.flap_window
+        history = int(data["history"]) & ((1 << window) - 1)
+        checks = min(int(data["checks"]), window)
+
+        self.state = state
+        self.maintenance_failures = maintenance_failures
+        self.api_failures = api_failures
+        self.successes = successes
+        self.cause = data.get("cause")
+        self.since = since
+        self.history = history
+        self.checks = checks
+        self.flapping = bool(data["flapping"]) and window > 0
+
+    def clear(self) -> None:
+        """Close the open alert without a resolution, e.g. one from a previous run."""
+        self.state = OK
+        self.cause = None
+        self.successes = 0
+
+    def pending_resolution(self) -> str:
+        """Describe what a recovering alert is waiting for, for logs."""
+        if self.flapping:
+            return "the target to stop flapping"
+        if self.successes < self.recover_threshold:
+            return f"{self.successes}/{self.recover_threshold} successful checks"
+        return f"the minimum alert hold of {self.min_hold:g}s"
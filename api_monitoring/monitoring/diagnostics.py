@@ -0,0 +1,265 @@
+import asyncio
+import socket
+import ssl
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from api_monitoring.monitoring.mtr import (
+    HopChange,
+    MtrError,
+    MtrTrace,
+    diff_traces,
+    run_mtr,
+)
+from api_monitoring.utils.http import http_session_manager
+from api_monitoring.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Order in which the steps are started and reported
+DIAGNOSTIC_STEPS = ("mtr", "dns", "tcp_connect", "tls_handshake", "http_head")
+
+
+@dataclass(slots=True)
+class DiagnosticResult:
+    """Outcome of a single diagnostic step."""
+
+    # Step name, e.g. "dns" or "mtr"
+    name: str
+    # Whether the step completed without an error
+    success: bool
+    # Short human-readable outcome (the full report for MTR)
+    output: str
+    # Time the step took in seconds
+    duration: float = 0.0
+
+
+@dataclass(slots=True)
+class DiagnosticsReport:
+    """Diagnostics gathered for an alert within a time budget."""
+
+    # Results of the steps that finished before the deadline, by name
+    results: Dict[str, DiagnosticResult] = field(default_factory=dict)
+    # Names of the steps that were cancelled at the deadline
+    timed_out: List[str] = field(default_factory=list)
+    # The time budget in seconds
+    deadline: float = 0.0
+    # The fresh MTR trace, the baseline it was compared with and the changes
+    trace: Optional[MtrTrace] = None
+    baseline: Optional[MtrTrace] = None
+    path_changes: List[HopChange] = field(default_factory=list)
+
+    def summary(self) -> str:
+        """
+        Format the one-line steps (everything except MTR) for an alert.
+
+        The changes of the network path against the baseline follow the steps.
+
+        Returns:
+            One line per step, in the order the steps were started
+        """
+        lines = []
+        for name in DIAGNOSTIC_STEPS:
+            if name == "mtr":
+                continue
+            result = self.results.get(name)
+            if result is not None:
+                status = "ok" if result.success else "failed"
+                lines.append(
+                    f"{name}: {status} in {result.duration * 1000:.1f} ms"
+                    f" - {result.output}"
+                )
+            elif name in self.timed_out:
+                lines.append(f"{name}: no result within {self.deadline:g}s")
+        if self.trace is not None and self.baseline is not None:
+            taken = datetime.fromtimestamp(self.baseline.started).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            if self.path_changes:
+                lines.append(f"path changes since baseline of {taken}:")
+                lines.extend(f"  {change}" for change in self.path_changes)
+            else:
+                lines.append(f"path: same as baseline of {taken}")
+        return "\n".join(lines)
+
+
+def _endpoint_address(endpoint_url: str) -> Tuple[str, int, bool]:
+    """Return the host, port and TLS flag of an endpoint URL."""
+    parts = urlsplit(endpoint_url)
+    use_tls = parts.scheme != "http"
+    return parts.hostname or "", parts.port or (443 if use_tls else 80), use_tls
+
+
+async def check_dns(host: str) -> str:
+    """
+    Resolve a hostname.
+
+    Args:
+        host: The hostname
+
+    Returns:
+        The resolved addresses
+    """
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+    addresses = sorted({str(info[4][0]) for info in infos})
+    return ", ".join(addresses)
+
+
+async def check_tcp_connect(host: str, port: int) -> str:
+    """
+    Open and close a plain TCP connection.
+
+    Args:
+        host: The hostname
+        port: The port
+
+    Returns:
+        The connected peer address
+    """
+    _, writer = await asyncio.open_connection(host, port)
+    try:
+        peer = writer.get_extra_info("peername")
+        return f"connected to {peer[0]}:{peer[1]}"
+    finally:
+        writer.close()
+
+
+async def check_tls_handshake(host: str, port: int) -> str:
+    """
+    Time a TLS handshake on a fresh TCP connection.
+
+    Args:
+        host: The hostname
+        port: The port
+
+    Returns:
+        The handshake time, protocol version and cipher
+    """
+    _, writer = await asyncio.open_connection(host, port)
+    try:
+        start = time.perf_counter()
+        await writer.start_tls(ssl.create_default_context(), server_hostname=host)
+        handshake = time.perf_counter() - start
+        ssl_object = writer.get_extra_info("ssl_object")
+        cipher = ssl_object.cipher()[0] if ssl_object is not None else "unknown"
+        version = ssl_object.version() if ssl_object is not None else "unknown"
+        return f"handshake {handshake * 1000:.1f} ms, {version}, {cipher}"
+    finally:
+        writer.close()
+
+
+async def check_http_head(endpoint_url: str) -> str:
+    """
+    Send an HTTP HEAD request to the endpoint.
+
+    Args:
+        endpoint_url: The endpoint URL
+
+    Returns:
+        The HTTP status line
+    """
+    session = http_session_manager.get_session()
+    async with session.head(endpoint_url, allow_redirects=False) as response:
+        return f"HTTP {response.status} {response.reason or ''}".strip()
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable[str]]) -> DiagnosticResult:
+    """Run a diagnostic step and capture its outcome."""
+    start = time.perf_counter()
+    try:
+        output = await step()
+        success = True
+    except asyncio.CancelledError:
+        raise
+    except (
+        OSError,
+        asyncio.TimeoutError,
+        aiohttp.ClientError,
+        ssl.SSLError,
+        MtrError,
+    ) as e:
+        output = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        success = False
+    except Exception as e:
+        logger.warning(f"Diagnostic step {name} failed unexpectedly: {e}")
+        output = f"{type(e).__name__}: {e}"
+        success = False
+    return DiagnosticResult(name, success, output, time.perf_counter() - start)
+
+
+async def run_diagnostics(
+    endpoint_url: str,
+    mtr_target: Optional[str] = None,
+    deadline: float = 10.0,
+    baseline: Optional[MtrTrace] = None,
+    mtr_cycles: int = 1,
+    loss_jump: float = 20.0,
+    latency_jump: float = 50.0,
+) -> DiagnosticsReport:
+    """
+    Run all diagnostic steps concurrently within a time budget.
+
+    Steps still running at the deadline are cancelled and listed in the
+    report as timed out, so this never takes much longer than the deadline.
+
+    Args:
+        endpoint_url: The endpoint URL
+        mtr_target: Host to trace with MTR (defaults to the endpoint host)
+        deadline: Time budget in seconds
+        baseline: Baseline trace of the target the MTR trace is compared with
+        mtr_cycles: Probes MTR sends to every hop
+        loss_jump: Increase of a hop's loss in percentage points to report
+        latency_jump: Increase of a hop's average latency in ms to report
+
+    Returns:
+        The diagnostics report
+    """
+    host, port, use_tls = _endpoint_address(endpoint_url)
+    report = DiagnosticsReport(deadline=deadline, baseline=baseline)
+
+    async def trace() -> str:
+        report.trace = await run_mtr(mtr_target or host, mtr_cycles)
+        return report.trace.format()
+
+    steps: Dict[str, Callable[[], Awaitable[str]]] = {
+        "mtr": trace,
+        "dns": lambda: check_dns(host),
+        "tcp_connect": lambda: check_tcp_connect(host, port),
+        "http_head": lambda: check_http_head(endpoint_url),
+    }
+    if use_tls:
+        steps["tls_handshake"] = lambda: check_tls_handshake(host, port)
+
+    tasks = {
+        name: asyncio.create_task(_run_step(name, steps[name]), name=f"diag:{name}")
+        for name in DIAGNOSTIC_STEPS
+        if name in steps
+    }
+    try:
+        await asyncio.wait(tasks.values(), timeout=deadline)
+    finally:
+        pending = [task for task in tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    for name, task in tasks.items():
+        if task.cancelled():
+            report.timed_out.append(name)
+        else:
+            report.results[name] = task.result()
+    if report.trace is not None and baseline is not None:
+        report.path_changes = diff_traces(
+            baseline, report.trace, loss_jump, latency_jump
+        )
+    if report.timed_out:
+        timed_out = ", ".join(report.timed_out)
+        logger.warning(f"Diagnostics not finished within {deadline}s: {timed_out}")
+    return report
@@ -0,0 +1,138 @@
+import asyncio
+from typing import Iterable, List, Optional
+
+from api_monitoring.alerting.outbox import AlertOutbox
+from api_monitoring.config import TargetConfig, settings
+from api_monitoring.monitoring.monitor import ApiMonitor
+from api_monitoring.monitoring.mtr import MtrBaselineCache
+from api_monitoring.monitoring.scheduler import Scheduler
+from api_monitoring.storage.snapshot import StateSnapshot
+from api_monitoring.storage.timeseries import TimeSeriesStore
+from api_monitoring.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class MonitoringEngine:
+    """
+    Runs many API monitors concurrently on a single event loop.
+
+    Every monitor owns its checker, client, alerter and failure counters, so
+    targets never share state; the engine only owns the scheduler driving
+    their cycles.
+    """
+
+    def __init__(self, monitors: Iterable[ApiMonitor], overrun: Optional[str] = None):
+        """
+        Initialize the monitoring engine.
+
+        Args:
+            monitors: The monitors to run, one per target
+            overrun: What to do with a cycle that is due while the previous one
+                is still running, "skip" or "coalesce" (defaults to the global
+                settings)
+        """
+        self.monitors: List[ApiMonitor] = list(monitors)
+        self.scheduler = Scheduler(
+            overrun=overrun if overrun is not None else settings.schedule_overrun
+        )
+        for monitor in self.monitors:
+            monitor.schedule(self.scheduler)
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @classmethod
+    def from_targets(
+        cls,
+        targets: Iterable[TargetConfig],
+        store: Optional[TimeSeriesStore] = None,
+        outbox: Optional[AlertOutbox] = None,
+        snapshot: Optional[StateSnapshot] = None,
+        mtr_baselines: Optional[MtrBaselineCache] = None,
+    ) -> "MonitoringEngine":
+        """
+        Create an engine with an isolated monitor for every target.
+
+        Args:
+            targets: The target configurations
+            store: Optional time series store recording all probe results
+            outbox: Optional outbox queuing the notifications of all targets
+            snapshot: Optional state snapshot the monitors resume from
+            mtr_baselines: Optional cache of baseline traces of the targets
+
+        Returns:
+            A monitoring engine for the given targets
+        """
+        return cls(
+            ApiMonitor.from_target(target, store, outbox, snapshot, mtr_baselines)
+            for target in targets
+        )
+
+    def get_monitor(self, name: str) -> Optional[ApiMonitor]:
+        """
+        Look up a monitor by target name.
+
+        Args:
+            name: The target name
+
+        Returns:
+            The monitor for the target, or None if there is no such target
+        """
+        for monitor in self.monitors:
+            if monitor.name == name:
+                return monitor
+        return None
+
+    def update_credentials(self, targets: Iterable[TargetConfig]) -> None:
+        """
+        Pass reloaded credentials to the monitors of the given targets.
+
+        A client whose credentials changed is rebuilt before its next check;
+        targets without a running monitor are ignored.
+
+        Args:
+            targets: The reloaded target configurations
+        """
+        for target in targets:
+            monitor = self.get_monitor(target.name)
+            if monitor is None:
+                logger.warning(f"Ignoring credentials of unknown target {target.name}")
+                continue
+            monitor.aws_client.update_credentials(
+                target.aws_access_key_id, target.aws_secret_access_key
+            )
+
+    async def run(self) -> None:
+        """
+        Run all monitors until the engine is stopped.
+
+        A single scheduler starts every cycle on its deadline. A cycle that dies
+        with an unexpected exception is logged and does not take the remaining
+        monitors down with it.
+        """
+        logger.info(f"Starting monitoring engine with {len(self.monitors)} target(s)")
+
+        self._task = asyncio.create_task(self.scheduler.run(), name="scheduler")
+        try:
+            (result,) = await asyncio.gather(self._task, return_exceptions=True)
+        finally:
+            await self.stop()
+
+        if isinstance(result, BaseException) and not isinstance(
+            result, asyncio.CancelledError
+        ):
+            logger.error(f"Scheduler stopped with an error: {result}", exc_info=result)
+
+    async def stop(self) -> None:
+        """Cancel the scheduler and the running cycles and wait for them to finish."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            logger.info(f"Stopped {len(self.monitors)} monitor(s)")
+
+    async def close(self) -> None:
+        """Stop all monitors and release their network resources."""
+        await self.stop()
+        await asyncio.gather(
+            *(monitor.close() for monitor in self.monitors), return_exceptions=True
+        )
+        logger.info("Monitoring engine closed")
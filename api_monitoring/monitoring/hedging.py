@@ -0,0 +1,113 @@
+import asyncio
+import math
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Deque,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+from api_monitoring.monitoring.results import ProbeResult
+
+# Number of recent successful probe latencies the hedge delay is learned from
+HEDGE_HISTORY_SIZE = 200
+
+# Which probe answered a hedged check: the first one, the hedge, or neither
+HEDGE_WINNERS = ("primary", "hedge", "none")
+
+Probe = Callable[[], Coroutine[Any, Any, ProbeResult]]
+
+
+class LatencyHistory:
+    """Bounded window of recent probe latencies, in seconds."""
+
+    def __init__(self, size: int = HEDGE_HISTORY_SIZE):
+        """
+        Initialize the history.
+
+        Args:
+            size: Number of latencies to keep
+        """
+        self._values: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._values)
+
+    def add(self, latency: float) -> None:
+        """Record the latency of a successful probe."""
+        self._values.append(latency)
+
+    def extend(self, latencies: Iterable[float]) -> None:
+        """Record several latencies, oldest first."""
+        self._values.extend(latencies)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Return the nearest-rank percentile of the recorded latencies.
+
+        Args:
+            q: The percentile as a fraction, e.g. 0.95
+
+        Returns:
+            The percentile in seconds, or None if nothing was recorded
+        """
+        if not self._values:
+            return None
+        values = sorted(self._values)
+        rank = max(1, math.ceil(q * len(values)))
+        return values[rank - 1]
+
+
+async def run_hedged(
+    primary: Probe, hedge: Probe, delay: float
+) -> Tuple[ProbeResult, str]:
+    """
+    Run a probe and hedge it with a second one if it is slow to answer.
+
+    The hedge starts once the primary probe has been running for delay
+    seconds. The first successful result wins and the other probe is
+    cancelled. If both fail, the primary result is returned. Cancelling the
+    caller cancels both probes.
+
+    Args:
+        primary: Starts the primary probe
+        hedge: Starts the hedge probe
+        delay: Seconds to wait for the primary probe before hedging
+
+    Returns:
+        A tuple of (result, winner) where winner is "primary" or "hedge" if a
+        hedge was started and that probe succeeded first, "none" if both
+        failed, and an empty string if no hedge was needed.
+    """
+    primary_task: "asyncio.Task[ProbeResult]" = asyncio.create_task(primary())
+    hedge_task: Optional["asyncio.Task[ProbeResult]"] = None
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        if done:
+            return primary_task.result(), ""
+
+        hedge_task = asyncio.create_task(hedge())
+        pending = {primary_task, hedge_task}
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            # Prefer the primary if both finish in the same iteration
+            for task in sorted(done, key=lambda task: task is not primary_task):
+                result = task.result()
+                if result.success:
+                    return result, "primary" if task is primary_task else "hedge"
+        return primary_task.result(), "none"
+    finally:
+        tasks = [task for task in (primary_task, hedge_task) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
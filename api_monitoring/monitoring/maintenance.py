@@ -1,86 +1,242 @@
 import asyncio
-from typing import Optional, Tuple
+import re
+from typing import List, Optional, Sequence, Tuple
 
 import aiohttp
 
 from api_monitoring.config import settings
+from api_monitoring.monitoring.results import ProbeResult
+from api_monitoring.utils.http import http_session_manager
 from api_monitoring.utils.logging import get_logger
+from api_monitoring.utils.timings import PhaseTimings
 
 logger = get_logger(__name__)
 
 
+DEFAULT_MARKERS = ("OnMaintenance",)
+
+
+class MarkerScanner:
+    """
+    Incrementally searches a byte stream for maintenance markers.
+
+    Chunks are scanned as they arrive. The tail of the previous chunk is kept
+    so that a marker split across a chunk boundary is still found, which keeps
+    memory bounded by the chunk size plus the overlap window.
+    """
+
+    def __init__(
+        self,
+        literals: Sequence[str] = DEFAULT_MARKERS,
+        patterns: Sequence[str] = (),
+        pattern_window: int = 256,
+    ):
+        """
+        Initialize the scanner.
+
+        Args:
+            literals: Literal strings that indicate maintenance
+            patterns: Regular expressions that indicate maintenance
+            pattern_window: Maximum length of a regex match that may span two chunks
+        """
+        self.literals = [literal.encode() for literal in literals if literal]
+        self.patterns = [re.compile(pattern.encode()) for pattern in patterns]
+
+        overlap = max((len(literal) for literal in self.literals), default=1) - 1
+        if self.patterns:
+            overlap = max(overlap, pattern_window)
+        self.overlap = overlap
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        """
+        Scan the next chunk of the body.
+
+        Args:
+            chunk: The next chunk of the response body
+
+        Returns:
+            The marker that was found, or None if no marker has been seen yet
+        """
+        data = self._tail + chunk
+        for literal in self.literals:
+            if literal in data:
+                return literal.decode()
+        for pattern in self.patterns:
+            if pattern.search(data):
+                return pattern.pattern.decode()
+        self._tail = data[-self.overlap :] if self.overlap else b""
+        return None
+
+
 class MaintenanceChecker:
     """Checks if an API endpoint is in maintenance mode."""
 
-    def __init__(self, endpoint_url: str, timeout: int = 10):
+    def __init__(
+        self,
+        endpoint_url: str,
+        timeout: int = 10,
+        markers: Sequence[str] = DEFAULT_MARKERS,
+        marker_patterns: Sequence[str] = (),
+        status_codes: Sequence[int] = (),
+        headers: Sequence[str] = (),
+        max_body_bytes: int = 1024 * 1024,
+        chunk_size: int = 16 * 1024,
+    ):
         """
         Initialize the maintenance checker.
 
         Args:
             endpoint_url: The endpoint URL to check
             timeout: Timeout for the request in seconds
+            markers: Literal strings in the body that indicate maintenance
+            marker_patterns: Regular expressions in the body that indicate maintenance
+            status_codes: HTTP status codes that indicate maintenance
+            headers: Response headers that indicate maintenance, either "Name" to
+                match on presence or "Name: value" to match a substring of the value
+            max_body_bytes: Stop reading the body after this many bytes
+            chunk_size: Size of the chunks the body is read in
         """
         self.endpoint_url = endpoint_url
         self.timeout = timeout
+        self.markers = list(markers)
+        self.marker_patterns = list(marker_patterns)
+        self.status_codes = frozenset(status_codes)
+        self.header_markers: List[Tuple[str, Optional[str]]] = []
+        for header in headers:
+            name, _, value = header.partition(":")
+            self.header_markers.append((name.strip(), value.strip() or None))
+        self.max_body_bytes = max_body_bytes
+        self.chunk_size = chunk_size
+
+    def _match_headers(self, response: aiohttp.ClientResponse) -> Optional[str]:
+        """Return the first configured header marker present in the response."""
+        for name, value in self.header_markers:
+            header_value = response.headers.get(name)
+            if header_value is None:
+                continue
+            if value is None or value in header_value:
+                return name if value is None else f"{name}: {value}"
+        return None
+
+    async def _scan_body(self, response: aiohttp.ClientResponse) -> Optional[str]:
+        """
+        Read the body in chunks until a marker is found or the byte cap is hit.
 
-    async def is_on_maintenance(self) -> Tuple[bool, Optional[str]]:
+        Args:
+            response: The response whose body should be scanned
+
+        Returns:
+            The marker that was found, or None
+        """
+        scanner = MarkerScanner(self.markers, self.marker_patterns)
+        bytes_read = 0
+        async for chunk in response.content.iter_chunked(self.chunk_size):
+            remaining = self.max_body_bytes - bytes_read
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+            bytes_read += len(chunk)
+
+            marker = scanner.feed(chunk)
+            if marker is not None:
+                return marker
+            if bytes_read >= self.max_body_bytes:
+                logger.info(
+                    f"Stopped reading maintenance page after {bytes_read} bytes"
+                )
+                break
+        return None
+
+    async def is_on_maintenance(self) -> ProbeResult:
         """
         Check if the API is in maintenance mode.
 
         Returns:
-            A tuple of (is_maintenance, error_message) where is_maintenance is a boolean
-            indicating if the API is in maintenance mode, and error_message is an optional
-            error message if an error occurred during the check.
+            A probe result where on_maintenance indicates if the API is in maintenance
+            mode, success is False if an error occurred during the check, and timings
+            holds the DNS, connect, time-to-first-byte and total latency.
         """
         logger.info(f"Checking if API {self.endpoint_url} is on maintenance...")
 
+        timings = PhaseTimings()
+        timings.start()
+        result = await self._check(timings)
+        timings.finish()
+        result.timings = timings
+        return result
+
+    async def _check(self, timings: PhaseTimings) -> ProbeResult:
+        """
+        Fetch the endpoint and look for maintenance indicators.
+
+        Args:
+            timings: Collects the phase timings of the request
+
+        Returns:
+            The probe result without timings
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    self.endpoint_url,
-                    timeout=aiohttp.ClientTimeout(total=self.timeout),
-                    allow_redirects=True,
-                ) as response:
-                    # Check if the response contains the maintenance indicator
-                    text = await response.text()
-
-                    if "OnMaintenance" in text:
-                        logger.info("API is on maintenance.")
-                        return True, None
-
-                    logger.info("API is not on maintenance.")
-                    return False, None
+            session = http_session_manager.get_session()
+            async with session.get(
+                self.endpoint_url,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                allow_redirects=True,
+                trace_request_ctx=timings,
+            ) as response:
+                # Check status and headers before touching the body
+                if response.status in self.status_codes:
+                    logger.info(
+                        f"API is on maintenance (status code {response.status})."
+                    )
+                    return ProbeResult(success=True, on_maintenance=True)
+
+                marker = self._match_headers(response)
+                if marker is None and (self.markers or self.marker_patterns):
+                    # Check if the response body contains a maintenance indicator
+                    marker = await self._scan_body(response)
+
+                if marker is not None:
+                    logger.info(f"API is on maintenance (matched {marker!r}).")
+                    return ProbeResult(success=True, on_maintenance=True)
+
+                logger.info("API is not on maintenance.")
+                return ProbeResult(success=True)
 
         except asyncio.TimeoutError:
             error_msg = f"Timeout after waiting for {self.timeout} seconds."
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, "Timeout")
 
         except aiohttp.ClientConnectorError as e:
             error_msg = f"Connection error checking maintenance status: {e}"
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, type(e).__name__)
 
         except aiohttp.ClientResponseError as e:
             error_msg = (
                 f"Response error checking maintenance status: {e.status} - {e.message}"
             )
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, type(e).__name__)
 
         except aiohttp.ClientError as e:
             error_msg = f"HTTP client error checking maintenance status: {e}"
             logger.error(error_msg)
-            return False, error_msg
+            return ProbeResult(False, error_msg, type(e).__name__)
 
         except Exception as e:
             error_msg = f"Unexpected error checking maintenance status: {str(e)}"
             logger.error(error_msg, exc_info=True)
-            return False, error_msg
+            return ProbeResult(False, error_msg, type(e).__name__)
 
 
 # Create a default maintenance checker instance
 maintenance_checker = MaintenanceChecker(
     endpoint_url=settings.endpoint_url,
     timeout=settings.maintenance_check_timeout,
+    markers=settings.maintenance_markers,
+    marker_patterns=settings.maintenance_marker_patterns,
+    status_codes=settings.maintenance_status_codes,
+    headers=settings.maintenance_headers,
+    max_body_bytes=settings.maintenance_max_body_bytes,
 )
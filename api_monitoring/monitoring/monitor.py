@@ -1,12 +1,40 @@
 import asyncio
-from typing import Optional, Tuple
-
-from api_monitoring.alerting.telegram import telegram_alerter
-from api_monitoring.clients.aws_client import aws_client
-from api_monitoring.config import settings
-from api_monitoring.monitoring.maintenance import maintenance_checker
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from api_monitoring.alerting.dispatcher import telegram_dispatcher
+from api_monitoring.alerting.outbox import AlertOutbox
+from api_monitoring.alerting.sinks import Notification
+from api_monitoring.alerting.telegram import TelegramAlerter, telegram_alerter
+from api_monitoring.clients.aws_client import AWSClient, aws_client
+from api_monitoring.config import TargetConfig, hostname_from_url, settings
+from api_monitoring.monitoring.adaptive import AdaptiveProbePolicy
+from api_monitoring.monitoring.alert_state import (
+    API_FAILURE,
+    MAINTENANCE,
+    MAINTENANCE_FAILURE,
+    OPEN_ALERT,
+    RECOVERING,
+    RESOLVE_ALERT,
+    SUCCESS,
+    AlertState,
+)
+from api_monitoring.monitoring.diagnostics import DiagnosticsReport, run_diagnostics
+from api_monitoring.monitoring.hedging import LatencyHistory, run_hedged
+from api_monitoring.monitoring.maintenance import (
+    MaintenanceChecker,
+    maintenance_checker,
+)
+from api_monitoring.monitoring.mtr import MtrBaselineCache
+from api_monitoring.monitoring.results import ProbeResult
+from api_monitoring.monitoring.scheduler import ScheduledJob, Scheduler
+from api_monitoring.storage.snapshot import StateSnapshot, decode_floats, encode_floats
+from api_monitoring.storage.timeseries import TimeSeriesStore
 from api_monitoring.utils.logging import get_logger
-from api_monitoring.utils.network import run_mtr
+from api_monitoring.utils.metrics import TargetMetrics
+from api_monitoring.utils.timings import PhaseTimings
 
 logger = get_logger(__name__)
 
@@ -24,232 +52,796 @@ class ApiMonitor:
         check_interval: int = 60,
         api_timeout: int = 15,
         target_hostname: Optional[str] = None,
+        *,
+        name: Optional[str] = None,
+        maintenance_checker: MaintenanceChecker = maintenance_checker,
+        aws_client: AWSClient = aws_client,
+        alerter: TelegramAlerter = telegram_alerter,
+        maintenance_failure_threshold: Optional[int] = None,
+        api_failure_threshold: Optional[int] = None,
+        alert_comment: Optional[str] = None,
+        concurrent_probes: Optional[bool] = None,
+        diagnostics_deadline: Optional[float] = None,
+        hedge_probes: Optional[bool] = None,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: Optional[int] = None,
+        store: Optional[TimeSeriesStore] = None,
+        schedule_phase: Optional[float] = None,
+        schedule_jitter: Optional[float] = None,
+        probe_policy: Optional[AdaptiveProbePolicy] = None,
+        alert_state: Optional[AlertState] = None,
+        outbox: Optional[AlertOutbox] = None,
+        snapshot: Optional[StateSnapshot] = None,
+        mtr_baselines: Optional[MtrBaselineCache] = None,
     ):
         """
         Initialize the API monitor.
 
+        Components and thresholds default to the module-level instances and the
+        global settings, so a bare ApiMonitor() watches the single configured
+        endpoint. Use from_target() to build a monitor with isolated components.
+
         Args:
             check_interval: Interval between API checks in seconds
             api_timeout: Timeout for API requests in seconds
-            target_hostname: The hostname to use for MTR traces (defaults to endpoint URL hostname)
+            target_hostname: The hostname to use for MTR traces (defaults to the
+                endpoint URL hostname)
+            name: Target name used in logs (defaults to the hostname)
+            maintenance_checker: Maintenance checker for this target
+            aws_client: AWS client for this target
+            alerter: Telegram alerter for this target, used without an outbox
+            maintenance_failure_threshold: Consecutive maintenance check failures
+                before alerting
+            api_failure_threshold: Consecutive API check failures before alerting
+            alert_comment: Optional comment to include in alerts
+            concurrent_probes: Run the maintenance and API checks at the same time
+            diagnostics_deadline: Time budget in seconds for alert diagnostics
+            hedge_probes: Hedge slow API checks with a second one on a fresh connection
+            hedge_percentile: Latency percentile of recent API checks after which
+                a hedge starts
+            hedge_min_samples: Successful API checks needed before hedging starts
+            store: Optional time series store that records every probe result
+                and the path of alert traces
+            schedule_phase: Offset of the cycles within the check interval in
+                seconds (defaults to a stable offset derived from the name)
+            schedule_jitter: Maximum random delay added to every cycle in seconds
+            probe_policy: Policy adapting the probe frequency to the target state
+                (defaults to one built from the global settings)
+            alert_state: State machine deciding when alerts open and resolve
+                (defaults to one built from the thresholds and global settings)
+            outbox: Optional outbox that notifications are queued in, so the
+                cycle does not wait for them to be delivered (they are sent
+                directly if None)
+            snapshot: Optional state snapshot the monitor resumes from and
+                saves its state to after every cycle
+            mtr_baselines: Optional cache of baseline traces the alert trace is
+                compared with; the target is traced into it while healthy
         """
         self.check_interval = check_interval
         self.api_timeout = api_timeout
 
+        self.maintenance_checker = maintenance_checker
+        self.aws_client = aws_client
+        self.alerter = alerter
+        self.store = store
+        self.outbox = outbox
+        self.snapshot = snapshot
+        self.mtr_baselines = mtr_baselines
+
         # Extract hostname from endpoint URL if not provided
         if target_hostname is None:
-            # Remove protocol prefix if present
-            url = settings.endpoint_url
-            if "://" in url:
-                url = url.split("://")[1]
-            # Extract hostname (remove path and query parameters)
-            self.target_hostname = url.split("/")[0]
+            self.target_hostname = hostname_from_url(aws_client.endpoint_url)
         else:
             self.target_hostname = target_hostname
+        self.name = name or self.target_hostname
 
-        # Failure counters for threshold-based alerting
-        self.maintenance_failure_count = 0
-        self.api_failure_count = 0
+        self.alert_comment = (
+            alert_comment if alert_comment is not None else settings.alert_comment
+        )
+        self.concurrent_probes = (
+            concurrent_probes
+            if concurrent_probes is not None
+            else settings.concurrent_probes
+        )
+        self.diagnostics_deadline = (
+            diagnostics_deadline
+            if diagnostics_deadline is not None
+            else settings.diagnostics_deadline
+        )
+        self.hedge_probes = (
+            hedge_probes if hedge_probes is not None else settings.hedge_probes
+        )
+        self.hedge_percentile = (
+            hedge_percentile
+            if hedge_percentile is not None
+            else settings.hedge_percentile
+        )
+        self.hedge_min_samples = (
+            hedge_min_samples
+            if hedge_min_samples is not None
+            else settings.hedge_min_samples
+        )
+        self.schedule_phase = (
+            schedule_phase if schedule_phase is not None else settings.schedule_phase
+        )
+        self.schedule_jitter = (
+            schedule_jitter if schedule_jitter is not None else settings.schedule_jitter
+        )
+        self.probe_policy = probe_policy or AdaptiveProbePolicy.from_settings(
+            check_interval
+        )
 
-        logger.info(
-            f"Initialized API monitor for {self.target_hostname} with check interval {check_interval}s"
+        # Tag every log record with the target name
+        self.logger = logging.LoggerAdapter(logger, {"target": self.name})
+
+        # Alert state with separate failure counters per check
+        self.alert_state = alert_state or AlertState(
+            maintenance_threshold=(
+                maintenance_failure_threshold
+                if maintenance_failure_threshold is not None
+                else settings.maintenance_failure_threshold
+            ),
+            api_threshold=(
+                api_failure_threshold
+                if api_failure_threshold is not None
+                else settings.api_failure_threshold
+            ),
+            recover_threshold=settings.recover_threshold,
+            min_hold=settings.alert_min_hold,
+            flap_window=settings.flap_window,
+            flap_threshold=settings.flap_threshold,
         )
-        logger.info(
-            f"Failure thresholds: maintenance={settings.maintenance_failure_threshold}, "
-            f"api={settings.api_failure_threshold}"
+
+        # Most recent probe results, including phase timings
+        self.last_maintenance_result: Optional[ProbeResult] = None
+        self.last_api_result: Optional[ProbeResult] = None
+        self.last_diagnostics: Optional[DiagnosticsReport] = None
+
+        # Latencies of recent successful API checks, for the hedge delay
+        self.api_latencies = LatencyHistory()
+
+        # Resume from the state saved by a previous run
+        saved = snapshot.restore(self.name) if snapshot is not None else None
+        if saved is not None:
+            self.restore_state(saved)
+        # The outbox file knows best whether the alert of the previous run is
+        # open; a restored alert keeps its recovery progress and a restored
+        # suspicion its failure counters
+        if outbox is not None and outbox.is_open(self.name):
+            if not self.alert_state.alerting:
+                self.alert_state.open()
+        elif (
+            outbox is not None and outbox.path is not None and self.alert_state.alerting
+        ):
+            self.alert_state.clear()
+
+        # Metric series for this target, registered once it is scheduled or
+        # probed, so monitors that never run export nothing
+        self._metrics: Optional[TargetMetrics] = None
+
+        if mtr_baselines is not None:
+            mtr_baselines.add_target(
+                self.name, self.target_hostname, lambda: not self.alert_open
+            )
+
+        self.logger.info(
+            f"Initialized API monitor for {self.target_hostname} "
+            f"with check interval {check_interval}s"
         )
+        self.logger.info(
+            f"Failure thresholds: maintenance={self.maintenance_failure_threshold}, "
+            f"api={self.api_failure_threshold}"
+        )
+
+    @classmethod
+    def from_target(
+        cls,
+        target: TargetConfig,
+        store: Optional[TimeSeriesStore] = None,
+        outbox: Optional[AlertOutbox] = None,
+        snapshot: Optional[StateSnapshot] = None,
+        mtr_baselines: Optional[MtrBaselineCache] = None,
+    ) -> "ApiMonitor":
+        """
+        Create a monitor with its own checker, client and alerter for a target.
+
+        Args:
+            target: The target configuration
+            store: Optional time series store shared by all monitors
+            outbox: Optional alert outbox shared by all monitors
+            snapshot: Optional state snapshot shared by all monitors
+            mtr_baselines: Optional baseline trace cache shared by all monitors
+
+        Returns:
+            A monitor whose state is isolated from all other monitors
+        """
+        return cls(
+            check_interval=target.check_interval,
+            api_timeout=target.api_timeout,
+            target_hostname=target.hostname,
+            name=target.name,
+            maintenance_checker=MaintenanceChecker(
+                endpoint_url=target.endpoint_url,
+                timeout=target.maintenance_check_timeout,
+                markers=target.maintenance_markers,
+                marker_patterns=target.maintenance_marker_patterns,
+                status_codes=target.maintenance_status_codes,
+                headers=target.maintenance_headers,
+                max_body_bytes=target.maintenance_max_body_bytes,
+            ),
+            aws_client=AWSClient(
+                endpoint_url=target.endpoint_url,
+                aws_access_key_id=target.aws_access_key_id,
+                aws_secret_access_key=target.aws_secret_access_key,
+                region_name=target.aws_default_region,
+                cold_probe_interval=target.aws_cold_probe_interval,
+            ),
+            alerter=TelegramAlerter(
+                bot_token=settings.telegram_bot_token,
+                chat_id=settings.telegram_chat_id,
+                timeout=target.api_timeout,
+                dispatcher=telegram_dispatcher,
+            ),
+            maintenance_failure_threshold=target.maintenance_failure_threshold,
+            api_failure_threshold=target.api_failure_threshold,
+            alert_comment=target.alert_comment,
+            concurrent_probes=target.concurrent_probes,
+            diagnostics_deadline=target.diagnostics_deadline,
+            hedge_probes=target.hedge_probes,
+            hedge_percentile=target.hedge_percentile,
+            hedge_min_samples=target.hedge_min_samples,
+            store=store,
+            schedule_phase=target.schedule_phase,
+            schedule_jitter=target.schedule_jitter,
+            probe_policy=AdaptiveProbePolicy.from_target(target),
+            alert_state=AlertState.from_target(target),
+            outbox=outbox,
+            snapshot=snapshot,
+            mtr_baselines=mtr_baselines,
+        )
+
+    def export_state(self) -> Dict[str, Any]:
+        """
+        Return the state to resume from after a restart.
+
+        Returns:
+            The alert state, the adaptive probe window, the open Telegram alert
+            when sent without an outbox and recent API latencies
+        """
+        now = time.time()
+        policy = self.probe_policy
+        state: Dict[str, Any] = {
+            "alert": self.alert_state.dump(now),
+            "recovery_until": (
+                round(now + policy.recovery_until - policy.clock(), 3)
+                if policy.recovering
+                else None
+            ),
+            "latencies": encode_floats(self.api_latencies),
+        }
+        if self.outbox is None:
+            # With an outbox its file keeps the messages follow-ups refer to
+            state["message"] = {
+                "id": self.alerter.alert_message_id,
+                "timestamp": self.alerter.alert_timestamp,
+                "in_digest": self.alerter.alert_in_digest,
+            }
+        return state
+
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """
+        Resume from a state returned by export_state().
+
+        An invalid state is logged and ignored from the first invalid part on.
+
+        Args:
+            state: The saved state
+        """
+        now = time.time()
+        try:
+            self.alert_state.load(state["alert"], now)
+            recovery_until = state.get("recovery_until")
+            if recovery_until is not None:
+                policy = self.probe_policy
+                policy.recovery_until = policy.clock() + float(recovery_until) - now
+            self.api_latencies.extend(decode_floats(state.get("latencies", "")))
+            message = state.get("message")
+            if message is not None and self.outbox is None:
+                self.alerter.alert_message_id = message["id"]
+                self.alerter.alert_timestamp = message["timestamp"]
+                self.alerter.alert_in_digest = bool(message["in_digest"])
+        except (KeyError, TypeError, ValueError) as e:
+            self.logger.warning(f"Ignoring invalid saved state: {e}")
+            return
+        self.logger.info(
+            f"Resumed in alert state {self.alert_state.name} with failures "
+            f"maintenance={self.maintenance_failure_count}, "
+            f"api={self.api_failure_count}"
+        )
+
+    async def close(self) -> None:
+        """Release the network resources held by this monitor's components."""
+        await self.aws_client.close()
 
-    async def check_api_with_timeout(self) -> Tuple[bool, Optional[str]]:
+    async def check_api_with_timeout(self) -> ProbeResult:
         """
         Check API availability with a timeout.
 
         Returns:
-            A tuple of (success, error_message) where success is a boolean indicating if the
-            API is available, and error_message is an optional error message if not available.
+            The probe result of the API check
         """
+        hedge_delay = self.hedge_delay()
         try:
             # Use asyncio.wait_for to implement timeout
-            return await asyncio.wait_for(
-                aws_client.check_api_availability(), timeout=self.api_timeout
-            )
+            if hedge_delay is None:
+                result = await asyncio.wait_for(
+                    self.aws_client.check_api_availability(), timeout=self.api_timeout
+                )
+            else:
+                result = await asyncio.wait_for(
+                    self.check_api_hedged(hedge_delay), timeout=self.api_timeout
+                )
         except asyncio.TimeoutError:
             error_msg = f"API check timed out after {self.api_timeout} seconds"
-            logger.error(error_msg)
-            return False, error_msg
+            self.logger.error(error_msg)
+            result = ProbeResult(
+                False,
+                error_msg,
+                "Timeout",
+                timings=PhaseTimings(total=float(self.api_timeout)),
+            )
+        if result.success and result.timings.total is not None:
+            self.api_latencies.add(result.timings.total)
+        self.last_api_result = result
+        self.record_probe_result("api", result)
+        return result
 
-    def should_send_maintenance_alert(self) -> bool:
+    def hedge_delay(self) -> Optional[float]:
         """
-        Check if a maintenance failure alert should be sent based on the failure threshold.
+        Return how long to wait for an API check before hedging it.
 
         Returns:
-            True if an alert should be sent, False otherwise.
+            The learned latency percentile in seconds, or None if hedging is
+            disabled or there is not enough history yet
         """
-        self.maintenance_failure_count += 1
-        logger.info(
-            f"Maintenance failure count: {self.maintenance_failure_count}/{settings.maintenance_failure_threshold}"
-        )
+        if not self.hedge_probes or len(self.api_latencies) < self.hedge_min_samples:
+            return None
+        return self.api_latencies.percentile(self.hedge_percentile)
 
-        if self.maintenance_failure_count >= settings.maintenance_failure_threshold:
-            return True
-        return False
+    async def check_api_hedged(self, delay: float) -> ProbeResult:
+        """
+        Check API availability, hedging with a fresh connection after a delay.
 
-    def should_send_api_alert(self) -> bool:
+        Args:
+            delay: Seconds to wait for the first check before starting the hedge
+
+        Returns:
+            The first successful result, or the first check's failure
+        """
+        result, winner = await run_hedged(
+            self.aws_client.check_api_availability,
+            lambda: self.aws_client.check_api_availability(fresh=True),
+            delay,
+        )
+        if winner:
+            self.metrics.hedges[winner].inc()
+            self.logger.info(
+                f"API check hedged after {delay * 1000:.1f} ms, winner: {winner}"
+            )
+        return result
+
+    async def check_maintenance(self) -> ProbeResult:
         """
-        Check if an API failure alert should be sent based on the failure threshold.
+        Check if the API is in maintenance mode.
 
         Returns:
-            True if an alert should be sent, False otherwise.
+            The probe result of the maintenance check
+        """
+        result = await self.maintenance_checker.is_on_maintenance()
+        self.last_maintenance_result = result
+        self.record_probe_result("maintenance", result)
+        return result
+
+    def record_probe_result(self, probe: str, result: ProbeResult) -> None:
+        """
+        Log the outcome and phase timings of a probe, update its metrics and
+        append it to the time series store.
+
+        Args:
+            probe: The probe name ("maintenance" or "api")
+            result: The probe result
         """
-        self.api_failure_count += 1
         logger.info(
-            f"API failure count: {self.api_failure_count}/{settings.api_failure_threshold}"
+            f"{probe} probe finished: success={result.success}",
+            extra={
+                "target": self.name,
+                "probe": probe,
+                "success": result.success,
+                "error_class": result.error_class,
+                "reused_connection": result.timings.reused_connection,
+                **result.timings.as_dict(),
+            },
         )
+        if probe == "api":
+            self.metrics.api.record(result)
+        else:
+            self.metrics.maintenance.record(result)
+        if self.store is not None:
+            self.store.append(self.name, probe, result)
+
+    async def run_probes_concurrently(
+        self,
+    ) -> Tuple[ProbeResult, Optional[ProbeResult]]:
+        """
+        Run the maintenance check and the API check at the same time.
+
+        The API check is cancelled as soon as the maintenance check reports
+        maintenance or fails, since its result would be ignored in that case.
+
+        Returns:
+            A tuple of (maintenance_result, api_result) where api_result is the
+            result of check_api_with_timeout(), or None if it was cancelled.
+        """
+        api_task = asyncio.create_task(self.check_api_with_timeout())
+        try:
+            maintenance_result = await self.check_maintenance()
+        except BaseException:
+            api_task.cancel()
+            raise
+
+        if maintenance_result.on_maintenance or not maintenance_result.success:
+            api_task.cancel()
+            try:
+                await api_task
+            except asyncio.CancelledError:
+                pass
+            return maintenance_result, None
+
+        return maintenance_result, await api_task
+
+    @property
+    def maintenance_failure_threshold(self) -> int:
+        """Consecutive maintenance check failures before alerting."""
+        return self.alert_state.maintenance_threshold
+
+    @maintenance_failure_threshold.setter
+    def maintenance_failure_threshold(self, value: int) -> None:
+        self.alert_state.maintenance_threshold = value
+
+    @property
+    def api_failure_threshold(self) -> int:
+        """Consecutive API check failures before alerting."""
+        return self.alert_state.api_threshold
+
+    @api_failure_threshold.setter
+    def api_failure_threshold(self, value: int) -> None:
+        self.alert_state.api_threshold = value
+
+    @property
+    def maintenance_failure_count(self) -> int:
+        """Consecutive maintenance check failures."""
+        return self.alert_state.maintenance_failures
 
-        if self.api_failure_count >= settings.api_failure_threshold:
+    @maintenance_failure_count.setter
+    def maintenance_failure_count(self, value: int) -> None:
+        self.alert_state.maintenance_failures = value
+
+    @property
+    def api_failure_count(self) -> int:
+        """Consecutive API check failures."""
+        return self.alert_state.api_failures
+
+    @api_failure_count.setter
+    def api_failure_count(self, value: int) -> None:
+        self.alert_state.api_failures = value
+
+    @property
+    def alert_open(self) -> bool:
+        """Whether an alert is open for this target."""
+        return self.alert_state.alerting
+
+    async def handle_failure(self, outcome: int, error_message: str) -> bool:
+        """
+        Feed a failed check to the alert state and alert if that opens an alert.
+
+        Args:
+            outcome: MAINTENANCE_FAILURE or API_FAILURE
+            error_message: The error message of the failed check
+
+        Returns:
+            True if an alert is open (wait for the next cycle), False if the
+            failure is below its threshold (confirm it sooner)
+        """
+        state = self.alert_state
+        action = state.observe(outcome)
+        if outcome == MAINTENANCE_FAILURE:
+            check = "Maintenance check"
+            count, threshold = state.maintenance_failures, state.maintenance_threshold
+        else:
+            check = "API check"
+            count, threshold = state.api_failures, state.api_threshold
+
+        if action == OPEN_ALERT:
+            if outcome == MAINTENANCE_FAILURE:
+                error_message = f"Maintenance check failed: {error_message}"
+            await self.handle_api_failure(error_message, self.alert_comment)
+            return True
+        if state.alerting:
+            self.logger.info(f"{check} failed, but alert was already sent.")
             return True
+        self.logger.warning(f"{check} failed ({count}/{threshold}): {error_message}")
         return False
 
-    def reset_failure_counters(self) -> None:
-        """Reset all failure counters when checks succeed."""
-        if self.maintenance_failure_count > 0 or self.api_failure_count > 0:
-            logger.info("Resetting failure counters after successful checks")
-            self.maintenance_failure_count = 0
-            self.api_failure_count = 0
-
     async def handle_api_failure(
         self, error_message: str, comment: Optional[str] = None
     ) -> None:
         """
-        Handle API failure by running MTR and sending an alert.
+        Send an alert and complete it with diagnostics.
+
+        A minimal alert goes out first, so the first notification costs one
+        Telegram round-trip. MTR, DNS, TCP connect, TLS handshake and HTTP HEAD
+        then run concurrently under diagnostics_deadline, and the alert is
+        edited to include whatever finished in time, with the MTR trace
+        compared hop by hop with the baseline of the target. With an outbox both
+        notifications are queued for every alert sink instead, and the cycle
+        never waits for their delivery.
 
         Args:
             error_message: The error message from the API check
             comment: Optional comment to include in the alert
         """
-        logger.info("Handling API failure...")
-
-        # Only send an alert if one hasn't been sent already
-        if not telegram_alerter.alert_sent:
-            # Run MTR to trace the network path
-            success, mtr_output = await run_mtr(self.target_hostname)
+        self.logger.info("Handling API failure...")
+
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if self.outbox is not None:
+            await self.outbox.add(
+                self.name,
+                Notification(
+                    "alert", self.target_hostname, timestamp, error_message, comment
+                ),
+            )
+            initial_sent = True
+        else:
+            initial_sent = await self.alerter.send_initial_alert(
+                self.target_hostname, error_message, comment
+            )
 
-            if success:
-                # Send alert with MTR output
-                await telegram_alerter.send_alert(
-                    self.target_hostname, mtr_output, error_message, comment
-                )
-            else:
-                # Send alert without MTR output
-                await telegram_alerter.send_alert(
+        baseline = (
+            self.mtr_baselines.baseline(self.name)
+            if self.mtr_baselines is not None
+            else None
+        )
+        report = await run_diagnostics(
+            self.aws_client.endpoint_url,
+            self.target_hostname,
+            self.diagnostics_deadline,
+            baseline=baseline,
+            mtr_cycles=settings.mtr_report_cycles,
+            loss_jump=settings.mtr_loss_jump,
+            latency_jump=settings.mtr_latency_jump,
+        )
+        self.last_diagnostics = report
+        if self.store is not None and report.trace is not None:
+            self.store.append_path(self.name, report.trace)
+        diagnostics = report.summary() or None
+
+        mtr = report.results.get("mtr")
+        if mtr is not None and mtr.success:
+            mtr_output = mtr.output
+            alert_error = error_message
+        else:
+            mtr_error = (
+                mtr.output
+                if mtr is not None
+                else f"no result within {self.diagnostics_deadline:g}s"
+            )
+            mtr_output = "MTR failed to execute"
+            alert_error = f"{error_message} (MTR error: {mtr_error})"
+
+        if self.outbox is not None:
+            # Queued with their results, so diagnostics never run twice for one alert
+            await self.outbox.add(
+                self.name,
+                Notification(
+                    "diagnostics",
                     self.target_hostname,
-                    "MTR failed to execute",
-                    f"{error_message} (MTR error: {mtr_output})",
+                    timestamp,
+                    alert_error,
                     comment,
-                )
+                    mtr_output,
+                    diagnostics,
+                ),
+            )
+        elif initial_sent:
+            await self.alerter.enrich_alert(
+                self.target_hostname,
+                mtr_output,
+                alert_error,
+                comment,
+                diagnostics=diagnostics,
+            )
+        else:
+            # The minimal alert did not go out, send the full one instead
+            await self.alerter.send_alert(
+                self.target_hostname,
+                mtr_output,
+                alert_error,
+                comment,
+                diagnostics=diagnostics,
+            )
+
+    async def resolve_alert(self) -> None:
+        """Send, or queue in the outbox, the resolution of the open alert."""
+        if self.outbox is not None:
+            await self.outbox.add(
+                self.name,
+                Notification(
+                    "resolution",
+                    self.target_hostname,
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                ),
+            )
         else:
-            logger.info("API check failed, but alert was already sent.")
+            await self.alerter.send_resolution(self.target_hostname)
 
     async def run_once(self) -> bool:
         """
         Run a single monitoring cycle.
 
         Returns:
-            True if check was successful or maintenance mode, False if there was a failure
-            that hasn't reached the threshold (indicating immediate retry should happen).
+            True if check was successful or maintenance mode, False if there was a
+            failure that hasn't reached the threshold (indicating immediate retry
+            should happen).
         """
-        logger.info("Starting monitoring cycle...")
+        self.logger.info("Starting monitoring cycle...")
 
-        # Check if the API is in maintenance mode
-        is_maintenance, maintenance_error = (
-            await maintenance_checker.is_on_maintenance()
-        )
+        api_result: Optional[ProbeResult] = None
+        if self.concurrent_probes:
+            maintenance_result, api_result = await self.run_probes_concurrently()
+        else:
+            # Check if the API is in maintenance mode
+            maintenance_result = await self.check_maintenance()
+        is_maintenance = maintenance_result.on_maintenance
+        maintenance_error = maintenance_result.error_message
 
         if is_maintenance:
-            logger.info("The service is on maintenance. Skipping further checks.")
-            # Reset failure counters since maintenance is expected
-            self.reset_failure_counters()
+            self.logger.info("The service is on maintenance. Skipping further checks.")
+            # Failures so far do not count since maintenance is expected
+            self.alert_state.observe(MAINTENANCE)
             return True
 
         if maintenance_error:
-            # Handle maintenance check failure with threshold
-            if self.should_send_maintenance_alert():
-                await self.handle_api_failure(
-                    f"Maintenance check failed: {maintenance_error}",
-                    settings.alert_comment,
-                )
-                return True  # Alert sent, use normal interval
-            else:
-                logger.warning(
-                    f"Maintenance check failed ({self.maintenance_failure_count}/{settings.maintenance_failure_threshold}): {maintenance_error}"
-                )
-                return False  # Failure without alert, retry immediately
+            return await self.handle_failure(MAINTENANCE_FAILURE, maintenance_error)
 
         # Check API availability
-        success, error_message = await self.check_api_with_timeout()
+        if api_result is None:
+            api_result = await self.check_api_with_timeout()
+        success, error_message = api_result.success, api_result.error_message
 
         if not success:
-            # API is not available - check threshold before alerting
-            if self.should_send_api_alert():
+            return await self.handle_failure(
+                API_FAILURE, error_message or "Unknown error"
+            )
+
+        self.logger.info("API check succeeded.")
+        if self.alert_state.observe(SUCCESS) == RESOLVE_ALERT:
+            await self.resolve_alert()
+        elif self.alert_state.state == RECOVERING:
+            self.logger.info(
+                "Recovering, resolution waits for "
+                f"{self.alert_state.pending_resolution()}"
+            )
+        return True  # Success, use normal interval
+
+    async def run_cycle(self) -> Optional[float]:
+        """
+        Run one scheduled monitoring cycle and record its metrics.
+
+        Returns:
+            None to wait for the next scheduled cycle, or the delay in seconds
+            until the next cycle chosen by the probe policy.
+        """
+        cycle_start = time.perf_counter()
+        alert_open = self.alert_open
+        previous_maintenance_result = self.last_maintenance_result
+        try:
+            should_wait = await self.run_once()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(
+                f"Unexpected error in monitoring cycle: {e}", exc_info=True
+            )
+            # Alert about the monitoring system itself unless an alert is open
+            if self.alert_state.open("system"):
                 await self.handle_api_failure(
-                    error_message or "Unknown error", settings.alert_comment
-                )
-                return True  # Alert sent, use normal interval
-            else:
-                logger.warning(
-                    f"API check failed ({self.api_failure_count}/{settings.api_failure_threshold}): {error_message}"
+                    f"Monitoring system error: {str(e)}", self.alert_comment
                 )
-                return False  # Failure without alert, retry immediately
-        else:
-            # API is available
-            logger.info("API check succeeded.")
+            should_wait = True  # Wait normal interval after system errors
+
+        self.metrics.record_cycle(
+            time.perf_counter() - cycle_start,
+            self.maintenance_failure_count,
+            self.api_failure_count,
+            self.alert_open,
+            self.alert_state.state,
+            self.alert_state.flapping,
+        )
+        if self.snapshot is not None:
+            # Opened and resolved alerts must survive a crash right after
+            self.snapshot.update(
+                self.name, self.export_state(), urgent=self.alert_open != alert_open
+            )
 
-            # Reset failure counters on successful check
-            self.reset_failure_counters()
+        if should_wait:
+            failures = 0
+        else:
+            # Failure without alert, confirm it sooner than the next slot
+            failures = max(self.maintenance_failure_count, self.api_failure_count, 1)
+        maintenance_result = self.last_maintenance_result
+        on_maintenance = (
+            maintenance_result is not None
+            and maintenance_result is not previous_maintenance_result
+            and maintenance_result.on_maintenance
+        )
+        recovered = alert_open and not self.alert_open
 
-            # If an alert was previously sent, send a resolution message
-            if telegram_alerter.alert_sent:
-                await telegram_alerter.send_resolution(self.target_hostname)
+        delay = self.probe_policy.next_delay(failures, on_maintenance, recovered)
+        if delay is not None:
+            self.logger.info(f"Next check in {delay:g} seconds")
+        return delay
 
-            return True  # Success, use normal interval
+    def bind_metrics(self) -> TargetMetrics:
+        """
+        Register the metric series of this target, unless already registered.
 
-    async def run(self) -> None:
+        Returns:
+            The series, bound once so probes only increment them
         """
-        Run the monitoring process continuously.
+        if self._metrics is None:
+            self._metrics = TargetMetrics(self.name)
+        return self._metrics
+
+    @property
+    def metrics(self) -> TargetMetrics:
+        """Metric series of this target, see bind_metrics()."""
+        return self.bind_metrics()
 
-        This method runs in an infinite loop, checking the API at regular intervals.
+    def schedule(self, scheduler: Scheduler) -> ScheduledJob:
         """
-        logger.info(f"Starting continuous monitoring for {self.target_hostname}...")
+        Add the monitoring cycles of this monitor to a scheduler.
 
-        while True:
-            try:
-                should_wait = await self.run_once()
-            except asyncio.CancelledError:
-                logger.info("Monitoring task was cancelled")
-                break
-            except Exception as e:
-                logger.error(
-                    f"Unexpected error in monitoring cycle: {e}", exc_info=True
-                )
-                # Consider sending an alert about the monitoring system itself
-                await self.handle_api_failure(
-                    f"Monitoring system error: {str(e)}", settings.alert_comment
-                )
-                should_wait = True  # Wait normal interval after system errors
+        The metric series of the target are exported from then on.
 
-            # Wait for the next check interval only if check was successful or alert was sent
-            if should_wait:
-                logger.info(
-                    f"Waiting {self.check_interval} seconds until next check..."
-                )
-                await asyncio.sleep(self.check_interval)
-            else:
-                logger.info("Retrying immediately due to failure below threshold...")
-                # Small delay to prevent tight loop in case of persistent issues
-                await asyncio.sleep(1)
+        Args:
+            scheduler: The scheduler that runs the cycles
+
+        Returns:
+            The scheduled job
+        """
+        self.bind_metrics()
+        return scheduler.add(
+            self.name,
+            self.run_cycle,
+            self.check_interval,
+            phase=self.schedule_phase,
+            jitter=self.schedule_jitter,
+        )
+
+    async def run(self) -> None:
+        """
+        Run the monitoring process continuously.
 
+        Cycles start on absolute deadlines every check_interval seconds, so the
+        period does not stretch by the duration of each cycle.
+        """
+        self.logger.info(
+            f"Starting continuous monitoring for {self.target_hostname}..."
+        )
 
-# Create a default API monitor instance
-api_monitor = ApiMonitor(
-    check_interval=settings.check_interval,
-    api_timeout=settings.api_timeout,
-)
+        scheduler = Scheduler(overrun=settings.schedule_overrun)
+        self.schedule(scheduler)
+        try:
+            await scheduler.run()
+        except asyncio.CancelledError:
+            self.logger.info("Monitoring task was cancelled")
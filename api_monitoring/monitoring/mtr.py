@@ -0,0 +1,406 @@
+"""
+Structured MTR traces, baseline paths and hop-level diffs.
+
+A trace taken only after a failure says little on its own: one cycle is
+noisy and there is no normal path to compare it with. Baseline traces are
+therefore taken in the background while a target is healthy, with more
+cycles, at low CPU priority and a few at a time. They are kept in a small
+per-target cache. When an alert is raised, the fresh trace is compared hop
+by hop with the latest baseline, and the alert lists the new hops, the loss
+and the latency jumps instead of only the raw report.
+"""
+
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from api_monitoring.monitoring.scheduler import Scheduler
+from api_monitoring.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Host MTR reports for a hop that did not answer
+UNKNOWN_HOST = "???"
+
+# Niceness of the baseline traces, so they never compete with the probes
+BASELINE_NICENESS = 10
+
+
+class MtrError(Exception):
+    """MTR could not be run or its output could not be parsed."""
+
+
+@dataclass(slots=True)
+class MtrHop:
+    """One hop of a trace; latencies are in milliseconds."""
+
+    index: int
+    host: str
+    loss: float
+    sent: int
+    last: float
+    avg: float
+    best: float
+    worst: float
+    stdev: float
+
+    @property
+    def answered(self) -> bool:
+        """Whether the hop answered at least one probe."""
+        return self.host != UNKNOWN_HOST and self.loss < 100.0
+
+
+@dataclass(slots=True)
+class MtrTrace:
+    """A parsed MTR report."""
+
+    target: str
+    hops: List[MtrHop] = field(default_factory=list)
+    # Host the trace was taken from
+    source: str = ""
+    # Wall clock time the trace started
+    started: float = 0.0
+    # Probes sent to every hop
+    cycles: int = 1
+
+    @property
+    def reached(self) -> bool:
+        """Whether the last hop answered, i.e. the trace got through."""
+        return bool(self.hops) and self.hops[-1].answered
+
+    def format(self) -> str:
+        """
+        Format the trace like `mtr --report`.
+
+        Returns:
+            The report text, a start line and a header followed by one line per hop
+        """
+        start = (
+            datetime.fromtimestamp(self.started).astimezone().isoformat("T", "seconds")
+        )
+        lines = [
+            f"Start: {start}",
+            f"HOST: {self.source:<30} Loss%   Snt   Last   Avg  Best  Wrst StDev",
+        ]
+        for hop in self.hops:
+            lines.append(
+                f"{hop.index:3d}.|-- {hop.host:<30} {hop.loss:5.1f}% {hop.sent:5d} "
+                f"{hop.last:6.1f} {hop.avg:5.1f} {hop.best:5.1f} {hop.worst:5.1f} "
+                f"{hop.stdev:5.1f}"
+            )
+        return "\n".join(lines)
+
+
+def parse_mtr_json(output: str, target: str, started: float = 0.0) -> MtrTrace:
+    """
+    Parse the output of `mtr --json`.
+
+    Older MTR versions report numbers as strings; both forms are accepted.
+
+    Args:
+        output: The JSON output
+        target: The traced host
+        started: Wall clock time the trace started
+
+    Returns:
+        The trace
+
+    Raises:
+        MtrError: If the output is not an MTR JSON report
+    """
+    try:
+        report = json.loads(output)["report"]
+        info: Dict[str, Any] = report.get("mtr", {})
+        hops = [
+            MtrHop(
+                index=int(hub["count"]),
+                host=str(hub["host"]),
+                loss=float(hub["Loss%"]),
+                sent=int(hub["Snt"]),
+                last=float(hub["Last"]),
+                avg=float(hub["Avg"]),
+                best=float(hub["Best"]),
+                worst=float(hub["Wrst"]),
+                stdev=float(hub["StDev"]),
+            )
+            for hub in report.get("hubs", [])
+        ]
+        cycles = int(info.get("tests", 1))
+    except (ValueError, TypeError, KeyError) as e:
+        raise MtrError(f"Unexpected MTR output: {e}") from e
+    return MtrTrace(target, hops, str(info.get("src", "")), started, cycles)
+
+
+async def run_mtr(target: str, cycles: int = 1, low_priority: bool = False) -> MtrTrace:
+    """
+    Trace the network path to a target with MTR.
+
+    Args:
+        target: The hostname or IP address to trace
+        cycles: Probes sent to every hop
+        low_priority: Run MTR with a lower CPU priority
+
+    Returns:
+        The parsed trace
+
+    Raises:
+        MtrError: If MTR fails or its output cannot be parsed
+    """
+    logger.info(f"Running MTR for target: {target}")
+    started = time.time()
+    command = ["mtr", "--json", "--report-cycles", str(cycles), "-4", "--no-dns"]
+    if low_priority:
+        # nice(1) rather than preexec_fn, which is unsafe with threads running
+        command = ["nice", "-n", str(BASELINE_NICENESS), *command]
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            target,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except OSError as e:
+        raise MtrError(f"Exception running MTR: {e}") from e
+    try:
+        stdout, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        # Do not leave the trace running when the caller gives up on it
+        proc.kill()
+        await proc.wait()
+        raise
+
+    if proc.returncode != 0:
+        raise MtrError(f"MTR command failed: {stderr.decode().strip()}")
+    return parse_mtr_json(stdout.decode(), target, started)
+
+
+@dataclass(slots=True)
+class HopChange:
+    """A difference between a trace and the baseline of its target."""
+
+    # Hop index the change starts at
+    hop: int
+    # "route", "shorter", "longer", "loss" or "latency"
+    kind: str
+    message: str
+
+    def __str__(self) -> str:
+        return self.message
+
+
+def diff_traces(
+    baseline: MtrTrace,
+    trace: MtrTrace,
+    loss_jump: float = 20.0,
+    latency_jump: float = 50.0,
+) -> List[HopChange]:
+    """
+    Compare a trace with the baseline of its target hop by hop.
+
+    Loss and latency add up along the path, so a run of consecutive hops
+    that got worse is reported once, at the hop where it starts.
+
+    Args:
+        baseline: The baseline trace
+        trace: The fresh trace
+        loss_jump: Increase of the loss in percentage points that is reported
+        latency_jump: Increase of the average latency in ms that is reported
+
+    Returns:
+        The changes, in hop order
+    """
+    changes: List[HopChange] = []
+    # A new route usually changes a run of hops, reported as one change
+    route: Optional[HopChange] = None
+    route_start = ""
+    rerouted = 0
+    lossy = slow = False
+    for base, hop in zip(baseline.hops, trace.hops):
+        if hop.host != base.host and UNKNOWN_HOST not in (hop.host, base.host):
+            if route is None:
+                route_start = f"hop {hop.index}: {hop.host} replaces {base.host}"
+                route = HopChange(hop.index, "route", route_start)
+                changes.append(route)
+                rerouted = 0
+            else:
+                rerouted += 1
+                route.message = f"{route_start}, {rerouted} more hops changed"
+        else:
+            route = None
+
+        worse_loss = hop.loss - base.loss >= loss_jump
+        if worse_loss and not lossy:
+            changes.append(
+                HopChange(
+                    hop.index,
+                    "loss",
+                    f"hop {hop.index} ({hop.host}): loss {hop.loss:.0f}%, "
+                    f"baseline {base.loss:.0f}%",
+                )
+            )
+        lossy = worse_loss
+
+        # Latency of a hop that lost every probe is meaningless
+        worse_latency = hop.loss < 100.0 and hop.avg - base.avg >= latency_jump
+        if worse_latency and not slow:
+            changes.append(
+                HopChange(
+                    hop.index,
+                    "latency",
+                    f"hop {hop.index} ({hop.host}): avg {hop.avg:.1f} ms, "
+                    f"baseline {base.avg:.1f} ms (+{hop.avg - base.avg:.1f} ms)",
+                )
+            )
+        slow = worse_latency
+
+    if len(trace.hops) < len(baseline.hops):
+        last = trace.hops[-1].index if trace.hops else 0
+        changes.append(
+            HopChange(
+                last,
+                "shorter",
+                f"path ends after hop {last}, baseline reached hop "
+                f"{baseline.hops[-1].index} ({baseline.hops[-1].host})",
+            )
+        )
+    elif len(trace.hops) > len(baseline.hops):
+        first = trace.hops[len(baseline.hops)]
+        changes.append(
+            HopChange(
+                first.index,
+                "longer",
+                f"path is {len(trace.hops) - len(baseline.hops)} hops longer, "
+                f"from hop {first.index} ({first.host})",
+            )
+        )
+    return changes
+
+
+TraceRunner = Callable[..., Awaitable[MtrTrace]]
+
+
+class MtrBaselineCache:
+    """
+    Takes baseline traces of every target in the background.
+
+    Every target is traced every interval seconds, on a stable offset within
+    the interval, while it is healthy. At most concurrency traces run at
+    once and each runs at a lower CPU priority. The last history traces of
+    every target are kept.
+    """
+
+    def __init__(
+        self,
+        interval: float = 900.0,
+        cycles: int = 10,
+        concurrency: int = 2,
+        history: int = 3,
+        runner: TraceRunner = run_mtr,
+        on_trace: Optional[Callable[[str, MtrTrace], Any]] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            interval: Seconds between baseline traces of a target
+            cycles: Probes sent to every hop of a baseline trace
+            concurrency: Baseline traces running at once
+            history: Baseline traces kept per target
+            runner: Takes a trace, called as runner(host, cycles, low_priority=True)
+            on_trace: Called with the target name and every baseline trace taken,
+                e.g. to record its path
+        """
+        self.interval = interval
+        self.cycles = cycles
+        self.history = max(history, 1)
+        self.runner = runner
+        self.on_trace = on_trace
+        # Kept out of the schedule metrics, which describe the probe cycles
+        self.scheduler = Scheduler(overrun="skip", metrics=False)
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._traces: Dict[str, Deque[MtrTrace]] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+
+        # Trace statistics
+        self.taken = 0
+        self.failed = 0
+
+    def add_target(
+        self, name: str, host: str, healthy: Callable[[], bool] = lambda: True
+    ) -> None:
+        """
+        Start taking baseline traces of a target.
+
+        Args:
+            name: The target name
+            host: The host to trace
+            healthy: Whether the target is healthy, traces are skipped otherwise
+        """
+        self._traces[name] = deque(maxlen=self.history)
+
+        async def take() -> Optional[float]:
+            if healthy():
+                await self.refresh(name, host)
+            return None
+
+        self.scheduler.add(f"mtr-baseline:{name}", take, self.interval)
+
+    async def refresh(self, name: str, host: str) -> Optional[MtrTrace]:
+        """
+        Take a baseline trace of a target now.
+
+        Args:
+            name: The target name
+            host: The host to trace
+
+        Returns:
+            The trace, or None if it failed
+        """
+        async with self._semaphore:
+            try:
+                trace = await self.runner(host, self.cycles, low_priority=True)
+            except MtrError as e:
+                self.failed += 1
+                logger.warning(f"Baseline trace of {name} failed: {e}")
+                return None
+        self.taken += 1
+        self._traces.setdefault(name, deque(maxlen=self.history)).append(trace)
+        if self.on_trace is not None:
+            self.on_trace(name, trace)
+        return trace
+
+    def traces(self, name: str) -> List[MtrTrace]:
+        """Return the baseline traces of a target, oldest first."""
+        return list(self._traces.get(name, ()))
+
+    def baseline(self, name: str) -> Optional[MtrTrace]:
+        """
+        Return the trace a target is compared with.
+
+        Returns:
+            The latest baseline that got through, else the latest one, or None
+            if no baseline was taken yet
+        """
+        traces = self._traces.get(name)
+        if not traces:
+            return None
+        for trace in reversed(traces):
+            if trace.reached:
+                return trace
+        return traces[-1]
+
+    def start(self) -> None:
+        """Start taking baseline traces in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.scheduler.run(), name="mtr-baseline")
+
+    async def stop(self) -> None:
+        """Stop taking baseline traces, cancelling the running ones."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,20 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from api_monitoring.utils.timings import PhaseTimings
+
+
+@dataclass(slots=True)
+class ProbeResult:
+    """Outcome of a single maintenance or API probe."""
+
+    # Whether the probe completed without an error
+    success: bool
+    # Human-readable error description if the probe failed
+    error_message: Optional[str] = None
+    # Short, low-cardinality error classification (e.g. "Timeout")
+    error_class: Optional[str] = None
+    # Whether the endpoint reported maintenance (maintenance probes only)
+    on_maintenance: bool = False
+    # Latency breakdown of the probe
+    timings: PhaseTimings = field(default_factory=PhaseTimings)
@@ -0,0 +1,343 @@
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from api_monitoring.utils.logging import get_logger
+from api_monitoring.utils.metrics import (
+    LATENESS_BUCKETS,
+    CounterChild,
+    HistogramChild,
+    schedule_lateness_seconds,
+    schedule_overruns_total,
+)
+
+logger = get_logger(__name__)
+
+# What to do when a cycle is due while the previous one is still running
+OVERRUN_POLICIES = ("skip", "coalesce")
+
+# A job returns None to stay on its schedule, or a delay in seconds after
+# which it should run again instead of on the next scheduled slot
+Job = Callable[[], Awaitable[Optional[float]]]
+
+
+def default_phase(name: str, interval: float) -> float:
+    """
+    Derive a stable phase offset from a job name.
+
+    Spreads jobs with the same interval evenly over the interval, so targets
+    started together do not probe in lockstep, and keeps every target on the
+    same offset across restarts.
+
+    Args:
+        name: The job name
+        interval: The job interval in seconds
+
+    Returns:
+        The phase offset in seconds, between 0 and the interval
+    """
+    return zlib.crc32(name.encode()) / 2**32 * interval
+
+
+class ScheduledJob:
+    """
+    A periodic job and its position on the schedule.
+
+    Slot k of a job is due at origin + phase + k * interval on the monotonic
+    clock, plus a random jitter drawn for every slot. Deadlines never depend
+    on when previous cycles finished, so the period does not drift.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Job,
+        interval: float,
+        phase: float,
+        jitter: float,
+        origin: float,
+        metrics: bool = True,
+    ):
+        """
+        Initialize the job.
+
+        Args:
+            name: Job name, also used as the metric label
+            func: The coroutine function run on every slot
+            interval: Seconds between slots
+            phase: Offset of slot 0 from the origin in seconds
+            jitter: Maximum random delay added to every slot in seconds
+            origin: Monotonic time the schedule starts from
+            metrics: Export the lateness and overruns of the job, labelled
+                with its name
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.phase = phase
+        self.jitter = min(jitter, interval)
+        self.origin = origin
+
+        # Next slot and the deadline it fires at
+        self.slot = 0
+        self.deadline = origin + phase
+        self.generation = 0
+        self.task: Optional[asyncio.Task[None]] = None
+        self.removed = False
+
+        # Whether the current deadline is a rerun rather than a slot
+        self.rerun = False
+
+        # Deadline of the first slot that was coalesced into a pending run
+        self.pending_deadline: Optional[float] = None
+
+        # Schedule statistics
+        self.runs = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+        if metrics:
+            self._lateness = schedule_lateness_seconds.labels(name)
+            self._skips = schedule_overruns_total.labels(name, "skip")
+            self._coalesces = schedule_overruns_total.labels(name, "coalesce")
+        else:
+            # Series of their own, never exported
+            self._lateness = HistogramChild(LATENESS_BUCKETS)
+            self._skips = CounterChild()
+            self._coalesces = CounterChild()
+
+    @property
+    def running(self) -> bool:
+        """Whether a cycle of this job is currently running."""
+        return self.task is not None and not self.task.done()
+
+    def slot_time(self, slot: int) -> float:
+        """Return the monotonic time of a slot, without jitter."""
+        return self.origin + self.phase + slot * self.interval
+
+    def record_lateness(self, lateness: float) -> None:
+        """Record how late a cycle started."""
+        self.runs += 1
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        self._lateness.observe(lateness)
+
+
+class Scheduler:
+    """
+    Runs periodic jobs on absolute deadlines from a single dispatcher.
+
+    All jobs share one heap ordered by deadline and one coroutine that sleeps
+    until the earliest deadline, so thousands of targets cost one heap entry
+    each rather than one sleeping coroutine each. A task exists per job only
+    while its cycle is running.
+    """
+
+    def __init__(
+        self,
+        overrun: str = "skip",
+        clock: Callable[[], float] = time.monotonic,
+        rng: Optional[random.Random] = None,
+        metrics: bool = True,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            overrun: "skip" drops slots that are due while the previous cycle is
+                still running; "coalesce" runs one cycle as soon as it finishes,
+                however many slots were missed
+            clock: Monotonic clock returning seconds
+            rng: Random generator used for jitter
+            metrics: Export the schedule lateness and overruns of the jobs;
+                disabled for background work that is not a monitoring cycle
+
+        Raises:
+            ValueError: If the overrun policy is unknown
+        """
+        if overrun not in OVERRUN_POLICIES:
+            raise ValueError(
+                f"Unknown overrun policy {overrun!r}, "
+                f"expected one of {', '.join(OVERRUN_POLICIES)}"
+            )
+        self.overrun = overrun
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.metrics = metrics
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._heap: List[Tuple[float, int, int, ScheduledJob]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def add(
+        self,
+        name: str,
+        func: Job,
+        interval: float,
+        phase: Optional[float] = None,
+        jitter: float = 0.0,
+    ) -> ScheduledJob:
+        """
+        Schedule a periodic job.
+
+        Args:
+            name: Unique job name
+            func: The coroutine function run on every slot
+            interval: Seconds between slots
+            phase: Offset of the first slot in seconds (defaults to a stable
+                offset derived from the name)
+            jitter: Maximum random delay added to every slot in seconds
+
+        Returns:
+            The scheduled job
+
+        Raises:
+            ValueError: If the interval is not positive or the name is taken
+        """
+        if interval <= 0:
+            raise ValueError(f"Interval of {name} must be positive, got {interval}")
+        if name in self.jobs:
+            raise ValueError(f"Job {name} is already scheduled")
+        if phase is None:
+            phase = default_phase(name, interval)
+
+        job = ScheduledJob(
+            name,
+            func,
+            interval,
+            phase % interval,
+            jitter,
+            self.clock(),
+            self.metrics,
+        )
+        self.jobs[name] = job
+        self._schedule(job, job.slot_time(0) + self._jitter(job))
+        return job
+
+    def remove(self, name: str) -> None:
+        """
+        Unschedule a job, cancelling its running cycle.
+
+        Args:
+            name: The job name
+        """
+        job = self.jobs.pop(name, None)
+        if job is None:
+            return
+        # The heap entry is dropped lazily when it reaches the top
+        job.removed = True
+        if job.running:
+            job.task.cancel()  # type: ignore[union-attr]
+
+    def _jitter(self, job: ScheduledJob) -> float:
+        """Draw the jitter for one slot."""
+        return self.rng.uniform(0, job.jitter) if job.jitter else 0.0
+
+    def _schedule(
+        self, job: ScheduledJob, deadline: float, rerun: bool = False
+    ) -> None:
+        """Set the next deadline of a job, replacing the previous one."""
+        job.generation += 1
+        job.deadline = deadline
+        job.rerun = rerun
+        entry = (deadline, next(self._counter), job.generation, job)
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def _schedule_next_slot(self, job: ScheduledJob, now: float) -> None:
+        """Schedule the first slot after now, skipping slots already past."""
+        elapsed = now - job.slot_time(0)
+        # A rerun may fire before the pending slot, which then stays due
+        first = job.slot if job.rerun else job.slot + 1
+        job.slot = max(first, math.floor(elapsed / job.interval) + 1)
+        self._schedule(job, job.slot_time(job.slot) + self._jitter(job))
+
+    def _fire(self, job: ScheduledJob, now: float) -> None:
+        """Start a cycle of a job whose deadline has passed."""
+        deadline = job.deadline
+        self._schedule_next_slot(job, now)
+
+        if job.running:
+            if self.overrun == "skip":
+                job.skipped += 1
+                job._skips.inc()
+                logger.warning(
+                    f"Cycle of {job.name} still running at its next slot, skipping it"
+                )
+            else:
+                job.coalesced += 1
+                job._coalesces.inc()
+                if job.pending_deadline is None:
+                    job.pending_deadline = deadline
+            return
+
+        job.record_lateness(now - deadline)
+        job.task = asyncio.create_task(self._run_job(job), name=f"cycle:{job.name}")
+
+    async def _run_job(self, job: ScheduledJob) -> None:
+        """Run one cycle of a job and handle reruns off the schedule."""
+        retry_delay: Optional[float] = None
+        try:
+            retry_delay = await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled job {job.name} failed: {e}", exc_info=True)
+
+        if job.removed:
+            return
+        if job.pending_deadline is not None:
+            # Run the coalesced slots now; lateness counts from the first one
+            deadline, job.pending_deadline = job.pending_deadline, None
+            self._schedule(job, deadline, rerun=True)
+        elif retry_delay is not None:
+            # Slots passed while waiting for the rerun are not overruns
+            self._schedule(job, self.clock() + retry_delay, rerun=True)
+
+    async def run(self) -> None:
+        """Dispatch jobs until cancelled, then cancel their running cycles."""
+        try:
+            while True:
+                if not self._heap:
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+
+                now = self.clock()
+                delay = self._heap[0][0] - now
+                if delay > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                # Fire everything due by now, then let the new cycles start
+                # before looking at the clock again, so a burst of deadlines
+                # cannot starve the event loop
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, generation, job = heapq.heappop(self._heap)
+                    # Drop entries of removed jobs and deadlines replaced since
+                    if job.removed or generation != job.generation:
+                        continue
+                    self._fire(job, now)
+                await asyncio.sleep(0)
+        finally:
+            tasks = [
+                job.task
+                for job in self.jobs.values()
+                if job.task is not None and job.running
+            ]
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
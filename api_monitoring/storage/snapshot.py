@@ -0,0 +1,211 @@
+"""
+Crash-safe snapshot of the monitor state.
+
+Monitors hand their state (alert state machine and failure counters, the open
+alert message, the adaptive probe window and recent API latencies) to the
+snapshot after every cycle. A background task writes the whole snapshot as
+one JSON document to a temporary file, syncs it and renames it over the
+previous one, so a crash leaves either the old or the new snapshot, never a
+torn one. A cycle that opens or resolves an alert is written at once,
+anything else at most every interval seconds, and only if something changed.
+
+On startup every monitor reads its state back and resumes where it left off:
+an open alert stays open without collecting diagnostics again, its
+resolution is still sent, and failure counters keep counting toward their
+thresholds.
+
+    {"version": 1, "saved_at": 1760680000.0,
+     "targets": {"api": {"alert": {...}, "latencies": "AAB...", ...}}}
+"""
+
+import asyncio
+import base64
+import os
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from api_monitoring.utils.logging import get_logger
+from api_monitoring.utils.serialization import dumps, loads
+
+logger = get_logger(__name__)
+
+# Format version of the snapshot file; other versions are ignored
+SNAPSHOT_VERSION = 1
+
+
+def encode_floats(values: Iterable[float]) -> str:
+    """Pack floats as base64 of a float32 array, much faster to load than a list."""
+    return base64.b64encode(array("f", values).tobytes()).decode("ascii")
+
+
+def decode_floats(data: str) -> array:
+    """Unpack floats packed by encode_floats."""
+    values = array("f")
+    values.frombytes(base64.b64decode(data))
+    return values
+
+
+class StateSnapshot:
+    """
+    Keeps the latest state of every monitor and writes it to disk atomically.
+
+    Updating the state of a target only replaces a dict in memory; the file is
+    written by a background task, in a worker thread, so monitoring cycles
+    never wait on the disk.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        interval: float = 5.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Open the snapshot, reading the state saved by a previous run.
+
+        Args:
+            path: The snapshot file (None or empty disables the snapshot)
+            interval: Maximum seconds between writes of a changed snapshot
+            clock: Wall clock returning seconds
+        """
+        self.path = Path(path) if path else None
+        self.interval = interval
+        self.clock = clock
+
+        # Latest state of every target, written on the next flush
+        self._states: Dict[str, Dict[str, Any]] = {}
+        # States read from the file, until their monitor takes them
+        self._saved: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+        # Write statistics
+        self.writes = 0
+        self.failures = 0
+
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    def _load(self) -> None:
+        """Read the snapshot file."""
+        assert self.path is not None
+        try:
+            data = loads(self.path.read_bytes())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable state snapshot {self.path}: {e}")
+            return
+        if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+            logger.warning(f"Ignoring state snapshot {self.path} of unknown format")
+            return
+
+        targets = data.get("targets")
+        if isinstance(targets, dict):
+            self._saved = targets
+        age = self.clock() - float(data.get("saved_at", 0))
+        logger.info(
+            f"Loaded state of {len(self._saved)} targets from {self.path}, "
+            f"saved {age:.0f}s ago"
+        )
+
+    def restore(self, target: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the state saved for a target by the previous run.
+
+        The state is kept in the next snapshot until the target reports a new
+        one, so a crash before its first cycle does not lose it.
+
+        Args:
+            target: The target name
+
+        Returns:
+            The saved state, or None if there is none
+        """
+        state = self._saved.pop(target, None)
+        if state is not None:
+            self._states.setdefault(target, state)
+        return state
+
+    def update(self, target: str, state: Dict[str, Any], urgent: bool = False) -> None:
+        """
+        Record the current state of a target.
+
+        Args:
+            target: The target name
+            state: The state, made of JSON types
+            urgent: Write the snapshot now instead of within the interval
+        """
+        if self.path is None or self._states.get(target) == state:
+            return
+        self._states[target] = state
+        self._dirty = True
+        if urgent and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        """Start writing the snapshot in the background."""
+        if self.path is None or (self._task is not None and not self._task.done()):
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="state-snapshot")
+
+    async def _run(self) -> None:
+        """Write the snapshot whenever it changed, until stopped."""
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._dirty:
+                await self.flush()
+
+    def _serialize(self) -> bytes:
+        """Build the snapshot document and mark it written."""
+        self._dirty = False
+        return dumps(
+            {
+                "version": SNAPSHOT_VERSION,
+                "saved_at": self.clock(),
+                "targets": self._states,
+            }
+        )
+
+    def _write(self, data: bytes) -> None:
+        """Atomically replace the snapshot file."""
+        assert self.path is not None
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.writes += 1
+
+    async def flush(self) -> None:
+        """Write the snapshot now, in a worker thread."""
+        if self.path is None:
+            return
+        # Serialized on the loop, so no cycle changes the states mid-write
+        data = self._serialize()
+        try:
+            await asyncio.to_thread(self._write, data)
+        except OSError as e:
+            self.failures += 1
+            self._dirty = True
+            logger.error(f"Failed to write state snapshot {self.path}: {e}")
+
+    async def stop(self) -> None:
+        """Stop the background task and write the latest state."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._dirty:
+            await self.flush()
@@ -0,0 +1,943 @@
+"""
+Compact on-disk time series of probe results.
+
+Every probe result is appended as a fixed-width binary record to a daily raw
+segment file. Records are written in time order, so readers memory-map a
+segment and binary-search it by timestamp instead of scanning it.
+
+Alongside the raw records, 1-minute and 1-hour rollups (count, failures,
+min, max, percentiles and a latency histogram) are maintained incrementally
+per target and probe and written to small per-target files. An open rollup
+only holds counters and its fixed-bin histogram, whatever the number of
+probes, and its percentiles are estimated from the histogram. Histograms are
+mergeable, so percentiles over long ranges are answered from a few hundred
+rollups instead of millions of raw records.
+
+Network paths from MTR traces are stored as route changes: every distinct
+route (the hop addresses in order) is identified by a 64-bit hash and written
+once with the hop statistics of the trace it was first seen in, and a trace
+only appends a record when the route of its target differs from the previous
+one. Months of traces of a stable path cost a few bytes.
+
+Layout of the store directory:
+
+    symbols.json                      target and error class names
+    raw/YYYYMMDD.bin                  raw records of all targets
+    rollup_1m/<target id>/YYYYMMDD.bin
+    rollup_1h/<target id>/YYYYMM.bin
+    paths/routes.jsonl                distinct routes by hash
+    paths/<target id>.bin             route changes of a target
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, astuple, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from api_monitoring.monitoring.mtr import MtrHop, MtrTrace
+from api_monitoring.monitoring.results import ProbeResult
+from api_monitoring.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Probe names and their ids in records
+PROBES = ("maintenance", "api")
+
+# Probe outcomes and their ids in records
+STATUSES = ("ok", "failed", "maintenance")
+STATUS_OK = 0
+STATUS_FAILED = 1
+STATUS_MAINTENANCE = 2
+
+# Raw record: timestamp, target id, probe id, status, error class id and
+# dns/connect/ttfb/total latency in milliseconds (NaN if not measured),
+# padded to 32 bytes
+RECORD = struct.Struct("<dHBBHffff2x")
+_TIMESTAMP = struct.Struct("<d")
+
+# Upper bounds (ms) of the rollup latency histogram: 1 ms to about 50 s in
+# steps of 2^(1/3), plus an overflow bucket
+HISTOGRAM_BOUNDS = tuple(2 ** (i / 3) for i in range(47))
+HISTOGRAM_SIZE = len(HISTOGRAM_BOUNDS) + 1
+
+# Rollup record: bucket start, target id, probe id, samples, failures,
+# latency sum, min, max, p50, p90, p99 and the histogram counts
+ROLLUP = struct.Struct(f"<dHBxIId5f{HISTOGRAM_SIZE}H")
+
+# Rollup resolutions in seconds and their directory names
+ROLLUP_DIRECTORIES = {60: "rollup_1m", 3600: "rollup_1h"}
+
+# Queries spanning at most this many seconds read raw records, longer ones
+# read 1-minute rollups, and those longer than a couple of days 1-hour ones
+RAW_QUERY_MAX_SPAN = 2 * 3600
+ROLLUP_1M_QUERY_MAX_SPAN = 2 * 86400
+
+# Route change record: timestamp and hash of the new route
+PATH_RECORD = struct.Struct("<dQ")
+
+_DAY = 86400
+
+
+class ProbeRecord(NamedTuple):
+    """A decoded raw record."""
+
+    timestamp: float
+    target: str
+    probe: str
+    status: str
+    error_class: Optional[str]
+    dns_ms: Optional[float]
+    connect_ms: Optional[float]
+    ttfb_ms: Optional[float]
+    total_ms: Optional[float]
+
+
+class PathChange(NamedTuple):
+    """The route of a target from the time it changed."""
+
+    timestamp: float
+    route_hash: int
+    hops: Tuple[MtrHop, ...]
+
+
+class Rollup(NamedTuple):
+    """A decoded rollup of one target and probe over one time bucket."""
+
+    start: float
+    # Number of probes in the bucket
+    samples: int
+    failures: int
+    sum_ms: float
+    min_ms: float
+    max_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    histogram: Tuple[int, ...]
+
+
+@dataclass(slots=True)
+class LatencySummary:
+    """Latency statistics of a target over a time range, in milliseconds."""
+
+    # Number of probes in the range
+    count: int = 0
+    # Number of failed probes in the range
+    failures: int = 0
+    # Latency statistics over the probes that measured a latency
+    min_ms: Optional[float] = None
+    max_ms: Optional[float] = None
+    mean_ms: Optional[float] = None
+    p50_ms: Optional[float] = None
+    p90_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    # Where the answer came from: "raw", "rollup_1m" or "rollup_1h"
+    source: str = "raw"
+
+
+def _to_ms(value: Optional[float]) -> float:
+    """Convert seconds to milliseconds, with NaN for missing values."""
+    return math.nan if value is None else value * 1000
+
+
+def _from_ms(value: float) -> Optional[float]:
+    """Convert a stored latency back to an optional value."""
+    return None if math.isnan(value) else value
+
+
+def _day(timestamp: float) -> str:
+    """Return the UTC day of a timestamp as YYYYMMDD."""
+    return time.strftime("%Y%m%d", time.gmtime(timestamp))
+
+
+def _month(timestamp: float) -> str:
+    """Return the UTC month of a timestamp as YYYYMM."""
+    return time.strftime("%Y%m", time.gmtime(timestamp))
+
+
+def route_hash(hops: List[MtrHop]) -> int:
+    """Hash the hop addresses of a route into 64 bits."""
+    key = "\n".join(hop.host for hop in hops).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Return the nearest-rank percentile of sorted values."""
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _histogram_percentile(
+    histogram: List[int], count: int, q: float, low: float, high: float
+) -> float:
+    """
+    Estimate a percentile from histogram counts.
+
+    Interpolates linearly inside the bucket holding the percentile rank and
+    clamps the result to the observed min and max.
+    """
+    rank = max(1, math.ceil(q * count))
+    seen = 0
+    for index, bucket_count in enumerate(histogram):
+        if seen + bucket_count >= rank:
+            lower = HISTOGRAM_BOUNDS[index - 1] if index > 0 else 0.0
+            upper = HISTOGRAM_BOUNDS[index] if index < len(HISTOGRAM_BOUNDS) else high
+            estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+            return min(max(estimate, low), high)
+        seen += bucket_count
+    return high
+
+
+class _Bucket:
+    """
+    An open rollup bucket of one target and probe.
+
+    Latencies are only counted into the histogram, so a bucket takes the same
+    memory however many probes it holds.
+    """
+
+    __slots__ = (
+        "start",
+        "samples",
+        "failures",
+        "histogram",
+        "sum_ms",
+        "min_ms",
+        "max_ms",
+    )
+
+    def __init__(self, start: float):
+        self.start = start
+        self.samples = 0
+        self.failures = 0
+        self.histogram = [0] * HISTOGRAM_SIZE
+        self.sum_ms = 0.0
+        self.min_ms = math.inf
+        self.max_ms = -math.inf
+
+    def add(self, status: int, total_ms: float) -> None:
+        """Add a probe outcome to the bucket."""
+        self.samples += 1
+        if status == STATUS_FAILED:
+            self.failures += 1
+        if not math.isnan(total_ms):
+            self.histogram[bisect_left(HISTOGRAM_BOUNDS, total_ms)] += 1
+            self.sum_ms += total_ms
+            self.min_ms = min(self.min_ms, total_ms)
+            self.max_ms = max(self.max_ms, total_ms)
+
+    def to_rollup(self) -> Rollup:
+        """Compute the rollup of the bucket."""
+        histogram = tuple(min(value, 0xFFFF) for value in self.histogram)
+        measured = sum(self.histogram)
+        if not measured:
+            return Rollup(
+                self.start,
+                self.samples,
+                self.failures,
+                0.0,
+                math.nan,
+                math.nan,
+                math.nan,
+                math.nan,
+                math.nan,
+                histogram,
+            )
+        low, high = self.min_ms, self.max_ms
+        return Rollup(
+            self.start,
+            self.samples,
+            self.failures,
+            self.sum_ms,
+            low,
+            high,
+            _histogram_percentile(self.histogram, measured, 0.5, low, high),
+            _histogram_percentile(self.histogram, measured, 0.9, low, high),
+            _histogram_percentile(self.histogram, measured, 0.99, low, high),
+            histogram,
+        )
+
+
+class TimeSeriesStore:
+    """
+    Append-only store of probe results with memory-mapped, time-indexed reads.
+
+    The store is written from the event loop: appends are buffered in memory
+    and handed every flush_interval seconds to a writer thread, which also
+    saves the symbols and deletes expired segments, in order. Recording a probe
+    never waits on the disk; reads wait for the writes queued before them.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        raw_retention_days: int = 7,
+        rollup_1m_retention_days: int = 30,
+        rollup_1h_retention_days: int = 365,
+        flush_interval: float = 5.0,
+    ):
+        """
+        Open or create a store.
+
+        Args:
+            directory: Directory holding the store files
+            raw_retention_days: Days to keep raw records
+            rollup_1m_retention_days: Days to keep 1-minute rollups
+            rollup_1h_retention_days: Days to keep 1-hour rollups
+            flush_interval: Seconds between flushes of buffered writes
+        """
+        self.directory = Path(directory)
+        self.raw_retention_days = raw_retention_days
+        self.rollup_1m_retention_days = rollup_1m_retention_days
+        self.rollup_1h_retention_days = rollup_1h_retention_days
+        self.flush_interval = flush_interval
+
+        (self.directory / "raw").mkdir(parents=True, exist_ok=True)
+        (self.directory / "paths").mkdir(exist_ok=True)
+        for name in ROLLUP_DIRECTORIES.values():
+            (self.directory / name).mkdir(exist_ok=True)
+
+        self._targets: List[str] = []
+        self._target_ids: Dict[str, int] = {}
+        self._error_classes: List[str] = []
+        self._error_ids: Dict[str, int] = {}
+        self._load_symbols()
+
+        # Distinct routes by hash, and the current route hash of every target
+        self._routes: Dict[int, Tuple[MtrHop, ...]] = {}
+        self._current_routes: Dict[int, Optional[int]] = {}
+        self._load_routes()
+
+        self._raw_path: Optional[Path] = None
+        self._raw_day_start = -math.inf
+        self._buckets: Dict[int, Dict[Tuple[int, int], _Bucket]] = {
+            resolution: {} for resolution in ROLLUP_DIRECTORIES
+        }
+        # Appends to raw, rollup and path files, written on the next flush
+        self._pending: Dict[Path, bytearray] = {}
+        self._last_flush = time.monotonic()
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="timeseries-writer"
+        )
+        self._last_write: Optional[Future[None]] = None
+
+    def _load_symbols(self) -> None:
+        """Load the target and error class names."""
+        path = self.directory / "symbols.json"
+        if not path.exists():
+            return
+        data = json.loads(path.read_text(encoding="utf-8"))
+        self._targets = list(data.get("targets", []))
+        self._target_ids = {name: i for i, name in enumerate(self._targets)}
+        self._error_classes = list(data.get("error_classes", []))
+        # Error class id 0 means no error
+        self._error_ids = {name: i + 1 for i, name in enumerate(self._error_classes)}
+
+    def _save_symbols(self) -> None:
+        """Queue an atomic write of the target and error class names."""
+        text = json.dumps(
+            {"targets": self._targets, "error_classes": self._error_classes}
+        )
+        self._submit(self._write_symbols, text)
+
+    def _write_symbols(self, text: str) -> None:
+        """Atomically replace the symbols file, in the writer thread."""
+        path = self.directory / "symbols.json"
+        tmp_path = path.with_suffix(".json.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _submit(self, function: Callable[..., None], *args: Any) -> None:
+        """Run a write in the writer thread, after the writes queued before it."""
+        self._last_write = self._writer.submit(self._run_write, function, *args)
+
+    @staticmethod
+    def _run_write(function: Callable[..., None], *args: Any) -> None:
+        """Run a write, logging instead of raising in the writer thread."""
+        try:
+            function(*args)
+        except OSError as e:
+            logger.error(f"Failed to write time series store: {e}")
+
+    def _target_id(self, target: str) -> int:
+        """Return the id of a target name, assigning one if needed."""
+        target_id = self._target_ids.get(target)
+        if target_id is None:
+            target_id = len(self._targets)
+            self._targets.append(target)
+            self._target_ids[target] = target_id
+            self._save_symbols()
+        return target_id
+
+    def _error_id(self, error_class: Optional[str]) -> int:
+        """Return the id of an error class, assigning one if needed."""
+        if error_class is None:
+            return 0
+        error_id = self._error_ids.get(error_class)
+        if error_id is None:
+            self._error_classes.append(error_class)
+            error_id = len(self._error_classes)
+            self._error_ids[error_class] = error_id
+            self._save_symbols()
+        return error_id
+
+    def _load_routes(self) -> None:
+        """Load the distinct routes and the current route of every target."""
+        path = self.directory / "paths" / "routes.jsonl"
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    data = json.loads(line)
+                    hops = tuple(MtrHop(*hop) for hop in data["hops"])
+                    self._routes[int(data["hash"], 16)] = hops
+                except (ValueError, TypeError, KeyError):
+                    # A crash while appending leaves a torn last line
+                    continue
+
+        for target_id in range(len(self._targets)):
+            path = self._path_file(target_id)
+            size = path.stat().st_size if path.exists() else 0
+            # A torn record at the end is ignored
+            size -= size % PATH_RECORD.size
+            if size:
+                with open(path, "rb") as f:
+                    f.seek(size - PATH_RECORD.size)
+                    route = PATH_RECORD.unpack(f.read(PATH_RECORD.size))[1]
+                self._current_routes[target_id] = route
+
+    def _path_file(self, target_id: int) -> Path:
+        """Return the file holding the route changes of a target."""
+        return self.directory / "paths" / f"{target_id}.bin"
+
+    def _rollup_path(self, resolution: int, target_id: int, start: float) -> Path:
+        """Return the file holding a rollup bucket."""
+        period = _month(start) if resolution >= 3600 else _day(start)
+        directory = self.directory / ROLLUP_DIRECTORIES[resolution] / str(target_id)
+        return directory / f"{period}.bin"
+
+    def _open_raw(self, timestamp: float) -> None:
+        """Switch raw records to the segment of the day of a timestamp."""
+        self._raw_path = self.directory / "raw" / f"{_day(timestamp)}.bin"
+        self._raw_day_start = timestamp - timestamp % _DAY
+        # Segments only roll over once a day, a cheap time to expire old data
+        self._submit(self.apply_retention, timestamp)
+
+    def append(
+        self,
+        target: str,
+        probe: str,
+        result: ProbeResult,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        """
+        Append a probe result.
+
+        Args:
+            target: Target name
+            probe: Probe name ("maintenance" or "api")
+            result: The probe result
+            timestamp: Unix time of the probe (defaults to now)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        target_id = self._target_id(target)
+        probe_id = PROBES.index(probe)
+        if result.on_maintenance:
+            status = STATUS_MAINTENANCE
+        elif result.success:
+            status = STATUS_OK
+        else:
+            status = STATUS_FAILED
+        timings = result.timings
+        total_ms = _to_ms(timings.total)
+
+        if not 0 <= timestamp - self._raw_day_start < _DAY:
+            self._open_raw(timestamp)
+        assert self._raw_path is not None
+        self._pending.setdefault(self._raw_path, bytearray()).extend(
+            RECORD.pack(
+                timestamp,
+                target_id,
+                probe_id,
+                status,
+                self._error_id(result.error_class),
+                _to_ms(timings.dns),
+                _to_ms(timings.connect),
+                _to_ms(timings.ttfb),
+                total_ms,
+            )
+        )
+
+        # Close finished rollup buckets and add the result to the open ones
+        key = (target_id, probe_id)
+        for resolution, buckets in self._buckets.items():
+            start = timestamp - timestamp % resolution
+            bucket = buckets.get(key)
+            if bucket is None or bucket.start != start:
+                if bucket is not None:
+                    self._close_bucket(resolution, target_id, probe_id, bucket)
+                bucket = buckets[key] = _Bucket(start)
+            bucket.add(status, total_ms)
+
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._write_pending()
+
+    def _close_bucket(
+        self, resolution: int, target_id: int, probe_id: int, bucket: _Bucket
+    ) -> None:
+        """Queue the rollup of a finished bucket for writing."""
+        rollup = bucket.to_rollup()
+        data = ROLLUP.pack(
+            rollup.start,
+            target_id,
+            probe_id,
+            rollup.samples,
+            rollup.failures,
+            rollup.sum_ms,
+            rollup.min_ms,
+            rollup.max_ms,
+            rollup.p50_ms,
+            rollup.p90_ms,
+            rollup.p99_ms,
+            *rollup.histogram,
+        )
+        path = self._rollup_path(resolution, target_id, bucket.start)
+        self._pending.setdefault(path, bytearray()).extend(data)
+
+    def append_path(
+        self, target: str, trace: MtrTrace, timestamp: Optional[float] = None
+    ) -> bool:
+        """
+        Record the network path of a trace if its route changed.
+
+        Args:
+            target: Target name
+            trace: The MTR trace
+            timestamp: Unix time of the trace (defaults to its start, else now)
+
+        Returns:
+            Whether the route differs from the previous one of the target
+        """
+        if timestamp is None:
+            timestamp = trace.started or time.time()
+        target_id = self._target_id(target)
+        current = self._current_routes.get(target_id)
+        key = route_hash(trace.hops)
+        if key == current:
+            return False
+
+        if key not in self._routes:
+            self._routes[key] = tuple(trace.hops)
+            line = json.dumps(
+                {"hash": f"{key:016x}", "hops": [astuple(hop) for hop in trace.hops]}
+            )
+            routes_path = self.directory / "paths" / "routes.jsonl"
+            self._pending.setdefault(routes_path, bytearray()).extend(
+                (line + "\n").encode()
+            )
+        self._current_routes[target_id] = key
+        self._pending.setdefault(self._path_file(target_id), bytearray()).extend(
+            PATH_RECORD.pack(timestamp, key)
+        )
+        return True
+
+    def _write_pending(self) -> None:
+        """Hand the buffered appends to the writer thread."""
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            self._submit(self._append_files, pending)
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def _append_files(pending: Dict[Path, bytearray]) -> None:
+        """Append buffered data to its files, in the writer thread."""
+        for path, data in pending.items():
+            path.parent.mkdir(exist_ok=True)
+            with open(path, "ab") as f:
+                f.write(data)
+
+    def flush(self) -> None:
+        """
+        Write buffered raw records, finished rollups and route changes.
+
+        Blocks until the writer thread has written them and every write queued
+        before, so it is meant for readers and shutdown, not the probe path.
+        """
+        self._write_pending()
+        if self._last_write is not None:
+            self._last_write.result()
+
+    def close(self) -> None:
+        """Write the open rollup buckets, flush and close the store."""
+        for resolution, buckets in self._buckets.items():
+            for (target_id, probe_id), bucket in buckets.items():
+                self._close_bucket(resolution, target_id, probe_id, bucket)
+            buckets.clear()
+        self.flush()
+        self._writer.shutdown(wait=True)
+        self._raw_path = None
+        self._raw_day_start = -math.inf
+
+    def apply_retention(self, now: Optional[float] = None) -> None:
+        """
+        Delete segments older than their retention period.
+
+        Runs in the calling thread; the store itself calls it from the writer
+        thread when a new day starts.
+
+        Args:
+            now: Current Unix time (defaults to now)
+        """
+        if now is None:
+            now = time.time()
+        raw_cutoff = _day(now - self.raw_retention_days * _DAY)
+        for path in (self.directory / "raw").glob("*.bin"):
+            if path.stem < raw_cutoff:
+                path.unlink()
+
+        cutoffs = {
+            60: _day(now - self.rollup_1m_retention_days * _DAY),
+            3600: _month(now - self.rollup_1h_retention_days * _DAY),
+        }
+        for resolution, name in ROLLUP_DIRECTORIES.items():
+            for path in (self.directory / name).glob("*/*.bin"):
+                if path.stem < cutoffs[resolution]:
+                    path.unlink()
+
+    def records(
+        self, start: float, end: float, target: Optional[str] = None
+    ) -> Iterator[ProbeRecord]:
+        """
+        Iterate over the raw records in a time range.
+
+        Each daily segment is memory-mapped and binary-searched for the range,
+        so only the records inside the range are read.
+
+        Args:
+            start: Start of the range (Unix time, inclusive)
+            end: End of the range (Unix time, exclusive)
+            target: Only return records of this target
+
+        Returns:
+            An iterator over the records in time order
+        """
+        self.flush()
+        target_id = self._target_ids.get(target) if target is not None else None
+        if target is not None and target_id is None:
+            return
+
+        size = RECORD.size
+        day_start = start - start % _DAY
+        while day_start < end:
+            path = self.directory / "raw" / f"{_day(day_start)}.bin"
+            day_start += _DAY
+            if not path.exists() or path.stat().st_size < size:
+                continue
+            with (
+                open(path, "rb") as f,
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+            ):
+                count = len(mm) // size
+                first = _bisect_records(mm, count, start)
+                last = _bisect_records(mm, count, end)
+                data = mm[first * size : last * size]
+
+            for row in RECORD.iter_unpack(data):
+                if target_id is not None and row[1] != target_id:
+                    continue
+                yield ProbeRecord(
+                    row[0],
+                    self._targets[row[1]],
+                    PROBES[row[2]],
+                    STATUSES[row[3]],
+                    self._error_classes[row[4] - 1] if row[4] else None,
+                    _from_ms(row[5]),
+                    _from_ms(row[6]),
+                    _from_ms(row[7]),
+                    _from_ms(row[8]),
+                )
+
+    def rollups(
+        self,
+        target: str,
+        start: float,
+        end: float,
+        resolution: int = 3600,
+        probe: str = "api",
+    ) -> List[Rollup]:
+        """
+        Return the rollups of a target whose bucket starts in a time range.
+
+        Buckets still open in this process are included.
+
+        Args:
+            target: Target name
+            start: Start of the range (Unix time, inclusive)
+            end: End of the range (Unix time, exclusive)
+            resolution: Bucket size in seconds (60 or 3600)
+            probe: Probe name
+
+        Returns:
+            The rollups in the range
+        """
+        self.flush()
+        target_id = self._target_ids.get(target)
+        if target_id is None:
+            return []
+        probe_id = PROBES.index(probe)
+
+        result: List[Rollup] = []
+        directory = self.directory / ROLLUP_DIRECTORIES[resolution] / str(target_id)
+        if directory.exists():
+            first = self._rollup_path(resolution, target_id, start).stem
+            last = self._rollup_path(resolution, target_id, end).stem
+            for path in sorted(directory.glob("*.bin")):
+                if not first <= path.stem <= last:
+                    continue
+                for row in ROLLUP.iter_unpack(path.read_bytes()):
+                    if row[2] == probe_id and start <= row[0] < end:
+                        result.append(_unpack_rollup(row))
+
+        bucket = self._buckets[resolution].get((target_id, probe_id))
+        if bucket is not None and start <= bucket.start < end:
+            result.append(bucket.to_rollup())
+        return result
+
+    def path_changes(
+        self, target: str, start: float = 0.0, end: float = math.inf
+    ) -> List[PathChange]:
+        """
+        Return the route changes of a target in a time range.
+
+        Args:
+            target: Target name
+            start: Start of the range (Unix time, inclusive)
+            end: End of the range (Unix time, exclusive)
+
+        Returns:
+            The changes in time order, each with the route taken from then on;
+            the first route recorded for the target counts as a change
+        """
+        return [
+            change
+            for change in self._read_path_changes(target)
+            if start <= change.timestamp < end
+        ]
+
+    def path_at(self, target: str, timestamp: float) -> Optional[PathChange]:
+        """
+        Return the route of a target at a point in time.
+
+        Args:
+            target: Target name
+            timestamp: Unix time
+
+        Returns:
+            The last route change at or before the timestamp, or None
+        """
+        result = None
+        for change in self._read_path_changes(target):
+            if change.timestamp > timestamp:
+                break
+            result = change
+        return result
+
+    def _read_path_changes(self, target: str) -> List[PathChange]:
+        """Read all route changes of a target."""
+        self.flush()
+        target_id = self._target_ids.get(target)
+        if target_id is None:
+            return []
+        path = self._path_file(target_id)
+        if not path.exists():
+            return []
+        data = path.read_bytes()
+        data = data[: len(data) - len(data) % PATH_RECORD.size]
+        return [
+            PathChange(timestamp, key, self._routes.get(key, ()))
+            for timestamp, key in PATH_RECORD.iter_unpack(data)
+        ]
+
+    def summarize(
+        self, target: str, start: float, end: float, probe: str = "api"
+    ) -> LatencySummary:
+        """
+        Summarize the latency of a target over a time range.
+
+        Short ranges are answered exactly from raw records. Longer ranges are
+        answered from rollups: whole buckets starting inside the range are
+        merged and percentiles are estimated from their histograms.
+
+        Args:
+            target: Target name
+            start: Start of the range (Unix time, inclusive)
+            end: End of the range (Unix time, exclusive)
+            probe: Probe name
+
+        Returns:
+            The latency summary
+        """
+        span = end - start
+        if span <= RAW_QUERY_MAX_SPAN:
+            return self._summarize_raw(target, start, end, probe)
+        resolution = 60 if span <= ROLLUP_1M_QUERY_MAX_SPAN else 3600
+        return _merge_rollups(
+            self.rollups(target, start, end, resolution, probe),
+            ROLLUP_DIRECTORIES[resolution],
+        )
+
+    def _summarize_raw(
+        self, target: str, start: float, end: float, probe: str
+    ) -> LatencySummary:
+        """Summarize raw records exactly."""
+        summary = LatencySummary(source="raw")
+        latencies: List[float] = []
+        for record in self.records(start, end, target):
+            if record.probe != probe:
+                continue
+            summary.count += 1
+            if record.status == "failed":
+                summary.failures += 1
+            if record.total_ms is not None:
+                latencies.append(record.total_ms)
+        if latencies:
+            latencies.sort()
+            summary.min_ms = latencies[0]
+            summary.max_ms = latencies[-1]
+            summary.mean_ms = math.fsum(latencies) / len(latencies)
+            summary.p50_ms = _percentile(latencies, 0.5)
+            summary.p90_ms = _percentile(latencies, 0.9)
+            summary.p99_ms = _percentile(latencies, 0.99)
+        return summary
+
+
+def _bisect_records(mm: mmap.mmap, count: int, timestamp: float) -> int:
+    """Return the index of the first record at or after a timestamp."""
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if _TIMESTAMP.unpack_from(mm, middle * RECORD.size)[0] < timestamp:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _unpack_rollup(row: Tuple[Any, ...]) -> Rollup:
+    """Build a rollup out of a row unpacked with the ROLLUP struct."""
+    (
+        start,
+        _target_id,
+        _probe_id,
+        samples,
+        failures,
+        sum_ms,
+        min_ms,
+        max_ms,
+        p50_ms,
+        p90_ms,
+        p99_ms,
+        *histogram,
+    ) = row
+    return Rollup(
+        start,
+        samples,
+        failures,
+        sum_ms,
+        min_ms,
+        max_ms,
+        p50_ms,
+        p90_ms,
+        p99_ms,
+        tuple(histogram),
+    )
+
+
+def _merge_rollups(rollups: List[Rollup], source: str) -> LatencySummary:
+    """Merge rollups into one latency summary."""
+    summary = LatencySummary(source=source)
+    histogram = [0] * HISTOGRAM_SIZE
+    latency_count = 0
+    latency_sum = 0.0
+    for rollup in rollups:
+        summary.count += rollup.samples
+        summary.failures += rollup.failures
+        bucket_latencies = sum(rollup.histogram)
+        if not bucket_latencies:
+            continue
+        latency_count += bucket_latencies
+        latency_sum += rollup.sum_ms
+        for index, value in enumerate(rollup.histogram):
+            histogram[index] += value
+        if summary.min_ms is None or rollup.min_ms < summary.min_ms:
+            summary.min_ms = rollup.min_ms
+        if summary.max_ms is None or rollup.max_ms > summary.max_ms:
+            summary.max_ms = rollup.max_ms
+
+    if not latency_count or summary.min_ms is None or summary.max_ms is None:
+        return summary
+    summary.mean_ms = latency_sum / latency_count
+    low, high = summary.min_ms, summary.max_ms
+    summary.p50_ms = _histogram_percentile(histogram, latency_count, 0.5, low, high)
+    summary.p90_ms = _histogram_percentile(histogram, latency_count, 0.9, low, high)
+    summary.p99_ms = _histogram_percentile(histogram, latency_count, 0.99, low, high)
+    return summary
+
+
+def _parse_duration(value: str) -> float:
+    """Parse a duration like 90s, 15m, 12h or 7d into seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": _DAY, "w": 7 * _DAY}
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Print the latency summary or the route changes of a target."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("directory", help="Time series store directory")
+    parser.add_argument("target", help="Target name")
+    parser.add_argument("--since", default="1h", help="Range, e.g. 15m, 24h, 7d")
+    parser.add_argument("--probe", default="api", choices=PROBES)
+    parser.add_argument(
+        "--paths", action="store_true", help="Print route changes instead"
+    )
+    args = parser.parse_args(argv)
+
+    if not Path(args.directory, "symbols.json").exists():
+        print(f"No time series store in {args.directory}", file=sys.stderr)
+        return 1
+    store = TimeSeriesStore(args.directory)
+    end = time.time()
+    if args.paths:
+        start = end - _parse_duration(args.since)
+        for change in store.path_changes(args.target, start, end):
+            print(
+                json.dumps(
+                    {
+                        "timestamp": change.timestamp,
+                        "route": f"{change.route_hash:016x}",
+                        "hops": [hop.host for hop in change.hops],
+                    }
+                )
+            )
+        return 0
+    summary = store.summarize(
+        args.target, end - _parse_duration(args.since), end, args.probe
+    )
+    print(json.dumps({"target": args.target, **asdict(summary)}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import aiohttp
+
+from api_monitoring.config import settings
+from api_monitoring.utils.logging import get_logger
+from api_monitoring.utils.timings import PhaseTimings
+
+logger = get_logger(__name__)
+
+
+class HttpSessionManager:
+    """
+    Owns the process-wide aiohttp session shared by all HTTP callers.
+
+    Keeping one session (and one TCPConnector) alive across calls preserves
+    keep-alive connections, the DNS cache and TLS sessions. The manager also
+    counts new versus reused connections so the savings can be verified.
+
+    Requests made with trace_request_ctx set to a PhaseTimings instance get
+    their DNS, connect and time-to-first-byte phases recorded into it.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+    ):
+        """
+        Initialize the session manager.
+
+        Args:
+            limit: Maximum number of simultaneous connections
+            limit_per_host: Maximum number of simultaneous connections per host
+            dns_cache_ttl: Seconds to cache DNS lookups (0 disables the cache)
+            keepalive_timeout: Seconds to keep idle connections open
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        # Connection usage counters
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        """Create a trace config that feeds the counters and phase timings."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceRequestStartParams,
+        ) -> None:
+            context.request_start = time.perf_counter()
+            context.dns = 0.0
+            timings = context.trace_request_ctx
+            if isinstance(timings, PhaseTimings):
+                timings.attempts += 1
+
+        async def on_dns_resolvehost_start(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceDnsResolveHostStartParams,
+        ) -> None:
+            context.dns_start = time.perf_counter()
+
+        async def on_dns_resolvehost_end(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceDnsResolveHostEndParams,
+        ) -> None:
+            context.dns = time.perf_counter() - context.dns_start
+            timings = context.trace_request_ctx
+            if isinstance(timings, PhaseTimings):
+                timings.dns = (timings.dns or 0.0) + context.dns
+
+        async def on_connection_create_start(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceConnectionCreateStartParams,
+        ) -> None:
+            context.connect_start = time.perf_counter()
+
+        async def on_connection_create_end(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceConnectionCreateEndParams,
+        ) -> None:
+            self.new_connections += 1
+            timings = context.trace_request_ctx
+            if isinstance(timings, PhaseTimings):
+                # DNS resolution happens inside connection creation
+                connect = time.perf_counter() - context.connect_start - context.dns
+                timings.connect = (timings.connect or 0.0) + connect
+                timings.reused_connection = False
+
+        async def on_connection_reuseconn(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceConnectionReuseconnParams,
+        ) -> None:
+            self.reused_connections += 1
+            timings = context.trace_request_ctx
+            if isinstance(timings, PhaseTimings) and timings.reused_connection is None:
+                timings.reused_connection = True
+
+        async def on_request_headers_sent(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceRequestHeadersSentParams,
+        ) -> None:
+            context.headers_sent = time.perf_counter()
+
+        async def on_request_end(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceRequestEndParams,
+        ) -> None:
+            timings = context.trace_request_ctx
+            if isinstance(timings, PhaseTimings):
+                sent = getattr(context, "headers_sent", context.request_start)
+                timings.ttfb = time.perf_counter() - sent
+
+        async def on_dns_cache_hit(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceDnsCacheHitParams,
+        ) -> None:
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(
+            session: aiohttp.ClientSession,
+            context: SimpleNamespace,
+            params: aiohttp.TraceDnsCacheMissParams,
+        ) -> None:
+            self.dns_cache_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_request_headers_sent.append(on_request_headers_sent)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the shared session, creating it if needed.
+
+        Must be called from a coroutine running on the event loop that will
+        use the session.
+
+        Returns:
+            The shared aiohttp client session
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl or None,
+                use_dns_cache=self.dns_cache_ttl > 0,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, trace_configs=[self._create_trace_config()]
+            )
+            logger.info(
+                f"Created shared HTTP session (limit={self.limit}, "
+                f"limit_per_host={self.limit_per_host}, dns_ttl={self.dns_cache_ttl}s)"
+            )
+        return self._session
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the connection usage counters.
+
+        Returns:
+            A dictionary with new/reused connection and DNS cache counts
+        """
+        return {
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+    async def close(self) -> None:
+        """Close the shared session and all pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(f"Closed shared HTTP session: {self.stats()}")
+        self._session = None
+
+
+# Create the process-wide session manager
+http_session_manager = HttpSessionManager(
+    limit=settings.http_pool_limit,
+    limit_per_host=settings.http_pool_limit_per_host,
+    dns_cache_ttl=settings.http_dns_cache_ttl,
+    keepalive_timeout=settings.http_keepalive_timeout,
+)
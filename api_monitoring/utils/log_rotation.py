@@ -0,0 +1,169 @@
+import gzip
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+
+class RotatingLogFileHandler(logging.FileHandler):
+    """
+    File handler that rotates by size and by age.
+
+    A rotated segment is renamed to "<file>.<YYYYmmdd-HHMMSS>" and then, on a
+    background thread, compressed to "<file>.<YYYYmmdd-HHMMSS>.gz". Only the
+    newest backup_count segments are kept. Renaming is the only file
+    operation done on the writing thread.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        max_bytes: int = 0,
+        rotate_interval: float = 0,
+        backup_count: int = 7,
+        compress: bool = True,
+        encoding: Optional[str] = "utf-8",
+    ):
+        """
+        Initialize the handler.
+
+        Args:
+            filename: Path of the active log file
+            max_bytes: Rotate once the file reaches this size (0 disables)
+            rotate_interval: Rotate after this many seconds (0 disables)
+            backup_count: Number of rotated segments to keep (0 keeps all)
+            compress: Gzip rotated segments in the background
+            encoding: File encoding
+        """
+        super().__init__(filename, mode="a", encoding=encoding)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: List[Future[None]] = []
+
+        # Age-based rotation is measured from the file's last modification
+        path = Path(self.baseFilename)
+        start = path.stat().st_mtime if path.exists() else time.time()
+        self.rollover_at = start + rotate_interval if rotate_interval else 0.0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Write a record and rotate the file if needed."""
+        super().emit(record)
+        self.rollover_if_needed()
+
+    def should_rollover(self) -> bool:
+        """
+        Check whether the active file is due for rotation.
+
+        Returns:
+            True if the file is too large or too old
+        """
+        if self.rollover_at and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes and self.stream is not None:
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def rollover_if_needed(self) -> None:
+        """Rotate the active file if it is too large or too old."""
+        if self.should_rollover():
+            self.acquire()
+            try:
+                self.do_rollover()
+            finally:
+                self.release()
+
+    def _segment_path(self) -> str:
+        """Return an unused name for the segment being rotated out."""
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = f"{self.baseFilename}.{stamp}"
+        suffix = 1
+        while os.path.exists(path) or os.path.exists(f"{path}.gz"):
+            path = f"{self.baseFilename}.{stamp}-{suffix}"
+            suffix += 1
+        return path
+
+    def do_rollover(self) -> None:
+        """Rename the active file and start a new one."""
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename):
+            segment = self._segment_path()
+            os.replace(self.baseFilename, segment)
+            if self.compress:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="log-compress"
+                    )
+                self._pending = [f for f in self._pending if not f.done()]
+                self._pending.append(self._executor.submit(self._compress, segment))
+            else:
+                self._apply_retention()
+
+        self.stream = self._open()
+        if self.rotate_interval:
+            self.rollover_at = time.time() + self.rotate_interval
+
+    def _compress(self, segment: str) -> None:
+        """Gzip a rotated segment, then apply the retention count."""
+        try:
+            with (
+                open(segment, "rb") as source,
+                gzip.open(f"{segment}.gz", "wb") as dest,
+            ):
+                shutil.copyfileobj(source, dest)
+            os.remove(segment)
+        except OSError:
+            # Leave the uncompressed segment in place, it is still readable
+            pass
+        self._apply_retention()
+
+    def rotated_segments(self) -> List[str]:
+        """
+        List the rotated segments, oldest first.
+
+        Returns:
+            Paths of the rotated segments, compressed or not
+        """
+        directory, name = os.path.split(self.baseFilename)
+        prefix = f"{name}."
+        segments = [
+            os.path.join(directory, entry)
+            for entry in os.listdir(directory or ".")
+            if entry.startswith(prefix)
+            and entry[len(prefix) : len(prefix) + 1].isdigit()
+        ]
+        # Sort on the uncompressed name, so a compressed segment keeps its place
+        return sorted(segments, key=lambda path: path.removesuffix(".gz"))
+
+    def _apply_retention(self) -> None:
+        """Delete the oldest segments beyond the retention count."""
+        if not self.backup_count:
+            return
+        segments = self.rotated_segments()
+        for segment in segments[: max(0, len(segments) - self.backup_count)]:
+            try:
+                os.remove(segment)
+            except OSError:
+                pass
+
+    def wait_for_compression(self) -> None:
+        """Block until all submitted compressions have finished."""
+        for future in list(self._pending):
+            future.result()
+        self._pending = []
+
+    def close(self) -> None:
+        """Close the file and finish pending compressions."""
+        super().close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._pending = []
@@ -1,20 +1,50 @@
-import json
+import atexit
 import logging
+import queue
 import sys
-from datetime import datetime
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 from api_monitoring.config import settings
+from api_monitoring.utils.log_rotation import RotatingLogFileHandler
+from api_monitoring.utils.serialization import dumps
+
+# Attributes every LogRecord has; anything else on a record is an extra field
+STANDARD_RECORD_ATTRS = frozenset(
+    logging.LogRecord("", 0, "", 0, "", None, None).__dict__
+) | {"message", "asctime"}
 
 
 class StructuredLogFormatter(logging.Formatter):
-    """Custom formatter for structured JSON logs."""
+    """
+    Custom formatter for structured JSON logs.
+
+    Emits the timestamp, level, logger name, message and source location, plus
+    the extra fields passed to the log call. Standard LogRecord attributes are
+    not repeated in the output.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        # The last second formatted and its UTC date and time
+        self._cached_second: Tuple[int, str] = (-1, "")
+
+    def _timestamp(self, created: float) -> str:
+        """Format a record creation time as an ISO 8601 UTC timestamp."""
+        second = int(created)
+        cached_second, prefix = self._cached_second
+        if second != cached_second:
+            prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._cached_second = (second, prefix)
+        return f"{prefix}.{int((created - second) * 1e6):06d}"
 
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
+            "name": record.name,
             "message": record.getMessage(),
             "module": record.module,
             "function": record.funcName,
@@ -27,10 +57,245 @@ class StructuredLogFormatter(logging.Formatter):
 
         # Add extra fields if available
         for key, value in record.__dict__.items():
-            if key not in log_data and not key.startswith("_") and key != "exc_info":
+            if key not in STANDARD_RECORD_ATTRS and key not in log_data:
                 log_data[key] = value
 
-        return json.dumps(log_data)
+        return dumps(log_data, default=str).decode()
+
+
+class QueueLogHandler(logging.Handler):
+    """
+    Handler that only puts records on a bounded queue.
+
+    Formatting and I/O happen on the LogWriter thread, so logging from the
+    event loop never waits on a disk or a pipe. When the queue is full the
+    record is dropped and counted instead of blocking the caller.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[Optional[logging.LogRecord]]"):
+        """
+        Initialize the handler.
+
+        Args:
+            log_queue: The queue shared with the writer thread
+        """
+        super().__init__()
+        self.queue = log_queue
+        self.dropped = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Enqueue a record without blocking."""
+        if record.args:
+            # Render %-style arguments now, they may change before the write
+            record.msg = record.getMessage()
+            record.args = None
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogWriter(threading.Thread):
+    """
+    Background thread that formats queued records and writes them in batches.
+
+    Stream handlers get each batch in a single write; their streams are
+    flushed when the queue runs empty or every flush_interval seconds while
+    it is busy. Rotating file handlers are checked for rotation after each
+    batch. Other handlers receive records one by one.
+    """
+
+    def __init__(
+        self,
+        queue_handler: QueueLogHandler,
+        handlers: List[logging.Handler],
+        flush_interval: float = 1.0,
+        batch_size: int = 512,
+    ):
+        """
+        Initialize the writer thread.
+
+        Args:
+            queue_handler: The handler feeding the queue
+            handlers: The output handlers records are written to
+            flush_interval: Maximum seconds between flushes while busy
+            batch_size: Maximum number of records written at once
+        """
+        super().__init__(name="log-writer", daemon=True)
+        self.queue_handler = queue_handler
+        self.queue = queue_handler.queue
+        self.handlers = handlers
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._reported_dropped = 0
+
+    def run(self) -> None:
+        """Write records until the stop sentinel is received."""
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush()
+                last_flush = time.monotonic()
+                continue
+
+            batch: List[logging.LogRecord] = []
+            while record is not None:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            # A None record is the stop sentinel
+            running = record is not None
+
+            self._write(batch)
+            now = time.monotonic()
+            if (
+                not running
+                or self.queue.empty()
+                or now - last_flush >= self.flush_interval
+            ):
+                self._flush()
+                last_flush = now
+
+    def _dropped_record(self) -> Optional[logging.LogRecord]:
+        """Return a warning record if records were dropped since the last one."""
+        dropped = self.queue_handler.dropped
+        if dropped == self._reported_dropped:
+            return None
+        count = dropped - self._reported_dropped
+        self._reported_dropped = dropped
+        return logging.LogRecord(
+            "api_monitoring.utils.logging",
+            logging.WARNING,
+            __file__,
+            0,
+            f"Log queue full, dropped {count} record(s) ({dropped} in total)",
+            None,
+            None,
+        )
+
+    def _write(self, batch: List[logging.LogRecord]) -> None:
+        """Format and write a batch of records to every output handler."""
+        dropped_record = self._dropped_record()
+        if dropped_record is not None:
+            batch.append(dropped_record)
+
+        for handler in self.handlers:
+            records = [r for r in batch if r.levelno >= handler.level]
+            if not records:
+                continue
+            if not isinstance(handler, logging.StreamHandler):
+                for record in records:
+                    handler.handle(record)
+                continue
+            try:
+                lines = [handler.format(record) for record in records]
+                handler.acquire()
+                try:
+                    stream = handler.stream
+                    if stream is None and isinstance(handler, logging.FileHandler):
+                        stream = handler.stream = handler._open()
+                    if stream is None:
+                        continue
+                    stream.write(handler.terminator.join(lines) + handler.terminator)
+                    if isinstance(handler, RotatingLogFileHandler):
+                        handler.rollover_if_needed()
+                finally:
+                    handler.release()
+            except Exception:
+                handler.handleError(records[0])
+
+    def _flush(self) -> None:
+        """Flush every output handler."""
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except Exception:
+                pass
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """
+        Write all queued records, flush and close the output handlers.
+
+        Args:
+            timeout: Maximum seconds to wait for the queue to drain
+        """
+        if self.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.join(timeout)
+        for handler in self.handlers:
+            try:
+                handler.flush()
+                handler.close()
+            except Exception:
+                pass
+
+
+def _create_output_handlers() -> List[logging.Handler]:
+    """Create the console and file handlers the writer thread writes to."""
+    handlers: List[logging.Handler] = []
+
+    # Create console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(StructuredLogFormatter())
+    handlers.append(console_handler)
+
+    # Create a rotating file handler if log file is specified
+    if settings.log_file:
+        file_handler = RotatingLogFileHandler(
+            settings.log_file,
+            max_bytes=settings.log_max_bytes,
+            rotate_interval=settings.log_rotate_interval,
+            backup_count=settings.log_backup_count,
+            compress=settings.log_compress,
+        )
+        file_handler.setFormatter(StructuredLogFormatter())
+        handlers.append(file_handler)
+
+    return handlers
+
+
+_queue_handler: Optional[QueueLogHandler] = None
+_log_writer: Optional[LogWriter] = None
+
+
+def _get_queue_handler() -> QueueLogHandler:
+    """Return the process-wide queue handler, starting the writer if needed."""
+    global _queue_handler, _log_writer
+    if _queue_handler is None:
+        _queue_handler = QueueLogHandler(queue.Queue(maxsize=settings.log_queue_size))
+        _log_writer = LogWriter(
+            _queue_handler,
+            _create_output_handlers(),
+            flush_interval=settings.log_flush_interval,
+        )
+        _log_writer.start()
+        atexit.register(shutdown_logging)
+    return _queue_handler
+
+
+def shutdown_logging(timeout: float = 5.0) -> None:
+    """
+    Drain the log queue and stop the writer thread.
+
+    Records logged afterwards are dropped. Called automatically at exit.
+
+    Args:
+        timeout: Maximum seconds to wait for the queue to drain
+    """
+    global _log_writer
+    if _log_writer is not None:
+        _log_writer.stop(timeout)
+        _log_writer = None
 
 
 def get_logger(name: str, extra: Optional[Dict[str, Any]] = None) -> logging.Logger:
@@ -55,16 +320,8 @@ def get_logger(name: str, extra: Optional[Dict[str, Any]] = None) -> logging.Log
         # Prevent propagation to parent loggers to avoid duplicate messages
         logger.propagate = False
 
-        # Create console handler
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(StructuredLogFormatter())
-        logger.addHandler(console_handler)
-
-        # Create file handler if log file is specified
-        if settings.log_file:
-            file_handler = logging.FileHandler(settings.log_file)
-            file_handler.setFormatter(StructuredLogFormatter())
-            logger.addHandler(file_handler)
+        # Hand records to the background writer instead of writing them here
+        logger.addHandler(_get_queue_handler())
 
     # Create a filter to add extra fields
     if extra:
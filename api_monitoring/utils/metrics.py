@@ -0,0 +1,518 @@
+import asyncio
+import math
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from api_monitoring.utils.logging import get_logger
+
+if TYPE_CHECKING:
+    # Only for annotations, utils does not depend on monitoring at runtime
+    from api_monitoring.monitoring.results import ProbeResult
+
+logger = get_logger(__name__)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Probe latency buckets in seconds
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    15.0,
+    30.0,
+)
+
+# Schedule lateness buckets in seconds
+LATENESS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value in the Prometheus text format."""
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Format a label set, e.g. {target="a",probe="api"}."""
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class CounterChild:
+    """A single counter time series."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increase the counter."""
+        self.value += amount
+
+
+class GaugeChild:
+    """A single gauge time series."""
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        """Set the gauge to a value."""
+        self.value = value
+
+
+class HistogramChild:
+    """A single histogram time series with fixed buckets."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Non-cumulative counts per bucket, the last one is the +Inf bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record an observation."""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricFamily:
+    """
+    A named metric with a fixed set of label names.
+
+    Call labels() once to bind a child for a label set and keep it: updates
+    on a bound child are plain attribute increments with no lookups.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        metric_type: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """
+        Initialize the metric family.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            metric_type: "counter", "gauge" or "histogram"
+            labelnames: Names of the labels
+            buckets: Upper bounds of the histogram buckets
+        """
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str) -> Any:
+        """
+        Return the child for a label set, creating it on first use.
+
+        Args:
+            values: Label values in the order of the label names
+
+        Returns:
+            The child time series
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(
+                    f"{self.name} expects labels {self.labelnames}, got {values}"
+                )
+            if self.metric_type == "histogram":
+                child = HistogramChild(self.buckets)
+            elif self.metric_type == "counter":
+                child = CounterChild()
+            else:
+                child = GaugeChild()
+            self._children[values] = child
+        return child
+
+    def remove(self, *values: str) -> None:
+        """Drop the child for a label set."""
+        self._children.pop(values, None)
+
+    def render(self, lines: List[str]) -> None:
+        """
+        Append the text exposition of this family to lines.
+
+        Args:
+            lines: Output lines
+        """
+        lines.append(f"# HELP {self.name} {self.documentation}")
+        lines.append(f"# TYPE {self.name} {self.metric_type}")
+
+        # Copy first: the event loop may add children while a scrape renders
+        for values, child in list(self._children.items()):
+            if isinstance(child, HistogramChild):
+                counts = list(child.counts)
+                cumulative = 0
+                for bound, count in zip(child.bounds + (math.inf,), counts):
+                    cumulative += count
+                    labels = _format_labels(
+                        self.labelnames + ("le",), values + (_format_value(bound),)
+                    )
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, values)
+                lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+            else:
+                labels = _format_labels(self.labelnames, values)
+                lines.append(f"{self.name}{labels} {_format_value(child.value)}")
+
+
+class MetricsRegistry:
+    """In-process registry of metric families rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        """Register a family, or return the existing one with the same name."""
+        existing = self._families.get(family.name)
+        if existing is not None:
+            return existing
+        self._families[family.name] = family
+        return family
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> MetricFamily:
+        """Create or return a counter family."""
+        return self._register(MetricFamily(name, documentation, "counter", labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> MetricFamily:
+        """Create or return a gauge family."""
+        return self._register(MetricFamily(name, documentation, "gauge", labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> MetricFamily:
+        """Create or return a histogram family."""
+        return self._register(
+            MetricFamily(name, documentation, "histogram", labelnames, buckets)
+        )
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Register a callback that refreshes gauges right before a scrape.
+
+        Args:
+            collector: A cheap, non-blocking callable run on the event loop
+        """
+        self._collectors.append(collector)
+
+    def collect(self) -> None:
+        """Run all collectors."""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+    def render(self) -> str:
+        """
+        Render all families in the Prometheus text format.
+
+        Safe to call from a worker thread while the event loop updates metrics.
+
+        Returns:
+            The text exposition
+        """
+        lines: List[str] = []
+        for family in list(self._families.values()):
+            family.render(lines)
+        lines.append("")
+        return "\n".join(lines)
+
+
+class MetricsServer:
+    """Serves the registry over HTTP on the running event loop."""
+
+    def __init__(
+        self, registry: "MetricsRegistry", host: str = "0.0.0.0", port: int = 9108
+    ):
+        """
+        Initialize the metrics server.
+
+        Args:
+            registry: The registry to expose
+            host: Address to listen on
+            port: Port to listen on (0 picks a free port)
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """Handle a scrape of /metrics."""
+        self.registry.collect()
+        # Render off the event loop so large scrapes never delay a probe
+        body = await asyncio.to_thread(self.registry.render)
+        return web.Response(
+            body=body.encode("utf-8"), headers={"Content-Type": CONTENT_TYPE}
+        )
+
+    async def start(self) -> None:
+        """Start listening."""
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 binds an ephemeral port; report the one actually used
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        """Stop listening."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# Create the process-wide metrics registry
+metrics_registry = MetricsRegistry()
+
+probe_duration_seconds = metrics_registry.histogram(
+    "api_monitor_probe_duration_seconds",
+    "Total probe latency",
+    ["target", "probe"],
+)
+probe_phase_seconds = metrics_registry.histogram(
+    "api_monitor_probe_phase_seconds",
+    "Probe latency per phase (dns, connect, ttfb)",
+    ["target", "probe", "phase"],
+)
+probe_success_total = metrics_registry.counter(
+    "api_monitor_probe_success_total",
+    "Number of successful probes",
+    ["target", "probe"],
+)
+probe_failures_total = metrics_registry.counter(
+    "api_monitor_probe_failures_total",
+    "Number of failed probes by error class",
+    ["target", "probe", "error_class"],
+)
+cycle_duration_seconds = metrics_registry.histogram(
+    "api_monitor_cycle_duration_seconds",
+    "Duration of a monitoring cycle including alerting",
+    ["target"],
+)
+failure_count = metrics_registry.gauge(
+    "api_monitor_failure_count",
+    "Current consecutive failure counter",
+    ["target", "check"],
+)
+alert_active = metrics_registry.gauge(
+    "api_monitor_alert_active",
+    "Whether an alert is currently open for the target (1) or not (0)",
+    ["target"],
+)
+hedged_probes_total = metrics_registry.counter(
+    "api_monitor_hedged_probes_total",
+    "API checks that started a hedge probe, by the probe that succeeded first",
+    ["target", "winner"],
+)
+alert_outbox_pending = metrics_registry.gauge(
+    "api_monitor_alert_outbox_pending",
+    "Notifications waiting in the alert outbox",
+    ["sink", "target"],
+)
+alert_deliveries_total = metrics_registry.counter(
+    "api_monitor_alert_deliveries_total",
+    "Attempts to deliver a notification from the alert outbox, by result",
+    ["sink", "target", "result"],
+)
+alert_state = metrics_registry.gauge(
+    "api_monitor_alert_state",
+    "Alert state of the target: 0 ok, 1 suspect, 2 alerting, 3 recovering",
+    ["target"],
+)
+alert_flapping = metrics_registry.gauge(
+    "api_monitor_alert_flapping",
+    "Whether the target is flapping between failure and success (1) or not (0)",
+    ["target"],
+)
+schedule_lateness_seconds = metrics_registry.histogram(
+    "api_monitor_schedule_lateness_seconds",
+    "Delay between the scheduled and the actual start of a monitoring cycle",
+    ["target"],
+    LATENESS_BUCKETS,
+)
+schedule_overruns_total = metrics_registry.counter(
+    "api_monitor_schedule_overruns_total",
+    "Scheduled cycles that found the previous cycle still running",
+    ["target", "action"],
+)
+
+
+class ProbeMetrics:
+    """Metric series of one probe of one target, bound once up front."""
+
+    __slots__ = (
+        "target",
+        "probe",
+        "duration",
+        "dns",
+        "connect",
+        "ttfb",
+        "success",
+        "_failures",
+    )
+
+    def __init__(self, target: str, probe: str):
+        """
+        Bind the series for a probe.
+
+        Args:
+            target: Target name
+            probe: Probe name ("maintenance" or "api")
+        """
+        self.target = target
+        self.probe = probe
+        self.duration = probe_duration_seconds.labels(target, probe)
+        self.dns = probe_phase_seconds.labels(target, probe, "dns")
+        self.connect = probe_phase_seconds.labels(target, probe, "connect")
+        self.ttfb = probe_phase_seconds.labels(target, probe, "ttfb")
+        self.success = probe_success_total.labels(target, probe)
+        # Failure series are bound lazily, one per error class seen
+        self._failures: Dict[str, CounterChild] = {}
+
+    def record(self, result: "ProbeResult") -> None:
+        """
+        Record the outcome and phase timings of a probe.
+
+        Args:
+            result: The probe result
+        """
+        timings = result.timings
+        if timings.total is not None:
+            self.duration.observe(timings.total)
+        if timings.dns is not None:
+            self.dns.observe(timings.dns)
+        if timings.connect is not None:
+            self.connect.observe(timings.connect)
+        if timings.ttfb is not None:
+            self.ttfb.observe(timings.ttfb)
+
+        if result.success:
+            self.success.inc()
+            return
+        error_class = result.error_class or "Unknown"
+        failures = self._failures.get(error_class)
+        if failures is None:
+            failures = probe_failures_total.labels(self.target, self.probe, error_class)
+            self._failures[error_class] = failures
+        failures.inc()
+
+
+class TargetMetrics:
+    """All metric series of one monitored target."""
+
+    __slots__ = (
+        "maintenance",
+        "api",
+        "cycle_duration",
+        "maintenance_failures",
+        "api_failures",
+        "alert_active",
+        "alert_state",
+        "flapping",
+        "hedges",
+    )
+
+    def __init__(self, target: str):
+        """
+        Bind the series for a target.
+
+        Args:
+            target: Target name
+        """
+        self.maintenance = ProbeMetrics(target, "maintenance")
+        self.api = ProbeMetrics(target, "api")
+        self.cycle_duration = cycle_duration_seconds.labels(target)
+        self.maintenance_failures = failure_count.labels(target, "maintenance")
+        self.api_failures = failure_count.labels(target, "api")
+        self.alert_active = alert_active.labels(target)
+        self.alert_state = alert_state.labels(target)
+        self.flapping = alert_flapping.labels(target)
+        self.hedges = {
+            winner: hedged_probes_total.labels(target, winner)
+            for winner in ("primary", "hedge", "none")
+        }
+
+    def record_cycle(
+        self,
+        duration: float,
+        maintenance_failure_count: int,
+        api_failure_count: int,
+        alert_open: bool,
+        state: int = 0,
+        flapping: bool = False,
+    ) -> None:
+        """
+        Record the duration and resulting state of a monitoring cycle.
+
+        Args:
+            duration: Cycle duration in seconds
+            maintenance_failure_count: Current maintenance failure counter
+            api_failure_count: Current API failure counter
+            alert_open: Whether an alert is open for the target
+            state: The alert state, see api_monitoring.monitoring.alert_state
+            flapping: Whether the target is flapping
+        """
+        self.cycle_duration.observe(duration)
+        self.maintenance_failures.value = maintenance_failure_count
+        self.api_failures.value = api_failure_count
+        self.alert_active.value = 1 if alert_open else 0
+        self.alert_state.value = state
+        self.flapping.value = 1 if flapping else 0
@@ -1,120 +1,228 @@
 import asyncio
 import subprocess
-from typing import Optional, Tuple
+import time
+from typing import Awaitable, Callable, Optional
 
 import aiohttp
 
+from api_monitoring.config import settings
+from api_monitoring.utils.http import http_session_manager
 from api_monitoring.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Value reported when the external IP address cannot be determined
+UNKNOWN_IP = "Unknown IP"
 
-async def get_external_ip() -> str:
+# Sources of the external IP address
+EXTERNAL_IP_SERVICE_URL = "https://httpbin.org/ip"
+EC2_METADATA_URL = "http://169.254.169.254"
+EC2_METADATA_TIMEOUT = 2
+
+
+async def _get_ip_from_service(url: str) -> Optional[str]:
     """
-    Asynchronously retrieve the external IP address of the current machine.
+    Retrieve the external IP address from an httpbin-compatible service.
+
+    Args:
+        url: URL returning JSON with an "origin" field
 
     Returns:
-        The external IP address as a string, or "Unknown IP" if it cannot be determined.
+        The IP address, or None if it cannot be determined.
     """
-    logger.info("Retrieving external IP...")
-
-    # Try using httpbin.org first
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                "https://httpbin.org/ip", timeout=aiohttp.ClientTimeout(total=5)
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    ip: str = data.get("origin", "")
-                    if ip:
-                        logger.info(f"Successfully retrieved external IP: {ip}")
-                        return ip
-                logger.warning(
-                    f"Failed to retrieve IP from httpbin.org: HTTP {response.status}"
-                )
+        session = http_session_manager.get_session()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+            if response.status == 200:
+                data = await response.json()
+                ip: str = data.get("origin", "")
+                if ip:
+                    logger.info(f"Successfully retrieved external IP: {ip}")
+                    return ip
+            logger.warning(f"Failed to retrieve IP from {url}: HTTP {response.status}")
     except asyncio.TimeoutError:
-        logger.warning("Timeout retrieving IP from httpbin.org")
+        logger.warning(f"Timeout retrieving IP from {url}")
     except aiohttp.ClientConnectorError as e:
-        logger.warning(f"Connection error retrieving IP from httpbin.org: {e}")
+        logger.warning(f"Connection error retrieving IP from {url}: {e}")
     except aiohttp.ClientResponseError as e:
         logger.warning(
-            f"Response error retrieving IP from httpbin.org: {e.status} - {e.message}"
+            f"Response error retrieving IP from {url}: {e.status} - {e.message}"
         )
     except aiohttp.ClientError as e:
-        logger.warning(f"HTTP client error retrieving IP from httpbin.org: {e}")
+        logger.warning(f"HTTP client error retrieving IP from {url}: {e}")
     except Exception as e:
         logger.warning(
             f"Unexpected error retrieving IP from external service: {e}", exc_info=True
         )
+    return None
 
-    # Fall back to EC2 metadata
-    logger.info("Falling back to EC2 metadata...")
+
+async def _get_ip_from_ec2_metadata(base_url: str) -> Optional[str]:
+    """
+    Retrieve the public IPv4 address from the EC2 instance metadata service.
+
+    Uses an IMDSv2 session token when the service issues one and falls back to
+    a plain IMDSv1 request otherwise.
+
+    Args:
+        base_url: Base URL of the metadata service
+
+    Returns:
+        The IP address, or None if it cannot be determined.
+    """
+    session = http_session_manager.get_session()
+    timeout = aiohttp.ClientTimeout(total=EC2_METADATA_TIMEOUT)
+    headers = {}
     try:
-        # Use asyncio to run the subprocess command
-        proc = await asyncio.create_subprocess_exec(
-            "curl",
-            "-s",
-            "http://169.254.169.254/latest/meta-data/public-ipv4",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await proc.communicate()
+        async with session.put(
+            f"{base_url}/latest/api/token",
+            headers={"X-aws-ec2-metadata-token-ttl-seconds": "60"},
+            timeout=timeout,
+        ) as response:
+            if response.status == 200:
+                headers["X-aws-ec2-metadata-token"] = await response.text()
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        logger.warning(f"Could not get an EC2 metadata token: {e}")
+        # No metadata service at all, do not wait for a second timeout
+        return None
 
-        if proc.returncode == 0:
-            ip = stdout.decode().strip()
-            if ip:
-                logger.info(f"Successfully retrieved IP from EC2 metadata: {ip}")
-                return ip
-            else:
+    try:
+        async with session.get(
+            f"{base_url}/latest/meta-data/public-ipv4",
+            headers=headers,
+            timeout=timeout,
+        ) as response:
+            if response.status == 200:
+                ip = (await response.text()).strip()
+                if ip:
+                    logger.info(f"Successfully retrieved IP from EC2 metadata: {ip}")
+                    return ip
                 logger.error("No IP returned from EC2 metadata.")
-        else:
-            logger.error(f"Error retrieving IP from EC2 metadata: {stderr.decode()}")
-    except Exception as e:
+            else:
+                logger.error(
+                    f"Error retrieving IP from EC2 metadata: HTTP {response.status}"
+                )
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
         logger.error(f"Exception retrieving IP from EC2 metadata: {e}")
-
-    return "Unknown IP"
+    return None
 
 
-async def run_mtr(target: str) -> Tuple[bool, str]:
+async def get_external_ip(
+    service_url: str = EXTERNAL_IP_SERVICE_URL,
+    metadata_url: str = EC2_METADATA_URL,
+) -> str:
     """
-    Asynchronously execute MTR to get a network trace to the specified target.
+    Asynchronously retrieve the external IP address of the current machine.
+
+    This makes network calls; alerts should read ExternalIPCache.get() instead.
 
     Args:
-        target: The hostname or IP address to trace
+        service_url: URL of the httpbin-compatible IP service
+        metadata_url: Base URL of the EC2 instance metadata service
 
     Returns:
-        A tuple of (success, output) where success is a boolean indicating if the
-        command was successful, and output is the command output or error message.
+        The external IP address as a string, or "Unknown IP" if it cannot be determined.
     """
-    logger.info(f"Running MTR for target: {target}")
+    logger.info("Retrieving external IP...")
 
-    try:
-        # Use asyncio to run the subprocess command
-        proc = await asyncio.create_subprocess_exec(
-            "mtr",
-            "--report",
-            "--report-cycles",
-            "1",
-            "-4",
-            "--no-dns",
-            target,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await proc.communicate()
-
-        if proc.returncode == 0:
-            output = stdout.decode()
-            logger.info("MTR trace successfully retrieved")
-            return True, output
-        else:
-            error = stderr.decode()
-            logger.error(f"MTR error: {error}")
-            return False, f"MTR command failed: {error}"
-    except Exception as e:
-        logger.error(f"General error running MTR: {e}")
-        return False, f"Exception running MTR: {str(e)}"
+    # Try the external IP service first
+    ip = await _get_ip_from_service(service_url)
+    if ip:
+        return ip
+
+    # Fall back to EC2 metadata
+    logger.info("Falling back to EC2 metadata...")
+    ip = await _get_ip_from_ec2_metadata(metadata_url)
+    if ip:
+        return ip
+
+    return UNKNOWN_IP
+
+
+class ExternalIPCache:
+    """
+    Keeps the external IP address resolved in the background.
+
+    The address is resolved when the cache starts and refreshed every ttl
+    seconds, so readers such as alerts get it immediately without touching
+    the network. A failed refresh keeps the last known address.
+    """
+
+    def __init__(
+        self,
+        ttl: int = 3600,
+        retry_interval: int = 60,
+        resolver: Callable[[], Awaitable[str]] = get_external_ip,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds between refreshes of a resolved address
+            retry_interval: Seconds between attempts while the address is unknown
+            resolver: Coroutine function returning the address or "Unknown IP"
+        """
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self.resolver = resolver
+        self.ip: Optional[str] = None
+        self.updated_at: Optional[float] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def get(self) -> str:
+        """
+        Return the cached address without waiting.
+
+        Returns:
+            The last resolved IP address, or "Unknown IP" if none is known yet.
+        """
+        return self.ip or UNKNOWN_IP
+
+    @property
+    def is_stale(self) -> bool:
+        """Whether the cached address is missing or older than the TTL."""
+        return self.updated_at is None or time.monotonic() - self.updated_at >= self.ttl
+
+    async def refresh(self) -> str:
+        """
+        Resolve the address now and update the cache.
+
+        Returns:
+            The cached address after the refresh
+        """
+        ip = await self.resolver()
+        if ip and ip != UNKNOWN_IP:
+            if ip != self.ip:
+                logger.info(f"External IP is now {ip}")
+            self.ip = ip
+            self.updated_at = time.monotonic()
+        return self.get()
+
+    async def _refresh_loop(self) -> None:
+        """Refresh the address until the cache is stopped."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Failed to refresh external IP: {e}")
+            await asyncio.sleep(self.retry_interval if self.is_stale else self.ttl)
+
+    def start(self) -> None:
+        """Start resolving and refreshing the address in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(
+                self._refresh_loop(), name="external-ip-refresh"
+            )
+
+    async def stop(self) -> None:
+        """Stop the background refresh."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
 
 
 async def is_command_available(command: str) -> bool:
@@ -160,3 +268,7 @@ def is_command_available_sync(command: str) -> bool:
         return True
     except subprocess.CalledProcessError:
         return False
+
+
+# Create the process-wide external IP cache
+external_ip_cache = ExternalIPCache(ttl=settings.external_ip_ttl)
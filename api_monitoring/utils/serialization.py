@@ -0,0 +1,47 @@
+"""
+Compact JSON serialization, with orjson when it is installed.
+
+orjson is optional (the "fast" extra); it serializes log entries and state
+snapshots several times faster than the standard library, which is used
+otherwise. Both produce the same compact JSON.
+"""
+
+import importlib
+import json
+from types import ModuleType
+from typing import Any, Callable, Optional, Union
+
+
+def _import_orjson() -> Optional[ModuleType]:
+    """Import orjson if it is installed."""
+    try:
+        return importlib.import_module("orjson")
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+
+
+orjson: Optional[ModuleType] = _import_orjson()
+
+
+def dumps(data: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Serialize data as compact JSON.
+
+    Args:
+        data: The data, made of JSON types
+        default: Converts values that JSON cannot represent, e.g. str
+
+    Returns:
+        The UTF-8 encoded JSON document
+    """
+    if orjson is not None:
+        result: bytes = orjson.dumps(data, default=default)
+        return result
+    return json.dumps(data, default=default, separators=(",", ":")).encode()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse a JSON document."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
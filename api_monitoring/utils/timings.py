@@ -0,0 +1,72 @@
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass(slots=True)
+class PhaseTimings:
+    """
+    Latency breakdown of a single probe, in seconds.
+
+    Phases are durations, not cumulative offsets. A phase is None when it did
+    not happen (e.g. no DNS lookup or connect on a reused connection) or could
+    not be observed by the client library.
+    """
+
+    # DNS resolution of the endpoint hostname
+    dns: Optional[float] = None
+    # Establishing a new connection: TCP connect plus TLS handshake
+    connect: Optional[float] = None
+    # Request sent until the response arrived
+    ttfb: Optional[float] = None
+    # The whole probe, as seen by the caller
+    total: Optional[float] = None
+    # Whether the request went out on a pooled keep-alive connection
+    reused_connection: Optional[bool] = None
+    # Number of HTTP requests sent, including retries and redirects
+    attempts: int = 0
+
+    # Internal marks used while the probe is running
+    _start: float = field(default=0.0, repr=False, compare=False)
+    _mark: float = field(default=0.0, repr=False, compare=False)
+
+    def start(self) -> None:
+        """Mark the start of the probe."""
+        self._start = time.perf_counter()
+
+    def finish(self) -> None:
+        """Mark the end of the probe and record the total duration."""
+        if self._start:
+            self.total = time.perf_counter() - self._start
+
+    def mark(self) -> None:
+        """Remember the current time as the start of an intermediate phase."""
+        self._mark = time.perf_counter()
+
+    def since_mark(self) -> float:
+        """
+        Return the time elapsed since the last mark().
+
+        Returns:
+            Seconds since the last mark
+        """
+        return time.perf_counter() - self._mark
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        """
+        Return the phase durations in milliseconds for logging.
+
+        Returns:
+            A dictionary mapping phase names to milliseconds (or None)
+        """
+        return {
+            "dns_ms": _to_ms(self.dns),
+            "connect_ms": _to_ms(self.connect),
+            "ttfb_ms": _to_ms(self.ttfb),
+            "total_ms": _to_ms(self.total),
+        }
+
+
+def _to_ms(value: Optional[float]) -> Optional[float]:
+    """Convert seconds to milliseconds rounded to microsecond precision."""
+    return None if value is None else round(value * 1000, 3)
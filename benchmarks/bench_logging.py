@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark: throughput and output size of the structured log formatter.
+
+Formats the same mix of records (plain messages, messages with structured
+extras as logged by the probes, and exceptions) with the previous formatter
+implementation and with the current one, using both the stdlib JSON encoder
+and orjson when it is installed. Reports records per second and the average
+size of a formatted record.
+
+Usage:
+    python benchmarks/bench_logging.py [--records 100000] [--json results.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+os.environ.setdefault("LOG_FILE", "")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import api_monitoring.utils.logging as log_module  # noqa: E402
+from api_monitoring.utils.logging import StructuredLogFormatter  # noqa: E402
+
+
+class LegacyStructuredLogFormatter(logging.Formatter):
+    """The formatter as it was before precomputing the standard attributes."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_data = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        if record.exc_info:
+            log_data["exception"] = self.formatException(record.exc_info)
+        for key, value in record.__dict__.items():
+            if key not in log_data and not key.startswith("_") and key != "exc_info":
+                log_data[key] = value
+        return json.dumps(log_data, default=str)
+
+
+def make_records() -> List[logging.LogRecord]:
+    """Build a representative mix of log records."""
+    logger = logging.getLogger("api_monitoring.monitoring.monitor")
+    plain = logger.makeRecord(
+        logger.name,
+        logging.INFO,
+        __file__,
+        10,
+        "Starting monitoring cycle...",
+        None,
+        None,
+    )
+    probe = logger.makeRecord(
+        logger.name,
+        logging.INFO,
+        __file__,
+        20,
+        "api probe finished: success=True",
+        None,
+        None,
+        extra={
+            "target": "eu-west",
+            "probe": "api",
+            "success": True,
+            "error_class": None,
+            "reused_connection": True,
+            "dns_ms": None,
+            "connect_ms": None,
+            "ttfb_ms": 41.532,
+            "total_ms": 43.87,
+        },
+    )
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        error = logger.makeRecord(
+            logger.name,
+            logging.ERROR,
+            __file__,
+            30,
+            "Unexpected error in monitoring cycle",
+            None,
+            sys.exc_info(),
+        )
+    return [plain] * 4 + [probe] * 5 + [error]
+
+
+def measure(
+    formatter: logging.Formatter, records: List[logging.LogRecord], count: int
+) -> Dict[str, Any]:
+    """Format count records and return the throughput and average size."""
+    total_bytes = 0
+    start = time.perf_counter()
+    for i in range(count):
+        record = records[i % len(records)]
+        # Formatters cache exception text on the record; do not let that help
+        record.exc_text = None
+        total_bytes += len(formatter.format(record))
+    elapsed = time.perf_counter() - start
+    return {
+        "records_per_second": round(count / elapsed),
+        "avg_bytes_per_record": round(total_bytes / count, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--json", type=Path, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    records = make_records()
+    results: Dict[str, Any] = {
+        "legacy": measure(LegacyStructuredLogFormatter(), records, args.records)
+    }
+
+    orjson = log_module.orjson
+    log_module.orjson = None
+    results["current_stdlib_json"] = measure(
+        StructuredLogFormatter(), records, args.records
+    )
+    log_module.orjson = orjson
+    if orjson is not None:
+        results["current_orjson"] = measure(
+            StructuredLogFormatter(), records, args.records
+        )
+
+    for name, result in results.items():
+        print(
+            f"{name:>20}: {result['records_per_second']:>9,} records/s, "
+            f"{result['avg_bytes_per_record']:>7} bytes/record"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-to-end performance of the monitor against fake services.
+
+Runs MonitoringEngine with N targets built from the real AWS client,
+maintenance checker and Telegram alerter, pointed at the fake EC2 endpoint,
+maintenance page and Telegram Bot API of tests/fake_services.py. The fakes
+run in a child process, so the benchmark needs no network access and their
+CPU time does not slow down the monitor. For each N it reports:
+
+- startup time until every target created its AWS client and is healthy,
+  and the false alerts raised while the event loop was busy starting up
+- memory retained per target once every target ran its first cycle
+- cycle latency percentiles and probes per second in the steady state
+- time to detect (an endpoint goes down until its monitor opens the alert)
+  and time to alert (until the fake Bot API receives the alert) for a few
+  targets taken down at once
+
+Results can be written as JSON and compared with those of a previous run.
+
+Usage:
+    python benchmarks/bench_monitor.py [--targets 1 10 100 1000] [--duration 5]
+        [--json results.json] [--compare baseline.json --max-regression 0.25]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+os.environ.setdefault("LOG_FILE", "")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api_monitoring.alerting.telegram import TelegramAlerter  # noqa: E402
+from api_monitoring.clients.aws_client import AWSClient  # noqa: E402
+from api_monitoring.monitoring.adaptive import AdaptiveProbePolicy  # noqa: E402
+from api_monitoring.monitoring.engine import MonitoringEngine  # noqa: E402
+from api_monitoring.monitoring.maintenance import MaintenanceChecker  # noqa: E402
+from api_monitoring.monitoring.monitor import ApiMonitor  # noqa: E402
+from api_monitoring.utils.http import http_session_manager  # noqa: E402
+from tests.fake_services import FakeEndpoint, FakeTelegram  # noqa: E402
+
+# Keep logging out of the measurement
+logging.disable(logging.CRITICAL)
+
+# Metrics compared with a baseline run, and whether lower values are better
+COMPARED_METRICS = {
+    "startup_s": True,
+    "memory_kib_per_target": True,
+    "cycle_p50_ms": True,
+    "cycle_p99_ms": True,
+    "probes_per_second": False,
+    "detect_p50_s": True,
+    "detect_max_s": True,
+    "alert_p50_s": True,
+    "alert_max_s": True,
+}
+
+
+def serve_fakes(conn: Connection, latency: float, seed: int) -> None:
+    """Run the fake services in a child process, controlled through a pipe."""
+    logging.disable(logging.CRITICAL)
+
+    async def serve() -> None:
+        endpoint = FakeEndpoint(seed=seed)
+        endpoint.default.latency = latency
+        telegram = FakeTelegram()
+        await endpoint.start()
+        await telegram.start()
+        conn.send((endpoint.url, telegram.url, telegram.token))
+
+        loop = asyncio.get_running_loop()
+        while True:
+            command, *args = await loop.run_in_executor(None, conn.recv)
+            if command == "behavior":
+                names, changes = args
+                for name in names:
+                    endpoint.set_behavior(name, **changes)
+                conn.send(time.monotonic())
+            elif command == "reset":
+                endpoint.behaviors.clear()
+                endpoint.stats.clear()
+                telegram.messages.clear()
+                conn.send(None)
+            elif command == "requests":
+                conn.send(
+                    sum(s.api_calls + s.page_views for s in endpoint.stats.values())
+                )
+            elif command == "alerts":
+                (since,) = args
+                conn.send(
+                    [
+                        (message.chat_id, message.received)
+                        for message in telegram.messages
+                        if message.method == "sendMessage" and message.received >= since
+                    ]
+                )
+            else:
+                break
+        await telegram.close()
+        await endpoint.close()
+        conn.send(None)
+
+    asyncio.run(serve())
+
+
+class FakeServices:
+    """Client side of the fake services running in a child process."""
+
+    def __init__(self, latency: float, seed: int = 1):
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=serve_fakes, args=(child_conn, latency, seed), daemon=True
+        )
+        self.endpoint_url = self.telegram_url = self.telegram_token = ""
+
+    async def _call(self, *command: Any) -> Any:
+        self.conn.send(command)
+        return await asyncio.to_thread(self.conn.recv)
+
+    async def start(self) -> None:
+        self.process.start()
+        self.endpoint_url, self.telegram_url, self.telegram_token = (
+            await asyncio.to_thread(self.conn.recv)
+        )
+
+    async def set_behavior(self, names: Sequence[str], **changes: Any) -> float:
+        """Change the behavior of targets, returning when it took effect."""
+        return await self._call("behavior", list(names), changes)
+
+    async def reset(self) -> None:
+        await self._call("reset")
+
+    async def requests(self) -> int:
+        """Return the API calls and page views answered so far."""
+        return await self._call("requests")
+
+    async def alerts(self, since: float) -> List[Tuple[str, float]]:
+        """Return the chat and receive time of the alerts sent since a time."""
+        return await self._call("alerts", since)
+
+    async def stop(self) -> None:
+        await self._call("stop")
+        await asyncio.to_thread(self.process.join, 5)
+
+
+class BenchMonitor(ApiMonitor):
+    """Monitor that records its cycles and when it opened an alert."""
+
+    def __init__(self, *args: Any, cycle_durations: List[float], **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.cycle_durations = cycle_durations
+        self.cycles = 0
+        self.alert_opened_at: Optional[float] = None
+
+    async def run_cycle(self) -> Optional[float]:
+        start = time.perf_counter()
+        try:
+            return await super().run_cycle()
+        finally:
+            self.cycles += 1
+            self.cycle_durations.append(time.perf_counter() - start)
+
+    async def handle_api_failure(self, *args: Any, **kwargs: Any) -> None:
+        if self.alert_opened_at is None:
+            self.alert_opened_at = time.monotonic()
+        await super().handle_api_failure(*args, **kwargs)
+
+
+def build_engine(
+    fakes: FakeServices,
+    names: Sequence[str],
+    args: argparse.Namespace,
+    cycle_durations: List[float],
+) -> MonitoringEngine:
+    """Build an engine whose targets all point at the fake services."""
+    monitors: List[ApiMonitor] = []
+    for name in names:
+        endpoint_url = f"{fakes.endpoint_url}/{name}"
+        monitors.append(
+            BenchMonitor(
+                check_interval=args.interval,
+                api_timeout=5,
+                target_hostname="127.0.0.1",
+                name=name,
+                maintenance_checker=MaintenanceChecker(endpoint_url, timeout=5),
+                aws_client=AWSClient(
+                    endpoint_url,
+                    "AKIDBENCHMARK",
+                    "benchmark-secret",
+                    "us-east-1",
+                    max_retries=args.api_retries,
+                ),
+                alerter=TelegramAlerter(
+                    fakes.telegram_token,
+                    # One chat per target tells the alerts apart
+                    name,
+                    timeout=5,
+                    api_base_url=fakes.telegram_url,
+                ),
+                api_failure_threshold=args.threshold,
+                diagnostics_deadline=1.0,
+                probe_policy=AdaptiveProbePolicy(
+                    args.interval,
+                    retry_delay=args.retry_delay,
+                    retry_max_delay=args.interval,
+                ),
+                cycle_durations=cycle_durations,
+            )
+        )
+    return MonitoringEngine(monitors)
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Return the nearest-rank percentile of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(q * len(ordered))) - 1]
+
+
+def rounded(value: Optional[float], scale: float = 1.0, digits: int = 3) -> Any:
+    return None if value is None else round(value * scale, digits)
+
+
+async def measure_memory(
+    fakes: FakeServices, names: Sequence[str], args: argparse.Namespace
+) -> Tuple[float, float]:
+    """
+    Measure the memory of an engine once every target ran its first cycle.
+
+    Tracing allocations slows creating the AWS clients down severalfold, so
+    memory is measured on an engine of its own, not the one that is timed.
+
+    Returns:
+        The memory retained per target and the peak memory, in KiB
+    """
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    engine = build_engine(fakes, names, args, [])
+    monitors = [m for m in engine.monitors if isinstance(m, BenchMonitor)]
+    run_task = asyncio.create_task(engine.run())
+    while any(monitor.cycles == 0 for monitor in monitors):
+        await asyncio.sleep(0.05)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await engine.close()
+    await run_task
+    return (retained - baseline) / 1024 / len(names), (peak - baseline) / 1024
+
+
+async def run_case(
+    fakes: FakeServices, count: int, args: argparse.Namespace
+) -> Dict[str, Any]:
+    """Measure one engine size."""
+    await fakes.reset()
+    names = [f"target-{i}" for i in range(count)]
+    memory_per_target, peak_memory = await measure_memory(fakes, names, args)
+
+    # Startup until every target is checked and healthy
+    await fakes.reset()
+    cycle_durations: List[float] = []
+    startup_start = time.perf_counter()
+    engine = build_engine(fakes, names, args, cycle_durations)
+    monitors = [m for m in engine.monitors if isinstance(m, BenchMonitor)]
+    run_task = asyncio.create_task(engine.run())
+    while not all(
+        monitor.cycles and not monitor.alert_open and not monitor.api_failure_count
+        for monitor in monitors
+    ):
+        if time.perf_counter() - startup_start > args.startup_timeout:
+            raise RuntimeError(f"{count} targets not healthy after startup timeout")
+        await asyncio.sleep(0.05)
+    startup_seconds = time.perf_counter() - startup_start
+    startup_alerts = sum(m.alert_opened_at is not None for m in monitors)
+    await asyncio.sleep(args.warmup)
+
+    # Steady state
+    cycle_durations.clear()
+    requests_start = await fakes.requests()
+    steady_start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    steady_seconds = time.perf_counter() - steady_start
+    requests = await fakes.requests() - requests_start
+    steady_cycles = list(cycle_durations)
+    jobs = engine.scheduler.jobs.values()
+    max_lateness = max((job.max_lateness for job in jobs), default=0.0)
+
+    # Outage of a few targets at once
+    down = monitors[: min(count, args.outages)]
+    for monitor in down:
+        monitor.alert_opened_at = None
+    outage_start = await fakes.set_behavior([m.name for m in down], down=True)
+    alerts: Dict[str, float] = {}
+    deadline = time.monotonic() + args.detect_timeout
+    while len(alerts) < len(down) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        for chat_id, received in await fakes.alerts(outage_start):
+            alerts.setdefault(chat_id, received)
+    detect = [
+        monitor.alert_opened_at - outage_start
+        for monitor in down
+        if monitor.alert_opened_at is not None
+    ]
+    alert = [alerts[m.name] - outage_start for m in down if m.name in alerts]
+
+    await engine.close()
+    await run_task
+
+    return {
+        "targets": count,
+        "startup_s": round(startup_seconds, 3),
+        "startup_alerts": startup_alerts,
+        "memory_kib_per_target": round(memory_per_target, 2),
+        "peak_kib": round(peak_memory, 1),
+        "cycles": len(steady_cycles),
+        "probes_per_second": round(requests / steady_seconds, 1),
+        "cycle_p50_ms": rounded(percentile(steady_cycles, 0.5), 1e3, 2),
+        "cycle_p90_ms": rounded(percentile(steady_cycles, 0.9), 1e3, 2),
+        "cycle_p99_ms": rounded(percentile(steady_cycles, 0.99), 1e3, 2),
+        "cycle_max_ms": rounded(max(steady_cycles, default=None), 1e3, 2),
+        "max_lateness_ms": round(1e3 * max_lateness, 2),
+        "outages": len(down),
+        "detected": len(detect),
+        "alerted": len(alert),
+        "detect_p50_s": rounded(percentile(detect, 0.5)),
+        "detect_max_s": rounded(max(detect, default=None)),
+        "alert_p50_s": rounded(percentile(alert, 0.5)),
+        "alert_max_s": rounded(max(alert, default=None)),
+    }
+
+
+def compare(
+    results: List[Dict[str, Any]], baseline_path: Path, max_regression: float
+) -> bool:
+    """
+    Print the change of every metric against a previous run.
+
+    Returns:
+        Whether no metric regressed by more than max_regression
+    """
+    baseline = {
+        result["targets"]: result
+        for result in json.loads(baseline_path.read_text())["results"]
+    }
+    ok = True
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get(result["targets"])
+        if previous is None:
+            continue
+        changes = []
+        for metric, lower_is_better in COMPARED_METRICS.items():
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regression = change if lower_is_better else -change
+            flag = ""
+            if regression > max_regression:
+                ok = False
+                flag = " REGRESSION"
+            changes.append(f"{metric} {change:+.0%}{flag}")
+        print(f"{result['targets']:>8} targets: " + ", ".join(changes))
+    return ok
+
+
+def raise_open_file_limit() -> None:
+    """Every target keeps connections open: allow as many files as possible."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--targets",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100, 1000],
+        help="Target counts to benchmark",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="Seconds of steady state"
+    )
+    parser.add_argument(
+        "--startup-timeout",
+        type=float,
+        default=900.0,
+        help="Seconds to wait for all targets to be healthy",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        default=2.0,
+        help="Seconds between startup and the steady state",
+    )
+    parser.add_argument(
+        "--interval", type=int, default=1, help="Check interval of every target"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.005, help="Latency of the fake endpoint"
+    )
+    parser.add_argument(
+        "--threshold", type=int, default=2, help="API failures that open an alert"
+    )
+    parser.add_argument(
+        "--retry-delay", type=float, default=0.5, help="Delay of confirming checks"
+    )
+    parser.add_argument(
+        "--api-retries", type=int, default=0, help="Retries of the AWS client"
+    )
+    parser.add_argument(
+        "--outages", type=int, default=10, help="Targets taken down to time alerts"
+    )
+    parser.add_argument(
+        "--detect-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds to wait for the outages to be alerted",
+    )
+    parser.add_argument("--json", type=Path, help="Write results to this JSON file")
+    parser.add_argument(
+        "--compare", type=Path, help="Compare with the results of a previous run"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.25,
+        help="Relative regression that fails the comparison",
+    )
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    # All fake targets share one host, real ones do not
+    http_session_manager.limit_per_host = http_session_manager.limit
+
+    fakes = FakeServices(args.latency)
+    await fakes.start()
+    results: List[Dict[str, Any]] = []
+    print(
+        f"{'targets':>8} {'startup s':>10} {'KiB/target':>11} {'probes/s':>9} "
+        f"{'cycle p50':>10} {'cycle p99':>10} {'detect p50':>11} {'alert p50':>10} "
+        f"{'alerted':>8}"
+    )
+    try:
+        for count in args.targets:
+            result = await run_case(fakes, count, args)
+            results.append(result)
+            print(
+                f"{result['targets']:>8} {result['startup_s']:>10} "
+                f"{result['memory_kib_per_target']:>11} "
+                f"{result['probes_per_second']:>9} {result['cycle_p50_ms']!s:>10} "
+                f"{result['cycle_p99_ms']!s:>10} {result['detect_p50_s']!s:>11} "
+                f"{result['alert_p50_s']!s:>10} "
+                f"{result['alerted']:>4}/{result['outages']:<3}"
+            )
+    finally:
+        await http_session_manager.close()
+        await fakes.stop()
+
+    if args.json:
+        args.json.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "args": {
+                        key: str(value) if isinstance(value, Path) else value
+                        for key, value in vars(args).items()
+                    },
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+    if args.compare and not compare(results, args.compare, args.max_regression):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark: resource usage of the monitoring engine versus number of targets.
+
+Runs MonitoringEngine with N targets whose checker, client and alerter are
+in-process fakes with a small simulated latency, so only the engine's own
+overhead is measured. For each N it reports the memory retained per target,
+the CPU time spent per monitoring cycle and the worst schedule lateness.
+
+Usage:
+    python benchmarks/bench_targets.py [--targets 1 10 100 1000] [--duration 5]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List
+
+os.environ.setdefault("LOG_FILE", "")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api_monitoring.monitoring.engine import MonitoringEngine  # noqa: E402
+from api_monitoring.monitoring.monitor import ApiMonitor  # noqa: E402
+from api_monitoring.monitoring.results import ProbeResult  # noqa: E402
+
+# Keep logging out of the measurement
+logging.disable(logging.CRITICAL)
+
+
+class FakeMaintenanceChecker:
+    """Maintenance checker that answers "not on maintenance" after a delay."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def is_on_maintenance(self) -> ProbeResult:
+        await asyncio.sleep(self.latency)
+        return ProbeResult(success=True)
+
+
+class FakeAWSClient:
+    """AWS client that answers successfully after a delay."""
+
+    def __init__(self, endpoint_url: str, latency: float):
+        self.endpoint_url = endpoint_url
+        self.latency = latency
+        self.calls = 0
+
+    async def check_api_availability(self) -> ProbeResult:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return ProbeResult(success=True)
+
+
+class FakeAlerter:
+    """Alerter that never sends anything."""
+
+
+def build_engine(count: int, interval: int) -> MonitoringEngine:
+    """Build an engine with `count` fake targets."""
+    monitors = []
+    for i in range(count):
+        name = f"target-{i}.example.com"
+        monitors.append(
+            ApiMonitor(
+                check_interval=interval,
+                api_timeout=5,
+                target_hostname=name,
+                name=name,
+                maintenance_checker=FakeMaintenanceChecker(  # type: ignore[arg-type]
+                    random.uniform(0.001, 0.01)
+                ),
+                aws_client=FakeAWSClient(  # type: ignore[arg-type]
+                    f"https://{name}", random.uniform(0.005, 0.02)
+                ),
+                alerter=FakeAlerter(),  # type: ignore[arg-type]
+            )
+        )
+    return MonitoringEngine(monitors)
+
+
+async def run_case(count: int, duration: float, interval: int) -> Dict[str, Any]:
+    """Measure one engine size."""
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+
+    engine = build_engine(count, interval)
+    setup_memory, _ = tracemalloc.get_traced_memory()
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    run_task = asyncio.create_task(engine.run())
+    await asyncio.sleep(duration)
+    running_memory, peak_memory = tracemalloc.get_traced_memory()
+    await engine.stop()
+    await run_task
+    cpu_used = time.process_time() - cpu_start
+    wall_used = time.perf_counter() - wall_start
+    tracemalloc.stop()
+
+    cycles = sum(
+        m.aws_client.calls for m in engine.monitors  # type: ignore[attr-defined]
+    )
+    jobs = engine.scheduler.jobs.values()
+    max_lateness = max((job.max_lateness for job in jobs), default=0.0)
+    return {
+        "targets": count,
+        "cycles": cycles,
+        "wall_seconds": round(wall_used, 3),
+        "cpu_seconds": round(cpu_used, 3),
+        "cpu_percent": round(100 * cpu_used / wall_used, 2),
+        "cpu_us_per_cycle": round(1e6 * cpu_used / max(cycles, 1), 1),
+        "setup_kib_per_target": round((setup_memory - baseline) / 1024 / count, 2),
+        "running_kib_per_target": round((running_memory - baseline) / 1024 / count, 2),
+        "peak_kib": round((peak_memory - baseline) / 1024, 1),
+        "max_lateness_ms": round(1e3 * max_lateness, 2),
+        "skipped": sum(job.skipped for job in jobs),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--targets",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100, 1000],
+        help="Target counts to benchmark",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=5.0, help="Seconds to run each case"
+    )
+    parser.add_argument(
+        "--interval", type=int, default=1, help="Check interval of every target"
+    )
+    parser.add_argument("--json", type=Path, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    print(
+        f"{'targets':>8} {'cycles':>8} {'cpu %':>7} {'cpu us/cycle':>13} "
+        f"{'KiB/target':>11} {'peak KiB':>10} {'late ms':>8}"
+    )
+    for count in args.targets:
+        result = await run_case(count, args.duration, args.interval)
+        results.append(result)
+        print(
+            f"{result['targets']:>8} {result['cycles']:>8} "
+            f"{result['cpu_percent']:>7} {result['cpu_us_per_cycle']:>13} "
+            f"{result['running_kib_per_target']:>11} {result['peak_kib']:>10} "
+            f"{result['max_lateness_ms']:>8}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
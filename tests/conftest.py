@@ -0,0 +1,25 @@
+import pytest
+
+
+class FakeClock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fake_clock(request: pytest.FixtureRequest) -> FakeClock:
+    """
+    Provide a clock that only moves when a test advances it.
+
+    unittest test cases cannot take fixture arguments, so the clock is also set
+    as their clock attribute before setUp runs.
+    """
+    clock = FakeClock()
+    if request.instance is not None:
+        request.instance.clock = clock
+    return clock
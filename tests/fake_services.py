@@ -0,0 +1,340 @@
+"""
+In-process fakes of the services the monitor talks to.
+
+FakeEndpoint serves an AWS-compatible endpoint: POST requests are answered
+as the EC2 query API (DescribeAvailabilityZones) and GET requests with its
+maintenance page. FakeTelegram serves the Telegram Bot API methods the
+alerter uses and records every message. Both run on a local aiohttp server,
+so tests and benchmarks drive the real AWS client, maintenance checker and
+alerter without any network access.
+
+Every target gets its own path on the endpoint, e.g. http://127.0.0.1:PORT/api-1,
+whose latency, errors, throttling and maintenance state are set with
+FakeEndpoint.set_behavior().
+"""
+
+import asyncio
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+EC2_NAMESPACE = "http://ec2.amazonaws.com/doc/2016-11-15/"
+
+AVAILABILITY_ZONES = ("a", "b", "c")
+
+
+@dataclass
+class EndpointBehavior:
+    """How a fake endpoint answers the requests of one target."""
+
+    # Seconds before answering, plus a uniform random jitter
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Fraction of API calls answered with 500 InternalError
+    error_rate: float = 0.0
+    # Fraction of API calls answered with 503 RequestLimitExceeded
+    throttle_rate: float = 0.0
+    # Answer every API call with 500 InternalError
+    down: bool = False
+    # Serve the maintenance page on GET
+    maintenance: bool = False
+
+
+@dataclass
+class EndpointStats:
+    """Requests answered by a fake endpoint."""
+
+    api_calls: int = 0
+    errors: int = 0
+    throttled: int = 0
+    page_views: int = 0
+
+
+class FakeServer:
+    """A fake service running on a local aiohttp server."""
+
+    def __init__(self) -> None:
+        self.app = web.Application()
+        self.server: Optional[TestServer] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server, without a trailing slash."""
+        assert self.server is not None, "server not started"
+        return str(self.server.make_url("")).rstrip("/")
+
+    async def start(self) -> None:
+        """Start serving on a free local port."""
+        self.server = TestServer(self.app, host="127.0.0.1")
+        await self.server.start_server()
+
+    async def close(self) -> None:
+        """Stop the server."""
+        if self.server is not None:
+            await self.server.close()
+            self.server = None
+
+    async def __aenter__(self) -> "FakeServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+
+class FakeEndpoint(FakeServer):
+    """
+    Fake AWS-compatible endpoint with a maintenance page.
+
+    The first path segment of a request selects the target whose behavior
+    applies; targets without one get the default behavior.
+    """
+
+    def __init__(
+        self,
+        default: Optional[EndpointBehavior] = None,
+        region: str = "us-east-1",
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the endpoint.
+
+        Args:
+            default: Behavior of targets without their own
+            region: Region of the availability zones returned
+            seed: Seed of the random errors, throttling and jitter
+        """
+        super().__init__()
+        self.default = default or EndpointBehavior()
+        self.region = region
+        self.behaviors: Dict[str, EndpointBehavior] = {}
+        self.stats: Dict[str, EndpointStats] = {}
+        self.random = random.Random(seed)
+        self.app.router.add_post("/{target:.*}", self.handle_api)
+        self.app.router.add_get("/{target:.*}", self.handle_page)
+
+    def url_for(self, target: str) -> str:
+        """Return the endpoint URL of a target."""
+        return f"{self.url}/{target}"
+
+    def set_behavior(self, target: str, **changes: Any) -> EndpointBehavior:
+        """
+        Change how the requests of a target are answered.
+
+        Args:
+            target: The target, i.e. the first path segment of its URL
+            **changes: EndpointBehavior fields to change
+
+        Returns:
+            The behavior of the target
+        """
+        behavior = self.behaviors.get(target)
+        if behavior is None:
+            behavior = self.behaviors[target] = EndpointBehavior(**vars(self.default))
+        for name, value in changes.items():
+            if not hasattr(behavior, name):
+                raise AttributeError(f"Unknown endpoint behavior {name!r}")
+            setattr(behavior, name, value)
+        return behavior
+
+    def stats_for(self, target: str) -> EndpointStats:
+        """Return the request counters of a target."""
+        return self.stats.setdefault(target, EndpointStats())
+
+    @property
+    def api_calls(self) -> int:
+        """API calls answered for all targets."""
+        return sum(stats.api_calls for stats in self.stats.values())
+
+    def _target(self, request: web.Request) -> str:
+        return request.match_info["target"].split("/", 1)[0]
+
+    async def _delay(self, behavior: EndpointBehavior) -> None:
+        delay = behavior.latency + self.random.uniform(0.0, behavior.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _error(self, status: int, code: str, message: str) -> web.Response:
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f"<Response><Errors><Error><Code>{code}</Code>"
+            f"<Message>{message}</Message></Error></Errors>"
+            f"<RequestID>{uuid.uuid4()}</RequestID></Response>"
+        )
+        return web.Response(status=status, text=body, content_type="text/xml")
+
+    async def handle_api(self, request: web.Request) -> web.Response:
+        """Answer an EC2 query API call."""
+        target = self._target(request)
+        behavior = self.behaviors.get(target, self.default)
+        stats = self.stats_for(target)
+        stats.api_calls += 1
+        form = await request.post()
+        await self._delay(behavior)
+
+        action = form.get("Action")
+        if action != "DescribeAvailabilityZones":
+            return self._error(
+                400, "InvalidAction", f"The action {action} is not valid"
+            )
+        draw = self.random.random()
+        if behavior.down or draw < behavior.error_rate:
+            stats.errors += 1
+            return self._error(500, "InternalError", "An internal error has occurred")
+        if draw < behavior.error_rate + behavior.throttle_rate:
+            stats.throttled += 1
+            return self._error(503, "RequestLimitExceeded", "Request limit exceeded.")
+
+        zones = "".join(
+            f"<item><zoneName>{self.region}{zone}</zoneName>"
+            "<zoneState>available</zoneState>"
+            f"<regionName>{self.region}</regionName>"
+            f"<zoneId>use1-az{i}</zoneId><messageSet/></item>"
+            for i, zone in enumerate(AVAILABILITY_ZONES, 1)
+        )
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<DescribeAvailabilityZonesResponse xmlns="{EC2_NAMESPACE}">'
+            f"<requestId>{uuid.uuid4()}</requestId>"
+            f"<availabilityZoneInfo>{zones}</availabilityZoneInfo>"
+            "</DescribeAvailabilityZonesResponse>"
+        )
+        return web.Response(text=body, content_type="text/xml")
+
+    async def handle_page(self, request: web.Request) -> web.Response:
+        """Serve the landing page, or the maintenance page of a target."""
+        target = self._target(request)
+        behavior = self.behaviors.get(target, self.default)
+        self.stats_for(target).page_views += 1
+        await self._delay(behavior)
+        if behavior.maintenance:
+            return web.Response(
+                status=503,
+                text="<html><body><h1>OnMaintenance</h1></body></html>",
+                content_type="text/html",
+            )
+        return web.Response(
+            text="<html><body><h1>Cloud API</h1></body></html>",
+            content_type="text/html",
+        )
+
+
+@dataclass
+class TelegramMessage:
+    """A message received by the fake Telegram Bot API."""
+
+    # time.monotonic() when the message was received, comparable across processes
+    received: float
+    method: str
+    chat_id: str
+    text: str
+    message_id: int
+    reply_to_message_id: Optional[int] = None
+
+
+class FakeTelegram(FakeServer):
+    """
+    Fake Telegram Bot API answering sendMessage and editMessageText.
+
+    With a rate limit, requests beyond rate_limit per second are answered
+    with HTTP 429 and a retry_after, like Telegram's flood control.
+    """
+
+    def __init__(
+        self,
+        token: str = "123456:TEST",
+        latency: float = 0.0,
+        rate_limit: Optional[float] = None,
+    ):
+        """
+        Initialize the Bot API.
+
+        Args:
+            token: Bot token accepted in the URL
+            latency: Seconds before answering
+            rate_limit: Requests answered per second, the rest get HTTP 429
+        """
+        super().__init__()
+        self.token = token
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.messages: List[TelegramMessage] = []
+        self.rate_limited = 0
+        self._recent: Deque[float] = deque()
+        self._next_id = 1
+        self.app.router.add_post(f"/bot{token}/{{method}}", self.handle)
+
+    def messages_for(self, chat_id: str) -> List[TelegramMessage]:
+        """Return the messages sent to a chat."""
+        return [message for message in self.messages if message.chat_id == chat_id]
+
+    def _limited(self, now: float) -> Optional[float]:
+        """Return the seconds to wait if the request exceeds the rate limit."""
+        if self.rate_limit is None:
+            return None
+        while self._recent and now - self._recent[0] >= 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.rate_limit:
+            return 1.0 - (now - self._recent[0])
+        self._recent.append(now)
+        return None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Answer a Bot API call."""
+        method = request.match_info["method"]
+        form = await request.post()
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+        retry_after = self._limited(time.monotonic())
+        if retry_after is not None:
+            self.rate_limited += 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": "Too Many Requests",
+                    "parameters": {"retry_after": max(1, round(retry_after))},
+                },
+                status=429,
+            )
+        if method not in ("sendMessage", "editMessageText"):
+            return web.json_response(
+                {"ok": False, "error_code": 404, "description": "Not Found"},
+                status=404,
+            )
+
+        chat_id = str(form.get("chat_id", ""))
+        if method == "sendMessage":
+            message_id = self._next_id
+            self._next_id += 1
+        else:
+            message_id = int(str(form.get("message_id", "0")))
+        reply_to = form.get("reply_to_message_id")
+        self.messages.append(
+            TelegramMessage(
+                time.monotonic(),
+                method,
+                chat_id,
+                str(form.get("text", "")),
+                message_id,
+                int(str(reply_to)) if reply_to else None,
+            )
+        )
+        return web.json_response(
+            {
+                "ok": True,
+                "result": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id},
+                    "text": str(form.get("text", "")),
+                },
+            }
+        )
@@ -0,0 +1,60 @@
+import unittest
+
+import pytest
+
+from api_monitoring.monitoring.adaptive import AdaptiveProbePolicy
+
+
+@pytest.mark.usefixtures("fake_clock")
+class TestAdaptiveProbePolicy(unittest.TestCase):
+    """Test the probe delays chosen for each target state."""
+
+    def setUp(self):
+        self.policy = AdaptiveProbePolicy(
+            check_interval=60,
+            retry_delay=1.0,
+            retry_max_delay=8.0,
+            recovery_interval=10.0,
+            recovery_window=120.0,
+            maintenance_interval=300.0,
+            clock=self.clock,
+        )
+
+    def test_regular_schedule(self):
+        """Test that a healthy target stays on its schedule."""
+        self.assertIsNone(self.policy.next_delay())
+
+    def test_confirmation_backoff_is_bounded(self):
+        """Test that confirmation delays double up to the maximum."""
+        delays = [self.policy.next_delay(failures=n) for n in range(1, 7)]
+        self.assertEqual(delays, [1.0, 2.0, 4.0, 8.0, 8.0, 8.0])
+        self.assertEqual(self.policy.next_delay(failures=10_000), 8.0)
+
+    def test_backoff_never_exceeds_check_interval(self):
+        """Test that confirming a failure is never slower than the schedule."""
+        policy = AdaptiveProbePolicy(check_interval=5, retry_max_delay=30.0)
+        self.assertEqual(policy.next_delay(failures=4), 5)
+
+    def test_maintenance_interval(self):
+        """Test that maintenance slows probing down."""
+        self.assertEqual(self.policy.next_delay(on_maintenance=True), 300.0)
+        policy = AdaptiveProbePolicy(check_interval=60)
+        self.assertIsNone(policy.next_delay(on_maintenance=True))
+
+    def test_recovery_window(self):
+        """Test that probing is faster for a while after a recovery."""
+        self.assertEqual(self.policy.next_delay(recovered=True), 10.0)
+        self.clock.now += 100
+        self.assertEqual(self.policy.next_delay(), 10.0)
+        self.clock.now += 30
+        self.assertIsNone(self.policy.next_delay())
+
+    def test_failure_during_recovery_window(self):
+        """Test that a new failure is confirmed with the backoff, not the window."""
+        self.policy.next_delay(recovered=True)
+        self.assertEqual(self.policy.next_delay(failures=1), 1.0)
+        self.assertTrue(self.policy.recovering)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import time
+import unittest
+
+import pytest
+
+from api_monitoring.monitoring.alert_state import (
+    ALERTING,
+    API_FAILURE,
+    MAINTENANCE,
+    MAINTENANCE_FAILURE,
+    NO_ACTION,
+    OK,
+    OPEN_ALERT,
+    RECOVERING,
+    RESOLVE_ALERT,
+    SUCCESS,
+    SUSPECT,
+    AlertState,
+)
+
+
+@pytest.mark.usefixtures("fake_clock")
+class TestAlertState(unittest.TestCase):
+    """Test the per-target alert state machine."""
+
+    def test_transitions(self):
+        """Test OK -> SUSPECT -> ALERTING -> RECOVERING -> OK."""
+        state = AlertState(api_threshold=2)
+        self.assertEqual(state.observe(API_FAILURE), NO_ACTION)
+        self.assertEqual(state.state, SUSPECT)
+        self.assertEqual(state.observe(API_FAILURE), OPEN_ALERT)
+        self.assertEqual(state.state, ALERTING)
+        self.assertEqual(state.cause, "api")
+        self.assertTrue(state.alerting)
+
+        # Further failures do not open another alert
+        self.assertEqual(state.observe(API_FAILURE), NO_ACTION)
+        self.assertEqual(state.observe(SUCCESS), RESOLVE_ALERT)
+        self.assertEqual(state.state, OK)
+        self.assertFalse(state.alerting)
+
+    def test_suspect_clears_on_success(self):
+        """Test that a single failure below the threshold leaves no trace."""
+        state = AlertState(api_threshold=3)
+        state.observe(API_FAILURE)
+        state.observe(API_FAILURE)
+        self.assertEqual(state.observe(SUCCESS), NO_ACTION)
+        self.assertEqual(state.state, OK)
+        self.assertEqual(state.observe(API_FAILURE), NO_ACTION)
+        self.assertEqual(state.state, SUSPECT)
+
+    def test_failure_modes_counted_separately(self):
+        """Test that each check type counts against its own threshold."""
+        state = AlertState(maintenance_threshold=3, api_threshold=2)
+        state.observe(MAINTENANCE_FAILURE)
+        state.observe(MAINTENANCE_FAILURE)
+        self.assertEqual(state.observe(API_FAILURE), NO_ACTION)
+        self.assertEqual(state.maintenance_failures, 2)
+        self.assertEqual(state.api_failures, 1)
+        self.assertEqual(state.observe(MAINTENANCE_FAILURE), OPEN_ALERT)
+        self.assertEqual(state.cause, "maintenance")
+
+    def test_maintenance_is_neutral(self):
+        """Test that maintenance resets counters but keeps open alerts."""
+        state = AlertState(api_threshold=2)
+        state.observe(API_FAILURE)
+        self.assertEqual(state.observe(MAINTENANCE), NO_ACTION)
+        self.assertEqual(state.state, OK)
+        self.assertEqual(state.observe(API_FAILURE), NO_ACTION)
+
+        state.observe(API_FAILURE)
+        self.assertTrue(state.alerting)
+        self.assertEqual(state.observe(MAINTENANCE), NO_ACTION)
+        self.assertEqual(state.state, ALERTING)
+
+    def test_recover_threshold(self):
+        """Test that resolving waits for consecutive successes."""
+        state = AlertState(recover_threshold=3)
+        state.observe(API_FAILURE)
+        self.assertEqual(state.observe(SUCCESS), NO_ACTION)
+        self.assertEqual(state.state, RECOVERING)
+        self.assertEqual(state.pending_resolution(), "1/3 successful checks")
+        self.assertEqual(state.observe(SUCCESS), NO_ACTION)
+
+        # A failure while recovering goes back to ALERTING without a new alert
+        self.assertEqual(state.observe(API_FAILURE), NO_ACTION)
+        self.assertEqual(state.state, ALERTING)
+        for _ in range(2):
+            self.assertEqual(state.observe(SUCCESS), NO_ACTION)
+        self.assertEqual(state.observe(SUCCESS), RESOLVE_ALERT)
+
+    def test_min_hold(self):
+        """Test that an alert stays open for the minimum hold time."""
+        state = AlertState(min_hold=300, clock=self.clock)
+        state.observe(API_FAILURE)
+        self.clock.now += 60
+        self.assertEqual(state.observe(SUCCESS), NO_ACTION)
+        self.assertIn("hold", state.pending_resolution())
+        self.clock.now += 240
+        self.assertEqual(state.observe(SUCCESS), RESOLVE_ALERT)
+
+    def test_open_is_idempotent(self):
+        """Test opening an alert directly, e.g. after a crash of the cycle."""
+        state = AlertState()
+        self.assertTrue(state.open("system", now=0))
+        self.assertFalse(state.open("system", now=0))
+        self.assertEqual(state.observe(SUCCESS, now=0), RESOLVE_ALERT)
+        state.recover_threshold = 2
+
+        state.observe(API_FAILURE)
+        state.observe(SUCCESS)
+        self.assertEqual(state.state, RECOVERING)
+        self.assertFalse(state.open("system"))
+        self.assertEqual(state.state, ALERTING)
+
+    def test_flapping_holds_alert(self):
+        """Test that a flapping target gets one alert that stays open."""
+        state = AlertState(flap_window=10, flap_threshold=0.5)
+        # Flapping is only known once a full window of checks was seen
+        for i in range(10):
+            state.observe(API_FAILURE if i % 2 == 0 else SUCCESS)
+        self.assertTrue(state.flapping)
+        self.assertTrue(state.alerting)
+
+        actions = []
+        for i in range(30):
+            actions.append(state.observe(API_FAILURE if i % 2 == 0 else SUCCESS))
+        self.assertEqual(actions.count(OPEN_ALERT), 0)
+        self.assertEqual(actions.count(RESOLVE_ALERT), 0)
+        self.assertTrue(state.alerting)
+        self.assertEqual(state.pending_resolution(), "the target to stop flapping")
+
+        # Stable again: flapping ends below half the threshold and it resolves
+        resolved = [state.observe(SUCCESS) for _ in range(10)]
+        self.assertFalse(state.flapping)
+        self.assertIn(RESOLVE_ALERT, resolved)
+        self.assertEqual(state.state, OK)
+
+    def test_short_outage_is_not_flapping(self):
+        """Test that an outage starting and ending is not taken for flapping."""
+        state = AlertState(flap_window=10)
+        state.observe(API_FAILURE)
+        state.observe(API_FAILURE)
+        self.assertEqual(state.observe(SUCCESS), RESOLVE_ALERT)
+        self.assertFalse(state.flapping)
+
+    def test_many_targets(self):
+        """Test that evaluating 10k targets per tick stays cheap."""
+        states = [AlertState(api_threshold=2, flap_window=20) for _ in range(10000)]
+        outcomes = (SUCCESS, API_FAILURE, API_FAILURE, SUCCESS)
+        start = time.perf_counter()
+        for outcome in outcomes:
+            for state in states:
+                state.observe(outcome, 0.0)
+        elapsed = time.perf_counter() - start
+        self.assertTrue(
+            all(state.state == RECOVERING or state.state == OK for state in states)
+        )
+        # Generous bound, well above the few microseconds per call expected
+        self.assertLess(elapsed, 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+from botocore.exceptions import EndpointConnectionError
+
+from api_monitoring.clients.aws_client import AWSClient, shared_session
+
+
+class FakeEvents:
+    """Minimal stand-in for the botocore event emitter."""
+
+    def __init__(self) -> None:
+        self.handlers: Dict[str, Callable[..., Any]] = {}
+
+    def register(self, event_name: str, handler: Callable[..., Any]) -> None:
+        self.handlers[event_name] = handler
+
+    def emit(self, event_name: str) -> None:
+        self.handlers[event_name]()
+
+
+class FakeEC2Client:
+    """EC2 client answering describe_availability_zones() from a script."""
+
+    def __init__(self, errors: List[Optional[Exception]]):
+        self.errors = errors
+        self.calls = 0
+        self.delay = 0.0
+        self.meta = SimpleNamespace(events=FakeEvents())
+
+    async def describe_availability_zones(self) -> dict:
+        self.calls += 1
+        self.meta.events.emit("before-send.ec2")
+        await asyncio.sleep(self.delay)
+        error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        self.meta.events.emit("before-parse.ec2")
+        return {"AvailabilityZones": []}
+
+
+class FakeClientContext:
+    """Async context manager standing in for aiobotocore's ClientCreatorContext."""
+
+    def __init__(self, client: FakeEC2Client):
+        self.client = client
+        self.closed = False
+
+    async def __aenter__(self) -> FakeEC2Client:
+        return self.client
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.closed = True
+
+
+class TestAWSClient(unittest.IsolatedAsyncioTestCase):
+    """Test the lifecycle of the persistent EC2 client."""
+
+    def make_client(self, cold_probe_interval: int = 0) -> AWSClient:
+        client = AWSClient(
+            endpoint_url="https://api.example.com",
+            aws_access_key_id="key",
+            aws_secret_access_key="secret",
+            region_name="us-east-1",
+            cold_probe_interval=cold_probe_interval,
+        )
+        self.errors: List[Optional[Exception]] = []
+        self.contexts: List[FakeClientContext] = []
+
+        def create_context() -> FakeClientContext:
+            context = FakeClientContext(FakeEC2Client(self.errors))
+            self.contexts.append(context)
+            return context
+
+        client._create_client_context = create_context  # type: ignore[method-assign]
+        return client
+
+    async def test_client_is_reused(self):
+        """Test that consecutive checks share one client."""
+        client = self.make_client()
+        for _ in range(3):
+            result = await client.check_api_availability()
+            self.assertTrue(result.success)
+            self.assertIsNotNone(result.timings.total)
+            self.assertIsNotNone(result.timings.ttfb)
+            self.assertEqual(result.timings.attempts, 1)
+        self.assertEqual(len(self.contexts), 1)
+        self.assertEqual(self.contexts[0].client.calls, 3)
+
+    async def test_rebuild_after_connection_error(self):
+        """Test that a connection error discards the pooled client."""
+        client = self.make_client()
+        self.errors.append(EndpointConnectionError(endpoint_url="https://x"))
+        result = await client.check_api_availability()
+        self.assertFalse(result.success)
+        self.assertIn("Cannot connect", result.error_message)
+        self.assertEqual(result.error_class, "EndpointConnectionError")
+        self.assertTrue(self.contexts[0].closed)
+
+        self.assertTrue((await client.check_api_availability()).success)
+        self.assertEqual(len(self.contexts), 2)
+
+    async def test_rebuild_after_credential_change(self):
+        """Test that new credentials produce a new client."""
+        client = self.make_client()
+        await client.check_api_availability()
+        client.update_credentials("key", "secret")
+        await client.check_api_availability()
+        self.assertEqual(len(self.contexts), 1)
+
+        client.update_credentials("new-key", "new-secret")
+        await client.check_api_availability()
+        self.assertEqual(len(self.contexts), 2)
+        self.assertTrue(self.contexts[0].closed)
+
+    async def test_cancellation_keeps_client(self):
+        """Test that a cancelled check, e.g. a hedge that lost, keeps the client."""
+        client = self.make_client()
+        await client.check_api_availability()
+        self.contexts[0].client.delay = 10
+        task = asyncio.create_task(client.check_api_availability())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.contexts[0].client.delay = 0
+        self.assertTrue((await client.check_api_availability()).success)
+        self.assertEqual(len(self.contexts), 1)
+        self.assertFalse(self.contexts[0].closed)
+
+    async def test_cold_probe_interval(self):
+        """Test that every Nth check runs on a throwaway client."""
+        client = self.make_client(cold_probe_interval=2)
+        await client.check_api_availability()
+        self.assertFalse(client.last_probe_cold)
+        await client.check_api_availability()
+        self.assertTrue(client.last_probe_cold)
+        await client.check_api_availability()
+
+        # One persistent client plus one closed cold client
+        self.assertEqual(len(self.contexts), 2)
+        self.assertFalse(self.contexts[0].closed)
+        self.assertTrue(self.contexts[1].closed)
+        self.assertEqual(self.contexts[0].client.calls, 2)
+
+    async def test_fresh_check_leaves_persistent_client_alone(self):
+        """Test that a fresh check neither uses nor resets the persistent client."""
+        client = self.make_client()
+        await client.check_api_availability()
+        self.errors.append(EndpointConnectionError(endpoint_url="https://x"))
+        result = await client.check_api_availability(fresh=True)
+        self.assertFalse(result.success)
+
+        self.assertEqual(len(self.contexts), 2)
+        self.assertFalse(self.contexts[0].closed)
+        self.assertTrue(self.contexts[1].closed)
+        self.assertTrue((await client.check_api_availability()).success)
+        self.assertEqual(self.contexts[0].client.calls, 2)
+
+    async def test_close(self):
+        """Test that close() releases the persistent client."""
+        client = self.make_client()
+        await client.check_api_availability()
+        await client.close()
+        self.assertTrue(self.contexts[0].closed)
+        await client.close()
+
+    def test_clients_share_one_session(self):
+        """Test that clients for different targets reuse one botocore session."""
+        first = self.make_client()
+        second = AWSClient(
+            endpoint_url="https://other.example.com",
+            aws_access_key_id="other-key",
+            aws_secret_access_key="other-secret",
+            region_name="eu-west-1",
+        )
+        self.assertIs(first.session, second.session)
+        self.assertIs(first.session, shared_session())
+
+
+if __name__ == "__main__":
+    unittest.main()
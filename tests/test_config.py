@@ -1,8 +1,10 @@
+import json
 import os
+import tempfile
 import unittest
 from unittest.mock import patch
 
-from api_monitoring.config import Settings
+from api_monitoring.config import Settings, TargetConfig
 
 
 class TestSettings(unittest.TestCase):
@@ -124,6 +126,96 @@ class TestSettings(unittest.TestCase):
         settings = Settings()
         self.assertEqual(settings.endpoint_url, "https://test-api.example.com")
 
+    @patch.dict(
+        os.environ,
+        {
+            "ENDPOINT_URL": "default-api.example.com",
+            "AWS_ACCESS_KEY_ID": "test-access-key",
+            "AWS_SECRET_ACCESS_KEY": "test-secret-key",
+            "TELEGRAM_BOT_TOKEN": "test-bot-token",
+            "TELEGRAM_CHAT_ID": "test-chat-id",
+            "CHECK_INTERVAL": "30",
+        },
+    )
+    def test_load_targets_without_file(self):
+        """Test that a single target is built from the global settings."""
+        targets = Settings().load_targets()
+        self.assertEqual(len(targets), 1)
+        self.assertEqual(targets[0].name, "default-api.example.com")
+        self.assertEqual(targets[0].endpoint_url, "https://default-api.example.com")
+        self.assertEqual(targets[0].check_interval, 30)
+
+    def test_load_targets_from_file(self):
+        """Test that targets override the global settings per field."""
+        targets_data = {
+            "targets": [
+                {"endpoint_url": "eu.example.com", "check_interval": 10},
+                {
+                    "name": "us",
+                    "endpoint_url": "https://us.example.com",
+                    "aws_access_key_id": "us-key",
+                    "api_failure_threshold": 3,
+                },
+            ]
+        }
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "targets.json")
+            with open(path, "w") as f:
+                json.dump(targets_data, f)
+
+            env = {
+                "AWS_ACCESS_KEY_ID": "default-key",
+                "AWS_SECRET_ACCESS_KEY": "default-secret",
+                "TELEGRAM_BOT_TOKEN": "test-bot-token",
+                "TELEGRAM_CHAT_ID": "test-chat-id",
+                "TARGETS_FILE": path,
+            }
+            with patch.dict(os.environ, env, clear=True):
+                settings = Settings(_env_file=None)
+                targets = settings.load_targets()
+
+        self.assertEqual([t.name for t in targets], ["eu.example.com", "us"])
+        self.assertEqual(targets[0].check_interval, 10)
+        self.assertEqual(targets[0].aws_access_key_id, "default-key")
+        self.assertEqual(targets[1].aws_access_key_id, "us-key")
+        self.assertEqual(targets[1].aws_secret_access_key, "default-secret")
+        self.assertEqual(targets[1].api_failure_threshold, 3)
+        self.assertEqual(targets[1].check_interval, 60)
+
+    def test_load_targets_duplicate_names(self):
+        """Test that duplicate target names are rejected."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "targets.json")
+            with open(path, "w") as f:
+                json.dump([{"endpoint_url": "a.example.com"}] * 2, f)
+
+            settings = Settings.model_construct(
+                endpoint_url="",
+                aws_access_key_id="key",
+                aws_secret_access_key="secret",
+                aws_default_region="us-east-1",
+                check_interval=60,
+                api_timeout=15,
+                maintenance_check_timeout=10,
+                maintenance_failure_threshold=1,
+                api_failure_threshold=1,
+                alert_comment=None,
+                targets_file=path,
+            )
+            with self.assertRaises(ValueError):
+                settings.load_targets()
+
+    def test_target_config_defaults(self):
+        """Test that a target derives its name and hostname from the URL."""
+        target = TargetConfig(
+            endpoint_url="api.example.com/path",
+            aws_access_key_id="key",
+            aws_secret_access_key="secret",
+        )
+        self.assertEqual(target.endpoint_url, "https://api.example.com/path")
+        self.assertEqual(target.name, "api.example.com")
+        self.assertEqual(target.hostname, "api.example.com")
+
 
 if __name__ == "__main__":
     unittest.main()
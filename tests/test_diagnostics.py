@@ -0,0 +1,100 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api_monitoring.monitoring.diagnostics import run_diagnostics
+from api_monitoring.monitoring.mtr import MtrHop, MtrTrace
+from api_monitoring.utils.http import http_session_manager
+
+
+def make_trace(target: str, *hosts: str, avg: float = 1.0) -> MtrTrace:
+    hops = [
+        MtrHop(i, host, 0.0, 1, avg, avg, avg, avg, 0.0)
+        for i, host in enumerate(hosts, 1)
+    ]
+    return MtrTrace(target, hops, "monitor", 1_700_000_000.0)
+
+
+async def slow_run_mtr(target: str, cycles: int = 1) -> MtrTrace:
+    await asyncio.sleep(30)
+    return make_trace(target)
+
+
+async def fast_run_mtr(target: str, cycles: int = 1) -> MtrTrace:
+    return make_trace(target, "10.0.0.1", "10.0.0.9")
+
+
+class TestRunDiagnostics(unittest.IsolatedAsyncioTestCase):
+    """Test deadline-bounded diagnostics against a local HTTP server."""
+
+    async def asyncSetUp(self):
+        """Start a local endpoint."""
+
+        async def root(request: web.Request) -> web.Response:
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_route("*", "/", root)
+        self.server = TestServer(app, host="127.0.0.1")
+        await self.server.start_server()
+        self.endpoint_url = str(self.server.make_url("/"))
+
+    async def asyncTearDown(self):
+        """Stop the server and close the shared session."""
+        await http_session_manager.close()
+        await self.server.close()
+
+    async def test_all_steps_finish(self):
+        """Test that every step reports a result when nothing is slow."""
+        with patch("api_monitoring.monitoring.diagnostics.run_mtr", fast_run_mtr):
+            report = await run_diagnostics(self.endpoint_url, "api.example.com", 5)
+
+        self.assertEqual(report.timed_out, [])
+        self.assertIn("10.0.0.9", report.results["mtr"].output)
+        self.assertEqual(report.trace.target, "api.example.com")
+        self.assertIn("127.0.0.1", report.results["dns"].output)
+        self.assertTrue(report.results["tcp_connect"].success)
+        self.assertEqual(report.results["http_head"].output, "HTTP 200 OK")
+        # Plain HTTP endpoints have no TLS handshake to time
+        self.assertNotIn("tls_handshake", report.results)
+        self.assertIn("http_head: ok", report.summary())
+
+    async def test_deadline_cancels_slow_steps(self):
+        """Test that slow steps are cancelled and the rest are reported."""
+        start = time.perf_counter()
+        with patch("api_monitoring.monitoring.diagnostics.run_mtr", slow_run_mtr):
+            report = await run_diagnostics(self.endpoint_url, deadline=0.5)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 2)
+        self.assertEqual(report.timed_out, ["mtr"])
+        self.assertNotIn("mtr", report.results)
+        self.assertTrue(report.results["http_head"].success)
+
+    async def test_trace_compared_with_baseline(self):
+        """Test that path changes against the baseline are summarized."""
+        baseline = make_trace("api.example.com", "10.0.0.1", "10.0.0.4")
+        with patch("api_monitoring.monitoring.diagnostics.run_mtr", fast_run_mtr):
+            report = await run_diagnostics(
+                self.endpoint_url, "api.example.com", 5, baseline=baseline
+            )
+        self.assertEqual([change.kind for change in report.path_changes], ["route"])
+        self.assertIn("path changes since baseline", report.summary())
+        self.assertIn("hop 2: 10.0.0.9 replaces 10.0.0.4", report.summary())
+
+    async def test_failed_step(self):
+        """Test that a refused connection is reported as a failed step."""
+        port = self.server.port
+        await self.server.close()
+        with patch("api_monitoring.monitoring.diagnostics.run_mtr", fast_run_mtr):
+            report = await run_diagnostics(f"http://127.0.0.1:{port}/", deadline=5)
+        self.assertFalse(report.results["tcp_connect"].success)
+        self.assertIn("tcp_connect: failed", report.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+import asyncio
+import time
+import unittest
+from typing import Any, Dict, List
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api_monitoring.alerting.dispatcher import (
+    MESSAGE_LIMIT,
+    TelegramDispatcher,
+    TokenBucket,
+    split_lines,
+)
+from api_monitoring.alerting.telegram import TelegramAlerter
+from api_monitoring.utils.http import http_session_manager
+from api_monitoring.utils.network import ExternalIPCache
+
+
+@pytest.mark.usefixtures("fake_clock")
+class TestTokenBucket(unittest.TestCase):
+    """Test the message rate limiter."""
+
+    def test_burst_then_rate(self):
+        """Test that a full bucket allows a burst, then refills at the rate."""
+        bucket = TokenBucket(rate=2.0, burst=2, clock=self.clock)
+        for _ in range(2):
+            self.assertEqual(bucket.delay(), 0)
+            bucket.tokens -= 1
+        self.assertAlmostEqual(bucket.delay(), 0.5)
+        self.clock.now += 0.5
+        self.assertEqual(bucket.delay(), 0)
+
+    def test_pause(self):
+        """Test that retry_after blocks the bucket until it has passed."""
+        bucket = TokenBucket(rate=1.0, burst=3, clock=self.clock)
+        bucket.pause(5)
+        self.assertAlmostEqual(bucket.delay(), 6.0)
+        self.clock.now += 6
+        self.assertEqual(bucket.delay(), 0)
+
+
+class TestSplitLines(unittest.TestCase):
+    """Test splitting digests over several messages."""
+
+    def test_split_keeps_lines_whole(self):
+        """Test that every message fits and carries the header."""
+        lines = [f"line {i} " + "x" * 100 for i in range(100)]
+        messages = split_lines("header", lines)
+        self.assertGreater(len(messages), 1)
+        for message in messages:
+            self.assertLessEqual(len(message), MESSAGE_LIMIT)
+            self.assertTrue(message.startswith("header\n"))
+        joined = "\n".join(message[len("header\n") :] for message in messages)
+        self.assertEqual(joined.splitlines(), lines)
+
+
+class TestTelegramDispatcher(unittest.IsolatedAsyncioTestCase):
+    """Test the dispatcher against a local stand-in Bot API."""
+
+    async def asyncSetUp(self):
+        """Start a fake Bot API that can answer with HTTP 429."""
+        self.calls: List[Dict[str, Any]] = []
+        self.call_times: List[float] = []
+        self.rate_limited_calls = 0
+        self.next_message_id = 100
+
+        async def send_message(request: web.Request) -> web.Response:
+            data = dict(await request.post())
+            self.call_times.append(time.monotonic())
+            if self.rate_limited_calls > 0:
+                self.rate_limited_calls -= 1
+                return web.json_response(
+                    {
+                        "ok": False,
+                        "error_code": 429,
+                        "parameters": {"retry_after": 0.1},
+                    },
+                    status=429,
+                )
+            self.calls.append({"method": "sendMessage", **data})
+            self.next_message_id += 1
+            return web.json_response(
+                {"ok": True, "result": {"message_id": self.next_message_id}}
+            )
+
+        async def edit_message_text(request: web.Request) -> web.Response:
+            data = dict(await request.post())
+            self.calls.append({"method": "editMessageText", **data})
+            return web.json_response({"ok": True, "result": {"message_id": 1}})
+
+        app = web.Application()
+        app.router.add_post("/bottoken/sendMessage", send_message)
+        app.router.add_post("/bottoken/editMessageText", edit_message_text)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        self.ip_cache = ExternalIPCache()
+        self.ip_cache.ip = "203.0.113.7"
+
+    async def asyncTearDown(self):
+        """Stop the server and close the shared session."""
+        await http_session_manager.close()
+        await self.server.close()
+
+    def make_alerter(self, dispatcher: TelegramDispatcher) -> TelegramAlerter:
+        return TelegramAlerter(
+            "token",
+            "42",
+            timeout=5,
+            ip_cache=self.ip_cache,
+            api_base_url=str(self.server.make_url("/")),
+            dispatcher=dispatcher,
+        )
+
+    async def test_retry_after_rate_limit(self):
+        """Test that a 429 response is retried after retry_after."""
+        dispatcher = TelegramDispatcher(rate=100, burst=5, digest_window=0)
+        alerter = self.make_alerter(dispatcher)
+        self.rate_limited_calls = 1
+        try:
+            self.assertTrue(await alerter.send_message("hello"))
+        finally:
+            await dispatcher.stop()
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(dispatcher.rate_limited, 1)
+        self.assertGreaterEqual(self.call_times[1] - self.call_times[0], 0.1)
+
+    async def test_rate_limit_spaces_messages(self):
+        """Test that messages beyond the burst are sent at the configured rate."""
+        dispatcher = TelegramDispatcher(rate=20, burst=1, digest_window=0)
+        alerter = self.make_alerter(dispatcher)
+        try:
+            results = await asyncio.gather(
+                *(alerter.send_message(f"message {i}") for i in range(4))
+            )
+        finally:
+            await dispatcher.stop()
+
+        self.assertEqual(results, [True] * 4)
+        self.assertGreaterEqual(self.call_times[-1] - self.call_times[0], 0.14)
+
+    async def test_alerts_are_merged_into_digest(self):
+        """Test that alerts of several targets fired together share one message."""
+        dispatcher = TelegramDispatcher(rate=100, burst=5, digest_window=0.1)
+        alerters = [self.make_alerter(dispatcher) for _ in range(3)]
+        try:
+            results = await asyncio.gather(
+                *(
+                    alerter.send_initial_alert(f"api-{i}", "boom")
+                    for i, alerter in enumerate(alerters)
+                )
+            )
+            self.assertEqual(results, [True] * 3)
+            self.assertEqual(len(self.calls), 1)
+            self.assertIn("3 APIs", self.calls[0]["text"])
+            for i, alerter in enumerate(alerters):
+                self.assertIn(f"api-{i}", self.calls[0]["text"])
+                self.assertTrue(alerter.alert_in_digest)
+                self.assertEqual(alerter.alert_message_id, 101)
+
+            # Diagnostics of a digest member are threaded, not edited in
+            self.assertTrue(await alerters[0].enrich_alert("api-0", "hop1", "boom"))
+        finally:
+            await dispatcher.stop()
+
+        self.assertEqual(self.calls[1]["method"], "sendMessage")
+        self.assertEqual(self.calls[1]["reply_to_message_id"], "101")
+
+    async def test_single_alert_is_not_a_digest(self):
+        """Test that a lone alert goes out as is and can be edited."""
+        dispatcher = TelegramDispatcher(rate=100, burst=5, digest_window=0.05)
+        alerter = self.make_alerter(dispatcher)
+        try:
+            self.assertTrue(await alerter.send_initial_alert("api", "boom"))
+            self.assertFalse(alerter.alert_in_digest)
+            self.assertTrue(await alerter.enrich_alert("api", "hop1", "boom"))
+        finally:
+            await dispatcher.stop()
+
+        self.assertIn("Issue detected with API api", self.calls[0]["text"])
+        self.assertEqual(self.calls[1]["method"], "editMessageText")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+
+from api_monitoring.alerting.telegram import TelegramAlerter
+from api_monitoring.clients.aws_client import AWSClient
+from api_monitoring.monitoring.maintenance import MaintenanceChecker
+from api_monitoring.monitoring.monitor import ApiMonitor
+from api_monitoring.utils.http import http_session_manager
+from tests.fake_services import EndpointBehavior, FakeEndpoint, FakeTelegram
+
+
+class TestFakeServices(unittest.IsolatedAsyncioTestCase):
+    """Test a monitor built from real components against the fake services."""
+
+    async def asyncSetUp(self):
+        self.endpoint = FakeEndpoint(seed=1)
+        self.telegram = FakeTelegram()
+        await self.endpoint.start()
+        await self.telegram.start()
+        self.client = AWSClient(
+            self.endpoint.url_for("api"), "AKID", "SECRET", "us-east-1", max_retries=0
+        )
+        self.monitor = ApiMonitor(
+            check_interval=60,
+            api_timeout=5,
+            target_hostname="127.0.0.1",
+            name="api",
+            maintenance_checker=MaintenanceChecker(
+                self.endpoint.url_for("api"), status_codes=[503]
+            ),
+            aws_client=self.client,
+            alerter=TelegramAlerter(
+                self.telegram.token, "chat-api", api_base_url=self.telegram.url
+            ),
+            api_failure_threshold=2,
+            diagnostics_deadline=0.5,
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await http_session_manager.close()
+        await self.telegram.close()
+        await self.endpoint.close()
+
+    async def test_healthy_endpoint(self):
+        """Test that a healthy endpoint is checked without alerts."""
+        await self.monitor.run_cycle()
+        stats = self.endpoint.stats_for("api")
+        self.assertEqual((stats.api_calls, stats.page_views), (1, 1))
+        self.assertFalse(self.monitor.alert_open)
+        self.assertEqual(self.telegram.messages, [])
+
+    async def test_outage_is_alerted_and_resolved(self):
+        """Test that an outage reaches Telegram and its recovery replies to it."""
+        self.endpoint.set_behavior("api", down=True)
+        await self.monitor.run_cycle()
+        self.assertEqual(self.telegram.messages, [])
+        await self.monitor.run_cycle()
+        self.assertTrue(self.monitor.alert_open)
+        alert, *edits = self.telegram.messages_for("chat-api")
+        self.assertEqual(alert.method, "sendMessage")
+        self.assertIn("InternalError", alert.text)
+
+        self.endpoint.set_behavior("api", down=False)
+        await self.monitor.run_cycle()
+        self.assertFalse(self.monitor.alert_open)
+        resolution = self.telegram.messages[-1]
+        self.assertEqual(resolution.reply_to_message_id, alert.message_id)
+
+    async def test_maintenance_page_suppresses_checks(self):
+        """Test that the maintenance page is recognized."""
+        self.endpoint.set_behavior("api", maintenance=True, down=True)
+        for _ in range(3):
+            await self.monitor.run_cycle()
+        self.assertEqual(self.endpoint.stats_for("api").api_calls, 0)
+        self.assertFalse(self.monitor.alert_open)
+
+    async def test_throttling_and_errors(self):
+        """Test that throttled and failed calls surface as API failures."""
+        self.endpoint.set_behavior("api", throttle_rate=1.0)
+        result = await self.client.check_api_availability()
+        self.assertEqual(result.error_class, "RequestLimitExceeded")
+
+        self.endpoint.set_behavior("api", throttle_rate=0.0, error_rate=0.5)
+        results = [await self.client.check_api_availability() for _ in range(40)]
+        stats = self.endpoint.stats_for("api")
+        self.assertEqual(sum(not r.success for r in results), stats.errors)
+        self.assertTrue(0 < stats.errors < 40)
+
+    async def test_default_behavior_and_latency(self):
+        """Test that targets without a behavior get the default one."""
+        self.endpoint.default = EndpointBehavior(latency=0.05)
+        result = await self.client.check_api_availability()
+        self.assertTrue(result.success)
+        self.assertGreaterEqual(result.timings.total, 0.05)
+
+    async def test_telegram_rate_limit(self):
+        """Test that the fake Bot API answers a flood with retry_after."""
+        self.telegram.rate_limit = 2
+        alerter = TelegramAlerter(
+            self.telegram.token, "chat-flood", api_base_url=self.telegram.url
+        )
+        responses = [
+            await alerter.request_api("sendMessage", {"chat_id": "x", "text": "hi"})
+            for _ in range(3)
+        ]
+        self.assertEqual([r.retry_after for r in responses], [None, None, 1.0])
+        self.assertEqual(self.telegram.rate_limited, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
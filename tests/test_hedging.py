@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+
+from api_monitoring.monitoring.hedging import LatencyHistory, run_hedged
+from api_monitoring.monitoring.results import ProbeResult
+
+
+class ScriptedProbe:
+    """Probe answering with a fixed result after a delay."""
+
+    def __init__(self, delay: float, success: bool = True):
+        self.delay = delay
+        self.success = success
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self) -> ProbeResult:
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return ProbeResult(self.success, None if self.success else "boom")
+
+
+class TestLatencyHistory(unittest.TestCase):
+    """Test the bounded latency window."""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles over the window."""
+        history = LatencyHistory(size=100)
+        self.assertIsNone(history.percentile(0.95))
+        for i in range(1, 101):
+            history.add(i / 100)
+        self.assertEqual(history.percentile(0.95), 0.95)
+        self.assertEqual(history.percentile(0.5), 0.5)
+
+    def test_window_is_bounded(self):
+        """Test that old latencies fall out of the window."""
+        history = LatencyHistory(size=10)
+        for value in [5.0] * 10 + [0.1] * 10:
+            history.add(value)
+        self.assertEqual(len(history), 10)
+        self.assertEqual(history.percentile(1.0), 0.1)
+
+
+class TestRunHedged(unittest.IsolatedAsyncioTestCase):
+    """Test hedging a slow probe with a second one."""
+
+    async def test_fast_primary_needs_no_hedge(self):
+        """Test that no hedge starts when the primary answers in time."""
+        primary, hedge = ScriptedProbe(0.01), ScriptedProbe(0.01)
+        result, winner = await run_hedged(primary, hedge, 0.1)
+        self.assertTrue(result.success)
+        self.assertEqual(winner, "")
+        self.assertEqual(hedge.started, 0)
+
+    async def test_hedge_wins_over_slow_primary(self):
+        """Test that the hedge answers first and the primary is cancelled."""
+        primary, hedge = ScriptedProbe(1.0), ScriptedProbe(0.01)
+        result, winner = await run_hedged(primary, hedge, 0.02)
+        self.assertTrue(result.success)
+        self.assertEqual(winner, "hedge")
+        self.assertEqual(primary.cancelled, 1)
+
+    async def test_failed_hedge_waits_for_primary(self):
+        """Test that a failing hedge does not beat a slower successful primary."""
+        primary, hedge = ScriptedProbe(0.05), ScriptedProbe(0.0, success=False)
+        result, winner = await run_hedged(primary, hedge, 0.02)
+        self.assertTrue(result.success)
+        self.assertEqual(winner, "primary")
+
+    async def test_both_fail(self):
+        """Test that the primary failure is returned when both probes fail."""
+        primary = ScriptedProbe(0.05, success=False)
+        hedge = ScriptedProbe(0.0, success=False)
+        result, winner = await run_hedged(primary, hedge, 0.02)
+        self.assertFalse(result.success)
+        self.assertEqual(winner, "none")
+
+    async def test_cancel_cancels_both(self):
+        """Test that an outer timeout cancels the primary and the hedge."""
+        primary, hedge = ScriptedProbe(1.0), ScriptedProbe(1.0)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(run_hedged(primary, hedge, 0.01), 0.05)
+        self.assertEqual((primary.cancelled, hedge.cancelled), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api_monitoring.utils.http import HttpSessionManager
+
+
+async def ok_handler(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+class TestHttpSessionManager(unittest.IsolatedAsyncioTestCase):
+    """Test the shared HTTP session and its connection counters."""
+
+    async def asyncSetUp(self):
+        """Start a local HTTP server."""
+        app = web.Application()
+        app.router.add_get("/", ok_handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.manager = HttpSessionManager(limit_per_host=1)
+
+    async def asyncTearDown(self):
+        """Close the session and stop the server."""
+        await self.manager.close()
+        await self.server.close()
+
+    async def test_session_is_shared(self):
+        """Test that the same session is returned until it is closed."""
+        session = self.manager.get_session()
+        self.assertIs(self.manager.get_session(), session)
+        await self.manager.close()
+        self.assertTrue(session.closed)
+        self.assertIsNot(self.manager.get_session(), session)
+
+    async def test_connections_are_reused(self):
+        """Test that keep-alive connections are reused and counted."""
+        url = str(self.server.make_url("/"))
+        for _ in range(5):
+            async with self.manager.get_session().get(url) as response:
+                self.assertEqual(await response.text(), "ok")
+
+        stats = self.manager.stats()
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["reused_connections"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
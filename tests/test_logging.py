@@ -0,0 +1,232 @@
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import time
+import unittest
+
+from api_monitoring.utils.log_rotation import RotatingLogFileHandler
+from api_monitoring.utils.logging import (
+    LogWriter,
+    QueueLogHandler,
+    StructuredLogFormatter,
+)
+
+
+class CountingStream(io.StringIO):
+    """StringIO that counts write calls."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s: str) -> int:
+        self.writes += 1
+        return super().write(s)
+
+
+def make_logger(name: str, handler: logging.Handler) -> logging.Logger:
+    """Create an isolated logger writing to a handler."""
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+class TestStructuredLogFormatter(unittest.TestCase):
+    """Test the JSON log formatter."""
+
+    def test_only_extras_are_added(self):
+        """Test that standard attributes are left out and extras kept."""
+        logger = logging.getLogger("test.formatter")
+        record = logger.makeRecord(
+            logger.name,
+            logging.INFO,
+            "/src/monitor.py",
+            42,
+            "probe %s finished",
+            ("api",),
+            None,
+            extra={"target": "eu-west", "total_ms": 12.5},
+        )
+        data = json.loads(StructuredLogFormatter().format(record))
+
+        self.assertEqual(data["message"], "probe api finished")
+        self.assertEqual(data["level"], "INFO")
+        self.assertEqual(data["line"], 42)
+        self.assertEqual(data["target"], "eu-west")
+        self.assertEqual(data["total_ms"], 12.5)
+        for attr in ("args", "msg", "pathname", "process", "thread", "created"):
+            self.assertNotIn(attr, data)
+
+    def test_timestamp_from_record(self):
+        """Test that the timestamp is the record creation time in UTC."""
+        record = logging.LogRecord("t", logging.INFO, "", 0, "m", None, None)
+        record.created = 1719403200.25
+        data = json.loads(StructuredLogFormatter().format(record))
+        self.assertEqual(data["timestamp"], "2024-06-26T12:00:00.250000")
+
+    def test_exception_and_unserializable_extras(self):
+        """Test that exceptions are formatted and odd extras do not fail."""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord(
+                "t", logging.ERROR, "", 0, "failed", None, sys.exc_info()
+            )
+        record.payload = object()
+        data = json.loads(StructuredLogFormatter().format(record))
+        self.assertIn("ValueError: boom", data["exception"])
+        self.assertIn("object", data["payload"])
+
+
+class TestLogPipeline(unittest.TestCase):
+    """Test the queue-based logging pipeline."""
+
+    def make_pipeline(self, maxsize: int = 1000):
+        stream = CountingStream()
+        output = logging.StreamHandler(stream)
+        output.setFormatter(StructuredLogFormatter())
+        queue_handler = QueueLogHandler(queue.Queue(maxsize=maxsize))
+        writer = LogWriter(queue_handler, [output], flush_interval=0.05)
+        return stream, queue_handler, writer
+
+    def test_records_are_written_in_batches(self):
+        """Test that queued records are drained in few writes on shutdown."""
+        stream, queue_handler, writer = self.make_pipeline()
+        logger = make_logger("test.pipeline.batches", queue_handler)
+        for i in range(200):
+            logger.info("record %d", i)
+
+        # Start the writer only now, so everything is queued up front
+        writer.start()
+        writer.stop()
+
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 200)
+        self.assertEqual(json.loads(lines[0])["message"], "record 0")
+        self.assertEqual(json.loads(lines[-1])["message"], "record 199")
+        self.assertLess(stream.writes, 10)
+
+    def test_full_queue_drops_and_counts(self):
+        """Test that records beyond the queue bound are dropped and reported."""
+        stream, queue_handler, writer = self.make_pipeline(maxsize=5)
+        logger = make_logger("test.pipeline.drops", queue_handler)
+        for i in range(8):
+            logger.info(f"record {i}")
+        self.assertEqual(queue_handler.dropped, 3)
+
+        writer.start()
+        writer.stop()
+
+        messages = [
+            json.loads(line)["message"] for line in stream.getvalue().splitlines()
+        ]
+        self.assertEqual(messages[:5], [f"record {i}" for i in range(5)])
+        self.assertIn("dropped 3 record(s)", messages[-1])
+
+    def test_writer_flushes_while_running(self):
+        """Test that records show up without stopping the writer."""
+        stream, queue_handler, writer = self.make_pipeline()
+        logger = make_logger("test.pipeline.flush", queue_handler)
+        writer.start()
+        try:
+            logger.warning("hello")
+            for _ in range(100):
+                if stream.getvalue():
+                    break
+                writer.join(0.01)
+            self.assertIn("hello", stream.getvalue())
+        finally:
+            writer.stop()
+
+
+class TestRotatingLogFileHandler(unittest.TestCase):
+    """Test size and age based log rotation."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "app.log")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_handler(self, **kwargs) -> RotatingLogFileHandler:
+        handler = RotatingLogFileHandler(self.path, **kwargs)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_rotates_by_size_and_compresses(self):
+        """Test that a full file is rotated and gzipped in the background."""
+        handler = self.make_handler(max_bytes=100, backup_count=5)
+        logger = make_logger("test.rotation.size", handler)
+        for i in range(3):
+            logger.info("x" * 60 + f" {i}")
+        handler.wait_for_compression()
+
+        segments = handler.rotated_segments()
+        self.assertEqual(len(segments), 1)
+        self.assertTrue(segments[0].endswith(".gz"))
+        with gzip.open(segments[0], "rt") as f:
+            self.assertEqual(f.read().splitlines(), ["x" * 60 + " 0", "x" * 60 + " 1"])
+        with open(self.path) as f:
+            self.assertEqual(f.read().splitlines(), ["x" * 60 + " 2"])
+
+    def test_retention_count(self):
+        """Test that only the newest backup_count segments are kept."""
+        handler = self.make_handler(max_bytes=1, backup_count=2)
+        logger = make_logger("test.rotation.retention", handler)
+        for i in range(5):
+            logger.info(f"record {i}")
+        handler.wait_for_compression()
+
+        segments = handler.rotated_segments()
+        self.assertEqual(len(segments), 2)
+        contents = []
+        for segment in segments:
+            with gzip.open(segment, "rt") as f:
+                contents.append(f.read().strip())
+        self.assertEqual(contents, ["record 3", "record 4"])
+
+    def test_rotates_by_age(self):
+        """Test that the file is rotated once the interval has passed."""
+        handler = self.make_handler(rotate_interval=3600, compress=False)
+        logger = make_logger("test.rotation.age", handler)
+        logger.info("old")
+        self.assertEqual(handler.rotated_segments(), [])
+
+        handler.rollover_at = time.time() - 1
+        logger.info("new")
+
+        segments = handler.rotated_segments()
+        self.assertEqual(len(segments), 1)
+        with open(segments[0]) as f:
+            self.assertEqual(f.read().splitlines(), ["old", "new"])
+        self.assertGreater(handler.rollover_at, time.time())
+
+    def test_writer_rotates_batches(self):
+        """Test that the background writer rotates after a batch write."""
+        handler = self.make_handler(max_bytes=10, compress=False)
+        queue_handler = QueueLogHandler(queue.Queue())
+        writer = LogWriter(queue_handler, [handler], flush_interval=0.05)
+        logger = make_logger("test.rotation.writer", queue_handler)
+        logger.info("a long enough record")
+
+        writer.start()
+        writer.stop()
+
+        segments = handler.rotated_segments()
+        self.assertEqual(len(segments), 1)
+        with open(segments[0]) as f:
+            self.assertEqual(f.read().strip(), "a long enough record")
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
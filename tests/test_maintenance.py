@@ -0,0 +1,138 @@
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api_monitoring.monitoring.maintenance import MaintenanceChecker, MarkerScanner
+from api_monitoring.utils.http import http_session_manager
+
+
+class TestMarkerScanner(unittest.TestCase):
+    """Test incremental marker scanning."""
+
+    def test_marker_within_chunk(self):
+        """Test that a marker inside one chunk is found."""
+        scanner = MarkerScanner(["OnMaintenance"])
+        self.assertIsNone(scanner.feed(b"<html>all good"))
+        self.assertEqual(scanner.feed(b"<p>OnMaintenance</p>"), "OnMaintenance")
+
+    def test_marker_across_chunks(self):
+        """Test that a marker split across chunks is found."""
+        scanner = MarkerScanner(["OnMaintenance"])
+        self.assertIsNone(scanner.feed(b"x" * 100 + b"OnMain"))
+        self.assertIsNone(scanner.feed(b"ten"))
+        self.assertEqual(scanner.feed(b"ance"), "OnMaintenance")
+
+    def test_pattern_across_chunks(self):
+        """Test that a regex split across chunks is found."""
+        scanner = MarkerScanner([], [r"maintenance until \d+:\d+"])
+        self.assertIsNone(scanner.feed(b"We are down for maintenance un"))
+        self.assertIsNotNone(scanner.feed(b"til 14:30 UTC"))
+
+    def test_no_marker(self):
+        """Test that unrelated content does not match."""
+        scanner = MarkerScanner(["OnMaintenance"])
+        for _ in range(10):
+            self.assertIsNone(scanner.feed(b"OnMaint" + b"-" * 50))
+
+
+class TestMaintenanceChecker(unittest.IsolatedAsyncioTestCase):
+    """Test maintenance detection against a local HTTP server."""
+
+    async def asyncSetUp(self):
+        """Start a local server with several kinds of pages."""
+        self.large_page_bytes_sent = 0
+
+        async def marker_page(request: web.Request) -> web.Response:
+            return web.Response(text="<html>Service OnMaintenance</html>")
+
+        async def ok_page(request: web.Request) -> web.Response:
+            return web.Response(text="<html>ok</html>")
+
+        async def status_page(request: web.Request) -> web.Response:
+            return web.Response(status=503, text="unavailable")
+
+        async def header_page(request: web.Request) -> web.Response:
+            return web.Response(text="ok", headers={"X-Status": "maintenance window"})
+
+        async def large_page(request: web.Request) -> web.StreamResponse:
+            response = web.StreamResponse()
+            await response.prepare(request)
+            try:
+                for _ in range(1000):
+                    await response.write(b"x" * 16384)
+                    self.large_page_bytes_sent += 16384
+            except (ConnectionResetError, RuntimeError):
+                pass
+            return response
+
+        app = web.Application()
+        app.router.add_get("/marker", marker_page)
+        app.router.add_get("/ok", ok_page)
+        app.router.add_get("/status", status_page)
+        app.router.add_get("/header", header_page)
+        app.router.add_get("/large", large_page)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        """Stop the server and close the shared session."""
+        await http_session_manager.close()
+        await self.server.close()
+
+    def url(self, path: str) -> str:
+        return str(self.server.make_url(path))
+
+    async def test_marker_in_body(self):
+        """Test that the default marker is detected."""
+        checker = MaintenanceChecker(self.url("/marker"))
+        self.assertTrue((await checker.is_on_maintenance()).on_maintenance)
+
+    async def test_not_on_maintenance(self):
+        """Test that a normal page is not reported as maintenance."""
+        checker = MaintenanceChecker(self.url("/ok"))
+        result = await checker.is_on_maintenance()
+        self.assertTrue(result.success)
+        self.assertFalse(result.on_maintenance)
+
+    async def test_phase_timings(self):
+        """Test that connect, TTFB and total latency are recorded."""
+        checker = MaintenanceChecker(self.url("/ok"))
+        first = (await checker.is_on_maintenance()).timings
+        self.assertFalse(first.reused_connection)
+        self.assertIsNotNone(first.connect)
+        self.assertIsNotNone(first.ttfb)
+        self.assertGreaterEqual(first.total, first.ttfb)
+        self.assertEqual(first.attempts, 1)
+
+        second = (await checker.is_on_maintenance()).timings
+        self.assertTrue(second.reused_connection)
+        self.assertIsNone(second.connect)
+
+    async def test_status_code(self):
+        """Test that configured status codes indicate maintenance."""
+        checker = MaintenanceChecker(self.url("/status"), status_codes=[503])
+        self.assertTrue((await checker.is_on_maintenance()).on_maintenance)
+
+    async def test_header(self):
+        """Test that configured headers indicate maintenance."""
+        checker = MaintenanceChecker(
+            self.url("/header"), headers=["X-Status: maintenance"]
+        )
+        self.assertTrue((await checker.is_on_maintenance()).on_maintenance)
+        checker = MaintenanceChecker(self.url("/header"), headers=["X-Missing"])
+        result = await checker.is_on_maintenance()
+        self.assertTrue(result.success)
+        self.assertFalse(result.on_maintenance)
+
+    async def test_body_cap(self):
+        """Test that reading stops at the byte cap on large pages."""
+        checker = MaintenanceChecker(self.url("/large"), max_body_bytes=64 * 1024)
+        result = await checker.is_on_maintenance()
+        self.assertTrue(result.success)
+        self.assertFalse(result.on_maintenance)
+        self.assertLess(self.large_page_bytes_sent, 1000 * 16384)
+
+
+if __name__ == "__main__":
+    unittest.main()
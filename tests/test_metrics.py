@@ -0,0 +1,120 @@
+import unittest
+
+from api_monitoring.monitoring.results import ProbeResult
+from api_monitoring.utils.http import http_session_manager
+from api_monitoring.utils.metrics import (
+    MetricsRegistry,
+    MetricsServer,
+    TargetMetrics,
+    metrics_registry,
+)
+from api_monitoring.utils.timings import PhaseTimings
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test the registry and the text exposition format."""
+
+    def test_counter_and_gauge(self):
+        """Test that counters and gauges render with their labels."""
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests", ["target"])
+        counter.labels("a").inc()
+        counter.labels("a").inc(2)
+        gauge = registry.gauge("temperature", "Temperature")
+        gauge.labels().set(1.5)
+
+        text = registry.render()
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{target="a"} 3', text)
+        self.assertIn("temperature 1.5", text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that histogram buckets count observations up to their bound."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency", "Latency", buckets=[0.1, 1.0])
+        child = histogram.labels()
+        for value in (0.05, 0.1, 0.5, 5.0):
+            child.observe(value)
+
+        text = registry.render()
+        self.assertIn('latency_bucket{le="0.1"} 2', text)
+        self.assertIn('latency_bucket{le="1"} 3', text)
+        self.assertIn('latency_bucket{le="+Inf"} 4', text)
+        self.assertIn("latency_count 4", text)
+        self.assertIn("latency_sum 5.65", text)
+
+    def test_label_values_are_escaped(self):
+        """Test that quotes and backslashes in label values are escaped."""
+        registry = MetricsRegistry()
+        registry.counter("c", "C", ["target"]).labels('a"b\\c').inc()
+        self.assertIn('c{target="a\\"b\\\\c"} 1', registry.render())
+
+    def test_labels_are_bound_once(self):
+        """Test that labels() returns the same child for the same values."""
+        registry = MetricsRegistry()
+        counter = registry.counter("c", "C", ["target"])
+        self.assertIs(counter.labels("a"), counter.labels("a"))
+        with self.assertRaises(ValueError):
+            counter.labels("a", "b")
+
+
+class TestTargetMetrics(unittest.TestCase):
+    """Test recording probe results and cycles for a target."""
+
+    def test_probe_results(self):
+        """Test that successes, failures and phase timings are recorded."""
+        metrics = TargetMetrics("metrics-target")
+        metrics.api.record(ProbeResult(True, timings=PhaseTimings(total=0.2, ttfb=0.1)))
+        metrics.api.record(ProbeResult(False, "timed out", "Timeout"))
+        metrics.api.record(ProbeResult(False, "timed out", "Timeout"))
+        metrics.record_cycle(0.3, 0, 2, True)
+
+        text = metrics_registry.render()
+        self.assertIn(
+            'api_monitor_probe_success_total{target="metrics-target",probe="api"} 1',
+            text,
+        )
+        self.assertIn(
+            "api_monitor_probe_failures_total"
+            '{target="metrics-target",probe="api",error_class="Timeout"} 2',
+            text,
+        )
+        self.assertIn(
+            "api_monitor_probe_phase_seconds_count"
+            '{target="metrics-target",probe="api",phase="ttfb"} 1',
+            text,
+        )
+        self.assertIn(
+            'api_monitor_failure_count{target="metrics-target",check="api"} 2', text
+        )
+        self.assertIn('api_monitor_alert_active{target="metrics-target"} 1', text)
+
+
+class TestMetricsServer(unittest.IsolatedAsyncioTestCase):
+    """Test scraping the /metrics endpoint."""
+
+    async def asyncTearDown(self):
+        """Close the shared session."""
+        await http_session_manager.close()
+
+    async def test_scrape(self):
+        """Test that a scrape runs collectors and returns the exposition."""
+        registry = MetricsRegistry()
+        gauge = registry.gauge("queue_depth", "Queue depth").labels()
+        registry.register_collector(lambda: gauge.set(7))
+
+        server = MetricsServer(registry, "127.0.0.1", 0)
+        await server.start()
+        try:
+            session = http_session_manager.get_session()
+            url = f"http://127.0.0.1:{server.port}/metrics"
+            async with session.get(url) as response:
+                self.assertEqual(response.status, 200)
+                self.assertIn("version=0.0.4", response.headers["Content-Type"])
+                self.assertIn("queue_depth 7", await response.text())
+        finally:
+            await server.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
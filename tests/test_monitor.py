@@ -0,0 +1,567 @@
+import asyncio
+import tempfile
+import unittest
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import AsyncIterator, List, Optional, Tuple
+from unittest.mock import patch
+
+from api_monitoring.alerting.outbox import AlertOutbox
+from api_monitoring.alerting.sinks import AlertSink, AlertThread, Notification
+from api_monitoring.clients.aws_client import AWSClient
+from api_monitoring.config import TargetConfig
+from api_monitoring.monitoring.adaptive import AdaptiveProbePolicy
+from api_monitoring.monitoring.alert_state import RECOVERING, SUSPECT, AlertState
+from api_monitoring.monitoring.diagnostics import DiagnosticResult, DiagnosticsReport
+from api_monitoring.monitoring.engine import MonitoringEngine
+from api_monitoring.monitoring.monitor import ApiMonitor
+from api_monitoring.monitoring.results import ProbeResult
+from api_monitoring.monitoring.scheduler import Scheduler
+from api_monitoring.storage.snapshot import StateSnapshot
+from api_monitoring.utils.metrics import metrics_registry
+
+
+class FakeMaintenanceChecker:
+    """Maintenance checker returning a scripted result."""
+
+    def __init__(
+        self, result: Tuple[bool, Optional[str]] = (False, None), delay: float = 0
+    ):
+        self.endpoint_url = "https://api.example.com"
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+
+    async def is_on_maintenance(self) -> ProbeResult:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        on_maintenance, error = self.result
+        return ProbeResult(error is None, error, on_maintenance=on_maintenance)
+
+
+class FakeAWSClient:
+    """AWS client returning a scripted result."""
+
+    def __init__(
+        self, result: Tuple[bool, Optional[str]] = (True, None), delay: float = 0
+    ):
+        self.endpoint_url = "https://api.example.com"
+        self.result = result
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = False
+        self.credentials: Optional[Tuple[str, str]] = None
+
+    def update_credentials(
+        self, aws_access_key_id: str, aws_secret_access_key: str
+    ) -> None:
+        self.credentials = (aws_access_key_id, aws_secret_access_key)
+
+    async def check_api_availability(self) -> ProbeResult:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return ProbeResult(*self.result)
+
+
+class SlowFirstAWSClient(FakeAWSClient):
+    """AWS client whose persistent connection hangs but fresh ones answer."""
+
+    async def check_api_availability(self, fresh: bool = False) -> ProbeResult:
+        self.delay = 0 if fresh else 10
+        return await super().check_api_availability()
+
+
+class HangingEC2Client:
+    """EC2 client whose calls never answer."""
+
+    def __init__(self) -> None:
+        self.meta = SimpleNamespace(events=SimpleNamespace(register=lambda *_: None))
+
+    async def describe_availability_zones(self) -> dict:
+        await asyncio.sleep(10)
+        return {}
+
+
+class FakeAlerter:
+    """Alerter recording alerts instead of sending them."""
+
+    def __init__(self) -> None:
+        self.alerts: List[Tuple[str, Optional[str]]] = []
+        self.enrichments: List[Tuple[str, str, Optional[str]]] = []
+        self.resolutions: List[str] = []
+        self.alert_message_id: Optional[int] = None
+        self.alert_timestamp: Optional[str] = None
+        self.alert_in_digest = False
+
+    async def send_initial_alert(
+        self,
+        target: str,
+        error_message: Optional[str] = None,
+        comment: Optional[str] = None,
+    ) -> bool:
+        self.alerts.append((target, error_message))
+        return True
+
+    async def enrich_alert(
+        self,
+        target: str,
+        mtr_output: str,
+        error_message: Optional[str] = None,
+        comment: Optional[str] = None,
+        diagnostics: Optional[str] = None,
+    ) -> bool:
+        self.enrichments.append((target, mtr_output, diagnostics))
+        return True
+
+    async def send_alert(
+        self,
+        target: str,
+        mtr_output: str,
+        error_message: Optional[str] = None,
+        comment: Optional[str] = None,
+        diagnostics: Optional[str] = None,
+    ) -> bool:
+        self.alerts.append((target, error_message))
+        return True
+
+    async def send_resolution(self, target: str) -> bool:
+        self.resolutions.append(target)
+        return True
+
+
+class DownSink(AlertSink):
+    """Alert sink that is never reachable."""
+
+    def __init__(self) -> None:
+        super().__init__("down")
+
+    async def send(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> Optional[AlertThread]:
+        return None
+
+
+def make_monitor(
+    name: str = "api.example.com",
+    maintenance: Tuple[bool, Optional[str]] = (False, None),
+    api: Tuple[bool, Optional[str]] = (True, None),
+    api_failure_threshold: int = 1,
+    check_interval: int = 60,
+    snapshot: Optional[StateSnapshot] = None,
+    outbox: Optional[AlertOutbox] = None,
+) -> ApiMonitor:
+    """Create a monitor wired to fake components."""
+    return ApiMonitor(
+        check_interval=check_interval,
+        api_timeout=1,
+        target_hostname=name,
+        name=name,
+        maintenance_checker=FakeMaintenanceChecker(  # type: ignore[arg-type]
+            maintenance
+        ),
+        aws_client=FakeAWSClient(api),  # type: ignore[arg-type]
+        alerter=FakeAlerter(),  # type: ignore[arg-type]
+        maintenance_failure_threshold=1,
+        api_failure_threshold=api_failure_threshold,
+        alert_comment=None,
+        schedule_phase=0,
+        snapshot=snapshot,
+        outbox=outbox,
+    )
+
+
+async def fake_run_diagnostics(
+    endpoint_url: str,
+    mtr_target: Optional[str] = None,
+    deadline: float = 10.0,
+    **kwargs,
+) -> DiagnosticsReport:
+    mtr = DiagnosticResult("mtr", True, f"trace to {mtr_target}")
+    return DiagnosticsReport(results={"mtr": mtr}, deadline=deadline)
+
+
+class TestApiMonitor(unittest.IsolatedAsyncioTestCase):
+    """Test the ApiMonitor monitoring cycle."""
+
+    def setUp(self):
+        """Replace diagnostics with a fake that does not touch the network."""
+        patcher = patch(
+            "api_monitoring.monitoring.monitor.run_diagnostics", fake_run_diagnostics
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_success_resets_counters(self):
+        """Test that a successful cycle resets failure counters."""
+        monitor = make_monitor()
+        monitor.api_failure_count = 2
+        self.assertTrue(await monitor.run_once())
+        self.assertEqual(monitor.api_failure_count, 0)
+        self.assertEqual(monitor.alerter.alerts, [])
+
+    async def test_maintenance_skips_api_check(self):
+        """Test that the API is not probed while on maintenance."""
+        monitor = make_monitor(maintenance=(True, None))
+        self.assertTrue(await monitor.run_once())
+        self.assertEqual(monitor.aws_client.calls, 0)
+
+    async def test_failure_threshold(self):
+        """Test that alerts are only sent once the threshold is reached."""
+        monitor = make_monitor(api=(False, "boom"), api_failure_threshold=2)
+        self.assertFalse(await monitor.run_once())
+        self.assertEqual(monitor.alerter.alerts, [])
+        self.assertTrue(await monitor.run_once())
+        self.assertEqual(monitor.alerter.alerts, [("api.example.com", "boom")])
+
+    async def test_alert_enriched_with_diagnostics(self):
+        """Test that the alert goes out first and is then enriched."""
+        monitor = make_monitor(api=(False, "boom"))
+        await monitor.run_once()
+        self.assertEqual(monitor.alerter.alerts, [("api.example.com", "boom")])
+        self.assertEqual(
+            monitor.alerter.enrichments,
+            [("api.example.com", "trace to api.example.com", None)],
+        )
+
+    async def test_resolution_after_alert(self):
+        """Test that a resolution is sent after a previous alert."""
+        monitor = make_monitor(api=(False, "boom"))
+        await monitor.run_once()
+        monitor.aws_client.result = (True, None)
+        await monitor.run_once()
+        self.assertEqual(monitor.alerter.resolutions, ["api.example.com"])
+
+    async def test_flapping_target_alerts_once(self):
+        """Test that a flapping target keeps its alert open instead of re-alerting."""
+        monitor = make_monitor(api=(False, "boom"))
+        monitor.alert_state = AlertState(flap_window=6, flap_threshold=0.5)
+        for i in range(6):
+            monitor.aws_client.result = (False, "boom") if i % 2 == 0 else (True, None)
+            await monitor.run_once()
+        self.assertTrue(monitor.alert_state.flapping)
+        alerts = len(monitor.alerter.alerts)
+        resolutions = len(monitor.alerter.resolutions)
+
+        for i in range(12):
+            monitor.aws_client.result = (False, "boom") if i % 2 == 0 else (True, None)
+            await monitor.run_once()
+        self.assertTrue(monitor.alert_open)
+        self.assertEqual(len(monitor.alerter.alerts), alerts)
+        self.assertEqual(len(monitor.alerter.resolutions), resolutions)
+
+    async def test_warm_restart_resumes_open_alert(self):
+        """Test that a restarted monitor neither re-alerts nor forgets to resolve."""
+        runs = []
+
+        async def counting_run_diagnostics(*args, **kwargs) -> DiagnosticsReport:
+            runs.append(args)
+            return await fake_run_diagnostics(*args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = str(Path(tmpdir) / "state.json")
+            with patch(
+                "api_monitoring.monitoring.monitor.run_diagnostics",
+                counting_run_diagnostics,
+            ):
+                snapshot = StateSnapshot(path)
+                monitor = make_monitor(api=(False, "boom"), snapshot=snapshot)
+                monitor.alerter.alert_message_id = 42
+                await monitor.run_cycle()
+                await snapshot.stop()
+                self.assertEqual(len(runs), 1)
+
+                # The process restarts with fresh components
+                snapshot = StateSnapshot(path)
+                monitor = make_monitor(api=(False, "boom"), snapshot=snapshot)
+                self.assertTrue(monitor.alert_open)
+                self.assertEqual(monitor.alerter.alert_message_id, 42)
+                await monitor.run_cycle()
+                self.assertEqual(monitor.alerter.alerts, [])
+                self.assertEqual(len(runs), 1)
+
+                monitor.aws_client.result = (True, None)
+                await monitor.run_cycle()
+                await snapshot.stop()
+                self.assertEqual(monitor.alerter.resolutions, ["api.example.com"])
+
+    async def test_restart_keeps_recovery_progress(self):
+        """Test that an undelivered alert does not reset a restored recovery."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            snapshot_path = str(Path(tmpdir) / "state.json")
+            outbox_path = str(Path(tmpdir) / "outbox.jsonl")
+
+            snapshot = StateSnapshot(snapshot_path)
+            outbox = AlertOutbox(outbox_path, [DownSink()], retry_delay=60)
+            monitor = make_monitor(
+                api=(False, "boom"), snapshot=snapshot, outbox=outbox
+            )
+            monitor.alert_state.recover_threshold = 3
+            await monitor.run_cycle()
+            monitor.aws_client.result = (True, None)
+            await monitor.run_cycle()
+            self.assertEqual(monitor.alert_state.state, RECOVERING)
+            await snapshot.stop()
+            await outbox.stop()
+
+            # The process restarts with the alert still in the outbox
+            snapshot = StateSnapshot(snapshot_path)
+            outbox = AlertOutbox(outbox_path, [DownSink()], retry_delay=60)
+            self.assertTrue(outbox.is_open("api.example.com"))
+            monitor = make_monitor(snapshot=snapshot, outbox=outbox)
+            self.assertEqual(monitor.alert_state.state, RECOVERING)
+            self.assertEqual(monitor.alert_state.successes, 1)
+            await outbox.stop()
+
+    async def test_restart_keeps_suspicion(self):
+        """Test that failures below the threshold keep counting after a restart."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            snapshot_path = str(Path(tmpdir) / "state.json")
+            outbox_path = str(Path(tmpdir) / "outbox.jsonl")
+
+            snapshot = StateSnapshot(snapshot_path)
+            outbox = AlertOutbox(outbox_path, [DownSink()], retry_delay=60)
+            monitor = make_monitor(
+                api=(False, "boom"),
+                api_failure_threshold=3,
+                snapshot=snapshot,
+                outbox=outbox,
+            )
+            await monitor.run_cycle()
+            self.assertEqual(monitor.alert_state.state, SUSPECT)
+            await snapshot.stop()
+            await outbox.stop()
+
+            snapshot = StateSnapshot(snapshot_path)
+            outbox = AlertOutbox(outbox_path, [DownSink()], retry_delay=60)
+            monitor = make_monitor(
+                api=(False, "boom"),
+                api_failure_threshold=3,
+                snapshot=snapshot,
+                outbox=outbox,
+            )
+            self.assertEqual(monitor.alert_state.state, SUSPECT)
+            self.assertEqual(monitor.alert_state.api_failures, 1)
+            await outbox.stop()
+
+    async def test_outbox_queues_notifications(self):
+        """Test that a sink being down neither blocks cycles nor reruns diagnostics."""
+        runs = []
+
+        async def counting_run_diagnostics(*args, **kwargs) -> DiagnosticsReport:
+            runs.append(args)
+            return await fake_run_diagnostics(*args, **kwargs)
+
+        outbox = AlertOutbox(sinks=[DownSink()], retry_delay=60)
+        monitor = make_monitor(api=(False, "boom"))
+        monitor.outbox = outbox
+
+        try:
+            with patch(
+                "api_monitoring.monitoring.monitor.run_diagnostics",
+                counting_run_diagnostics,
+            ):
+                await monitor.run_once()
+                await monitor.run_once()
+                self.assertTrue(monitor.alert_open)
+                self.assertEqual(len(runs), 1)
+                self.assertEqual(outbox.pending(), 2)
+
+                monitor.aws_client.result = (True, None)
+                await monitor.run_once()
+                self.assertFalse(monitor.alert_open)
+                self.assertEqual(outbox.pending(), 3)
+        finally:
+            await outbox.stop()
+        # Nothing went through the Telegram alerter
+        self.assertEqual(monitor.alerter.alerts, [])
+
+    async def test_cycle_delays_follow_probe_policy(self):
+        """Test that cycles confirm failures, slow down and watch recoveries."""
+        monitor = make_monitor(api=(False, "boom"), api_failure_threshold=3)
+        monitor.probe_policy = AdaptiveProbePolicy(
+            check_interval=60,
+            retry_delay=1.0,
+            recovery_interval=5.0,
+            recovery_window=60.0,
+            maintenance_interval=600.0,
+        )
+        self.assertEqual(await monitor.run_cycle(), 1.0)
+        self.assertEqual(await monitor.run_cycle(), 2.0)
+        # The alert confirms the failure, back to the regular schedule
+        self.assertIsNone(await monitor.run_cycle())
+
+        monitor.aws_client.result = (True, None)
+        self.assertEqual(await monitor.run_cycle(), 5.0)
+        self.assertEqual(monitor.alerter.resolutions, ["api.example.com"])
+
+        monitor.maintenance_checker.result = (True, None)
+        self.assertEqual(await monitor.run_cycle(), 600.0)
+
+
+class TestHedgedProbes(unittest.IsolatedAsyncioTestCase):
+    """Test hedging slow API checks."""
+
+    async def test_hedge_avoids_timeout(self):
+        """Test that a hedge answers before a hanging check times out."""
+        monitor = make_monitor()
+        monitor.aws_client = SlowFirstAWSClient()  # type: ignore[assignment]
+        monitor.hedge_probes = True
+        monitor.hedge_min_samples = 3
+        self.assertIsNone(monitor.hedge_delay())
+        for _ in range(3):
+            monitor.api_latencies.add(0.01)
+
+        result = await monitor.check_api_with_timeout()
+        self.assertTrue(result.success)
+        self.assertEqual(monitor.aws_client.calls, 2)
+        self.assertEqual(monitor.metrics.hedges["hedge"].value, 1)
+
+
+class TestConcurrentProbes(unittest.IsolatedAsyncioTestCase):
+    """Test running the maintenance and API checks concurrently."""
+
+    def setUp(self):
+        """Replace diagnostics with a fake that does not touch the network."""
+        patcher = patch(
+            "api_monitoring.monitoring.monitor.run_diagnostics", fake_run_diagnostics
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_concurrent_monitor(
+        self,
+        maintenance: Tuple[bool, Optional[str]],
+        api: Tuple[bool, Optional[str]],
+        maintenance_delay: float,
+        api_delay: float,
+    ) -> ApiMonitor:
+        monitor = make_monitor(maintenance=maintenance, api=api)
+        monitor.concurrent_probes = True
+        monitor.maintenance_checker.delay = maintenance_delay
+        monitor.aws_client.delay = api_delay
+        return monitor
+
+    async def test_cycle_takes_max_not_sum(self):
+        """Test that a healthy cycle takes as long as the slowest probe."""
+        monitor = self.make_concurrent_monitor((False, None), (True, None), 0.2, 0.2)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        self.assertTrue(await monitor.run_once())
+        self.assertLess(loop.time() - start, 0.35)
+
+    async def test_maintenance_cancels_api_check(self):
+        """Test that confirmed maintenance cancels the pending API check."""
+        monitor = self.make_concurrent_monitor((True, None), (False, "down"), 0, 10)
+        self.assertTrue(await monitor.run_once())
+        self.assertTrue(monitor.aws_client.cancelled)
+        self.assertEqual(monitor.api_failure_count, 0)
+        self.assertEqual(monitor.alerter.alerts, [])
+
+    async def test_api_failure_counts_after_maintenance_result(self):
+        """Test that threshold semantics match the sequential mode."""
+        monitor = self.make_concurrent_monitor((False, None), (False, "down"), 0.05, 0)
+        monitor.api_failure_threshold = 2
+        self.assertFalse(await monitor.run_once())
+        self.assertEqual(monitor.api_failure_count, 1)
+        self.assertTrue(await monitor.run_once())
+        self.assertEqual(monitor.alerter.alerts, [("api.example.com", "down")])
+
+    async def test_maintenance_error_ignores_api_result(self):
+        """Test that a failed maintenance check is handled like before."""
+        monitor = self.make_concurrent_monitor((False, "timeout"), (True, None), 0, 10)
+        self.assertTrue(await monitor.run_once())
+        self.assertTrue(monitor.aws_client.cancelled)
+        self.assertEqual(len(monitor.alerter.alerts), 1)
+
+    async def test_cancelled_api_check_keeps_aws_client(self):
+        """Test that cancelling the API check does not rebuild the EC2 client."""
+        monitor = self.make_concurrent_monitor(
+            (False, "timeout"), (True, None), 0.05, 0
+        )
+        client = AWSClient("https://api.example.com", "key", "secret", "us-east-1")
+        created: List[HangingEC2Client] = []
+
+        @asynccontextmanager
+        async def create_context() -> AsyncIterator[HangingEC2Client]:
+            created.append(HangingEC2Client())
+            yield created[-1]
+
+        client._create_client_context = create_context  # type: ignore[method-assign]
+        monitor.aws_client = client
+        try:
+            for _ in range(2):
+                await monitor.run_once()
+        finally:
+            await client.close()
+        self.assertEqual(len(created), 1)
+
+
+class TestMonitoringEngine(unittest.IsolatedAsyncioTestCase):
+    """Test running several monitors on one event loop."""
+
+    def setUp(self):
+        """Replace diagnostics with a fake that does not touch the network."""
+        patcher = patch(
+            "api_monitoring.monitoring.monitor.run_diagnostics", fake_run_diagnostics
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_targets_are_isolated(self):
+        """Test that one failing target does not affect the others."""
+        healthy = make_monitor(name="healthy")
+        failing = make_monitor(name="failing", api=(False, "down"))
+        engine = MonitoringEngine([healthy, failing])
+
+        run_task = asyncio.create_task(engine.run())
+        await asyncio.sleep(0.05)
+        await engine.stop()
+        await run_task
+
+        self.assertEqual(healthy.alerter.alerts, [])
+        self.assertEqual(failing.alerter.alerts, [("failing", "down")])
+        self.assertEqual(healthy.aws_client.calls, 1)
+        self.assertEqual(failing.aws_client.calls, 1)
+        self.assertIs(engine.get_monitor("failing"), failing)
+        self.assertIsNone(engine.get_monitor("missing"))
+
+    def test_update_credentials(self):
+        """Test that reloaded credentials reach the client of their target."""
+        first = make_monitor(name="first")
+        second = make_monitor(name="second")
+        engine = MonitoringEngine([first, second])
+        engine.update_credentials(
+            [
+                TargetConfig(
+                    name="second",
+                    endpoint_url="https://api.example.com",
+                    aws_access_key_id="new-key",
+                    aws_secret_access_key="new-secret",
+                ),
+                TargetConfig(
+                    name="removed",
+                    endpoint_url="https://api.example.com",
+                    aws_access_key_id="key",
+                    aws_secret_access_key="secret",
+                ),
+            ]
+        )
+        self.assertIsNone(first.aws_client.credentials)
+        self.assertEqual(second.aws_client.credentials, ("new-key", "new-secret"))
+
+    def test_metrics_registered_when_scheduled(self):
+        """Test that a monitor exports no series before it is scheduled."""
+        monitor = make_monitor(name="scheduled-target")
+        series = 'api_monitor_alert_active{target="scheduled-target"} 0'
+        self.assertNotIn('target="scheduled-target"', metrics_registry.render())
+        monitor.schedule(Scheduler())
+        self.assertIn(series, metrics_registry.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
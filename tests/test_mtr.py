@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from typing import List, Tuple
+from unittest.mock import patch
+
+from api_monitoring.monitoring.mtr import (
+    BASELINE_NICENESS,
+    MtrBaselineCache,
+    MtrError,
+    MtrHop,
+    MtrTrace,
+    diff_traces,
+    parse_mtr_json,
+    run_mtr,
+)
+from api_monitoring.utils.metrics import metrics_registry
+
+MTR_JSON = {
+    "report": {
+        "mtr": {"src": "monitor", "dst": "api.example.com", "tests": 10},
+        "hubs": [
+            {
+                "count": 1,
+                "host": "10.0.0.1",
+                "Loss%": 0.0,
+                "Snt": 10,
+                "Last": 0.4,
+                "Avg": 0.5,
+                "Best": 0.3,
+                "Wrst": 0.9,
+                "StDev": 0.1,
+            },
+            # Older MTR versions report numbers as strings
+            {
+                "count": "2",
+                "host": "???",
+                "Loss%": "100.0",
+                "Snt": "10",
+                "Last": "0.0",
+                "Avg": "0.0",
+                "Best": "0.0",
+                "Wrst": "0.0",
+                "StDev": "0.0",
+            },
+        ],
+    }
+}
+
+
+def make_trace(*hops: Tuple[str, float, float], started: float = 0.0) -> MtrTrace:
+    """Build a trace out of (host, loss, avg) tuples."""
+    return MtrTrace(
+        "api.example.com",
+        [
+            MtrHop(i, host, loss, 10, avg, avg, avg, avg, 0.0)
+            for i, (host, loss, avg) in enumerate(hops, 1)
+        ],
+        started=started,
+    )
+
+
+BASELINE = make_trace(
+    ("10.0.0.1", 0.0, 1.0),
+    ("10.0.0.2", 0.0, 5.0),
+    ("10.0.0.3", 0.0, 10.0),
+    ("10.0.0.4", 0.0, 20.0),
+)
+
+
+class TestMtrTrace(unittest.TestCase):
+    """Test parsing and formatting of MTR reports."""
+
+    def test_parse_json(self):
+        """Test that both numeric and string fields are parsed."""
+        trace = parse_mtr_json(json.dumps(MTR_JSON), "api.example.com", 1.0)
+        self.assertEqual(trace.source, "monitor")
+        self.assertEqual(trace.cycles, 10)
+        self.assertEqual([hop.index for hop in trace.hops], [1, 2])
+        self.assertEqual(trace.hops[0].avg, 0.5)
+        self.assertEqual(trace.hops[1].loss, 100.0)
+        self.assertFalse(trace.reached)
+
+    def test_parse_invalid_output(self):
+        """Test that unexpected output raises MtrError."""
+        for output in ("", "not json", '{"report": {"hubs": [{"count": 1}]}}'):
+            with self.assertRaises(MtrError):
+                parse_mtr_json(output, "api.example.com")
+
+    def test_format_like_report(self):
+        """Test that the text keeps the two header lines of `mtr --report`."""
+        lines = BASELINE.format().splitlines()
+        self.assertTrue(lines[0].startswith("Start: "))
+        self.assertTrue(lines[1].startswith("HOST: "))
+        self.assertEqual(len(lines), 6)
+        self.assertIn("  4.|-- 10.0.0.4", lines[5])
+
+
+class TestDiffTraces(unittest.TestCase):
+    """Test hop-level comparison with the baseline."""
+
+    def test_same_path(self):
+        """Test that small variations are not reported."""
+        trace = make_trace(
+            ("10.0.0.1", 0.0, 1.5),
+            ("10.0.0.2", 10.0, 6.0),
+            ("10.0.0.3", 0.0, 30.0),
+            ("10.0.0.4", 0.0, 40.0),
+        )
+        self.assertEqual(diff_traces(BASELINE, trace), [])
+
+    def test_route_change_reported_once(self):
+        """Test that a run of changed hops is one change."""
+        trace = make_trace(
+            ("10.0.0.1", 0.0, 1.0),
+            ("10.9.0.2", 0.0, 5.0),
+            ("10.9.0.3", 0.0, 10.0),
+            ("10.0.0.4", 0.0, 20.0),
+        )
+        (change,) = diff_traces(BASELINE, trace)
+        self.assertEqual((change.hop, change.kind), (2, "route"))
+        self.assertEqual(
+            str(change), "hop 2: 10.9.0.2 replaces 10.0.0.2, 1 more hops changed"
+        )
+
+    def test_unknown_hosts_are_not_route_changes(self):
+        """Test that a hop that did not answer is not taken for a new route."""
+        trace = make_trace(
+            ("10.0.0.1", 0.0, 1.0),
+            ("???", 0.0, 5.0),
+            ("10.0.0.3", 0.0, 10.0),
+            ("10.0.0.4", 0.0, 20.0),
+        )
+        self.assertEqual(diff_traces(BASELINE, trace), [])
+
+    def test_loss_and_latency_reported_where_they_start(self):
+        """Test that degradation is reported at its first hop only."""
+        trace = make_trace(
+            ("10.0.0.1", 0.0, 1.0),
+            ("10.0.0.2", 0.0, 120.0),
+            ("10.0.0.3", 50.0, 130.0),
+            ("10.0.0.4", 60.0, 140.0),
+        )
+        changes = diff_traces(BASELINE, trace)
+        self.assertEqual(
+            [(change.hop, change.kind) for change in changes],
+            [(2, "latency"), (3, "loss")],
+        )
+        self.assertIn("+115.0 ms", str(changes[0]))
+        self.assertIn("loss 50%, baseline 0%", str(changes[1]))
+
+    def test_shorter_and_longer_paths(self):
+        """Test that a path ending early or going further is reported."""
+        shorter = make_trace(("10.0.0.1", 0.0, 1.0), ("10.0.0.2", 0.0, 5.0))
+        (change,) = diff_traces(BASELINE, shorter)
+        self.assertEqual((change.hop, change.kind), (2, "shorter"))
+        self.assertIn("baseline reached hop 4 (10.0.0.4)", str(change))
+
+        longer = make_trace(
+            *[(hop.host, 0.0, hop.avg) for hop in BASELINE.hops],
+            ("10.0.0.5", 0.0, 21.0),
+        )
+        (change,) = diff_traces(BASELINE, longer)
+        self.assertEqual((change.hop, change.kind), (5, "longer"))
+
+
+class TestRunMtr(unittest.IsolatedAsyncioTestCase):
+    """Test running MTR through a stand-in executable."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        # The stand-in shadows any installed MTR
+        path = os.pathsep.join([self.tmpdir.name, os.environ.get("PATH", "")])
+        patcher = patch.dict(os.environ, {"PATH": path})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_mtr(self, script: str) -> None:
+        path = Path(self.tmpdir.name) / "mtr"
+        path.write_text(f"#!/bin/sh\n{script}\n")
+        path.chmod(0o755)
+
+    async def test_parses_json_output(self):
+        """Test that the JSON report of a low-priority trace is parsed."""
+        report = Path(self.tmpdir.name) / "report.json"
+        report.write_text(json.dumps(MTR_JSON))
+        tmp = self.tmpdir.name
+        self.write_mtr(f'echo "$@" > "{tmp}/args"; nice > "{tmp}/nice"; cat "{report}"')
+        trace = await run_mtr("api.example.com", cycles=10, low_priority=True)
+        self.assertEqual(len(trace.hops), 2)
+        self.assertGreater(trace.started, 0)
+        args = (Path(tmp) / "args").read_text().split()
+        self.assertIn("--json", args)
+        self.assertEqual(args[args.index("--report-cycles") + 1], "10")
+        niceness = int((Path(tmp) / "nice").read_text())
+        self.assertEqual(niceness, min(os.nice(0) + BASELINE_NICENESS, 19))
+
+    async def test_failure_raises(self):
+        """Test that a failing or missing MTR raises MtrError."""
+        with patch.dict(os.environ, {"PATH": self.tmpdir.name}):
+            with self.assertRaises(MtrError):
+                await run_mtr("api.example.com")
+        self.write_mtr('echo "mtr: boom" >&2; exit 1')
+        with self.assertRaisesRegex(MtrError, "boom"):
+            await run_mtr("api.example.com")
+
+
+class TestMtrBaselineCache(unittest.IsolatedAsyncioTestCase):
+    """Test the background baseline traces."""
+
+    def setUp(self):
+        self.calls: List[Tuple[str, int, bool]] = []
+        self.running = 0
+        self.max_running = 0
+        self.fail = False
+
+    async def runner(
+        self, host: str, cycles: int, low_priority: bool = False
+    ) -> MtrTrace:
+        self.calls.append((host, cycles, low_priority))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            self.running -= 1
+        if self.fail:
+            raise MtrError("boom")
+        return make_trace(("10.0.0.1", 0.0, 1.0), started=len(self.calls))
+
+    async def test_history_is_bounded(self):
+        """Test that only the last traces of a target are kept."""
+        cache = MtrBaselineCache(cycles=5, history=2, runner=self.runner)
+        for _ in range(3):
+            await cache.refresh("api", "api.example.com")
+        self.assertEqual([trace.started for trace in cache.traces("api")], [2, 3])
+        self.assertEqual(self.calls[0], ("api.example.com", 5, True))
+
+    async def test_traces_are_reported(self):
+        """Test that every baseline trace is handed to on_trace."""
+        recorded: List[Tuple[str, MtrTrace]] = []
+        cache = MtrBaselineCache(
+            runner=self.runner, on_trace=lambda *args: recorded.append(args)
+        )
+        trace = await cache.refresh("api", "api.example.com")
+        self.assertEqual(recorded, [("api", trace)])
+        self.fail = True
+        await cache.refresh("api", "api.example.com")
+        self.assertEqual(len(recorded), 1)
+
+    async def test_baseline_prefers_trace_that_got_through(self):
+        """Test that a trace cut short is not used as the baseline."""
+        cache = MtrBaselineCache(runner=self.runner)
+        self.assertIsNone(cache.baseline("api"))
+        await cache.refresh("api", "api.example.com")
+        cache._traces["api"].append(make_trace(("10.0.0.1", 100.0, 0.0), started=99))
+        self.assertEqual(cache.baseline("api").started, 1)
+
+        self.fail = True
+        self.assertIsNone(await cache.refresh("api", "api.example.com"))
+        self.assertEqual(cache.failed, 1)
+
+    async def test_background_traces_limited_and_skip_unhealthy(self):
+        """Test concurrency limits and that unhealthy targets are not traced."""
+        cache = MtrBaselineCache(interval=0.05, concurrency=2, runner=self.runner)
+        for i in range(6):
+            cache.add_target(f"t{i}", f"host{i}", lambda: True)
+        cache.add_target("down", "down-host", lambda: False)
+        cache.start()
+        try:
+            await asyncio.sleep(0.12)
+        finally:
+            await cache.stop()
+        self.assertEqual(self.max_running, 2)
+        self.assertGreaterEqual(cache.taken, 4)
+        self.assertNotIn("down-host", [host for host, _, _ in self.calls])
+        self.assertEqual(cache.traces("down"), [])
+        # Baseline traces stay out of the probe schedule metrics
+        self.assertNotIn("mtr-baseline", metrics_registry.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api_monitoring.utils.http import http_session_manager
+from api_monitoring.utils.network import UNKNOWN_IP, ExternalIPCache, get_external_ip
+
+
+class TestGetExternalIP(unittest.IsolatedAsyncioTestCase):
+    """Test external IP lookup against local stand-in services."""
+
+    async def asyncSetUp(self):
+        """Start a local IP service and a local EC2 metadata service."""
+        self.token_requests = 0
+
+        async def ip_service(request: web.Request) -> web.Response:
+            return web.json_response({"origin": "203.0.113.7"})
+
+        async def broken_service(request: web.Request) -> web.Response:
+            return web.Response(status=502)
+
+        async def token(request: web.Request) -> web.Response:
+            self.token_requests += 1
+            return web.Response(text="token-1")
+
+        async def public_ipv4(request: web.Request) -> web.Response:
+            if request.headers.get("X-aws-ec2-metadata-token") != "token-1":
+                return web.Response(status=401)
+            return web.Response(text="198.51.100.9\n")
+
+        app = web.Application()
+        app.router.add_get("/ip", ip_service)
+        app.router.add_get("/broken", broken_service)
+        app.router.add_put("/latest/api/token", token)
+        app.router.add_get("/latest/meta-data/public-ipv4", public_ipv4)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+    async def asyncTearDown(self):
+        """Stop the server and close the shared session."""
+        await http_session_manager.close()
+        await self.server.close()
+
+    def url(self, path: str) -> str:
+        return str(self.server.make_url(path))
+
+    async def test_ip_service(self):
+        """Test that the IP service is used first."""
+        ip = await get_external_ip(self.url("/ip"), self.url(""))
+        self.assertEqual(ip, "203.0.113.7")
+        self.assertEqual(self.token_requests, 0)
+
+    async def test_ec2_metadata_fallback(self):
+        """Test the IMDSv2 fallback when the IP service fails."""
+        ip = await get_external_ip(self.url("/broken"), self.url(""))
+        self.assertEqual(ip, "198.51.100.9")
+        self.assertEqual(self.token_requests, 1)
+
+    async def test_unknown_ip(self):
+        """Test that a missing metadata service yields "Unknown IP"."""
+        ip = await get_external_ip(self.url("/broken"), self.url("/missing"))
+        self.assertEqual(ip, UNKNOWN_IP)
+
+
+class TestExternalIPCache(unittest.IsolatedAsyncioTestCase):
+    """Test the background-refreshed external IP cache."""
+
+    async def test_get_is_immediate(self):
+        """Test that get() returns the cached value without resolving."""
+        calls = 0
+
+        async def resolver() -> str:
+            nonlocal calls
+            calls += 1
+            return "203.0.113.7"
+
+        cache = ExternalIPCache(ttl=3600, resolver=resolver)
+        self.assertEqual(cache.get(), UNKNOWN_IP)
+        await cache.refresh()
+        for _ in range(3):
+            self.assertEqual(cache.get(), "203.0.113.7")
+        self.assertEqual(calls, 1)
+        self.assertFalse(cache.is_stale)
+
+    async def test_failed_refresh_keeps_last_value(self):
+        """Test that an unknown result does not overwrite a known address."""
+        answers = ["203.0.113.7", UNKNOWN_IP]
+
+        async def resolver() -> str:
+            return answers.pop(0)
+
+        cache = ExternalIPCache(resolver=resolver)
+        await cache.refresh()
+        await cache.refresh()
+        self.assertEqual(cache.get(), "203.0.113.7")
+
+    async def test_background_refresh(self):
+        """Test that start() resolves the address in the background."""
+        resolved = asyncio.Event()
+
+        async def resolver() -> str:
+            resolved.set()
+            return "203.0.113.7"
+
+        cache = ExternalIPCache(resolver=resolver)
+        cache.start()
+        await asyncio.wait_for(resolved.wait(), timeout=1)
+        await asyncio.sleep(0)
+        self.assertEqual(cache.get(), "203.0.113.7")
+        await cache.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from typing import List, Optional, Tuple
+from unittest.mock import patch
+
+from api_monitoring.alerting.outbox import AlertOutbox
+from api_monitoring.alerting.sinks import AlertSink, AlertThread, Notification
+
+
+def notification(kind: str) -> Notification:
+    return Notification(kind, "api.example.com", "2024-06-26 12:00:00", "boom")
+
+
+class FakeSink(AlertSink):
+    """Sink recording deliveries, failing while it is down."""
+
+    def __init__(
+        self,
+        name: str = "fake",
+        failures: int = 0,
+        delay: float = 0.0,
+        concurrency: int = 4,
+    ) -> None:
+        super().__init__(name, concurrency=concurrency)
+        self.failures = failures
+        self.delay = delay
+        self.down = False
+        self.next_message_id = 100
+        self.running = 0
+        self.max_running = 0
+        self.sent: List[Tuple[str, Optional[int]]] = []
+        self.times: List[float] = []
+
+    async def send(
+        self, notification: Notification, thread: Optional[AlertThread]
+    ) -> Optional[AlertThread]:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        if self.down or self.failures > 0:
+            self.failures -= 1
+            return None
+        self.sent.append((notification.kind, thread and thread.message_id))
+        self.times.append(time.monotonic())
+        if notification.kind == "alert":
+            self.next_message_id += 1
+            return AlertThread(self.next_message_id)
+        return thread or AlertThread()
+
+
+class TestAlertOutbox(unittest.IsolatedAsyncioTestCase):
+    """Test ordering, retries, fan-out and replay of the alert outbox."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmpdir.name) / "outbox.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_outbox(self, *sinks: AlertSink, **kwargs) -> AlertOutbox:
+        return AlertOutbox(
+            self.path, sinks, retry_delay=0.01, retry_max_delay=0.05, **kwargs
+        )
+
+    async def test_delivers_in_order_after_failures(self):
+        """Test that retries keep the alert, diagnostics, resolution order."""
+        sink = FakeSink(failures=3)
+        outbox = self.make_outbox(sink)
+        await outbox.add("api", notification("alert"))
+        await outbox.add("api", notification("diagnostics"))
+        await outbox.add("api", notification("resolution"))
+        self.assertFalse(outbox.is_open("api"))
+
+        self.assertTrue(await outbox.drain(timeout=2))
+        await outbox.stop()
+
+        self.assertEqual(outbox.retries, 3)
+        self.assertEqual(
+            sink.sent, [("alert", None), ("diagnostics", 101), ("resolution", 101)]
+        )
+
+    async def test_add_does_not_wait_for_delivery(self):
+        """Test that queuing returns at once while the sink is down."""
+        sink = FakeSink()
+        sink.down = True
+        outbox = self.make_outbox(sink)
+
+        await outbox.add("api", notification("alert"))
+        self.assertTrue(outbox.is_open("api"))
+        self.assertEqual(outbox.pending(), 1)
+        self.assertFalse(await outbox.drain(timeout=0.05))
+        await outbox.stop()
+        self.assertEqual(sink.sent, [])
+
+    async def test_disk_writes_do_not_block_the_loop(self):
+        """Test that records are synced off the loop, sharing fsyncs."""
+        sink = FakeSink()
+        sink.down = True
+        outbox = self.make_outbox(sink)
+        sync = os.fsync
+        ticks = 0
+
+        def slow_fsync(fd: int) -> None:
+            time.sleep(0.1)
+            sync(fd)
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        with patch("api_monitoring.alerting.outbox.os.fsync", slow_fsync):
+            entries = await asyncio.gather(
+                *(outbox.add(f"target-{i}", notification("alert")) for i in range(10))
+            )
+        task.cancel()
+        await outbox.stop()
+
+        self.assertGreater(ticks, 5)
+        self.assertEqual(outbox.syncs, 1)
+        self.assertEqual(sorted(entry.id for entry in entries), list(range(1, 11)))
+        self.assertTrue(all(outbox.is_open(f"target-{i}") for i in range(10)))
+
+    async def test_disk_failure_still_delivers(self):
+        """Test that a failed write delivers from memory and rewrites the file."""
+        sink = FakeSink()
+        outbox = self.make_outbox(sink)
+
+        def full_disk(lines: List[str]) -> None:
+            raise OSError(28, "No space left on device")
+
+        with patch.object(outbox, "_append", full_disk):
+            await outbox.add("api", notification("alert"))
+            self.assertTrue(outbox.is_open("api"))
+            self.assertTrue(await outbox.drain(timeout=2))
+            self.assertEqual(sink.sent, [("alert", None)])
+            for _ in range(100):
+                if not outbox._stale:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertFalse(outbox._stale)
+        await outbox.stop()
+
+        sink = FakeSink()
+        restarted = self.make_outbox(sink)
+        self.assertTrue(restarted.is_open("api"))
+        self.assertEqual(restarted.pending(), 0)
+        restarted.start()
+        await restarted.add("api", notification("resolution"))
+        self.assertTrue(await restarted.drain(timeout=2))
+        await restarted.stop()
+        self.assertEqual(sink.sent, [("resolution", 101)])
+
+    async def test_slow_sink_does_not_delay_others(self):
+        """Test that every sink delivers on its own, in parallel."""
+        fast = FakeSink("fast")
+        slow = FakeSink("slow", delay=0.3)
+        broken = FakeSink("broken")
+        broken.down = True
+        outbox = self.make_outbox(fast, slow, broken)
+
+        start = time.monotonic()
+        for target in ("a", "b", "c"):
+            await outbox.add(target, notification("alert"))
+        await asyncio.sleep(0.1)
+
+        self.assertEqual(len(fast.sent), 3)
+        self.assertLess(max(fast.times) - start, 0.1)
+        self.assertEqual(slow.sent, [])
+        await asyncio.sleep(0.3)
+        self.assertEqual(len(slow.sent), 3)
+        await outbox.stop()
+        self.assertEqual(outbox.pending(), 3)
+
+    async def test_sink_concurrency_limit(self):
+        """Test that a sink never runs more deliveries than its limit."""
+        sink = FakeSink(delay=0.02, concurrency=2)
+        outbox = self.make_outbox(sink)
+        for i in range(6):
+            await outbox.add(f"target-{i}", notification("alert"))
+        self.assertTrue(await outbox.drain(timeout=2))
+        await outbox.stop()
+
+        self.assertEqual(len(sink.sent), 6)
+        self.assertEqual(sink.max_running, 2)
+
+    async def test_replay_after_restart(self):
+        """Test that undelivered notifications are sent after a restart."""
+        down = FakeSink()
+        down.down = True
+        outbox = self.make_outbox(down)
+        await outbox.add("api", notification("alert"))
+        await outbox.add("api", notification("diagnostics"))
+        await asyncio.sleep(0.02)
+        await outbox.stop()
+
+        sink = FakeSink()
+        restarted = self.make_outbox(sink)
+        self.assertEqual(restarted.pending("api"), 2)
+        self.assertTrue(restarted.is_open("api"))
+        restarted.start()
+        self.assertTrue(await restarted.drain(timeout=2))
+        await restarted.stop()
+
+        self.assertEqual(sink.sent, [("alert", None), ("diagnostics", 101)])
+
+    async def test_compaction_keeps_undelivered_sinks(self):
+        """Test that a rewrite only replays entries to sinks still owing them."""
+        fast = FakeSink("fast")
+        broken = FakeSink("broken")
+        broken.down = True
+        outbox = self.make_outbox(fast, broken, compact_after=1)
+        await outbox.add("api", notification("alert"))
+        await asyncio.sleep(0.05)
+        await outbox.stop()
+
+        fast, broken = FakeSink("fast"), FakeSink("broken")
+        restarted = self.make_outbox(fast, broken)
+        restarted.start()
+        self.assertTrue(await restarted.drain(timeout=2))
+        await restarted.stop()
+
+        self.assertEqual(fast.sent, [])
+        self.assertEqual(broken.sent, [("alert", None)])
+
+    async def test_open_alert_survives_restart(self):
+        """Test that a resolution after a restart replies to the alert."""
+        sink = FakeSink()
+        outbox = self.make_outbox(sink, compact_after=1)
+        await outbox.add("api", notification("alert"))
+        self.assertTrue(await outbox.drain(timeout=2))
+        await outbox.stop()
+
+        # Compaction left only the state of the open alert
+        records = [json.loads(line) for line in Path(self.path).read_text().split()]
+        self.assertEqual([record["op"] for record in records], ["state"])
+
+        restarted = self.make_outbox(sink)
+        self.assertTrue(restarted.is_open("api"))
+        self.assertEqual(restarted.pending(), 0)
+        await restarted.add("api", notification("resolution"))
+        self.assertTrue(await restarted.drain(timeout=2))
+        await restarted.stop()
+
+        self.assertEqual(sink.sent[-1], ("resolution", 101))
+        self.assertFalse(self.make_outbox(sink).is_open("api"))
+
+    async def test_torn_record_is_skipped(self):
+        """Test that a partly written last line does not break the replay."""
+        down = FakeSink()
+        down.down = True
+        outbox = self.make_outbox(down)
+        await outbox.add("api", notification("alert"))
+        await outbox.stop()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"op":"add","id":2,"tar')
+
+        sink = FakeSink()
+        restarted = self.make_outbox(sink)
+        self.assertEqual(restarted.pending(), 1)
+        restarted.start()
+        self.assertTrue(await restarted.drain(timeout=2))
+        await restarted.stop()
+        self.assertEqual(sink.sent, [("alert", None)])
+
+    async def test_stale_entries_are_dropped(self):
+        """Test that notifications older than max_age are given up."""
+        now = [1000.0]
+        sink = FakeSink()
+        sink.down = True
+        outbox = AlertOutbox(
+            None,
+            [sink],
+            retry_delay=0.01,
+            retry_max_delay=0.01,
+            max_age=60,
+            clock=lambda: now[0],
+        )
+        await outbox.add("api", notification("alert"))
+        await asyncio.sleep(0.03)
+        now[0] += 61
+        self.assertTrue(await outbox.drain(timeout=1))
+
+        self.assertEqual(outbox.dropped, 1)
+        self.assertEqual(sink.sent, [])
+
+    async def test_validation(self):
+        """Test that unknown kinds and duplicate sink names are rejected."""
+        with self.assertRaises(ValueError):
+            await AlertOutbox().add("api", notification("reminder"))
+        with self.assertRaises(ValueError):
+            AlertOutbox(sinks=[FakeSink(), FakeSink()])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import asyncio
+import random
+import time
+import unittest
+from typing import List, Optional
+
+from api_monitoring.monitoring.scheduler import Scheduler, default_phase
+
+
+class CountingJob:
+    """Job that records its start times and takes a fixed time to run."""
+
+    def __init__(self, duration: float = 0.0, retry: Optional[float] = None):
+        self.duration = duration
+        self.retry = retry
+        self.starts: List[float] = []
+
+    async def __call__(self) -> Optional[float]:
+        self.starts.append(time.monotonic())
+        await asyncio.sleep(self.duration)
+        # Ask for an early rerun once, after the first cycle only
+        retry, self.retry = self.retry, None
+        return retry
+
+
+async def run_for(scheduler: Scheduler, seconds: float) -> None:
+    """Run a scheduler for a while and stop it."""
+    task = asyncio.create_task(scheduler.run())
+    await asyncio.sleep(seconds)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+class TestScheduler(unittest.IsolatedAsyncioTestCase):
+    """Test deadline scheduling, jitter and overrun handling."""
+
+    async def test_period_does_not_drift(self):
+        """Test that slow cycles do not stretch the period."""
+        scheduler = Scheduler()
+        job = CountingJob(duration=0.03)
+        scheduled = scheduler.add("a", job, 0.05, phase=0)
+
+        await run_for(scheduler, 0.525)
+
+        self.assertEqual(len(job.starts), 11)
+        origin = scheduled.slot_time(0)
+        for slot, start in enumerate(job.starts):
+            self.assertAlmostEqual(start - origin, slot * 0.05, delta=0.02)
+        self.assertEqual(scheduled.runs, 11)
+        self.assertLess(scheduled.max_lateness, 0.02)
+
+    async def test_phase_and_jitter(self):
+        """Test that cycles start after their phase and within the jitter."""
+        scheduler = Scheduler(rng=random.Random(1))
+        job = CountingJob()
+        scheduled = scheduler.add("a", job, 0.1, phase=0.04, jitter=0.03)
+
+        await run_for(scheduler, 0.32)
+
+        self.assertEqual(len(job.starts), 3)
+        for slot, start in enumerate(job.starts):
+            offset = start - scheduled.slot_time(slot)
+            self.assertGreaterEqual(offset, 0)
+            self.assertLess(offset, 0.03 + 0.02)
+
+    async def test_overrun_skip(self):
+        """Test that slots due during a running cycle are dropped."""
+        scheduler = Scheduler(overrun="skip")
+        job = CountingJob(duration=0.12)
+        scheduled = scheduler.add("a", job, 0.05, phase=0)
+
+        await run_for(scheduler, 0.225)
+
+        # Slots 0 and 3 run, slots 1, 2 and 4 are skipped
+        self.assertEqual(len(job.starts), 2)
+        self.assertEqual(scheduled.skipped, 3)
+        self.assertAlmostEqual(job.starts[1] - scheduled.slot_time(0), 0.15, delta=0.02)
+
+    async def test_overrun_coalesce(self):
+        """Test that missed slots collapse into one run after the cycle."""
+        scheduler = Scheduler(overrun="coalesce")
+        job = CountingJob(duration=0.12)
+        scheduled = scheduler.add("a", job, 0.05, phase=0)
+
+        await run_for(scheduler, 0.14)
+
+        self.assertEqual(len(job.starts), 2)
+        self.assertEqual(scheduled.coalesced, 2)
+        # The coalesced run starts right after the first one, late by its slot
+        self.assertAlmostEqual(job.starts[1] - job.starts[0], 0.12, delta=0.02)
+        self.assertAlmostEqual(scheduled.last_lateness, 0.07, delta=0.02)
+
+    async def test_retry_runs_ahead_of_next_slot(self):
+        """Test that an early rerun does not consume the next slot."""
+        scheduler = Scheduler()
+        job = CountingJob(retry=0.02)
+        scheduled = scheduler.add("a", job, 0.1, phase=0)
+
+        await run_for(scheduler, 0.15)
+
+        self.assertEqual(len(job.starts), 3)
+        origin = scheduled.slot_time(0)
+        self.assertAlmostEqual(job.starts[1] - origin, 0.02, delta=0.015)
+        self.assertAlmostEqual(job.starts[2] - origin, 0.1, delta=0.015)
+
+    async def test_failing_job_keeps_schedule(self):
+        """Test that an exception in a cycle does not stop the job."""
+        calls = []
+
+        async def failing() -> None:
+            calls.append(1)
+            raise RuntimeError("boom")
+
+        scheduler = Scheduler()
+        scheduler.add("a", failing, 0.05, phase=0)
+        await run_for(scheduler, 0.125)
+
+        self.assertEqual(len(calls), 3)
+
+    async def test_remove_cancels_running_cycle(self):
+        """Test that removing a job cancels its cycle and its future slots."""
+        scheduler = Scheduler()
+        job = CountingJob(duration=1.0)
+        scheduled = scheduler.add("a", job, 0.05, phase=0)
+
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.01)
+        scheduler.remove("a")
+        await asyncio.sleep(0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        self.assertEqual(len(job.starts), 1)
+        self.assertFalse(scheduled.running)
+        self.assertNotIn("a", scheduler.jobs)
+
+    async def test_many_jobs_share_one_dispatcher(self):
+        """Test that thousands of jobs run without a task per idle job."""
+        # Debug mode records a traceback for every task, which dominates here
+        asyncio.get_running_loop().set_debug(False)
+        scheduler = Scheduler()
+        jobs = [CountingJob() for _ in range(2000)]
+        for i, job in enumerate(jobs):
+            scheduler.add(f"target-{i}", job, 0.2)
+
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0.3)
+        running = len(asyncio.all_tasks())
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        self.assertTrue(all(len(job.starts) >= 1 for job in jobs))
+        self.assertLess(running, 100)
+
+    def test_add_validation(self):
+        """Test that bad intervals, duplicate names and policies are rejected."""
+        scheduler = Scheduler()
+        with self.assertRaises(ValueError):
+            scheduler.add("a", CountingJob(), 0)
+        scheduler.add("a", CountingJob(), 1)
+        with self.assertRaises(ValueError):
+            scheduler.add("a", CountingJob(), 1)
+        with self.assertRaises(ValueError):
+            Scheduler(overrun="queue")
+
+    def test_default_phase_is_stable_and_spread(self):
+        """Test that phases depend only on the name and spread over the interval."""
+        self.assertEqual(default_phase("a", 60), default_phase("a", 60))
+        phases = [default_phase(f"target-{i}", 60) for i in range(1000)]
+        self.assertTrue(all(0 <= phase < 60 for phase in phases))
+        # Roughly a tenth of the targets fall in every tenth of the interval
+        for decile in range(10):
+            count = sum(1 for phase in phases if decile * 6 <= phase < decile * 6 + 6)
+            self.assertGreater(count, 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from api_monitoring.utils import serialization
+from api_monitoring.utils.serialization import dumps, loads
+
+
+class TestSerialization(unittest.TestCase):
+    """Test that orjson and the standard library produce the same JSON."""
+
+    def test_with_and_without_orjson(self):
+        """Test that both backends write compact JSON and read it back."""
+        data = {"target": "api", "latencies": [1.5, 2.0], "day": date(2024, 6, 26)}
+        outputs = [dumps(data, default=str)]
+        with patch.object(serialization, "orjson", None):
+            outputs.append(dumps(data, default=str))
+            self.assertEqual(loads(outputs[-1])["day"], "2024-06-26")
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(
+            outputs[0],
+            b'{"target":"api","latencies":[1.5,2.0],"day":"2024-06-26"}',
+        )
+
+    def test_unserializable_without_default(self):
+        """Test that values JSON cannot represent are rejected by default."""
+        with self.assertRaises(TypeError):
+            dumps({"value": object()})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,296 @@
+import asyncio
+import email
+import os
+import unittest
+from email.message import Message
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api_monitoring.alerting.dispatcher import TelegramDispatcher
+from api_monitoring.alerting.sinks import (
+    AlertSink,
+    AlertThread,
+    Notification,
+    SlackSink,
+    SmtpSink,
+    TelegramSink,
+    WebhookSink,
+    sinks_from_settings,
+)
+from api_monitoring.alerting.telegram import TelegramAlerter
+from api_monitoring.config import Settings
+from api_monitoring.utils.http import http_session_manager
+from api_monitoring.utils.network import ExternalIPCache
+
+
+def notification(kind: str, **kwargs: Any) -> Notification:
+    return Notification(
+        kind, "api.example.com", "2024-06-26 12:00:00", "<boom>", **kwargs
+    )
+
+
+class SmtpServer:
+    """Minimal local SMTP server keeping the messages it receives."""
+
+    def __init__(self) -> None:
+        self.messages: List[Message] = []
+        self.port = 0
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        writer.write(b"220 localhost ESMTP\r\n")
+        data: Optional[List[bytes]] = None
+        while line := await reader.readline():
+            if data is not None:
+                if line == b".\r\n":
+                    self.messages.append(email.message_from_bytes(b"".join(data)))
+                    data = None
+                    writer.write(b"250 OK\r\n")
+                else:
+                    data.append(line[1:] if line.startswith(b".") else line)
+                continue
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                writer.write(b"250 localhost\r\n")
+            elif command == b"DATA":
+                data = []
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+
+class TestHttpSinks(unittest.IsolatedAsyncioTestCase):
+    """Test the webhook, Slack and Telegram sinks against local servers."""
+
+    async def asyncSetUp(self):
+        """Start a server standing in for a webhook receiver and the Bot API."""
+        self.posts: List[Dict[str, Any]] = []
+        self.calls: List[Dict[str, Any]] = []
+        self.status = 200
+
+        async def webhook(request: web.Request) -> web.Response:
+            self.posts.append(await request.json())
+            return web.Response(status=self.status, text="ok")
+
+        async def send_message(request: web.Request) -> web.Response:
+            self.calls.append({"method": "sendMessage", **dict(await request.post())})
+            return web.json_response({"ok": True, "result": {"message_id": 7}})
+
+        async def edit_message_text(request: web.Request) -> web.Response:
+            self.calls.append(
+                {"method": "editMessageText", **dict(await request.post())}
+            )
+            return web.json_response({"ok": True, "result": {"message_id": 7}})
+
+        app = web.Application()
+        app.router.add_post("/hook", webhook)
+        app.router.add_post("/bottoken/sendMessage", send_message)
+        app.router.add_post("/bottoken/editMessageText", edit_message_text)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        self.ip_cache = ExternalIPCache()
+        self.ip_cache.ip = "203.0.113.7"
+
+    async def asyncTearDown(self):
+        """Stop the server and close the shared session."""
+        await http_session_manager.close()
+        await self.server.close()
+
+    async def test_webhook_posts_json(self):
+        """Test that the webhook receives every field of the notification."""
+        sink = WebhookSink(str(self.server.make_url("/hook")), ip_cache=self.ip_cache)
+        thread = await sink.deliver(notification("alert", comment="note"), None)
+
+        self.assertIsNotNone(thread)
+        self.assertEqual(self.posts[0]["kind"], "alert")
+        self.assertEqual(self.posts[0]["target"], "api.example.com")
+        self.assertEqual(self.posts[0]["error_message"], "<boom>")
+        self.assertEqual(self.posts[0]["comment"], "note")
+        self.assertEqual(self.posts[0]["source_ip"], "203.0.113.7")
+
+    async def test_webhook_error_is_a_failed_delivery(self):
+        """Test that a non-2xx answer is reported for a retry."""
+        self.status = 500
+        sink = WebhookSink(str(self.server.make_url("/hook")), ip_cache=self.ip_cache)
+        self.assertIsNone(await sink.deliver(notification("alert"), None))
+
+    async def test_slack_message(self):
+        """Test that Slack gets escaped mrkdwn text with the trace."""
+        sink = SlackSink(str(self.server.make_url("/hook")), ip_cache=self.ip_cache)
+        trace = "\n".join(f"{i}.|-- 10.0.0.{i}" for i in range(1, 400))
+        await sink.deliver(
+            notification("diagnostics", mtr_output=trace, diagnostics="dns ok"), None
+        )
+        await sink.deliver(notification("resolution"), None)
+
+        text = self.posts[0]["text"]
+        self.assertIn("*Issue detected with API api.example.com*", text)
+        self.assertIn("`&lt;boom&gt;`", text)
+        self.assertIn("```dns ok```", text)
+        self.assertIn("399.|-- 10.0.0.399", text)
+        self.assertIn("lines omitted", text)
+        self.assertIn("resolved", self.posts[1]["text"])
+
+    async def test_telegram_edits_alert_and_replies(self):
+        """Test that the Telegram sink edits the alert and threads the resolution."""
+        alerter = TelegramAlerter(
+            "token",
+            "42",
+            timeout=5,
+            ip_cache=self.ip_cache,
+            api_base_url=str(self.server.make_url("/")),
+        )
+        sink = TelegramSink(alerter)
+
+        thread = await sink.deliver(notification("alert"), None)
+        self.assertEqual(thread, AlertThread(7, False))
+        await sink.deliver(notification("diagnostics", mtr_output="hop1"), thread)
+        await sink.deliver(notification("resolution"), thread)
+
+        self.assertEqual(
+            [call["method"] for call in self.calls],
+            ["sendMessage", "editMessageText", "sendMessage"],
+        )
+        self.assertIn("Collecting diagnostics", self.calls[0]["text"])
+        self.assertEqual(self.calls[1]["message_id"], "7")
+        self.assertIn("hop1", self.calls[1]["text"])
+        self.assertEqual(self.calls[2]["reply_to_message_id"], "7")
+
+    async def test_telegram_alerts_share_one_digest(self):
+        """Test that more alerts than the concurrency limit share one digest."""
+        dispatcher = TelegramDispatcher(rate=100, burst=5, digest_window=0.2)
+        alerter = TelegramAlerter(
+            "token",
+            "42",
+            timeout=5,
+            ip_cache=self.ip_cache,
+            api_base_url=str(self.server.make_url("/")),
+            dispatcher=dispatcher,
+        )
+        sink = TelegramSink(alerter, concurrency=2)
+        try:
+            threads = await asyncio.gather(
+                *(
+                    sink.deliver(
+                        Notification("alert", f"api-{i}", "2024-06-26 12:00:00"),
+                        None,
+                    )
+                    for i in range(6)
+                )
+            )
+        finally:
+            await dispatcher.stop()
+
+        self.assertEqual(dispatcher.digests, 1)
+        self.assertEqual(len(self.calls), 1)
+        self.assertIn("6 APIs", self.calls[0]["text"])
+        self.assertEqual(threads, [AlertThread(7, True)] * 6)
+
+
+class TestSmtpSink(unittest.IsolatedAsyncioTestCase):
+    """Test the SMTP sink against a local SMTP server."""
+
+    async def asyncSetUp(self):
+        self.smtp = SmtpServer()
+        await self.smtp.start()
+
+    async def asyncTearDown(self):
+        await self.smtp.close()
+
+    async def test_mails_are_threaded(self):
+        """Test that follow-ups reply to the alert e-mail."""
+        ip_cache = ExternalIPCache()
+        ip_cache.ip = "203.0.113.7"
+        sink = SmtpSink(
+            "127.0.0.1",
+            "monitor@example.com",
+            ["ops@example.com", "oncall@example.com"],
+            port=self.smtp.port,
+            starttls=False,
+            timeout=5,
+            ip_cache=ip_cache,
+        )
+
+        thread = await sink.deliver(notification("alert"), None)
+        assert thread is not None
+        await sink.deliver(notification("diagnostics", mtr_output="hop1"), thread)
+        await sink.deliver(notification("resolution"), thread)
+
+        alert, diagnostics, resolution = self.smtp.messages
+        self.assertEqual(alert["Message-ID"], thread.message_id)
+        self.assertEqual(alert["To"], "ops@example.com, oncall@example.com")
+        self.assertIn("Error: <boom>", alert.get_payload())
+        self.assertEqual(diagnostics["In-Reply-To"], thread.message_id)
+        self.assertIn("hop1", diagnostics.get_payload())
+        self.assertTrue(resolution["Subject"].startswith("Re: "))
+
+    async def test_unreachable_server(self):
+        """Test that a refused connection is a failed delivery."""
+        port = self.smtp.port
+        await self.smtp.close()
+        sink = SmtpSink("127.0.0.1", "a@example.com", ["b@example.com"], port=port)
+        self.assertIsNone(await sink.deliver(notification("alert"), None))
+
+
+class TestSinksFromSettings(unittest.TestCase):
+    """Test building the configured sinks."""
+
+    @patch.dict(
+        os.environ,
+        {
+            "ENDPOINT_URL": "test-api.example.com",
+            "AWS_ACCESS_KEY_ID": "test-access-key",
+            "AWS_SECRET_ACCESS_KEY": "test-secret-key",
+            "ALERT_WEBHOOK_URL": "http://127.0.0.1/hook",
+            "SLACK_WEBHOOK_URL": "http://127.0.0.1/slack",
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_RECIPIENTS": '["ops@example.com"]',
+        },
+        clear=True,
+    )
+    def test_sinks_without_telegram(self):
+        """Test that other sinks make the Telegram settings optional."""
+
+        class TestSettings(Settings):
+            model_config = Settings.model_config.copy()
+            model_config.update({"env_file": None})
+
+        settings = TestSettings()
+        alerter = TelegramAlerter("", "")
+        sinks = sinks_from_settings(settings, alerter)
+        self.assertEqual([sink.name for sink in sinks], ["webhook", "slack", "smtp"])
+        smtp = sinks[2]
+        assert isinstance(smtp, SmtpSink)
+        self.assertEqual(smtp.recipients, ["ops@example.com"])
+
+    def test_sink_must_implement_send(self):
+        """Test that a sink without send() cannot be created."""
+
+        class IncompleteSink(AlertSink):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteSink("incomplete")  # type: ignore[abstract]
+
+
+if __name__ == "__main__":
+    unittest.main()
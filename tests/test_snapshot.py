@@ -0,0 +1,190 @@
+import asyncio
+import json
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+import pytest
+
+from api_monitoring.monitoring.alert_state import (
+    API_FAILURE,
+    NO_ACTION,
+    OPEN_ALERT,
+    RESOLVE_ALERT,
+    SUCCESS,
+    AlertState,
+)
+from api_monitoring.storage.snapshot import (
+    StateSnapshot,
+    decode_floats,
+    encode_floats,
+)
+
+
+class TestStateSnapshot(unittest.IsolatedAsyncioTestCase):
+    """Test writing and restoring the state snapshot."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.tmpdir.name) / "state.json")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    async def test_round_trip(self):
+        """Test that a written state is restored by the next run."""
+        snapshot = StateSnapshot(self.path)
+        snapshot.update("api", {"alert": {"state": 2}})
+        await snapshot.stop()
+        self.assertEqual(snapshot.writes, 1)
+        self.assertFalse(Path(self.path + ".tmp").exists())
+
+        restored = StateSnapshot(self.path)
+        self.assertEqual(restored.restore("api"), {"alert": {"state": 2}})
+        self.assertIsNone(restored.restore("other"))
+
+    async def test_unchanged_state_is_not_written(self):
+        """Test that only changes make the snapshot dirty."""
+        snapshot = StateSnapshot(self.path)
+        snapshot.update("api", {"alert": 1})
+        await snapshot.flush()
+        snapshot.update("api", {"alert": 1})
+        await snapshot.stop()
+        self.assertEqual(snapshot.writes, 1)
+
+    async def test_urgent_update_is_written_at_once(self):
+        """Test that an opened alert does not wait for the interval."""
+        snapshot = StateSnapshot(self.path, interval=60)
+        snapshot.start()
+        try:
+            snapshot.update("api", {"alert": 1}, urgent=True)
+            for _ in range(100):
+                if snapshot.writes:
+                    break
+                await asyncio.sleep(0.01)
+            self.assertEqual(snapshot.writes, 1)
+        finally:
+            await snapshot.stop()
+
+    async def test_unrun_targets_are_kept(self):
+        """Test that restored targets survive until they report a new state."""
+        snapshot = StateSnapshot(self.path)
+        snapshot.update("a", {"n": 1})
+        snapshot.update("b", {"n": 1})
+        await snapshot.stop()
+
+        restored = StateSnapshot(self.path)
+        restored.restore("a")
+        restored.restore("b")
+        restored.update("a", {"n": 2})
+        await restored.stop()
+        with open(self.path) as f:
+            targets = json.load(f)["targets"]
+        # Targets no monitor asked for, e.g. removed ones, are dropped
+        self.assertEqual(targets, {"a": {"n": 2}, "b": {"n": 1}})
+
+    async def test_corrupt_file_is_ignored(self):
+        """Test that an unreadable snapshot starts the targets fresh."""
+        Path(self.path).write_text('{"version": 1, "targets": {"api"')
+        snapshot = StateSnapshot(self.path)
+        self.assertIsNone(snapshot.restore("api"))
+        Path(self.path).write_text('{"version": 99, "targets": {"api": {}}}')
+        self.assertIsNone(StateSnapshot(self.path).restore("api"))
+
+    async def test_disabled_without_path(self):
+        """Test that no file is written without a path."""
+        snapshot = StateSnapshot("")
+        snapshot.start()
+        snapshot.update("api", {"n": 1}, urgent=True)
+        await snapshot.stop()
+        self.assertEqual(snapshot.writes, 0)
+
+    def test_encode_floats(self):
+        """Test the compact latency encoding."""
+        values = [0.125, 0.5, 2.0]
+        self.assertEqual(list(decode_floats(encode_floats(values))), values)
+        self.assertEqual(list(decode_floats("")), [])
+
+    async def test_restores_many_targets_quickly(self):
+        """Test that restoring thousands of targets takes milliseconds."""
+        latencies = encode_floats([0.05] * 200)
+        snapshot = StateSnapshot(self.path)
+        for i in range(5000):
+            state = AlertState(flap_window=20)
+            state.observe(API_FAILURE, 0.0)
+            snapshot.update(
+                f"target-{i}", {"alert": state.dump(1000.0), "latencies": latencies}
+            )
+        await snapshot.stop()
+
+        start = time.perf_counter()
+        restored = StateSnapshot(self.path)
+        for i in range(5000):
+            saved = restored.restore(f"target-{i}")
+            assert saved is not None
+            AlertState(flap_window=20).load(saved["alert"], 1000.0)
+            decode_floats(saved["latencies"])
+        elapsed = time.perf_counter() - start
+        # Generous bound for slow CI machines
+        self.assertLess(elapsed, 1.0)
+
+
+@pytest.mark.usefixtures("fake_clock")
+class TestAlertStateDump(unittest.TestCase):
+    """Test saving and loading the alert state machine."""
+
+    def test_open_alert_survives_restart(self):
+        """Test that a restored alert neither re-alerts nor loses its hold."""
+        self.clock.now = 100.0
+        state = AlertState(api_threshold=2, min_hold=300, clock=self.clock)
+        state.observe(API_FAILURE)
+        state.observe(API_FAILURE)
+        data = state.dump(now=10_000.0)
+
+        # New process: the monotonic clock restarted, 60s passed on the wall
+        self.clock.now = 5.0
+        restored = AlertState(api_threshold=2, min_hold=300, clock=self.clock)
+        restored.load(data, now=10_060.0)
+        self.assertTrue(restored.alerting)
+        self.assertEqual(restored.cause, "api")
+        self.assertEqual(restored.observe(API_FAILURE), NO_ACTION)
+        # 60s of the 300s hold passed before the restart
+        self.clock.now = 5.0 + 239
+        self.assertEqual(restored.observe(SUCCESS), NO_ACTION)
+        self.clock.now = 5.0 + 240
+        self.assertEqual(restored.observe(SUCCESS), RESOLVE_ALERT)
+
+    def test_counters_survive_restart(self):
+        """Test that failures below the threshold keep counting."""
+        state = AlertState(api_threshold=3)
+        state.observe(API_FAILURE)
+        state.observe(API_FAILURE)
+        restored = AlertState(api_threshold=3)
+        restored.load(state.dump(0.0), 0.0)
+        self.assertEqual(restored.api_failures, 2)
+        self.assertEqual(restored.observe(API_FAILURE), OPEN_ALERT)
+
+    def test_invalid_state_leaves_machine_untouched(self):
+        """Test that a bad snapshot entry is rejected as a whole."""
+        state = AlertState()
+        data = AlertState().dump(0.0)
+        data["api_failures"] = 5
+        data["state"] = 7
+        with self.assertRaises(ValueError):
+            state.load(data, 0.0)
+        self.assertEqual(state.api_failures, 0)
+
+    def test_history_fits_new_flap_window(self):
+        """Test that a shrunk flap window drops older outcomes."""
+        state = AlertState(flap_window=20)
+        for _ in range(20):
+            state.observe(API_FAILURE, 0.0)
+        restored = AlertState(flap_window=5)
+        restored.load(state.dump(0.0), 0.0)
+        self.assertEqual(restored.history, 0b11111)
+        self.assertEqual(restored.checks, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from typing import Any, Dict, List
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from api_monitoring.alerting.dispatcher import MESSAGE_LIMIT
+from api_monitoring.alerting.telegram import TelegramAlerter
+from api_monitoring.utils.http import http_session_manager
+from api_monitoring.utils.network import ExternalIPCache
+
+
+class TestTelegramAlerter(unittest.IsolatedAsyncioTestCase):
+    """Test the Telegram alerter against a local stand-in Bot API."""
+
+    async def asyncSetUp(self):
+        """Start a fake Bot API recording every call."""
+        self.calls: List[Dict[str, Any]] = []
+        self.edit_status = 200
+        self.next_message_id = 100
+
+        async def send_message(request: web.Request) -> web.Response:
+            data = dict(await request.post())
+            self.calls.append({"method": "sendMessage", **data})
+            self.next_message_id += 1
+            return web.json_response(
+                {"ok": True, "result": {"message_id": self.next_message_id}}
+            )
+
+        async def edit_message_text(request: web.Request) -> web.Response:
+            data = dict(await request.post())
+            self.calls.append({"method": "editMessageText", **data})
+            if self.edit_status != 200:
+                return web.json_response(
+                    {"ok": False, "description": "Bad Request"},
+                    status=self.edit_status,
+                )
+            return web.json_response({"ok": True, "result": {"message_id": 1}})
+
+        app = web.Application()
+        app.router.add_post("/bottoken/sendMessage", send_message)
+        app.router.add_post("/bottoken/editMessageText", edit_message_text)
+        self.server = TestServer(app)
+        await self.server.start_server()
+
+        ip_cache = ExternalIPCache()
+        ip_cache.ip = "203.0.113.7"
+        self.alerter = TelegramAlerter(
+            "token",
+            "42",
+            timeout=5,
+            ip_cache=ip_cache,
+            api_base_url=str(self.server.make_url("/")),
+        )
+
+    async def asyncTearDown(self):
+        """Stop the server and close the shared session."""
+        await http_session_manager.close()
+        await self.server.close()
+
+    async def test_initial_alert_then_edit(self):
+        """Test that the minimal alert is edited in place with diagnostics."""
+        self.assertTrue(await self.alerter.send_initial_alert("api", "boom"))
+        self.assertEqual(self.alerter.alert_message_id, 101)
+        self.assertIn("Collecting diagnostics", self.calls[0]["text"])
+        self.assertIn("203.0.113.7", self.calls[0]["text"])
+
+        self.assertTrue(
+            await self.alerter.enrich_alert(
+                "api", "hop1\nhop2", "boom", None, "dns: ok"
+            )
+        )
+        edit = self.calls[1]
+        self.assertEqual(edit["method"], "editMessageText")
+        self.assertEqual(edit["message_id"], "101")
+        self.assertIn("hop1", edit["text"])
+        self.assertIn("dns: ok", edit["text"])
+        self.assertNotIn("Collecting diagnostics", edit["text"])
+
+    async def test_reply_when_edit_fails(self):
+        """Test that diagnostics are threaded as a reply if editing fails."""
+        self.edit_status = 400
+        await self.alerter.send_initial_alert("api", "boom")
+        self.assertTrue(await self.alerter.enrich_alert("api", "hop1", "boom"))
+        reply = self.calls[2]
+        self.assertEqual(reply["method"], "sendMessage")
+        self.assertEqual(reply["reply_to_message_id"], "101")
+
+    async def test_resolution_replies_to_alert(self):
+        """Test that the resolution is threaded under the alert."""
+        await self.alerter.send_alert("api", "hop1", "boom")
+        self.assertTrue(await self.alerter.send_resolution("api"))
+        self.assertIsNone(self.alerter.alert_message_id)
+        self.assertEqual(self.calls[1]["reply_to_message_id"], "101")
+
+    async def test_long_trace_fits_one_message(self):
+        """Test that a long trace is shortened, keeping its header and last hops."""
+        trace = "\n".join(
+            ["Start: 2024-06-26", "HOST: monitor   Loss%   Snt   Last"]
+            + [f"{i}.|-- 10.0.{i}.1 <&> {'x' * 60}" for i in range(1, 200)]
+        )
+        text = self.alerter.format_alert("api", "boom", mtr_output=trace)
+        self.assertLessEqual(len(text), MESSAGE_LIMIT)
+        self.assertIn("HOST: monitor", text)
+        self.assertIn("199.|-- 10.0.199.1 &lt;&amp;&gt;", text)
+        self.assertIn("lines omitted", text)
+        self.assertTrue(text.rstrip().endswith("</pre>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
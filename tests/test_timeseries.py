@@ -0,0 +1,233 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from typing import List
+from unittest.mock import patch
+
+from api_monitoring.monitoring.mtr import MtrHop, MtrTrace
+from api_monitoring.monitoring.results import ProbeResult
+from api_monitoring.storage.timeseries import (
+    HISTOGRAM_SIZE,
+    RECORD,
+    TimeSeriesStore,
+)
+from api_monitoring.utils.timings import PhaseTimings
+
+# 2024-06-26 00:00:00 UTC
+DAY_START = 1719360000.0
+
+
+def trace(*hosts: str, avg: float = 1.0) -> MtrTrace:
+    """Build a trace through the given hosts."""
+    hops = [
+        MtrHop(i, host, 0.0, 10, avg, avg, avg, avg, 0.0)
+        for i, host in enumerate(hosts, 1)
+    ]
+    return MtrTrace("api.example.com", hops)
+
+
+def api_result(total: float, success: bool = True) -> ProbeResult:
+    """Build an API probe result with a total latency in seconds."""
+    return ProbeResult(
+        success,
+        None if success else "boom",
+        None if success else "Timeout",
+        timings=PhaseTimings(total=total, ttfb=total / 2),
+    )
+
+
+class TestTimeSeriesStore(unittest.TestCase):
+    """Test appending, querying and retention of probe results."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = self.tmpdir.name
+        self.store = TimeSeriesStore(self.directory)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_records_in_range(self):
+        """Test that range reads return only the matching records."""
+        for i in range(100):
+            target = "a" if i % 2 == 0 else "b"
+            self.store.append(target, "api", api_result(0.1), DAY_START + i)
+
+        records = list(self.store.records(DAY_START + 10, DAY_START + 20, "a"))
+        self.assertEqual(
+            [r.timestamp - DAY_START for r in records], list(range(10, 20, 2))
+        )
+        self.assertEqual(records[0].target, "a")
+        self.assertEqual(records[0].status, "ok")
+        self.assertIsNone(records[0].dns_ms)
+        self.assertAlmostEqual(records[0].total_ms, 100.0, places=3)
+        self.assertEqual(len(list(self.store.records(DAY_START, DAY_START + 100))), 100)
+        self.assertEqual(list(self.store.records(DAY_START, DAY_START + 100, "x")), [])
+
+    def test_records_across_days(self):
+        """Test that reads span daily segments."""
+        self.store.append("a", "api", api_result(0.1), DAY_START - 10)
+        self.store.append("a", "api", api_result(0.1), DAY_START + 10)
+        records = list(self.store.records(DAY_START - 60, DAY_START + 60))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(len(list(Path(self.directory, "raw").glob("*.bin"))), 2)
+
+    def test_raw_summary(self):
+        """Test exact percentiles over a short range."""
+        for i in range(100):
+            self.store.append("a", "api", api_result((i + 1) / 1000), DAY_START + i)
+        self.store.append("a", "api", api_result(5.0, success=False), DAY_START + 100)
+
+        summary = self.store.summarize("a", DAY_START, DAY_START + 3600)
+        self.assertEqual(summary.source, "raw")
+        self.assertEqual(summary.count, 101)
+        self.assertEqual(summary.failures, 1)
+        self.assertAlmostEqual(summary.min_ms, 1.0, places=3)
+        self.assertAlmostEqual(summary.p50_ms, 51.0, places=3)
+        self.assertAlmostEqual(summary.max_ms, 5000.0, places=3)
+
+    def test_rollup_summary(self):
+        """Test that long ranges are answered from merged hourly rollups."""
+        # One probe a minute for two days, 10 ms except for 200 ms spikes
+        for i in range(2 * 24 * 60):
+            total = 0.2 if i % 100 == 0 else 0.01
+            self.store.append("a", "api", api_result(total), DAY_START + i * 60)
+        self.store.close()
+
+        store = TimeSeriesStore(self.directory)
+        summary = store.summarize("a", DAY_START, DAY_START + 7 * 86400)
+        self.assertEqual(summary.source, "rollup_1h")
+        self.assertEqual(summary.count, 2 * 24 * 60)
+        self.assertAlmostEqual(summary.min_ms, 10.0, places=3)
+        self.assertAlmostEqual(summary.max_ms, 200.0, places=3)
+        self.assertAlmostEqual(summary.p50_ms, 10.0, delta=2.0)
+        self.assertGreater(summary.p99_ms, 100.0)
+
+        minute_rollups = store.rollups("a", DAY_START, DAY_START + 3600, 60)
+        self.assertEqual(len(minute_rollups), 60)
+        store.close()
+
+    def test_open_buckets_are_queryable(self):
+        """Test that rollups include buckets still open in memory."""
+        self.store.append("a", "api", api_result(0.01), DAY_START)
+        rollups = self.store.rollups("a", DAY_START, DAY_START + 3600, 3600)
+        self.assertEqual(len(rollups), 1)
+        self.assertEqual(rollups[0].samples, 1)
+
+    def test_open_bucket_memory_is_bounded(self):
+        """Test that an open bucket keeps a histogram, not every latency."""
+        for i in range(5000):
+            total = (i % 100 + 1) / 1000
+            self.store.append("a", "api", api_result(total), DAY_START + i * 0.5)
+        (rollup,) = self.store.rollups("a", DAY_START, DAY_START + 3600, 3600)
+        self.assertEqual(rollup.samples, 5000)
+        self.assertEqual(sum(rollup.histogram), 5000)
+        self.assertAlmostEqual(rollup.p50_ms, 50.0, delta=5.0)
+        self.assertAlmostEqual(rollup.p99_ms, 99.0, delta=10.0)
+        for buckets in self.store._buckets.values():
+            for bucket in buckets.values():
+                self.assertEqual(len(bucket.histogram), HISTOGRAM_SIZE)
+
+    def test_truncated_record_is_ignored(self):
+        """Test that a partially written trailing record is skipped."""
+        self.store.append("a", "api", api_result(0.01), DAY_START)
+        self.store.flush()
+        with open(Path(self.directory, "raw", "20240626.bin"), "ab") as f:
+            f.write(b"\x00" * (RECORD.size // 2))
+        self.assertEqual(len(list(self.store.records(DAY_START, DAY_START + 60))), 1)
+
+    def test_retention(self):
+        """Test that segments older than the retention period are deleted."""
+        self.store.append("a", "api", api_result(0.01), DAY_START)
+        self.store.append("a", "api", api_result(0.01), DAY_START + 10 * 86400)
+        self.store.flush()
+        self.store.apply_retention(now=DAY_START + 10 * 86400)
+        days = sorted(p.stem for p in Path(self.directory, "raw").glob("*.bin"))
+        self.assertEqual(days, ["20240706"])
+
+    def test_writes_run_in_the_writer_thread(self):
+        """Test that appends hand every disk write to the writer thread."""
+        store = TimeSeriesStore(self.directory, flush_interval=0)
+        threads: List[str] = []
+        append_files = TimeSeriesStore._append_files
+        write_symbols = TimeSeriesStore._write_symbols
+
+        def recording_append_files(pending):
+            threads.append(threading.current_thread().name)
+            append_files(pending)
+
+        def recording_write_symbols(self, text):
+            threads.append(threading.current_thread().name)
+            write_symbols(self, text)
+
+        with (
+            patch.object(
+                TimeSeriesStore, "_append_files", staticmethod(recording_append_files)
+            ),
+            patch.object(TimeSeriesStore, "_write_symbols", recording_write_symbols),
+        ):
+            store.append("a", "api", api_result(0.01), DAY_START)
+            store.append_path("a", trace("10.0.0.1"), DAY_START)
+            store.append("a", "api", api_result(0.01), DAY_START + 1)
+            store.close()
+
+        self.assertGreaterEqual(len(threads), 3)
+        self.assertTrue(all(name.startswith("timeseries-writer") for name in threads))
+        self.assertEqual(len(list(store.records(DAY_START, DAY_START + 60))), 2)
+
+    def test_path_changes(self):
+        """Test that only route changes are stored and can be queried."""
+        route_a = ("10.0.0.1", "10.0.0.2", "10.0.0.3")
+        route_b = ("10.0.0.1", "10.9.0.2", "10.0.0.3")
+        recorded = [
+            self.store.append_path("a", trace(*route, avg=i), DAY_START + i * 60)
+            for i, route in enumerate(
+                [route_a, route_a, route_a, route_b, route_b, route_a]
+            )
+        ]
+        self.assertEqual(recorded, [True, False, False, True, False, True])
+        self.store.append_path("b", trace(*route_b), DAY_START)
+
+        changes = self.store.path_changes("a")
+        self.assertEqual([c.timestamp - DAY_START for c in changes], [0, 180, 300])
+        self.assertEqual([hop.host for hop in changes[1].hops], list(route_b))
+        # A route seen again reuses its first hop statistics
+        self.assertEqual(changes[0].route_hash, changes[2].route_hash)
+        self.assertEqual(changes[2].hops[0].avg, 0.0)
+        self.assertEqual(
+            len(self.store.path_changes("a", DAY_START + 60, DAY_START + 240)), 1
+        )
+        self.assertEqual(
+            self.store.path_at("a", DAY_START + 200).hops[1].host, "10.9.0.2"
+        )
+        self.assertIsNone(self.store.path_at("a", DAY_START - 1))
+        self.assertEqual(self.store.path_changes("x"), [])
+
+        # Six traces of two routes: two routes stored, three 16 byte changes
+        self.store.flush()
+        routes = Path(self.directory, "paths", "routes.jsonl").read_text()
+        self.assertEqual(len(routes.splitlines()), 2)
+        self.assertEqual(Path(self.directory, "paths", "0.bin").stat().st_size, 48)
+
+    def test_path_history_survives_reopen(self):
+        """Test that a reopened store continues the route of every target."""
+        self.store.append_path("a", trace("10.0.0.1", "10.0.0.2"), DAY_START)
+        self.store.close()
+
+        store = TimeSeriesStore(self.directory)
+        try:
+            self.assertFalse(
+                store.append_path("a", trace("10.0.0.1", "10.0.0.2"), DAY_START + 60)
+            )
+            self.assertTrue(store.append_path("a", trace("10.0.0.1"), DAY_START + 120))
+            changes = store.path_changes("a")
+            self.assertEqual(len(changes), 2)
+            self.assertEqual(len(changes[0].hops), 2)
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()